@@ -11,7 +11,7 @@ Security Notes:
 - Always test with DRY_RUN=true first
 
 Usage:
-    python auto_claim.py [--dry-run] [--safe-address ADDRESS]
+    python auto_claim.py [--dry-run] [--safe-address ADDRESS] [--batch]
 """
 
 import os
@@ -27,6 +27,9 @@ from claimer_core.position_fetcher import fetchPositions, create_session
 from claimer_core.claim_filter import filterClaimables
 from claimer_core.tx_builder import buildRedeemTx
 from claimer_core.tx_sender import submitToSafe, submitDirect
+from claimer_core.tx_batcher import submitBatchToSafe
+from claimer_core.tx_manager import getTxManager
+from claimer_core.receipt_tracker import trackReceipts
 from claimer_core.tx_sender_magic import submitViaPolymarketClient
 from poly_data.polymarket_client import PolymarketClient
 from claimer_core.logger_config import setup_logger
@@ -62,6 +65,7 @@ def validate_config() -> Dict[str, str]:
     config['RPC_URL'] = os.getenv('POLYGON_RPC_URL', 'https://polygon-rpc.com')
     config['SAFE_ADDRESS'] = os.getenv('PROXY_ADDRESS')  # Gnosis Safe address
     config['DRY_RUN'] = os.getenv('DRY_RUN', 'false').lower() == 'true'
+    config['CLAIM_BATCH'] = os.getenv('CLAIM_BATCH', 'false').lower() == 'true'
     
     # Ensure wallet address is checksummed
     config['WALLET_ADDRESS'] = to_checksum_address(config['WALLET_ADDRESS'])
@@ -71,7 +75,8 @@ def validate_config() -> Dict[str, str]:
 def main(
     dry_run: bool = False,
     safe_address: Optional[str] = None,
-    rpc_url: Optional[str] = None
+    rpc_url: Optional[str] = None,
+    batch: bool = False
 ):
     """
     Main execution function for auto-claiming.
@@ -80,6 +85,7 @@ def main(
         dry_run: If True, only simulate without sending transactions
         safe_address: Optional Gnosis Safe address (if None, uses direct execution)
         rpc_url: Optional Polygon RPC URL
+        batch: If True, redeem through one Safe multiSend transaction (requires a Safe)
     """
     try:
         logger.info("=" * 80)
@@ -96,6 +102,8 @@ def main(
             config['SAFE_ADDRESS'] = safe_address
         if rpc_url:
             config['RPC_URL'] = rpc_url
+        if batch:
+            config['CLAIM_BATCH'] = True
         
         logger.info(f"Wallet: {config['WALLET_ADDRESS']}")
         logger.info(f"RPC: {config['RPC_URL']}")
@@ -104,6 +112,11 @@ def main(
             logger.info(f"Safe Address: {config['SAFE_ADDRESS']}")
         else:
             logger.info("Mode: Direct execution (not using Safe)")
+        if config['CLAIM_BATCH']:
+            if config['SAFE_ADDRESS']:
+                logger.info("Batch: redeems go out in one Safe multiSend transaction")
+            else:
+                logger.warning("⚠️  Batch mode needs a Safe address - sending one transaction per position")
         
         if config['DRY_RUN']:
             logger.warning("⚠️  DRY RUN MODE - No transactions will be sent")
@@ -115,6 +128,9 @@ def main(
             raise ConnectionError(f"Failed to connect to RPC: {config['RPC_URL']}")
         logger.info("✓ Connected to Polygon")
         
+        # Shared nonce/gas manager: transactions go out back to back, receipts are awaited at the end
+        tx_manager = None if config['DRY_RUN'] else getTxManager(web3, config['PRIVATE_KEY'])
+        
         # Check if using Magic Link (funder address matches wallet address)
         # If so, use PolymarketClient instead of direct signing
         use_magic_link = False
@@ -197,7 +213,36 @@ def main(
         logger.info("=" * 80)
         
         results = []
-        for idx, item in enumerate(tx_list, 1):
+        # A single claim is batched too: SafeBatcher sends one-item batches, submitToSafe sends nothing
+        use_batch = (config['CLAIM_BATCH'] and config['SAFE_ADDRESS'] and not use_magic_link
+                     and not config['DRY_RUN'] and len(tx_list) > 0)
+        if use_batch:
+            try:
+                batch_results = submitBatchToSafe(
+                    [item['tx_data'] for item in tx_list],
+                    config['SAFE_ADDRESS'],
+                    web3,
+                    config['PRIVATE_KEY'],
+                    tx_manager=tx_manager
+                )
+                # One result per position, so the summary counts positions as before
+                for batch_result in batch_results:
+                    for position_info in batch_result.get('positions', []):
+                        result = {k: v for k, v in batch_result.items() if k != 'positions'}
+                        result['position_info'] = position_info
+                        results.append(result)
+            except Exception as e:
+                logger.error(f"❌ Batch transaction failed: {e}")
+                results.extend({
+                    'status': 'error',
+                    'error': str(e),
+                    'position_info': item['tx_data'].get('position_info', {})
+                } for item in tx_list)
+            tx_list_sequential = []
+        else:
+            tx_list_sequential = tx_list
+
+        for idx, item in enumerate(tx_list_sequential, 1):
             claimable = item['claimable']
             tx_data = item['tx_data']
             position_info = tx_data.get('position_info', {})
@@ -224,7 +269,10 @@ def main(
                 logger.info(f"  Data: (not encoded - will be encoded on execution)")
             
             if config['DRY_RUN']:
-                logger.info("  [DRY RUN] Would execute transaction")
+                if config['CLAIM_BATCH'] and config['SAFE_ADDRESS']:
+                    logger.info("  [DRY RUN] Would include in Safe multiSend batch")
+                else:
+                    logger.info("  [DRY RUN] Would execute transaction")
                 results.append({
                     'status': 'dry_run',
                     'position_info': position_info,
@@ -237,7 +285,8 @@ def main(
                         logger.info("  Using PolymarketClient (Magic Link)")
                         result = submitViaPolymarketClient(
                             claimable,
-                            pm_client
+                            pm_client,
+                            tx_manager=tx_manager
                         )
                         if result.get('status') == 'requires_manual_action':
                             logger.warning("  ⚠️  Magic Link requires manual claim via Polymarket UI")
@@ -255,7 +304,9 @@ def main(
                         result = submitDirect(
                             tx_data,
                             web3,
-                            config['PRIVATE_KEY']
+                            config['PRIVATE_KEY'],
+                            tx_manager=tx_manager,
+                            wait=False
                         )
                     
                     results.append(result)
@@ -269,6 +320,10 @@ def main(
                         'position_info': position_info
                     })
         
+        # Track the receipts of everything sent above concurrently
+        if not config['DRY_RUN']:
+            trackReceipts(web3, results, tx_manager=tx_manager)
+        
         # Final summary
         logger.info("\n" + "=" * 80)
         logger.info("FINAL SUMMARY")
@@ -279,7 +334,7 @@ def main(
             logger.info(f"Total redeemable: ${total_redeemable:.2f}")
         else:
             successful = sum(1 for r in results if r.get('status') == 'success')
-            failed = sum(1 for r in results if r.get('status') in ['error', 'failed'])
+            failed = sum(1 for r in results if r.get('status') in ['error', 'failed', 'replaced'])
             pending = sum(1 for r in results if r.get('status') == 'pending')
             
             logger.info(f"Successful: {successful}")
@@ -315,13 +370,19 @@ if __name__ == "__main__":
         type=str,
         help='Polygon RPC URL (overrides POLYGON_RPC_URL from .env)'
     )
+    parser.add_argument(
+        '--batch',
+        action='store_true',
+        help='Redeem all positions in one Safe multiSend transaction (overrides CLAIM_BATCH from .env)'
+    )
     
     args = parser.parse_args()
     
     main(
         dry_run=args.dry_run,
         safe_address=args.safe_address,
-        rpc_url=args.rpc_url
+        rpc_url=args.rpc_url,
+        batch=args.batch
     )
 
 
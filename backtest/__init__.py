@@ -0,0 +1,22 @@
+"""
+Backtest offline da lógica de cotação sobre gravações do feed de mercado.
+
+- tape: decodifica as gravações (poly_data/feed_recorder.py) em arrays por mercado
+- book: book do token1 em arrays de ticks
+- fills: ordens simuladas e modelos de preenchimento
+- engine: perform_trade simulado (mesmas funções de trading_utils) + métricas
+- sweep: grade de parâmetros × mercados num pool de processos (fitas via mmap)
+"""
+from backtest.book import ArrayBook, TICK_SCALE
+from backtest.tape import MarketTape, load_tapes, save_tape, open_tape
+from backtest.fills import SimOrder, TouchFillModel, QueuePositionFillModel, FILL_MODELS
+from backtest.engine import Backtest, BacktestResult, run_backtest
+from backtest.sweep import param_grid, prepare_tapes, run_sweep, rank_param_sets, failed_param_sets, hyperparameter_rows
+
+__all__ = [
+    'ArrayBook', 'TICK_SCALE',
+    'MarketTape', 'load_tapes', 'save_tape', 'open_tape',
+    'SimOrder', 'TouchFillModel', 'QueuePositionFillModel', 'FILL_MODELS',
+    'Backtest', 'BacktestResult', 'run_backtest',
+    'param_grid', 'prepare_tapes', 'run_sweep', 'rank_param_sets', 'failed_param_sets', 'hyperparameter_rows',
+]
@@ -0,0 +1,112 @@
+"""
+Book em arrays para o backtest.
+
+Preços em ticks inteiros de 1/TICK_SCALE (0.001 cobre tick_size 0.01 e
+0.001), um array('d') de tamanhos por lado indexado pelo tick. Atualizar um
+nível é O(1); o melhor bid/ask é mantido incrementalmente (só varre quando o
+melhor nível esvazia). Como no bot, o book é o do token1; o token2 é o
+espelho (1 - p, lados invertidos).
+
+bid_view/ask_view expõem items() em ordem crescente de preço, a mesma
+interface do SortedDict de global_state.all_data, então book_deets
+(poly_data/trading_utils.py) roda sobre este book sem adaptação. A lista de
+níveis é cacheada até o próximo update do lado (uma decisão lê o book várias
+vezes sem mudanças entre as leituras).
+"""
+from array import array
+from typing import List, Optional, Tuple
+
+TICK_SCALE = 1000
+BID = 0
+ASK = 1
+
+
+def to_tick(price: float) -> int:
+    return int(round(float(price) * TICK_SCALE))
+
+
+def to_price(tick: int) -> float:
+    return tick / TICK_SCALE
+
+
+class BookSideView:
+    """Lado do book com a interface de leitura do SortedDict (items() crescente)."""
+
+    __slots__ = ('sizes', 'cached')
+
+    def __init__(self, sizes: array):
+        self.sizes = sizes
+        self.cached: Optional[List[Tuple[float, float]]] = None
+
+    def items(self) -> List[Tuple[float, float]]:
+        if self.cached is None:
+            self.cached = [(tick / TICK_SCALE, size) for tick, size in enumerate(self.sizes) if size > 0]
+        return self.cached
+
+    def __len__(self) -> int:
+        return len(self.items())
+
+
+class ArrayBook:
+    """Book do token1 em arrays de ticks, com melhor bid/ask incremental."""
+
+    __slots__ = ('bids', 'asks', 'best_bid', 'best_ask', 'bid_view', 'ask_view')
+
+    def __init__(self):
+        self.bids = array('d', [0.0]) * (TICK_SCALE + 1)
+        self.asks = array('d', [0.0]) * (TICK_SCALE + 1)
+        self.best_bid = -1  # sem bids
+        self.best_ask = TICK_SCALE + 1  # sem asks
+        self.bid_view = BookSideView(self.bids)
+        self.ask_view = BookSideView(self.asks)
+
+    def clear(self):
+        self.bids[:] = array('d', [0.0]) * (TICK_SCALE + 1)
+        self.asks[:] = array('d', [0.0]) * (TICK_SCALE + 1)
+        self.best_bid = -1
+        self.best_ask = TICK_SCALE + 1
+        self.bid_view.cached = None
+        self.ask_view.cached = None
+
+    def set_level(self, side: int, tick: int, size: float) -> float:
+        """Define o tamanho de um nível (0 remove). Devolve o tamanho anterior."""
+        if tick < 0 or tick > TICK_SCALE:
+            return 0.0
+        if size < 0:
+            size = 0.0
+        if side == BID:
+            old = self.bids[tick]
+            self.bids[tick] = size
+            self.bid_view.cached = None
+            if size > 0:
+                if tick > self.best_bid:
+                    self.best_bid = tick
+            elif tick == self.best_bid:
+                best = tick - 1
+                while best >= 0 and self.bids[best] <= 0:
+                    best -= 1
+                self.best_bid = best
+        else:
+            old = self.asks[tick]
+            self.asks[tick] = size
+            self.ask_view.cached = None
+            if size > 0:
+                if tick < self.best_ask:
+                    self.best_ask = tick
+            elif tick == self.best_ask:
+                best = tick + 1
+                while best <= TICK_SCALE and self.asks[best] <= 0:
+                    best += 1
+                self.best_ask = best
+        return old
+
+    def size_at(self, side: int, tick: int) -> float:
+        return (self.bids if side == BID else self.asks)[tick]
+
+    def has_both_sides(self) -> bool:
+        return self.best_bid >= 0 and self.best_ask <= TICK_SCALE
+
+    def mid(self) -> Optional[float]:
+        if not self.has_both_sides():
+            return None
+        return (self.best_bid + self.best_ask) / (2 * TICK_SCALE)
@@ -0,0 +1,472 @@
+"""
+Motor de backtest: reproduz uma fita de mercado pela mesma lógica de cotação
+do perform_trade, sem exchange, sem planilha e sem pandas no loop.
+
+A cada decisão (snapshot do book, ou price_change após decision_interval_s,
+o mesmo cooldown de 30s do process_data) e para cada token:
+- book_deets -> get_order_prices -> get_buy_sell_amount (trading_utils)
+- stop-loss via should_stop_loss: vende a posição no best_bid como taker,
+  cancela as ordens do mercado e pausa compras por sleep_period horas
+- compra/venda com as mesmas regras de reenvio do perform_trade e os mesmos
+  limiares de cancelamento de send_buy_order/send_sell_order (incentive_start,
+  faixa 0.1-0.9, take-profit sobre o avgPrice)
+- merge das posições opostas acima de MIN_MERGE_SIZE (resgata $1 por par)
+
+As ordens em repouso são executadas pelo modelo de preenchimento (fills.py)
+contra os trades e book updates seguintes. A volatilidade 3h usa o mesmo
+RollingVolatility do bot (live_volatility.py), alimentado pelo mid da fita.
+
+Recompensas de maker (estimativa): enquanto uma ordem com tamanho >= min_size
+estiver a menos de max_spread do mid, acumula rewards_daily_rate × Q_nosso /
+(Q_nosso + Q_book) pelo tempo em que ficou lá, com Q = ((v - s) / v)² × size
+sobre os níveis do book gravado (os concorrentes).
+
+Diferenças conhecidas do bot ao vivo: AGGRESSIVE_MODE não é simulado e o
+'best_bid' da planilha (referência do desvio de 0.15) é o topo do book no
+momento da decisão.
+"""
+import logging
+import math
+import os
+import time
+from typing import Dict, List, Optional
+
+import poly_data.CONSTANTS as CONSTANTS
+from poly_data.live_volatility import RollingVolatility, LIVE_VOLATILITY, LIVE_VOL_MIN_SAMPLES
+from poly_data.trading_utils import (book_deets, get_order_prices, get_buy_sell_amount,
+                                     should_stop_loss, round_down, round_up)
+from backtest.book import ArrayBook, BID, ASK, TICK_SCALE
+from backtest.fills import SimOrder, QueuePositionFillModel
+from backtest.tape import MarketTape, KIND_SNAPSHOT, KIND_BID, KIND_ASK, KIND_TRADE_BUY, KIND_TRADE, KIND_COMMIT
+
+logger = logging.getLogger(__name__)
+
+BACKTEST_DECISION_INTERVAL_S = float(os.getenv('BACKTEST_DECISION_INTERVAL_S', '30'))
+# Intervalo (tempo simulado) entre recálculos da fatia de recompensas
+BACKTEST_REWARD_SAMPLE_S = float(os.getenv('BACKTEST_REWARD_SAMPLE_S', '5'))
+
+TOKEN_NAMES = ('token1', 'token2')
+
+
+def _empty_orders() -> Dict:
+    return {'buy': {'price': 0, 'size': 0}, 'sell': {'price': 0, 'size': 0}}
+
+
+class BacktestResult:
+    """Métricas de um backtest (valores em USDC; tempos em segundos)."""
+
+    def __init__(self, market: str, param_type: str = ''):
+        self.market = market
+        self.param_type = param_type
+        self.events = 0
+        self.decisions = 0
+        self.span_s = 0.0
+        self.elapsed_s = 0.0
+        self.orders_placed = 0
+        self.orders_filled = 0
+        self.size_placed = 0.0
+        self.size_filled = 0.0
+        self.fills = 0
+        self.stop_losses = 0
+        self.merges = 0
+        self.merged_size = 0.0
+        self.cash = 0.0
+        self.realized_pnl = 0.0
+        self.positions = [0.0, 0.0]
+        self.avg_prices = [0.0, 0.0]
+        self.final_mid: Optional[float] = None
+        self.max_inventory = 0.0
+        self.rewards = 0.0
+
+    @property
+    def inventory_value(self) -> float:
+        if self.final_mid is None:
+            return 0.0
+        return self.positions[0] * self.final_mid + self.positions[1] * (1 - self.final_mid)
+
+    @property
+    def pnl(self) -> float:
+        """PnL marcado a mercado (caixa + posições ao mid final), sem recompensas."""
+        return self.cash + self.inventory_value
+
+    @property
+    def fill_rate(self) -> float:
+        return self.size_filled / self.size_placed if self.size_placed else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'market': self.market,
+            'param_type': self.param_type,
+            'events': self.events,
+            'decisions': self.decisions,
+            'span_s': round(self.span_s, 1),
+            'elapsed_s': round(self.elapsed_s, 3),
+            'orders_placed': self.orders_placed,
+            'orders_filled': self.orders_filled,
+            'size_placed': round(self.size_placed, 2),
+            'size_filled': round(self.size_filled, 2),
+            'fill_rate': round(self.fill_rate, 4),
+            'stop_losses': self.stop_losses,
+            'merges': self.merges,
+            'merged_size': round(self.merged_size, 2),
+            'cash': round(self.cash, 4),
+            'realized_pnl': round(self.realized_pnl, 4),
+            'position_token1': round(self.positions[0], 2),
+            'position_token2': round(self.positions[1], 2),
+            'max_inventory': round(self.max_inventory, 2),
+            'final_mid': self.final_mid,
+            'pnl': round(self.pnl, 4),
+            'rewards': round(self.rewards, 4),
+            'total': round(self.pnl + self.rewards, 4),
+        }
+
+    def report(self) -> str:
+        d = self.to_dict()
+        speed = f"{self.span_s / self.elapsed_s:,.0f}x" if self.elapsed_s else "n/a"
+        return "\n".join([
+            "=" * 80, f"🧪 BACKTEST {self.market[:20]}... ({self.param_type or 'params'})", "=" * 80,
+            f"eventos: {d['events']}  decisões: {d['decisions']}  "
+            f"duração gravada: {self.span_s / 3600:.2f}h  replay: {self.elapsed_s:.2f}s ({speed})",
+            f"ordens: {d['orders_placed']} colocadas, {d['orders_filled']} executadas  "
+            f"fill rate: {d['fill_rate']:.1%} ({d['size_filled']}/{d['size_placed']})",
+            f"posição final: token1={d['position_token1']} token2={d['position_token2']}  "
+            f"máx. inventário: {d['max_inventory']}",
+            f"stop-loss: {d['stop_losses']}  merges: {d['merges']} ({d['merged_size']})",
+            f"PnL: ${d['pnl']:.2f} (realizado ${d['realized_pnl']:.2f})  "
+            f"recompensas est.: ${d['rewards']:.2f}  total: ${d['total']:.2f}",
+            "=" * 80,
+        ])
+
+
+class Backtest:
+    """Simula o perform_trade de um mercado sobre uma MarketTape."""
+
+    def __init__(self, row: Dict, params: Dict, fill_model=None,
+                 decision_interval_s: float = BACKTEST_DECISION_INTERVAL_S,
+                 reward_sample_s: float = BACKTEST_REWARD_SAMPLE_S):
+        self.row = row
+        self.params = params
+        self.fill_model = fill_model or QueuePositionFillModel()
+        self.decision_interval_s = decision_interval_s
+        self.reward_sample_s = reward_sample_s
+        self.round_length = len(str(row['tick_size']).split(".")[1])
+        self.two_sided = os.getenv('TWO_SIDED_MARKET_MAKING', 'false').lower() == 'true'
+        self.book = ArrayBook()
+        self.volatility = RollingVolatility()
+        self.orders: List[Dict[str, Optional[SimOrder]]] = [{'buy': None, 'sell': None}, {'buy': None, 'sell': None}]
+        self.resting: List[SimOrder] = []  # mesmas ordens de self.orders, para o loop de eventos
+        self.positions = [0.0, 0.0]
+        self.avg_prices = [0.0, 0.0]
+        self.risk_off_until = -1.0
+        self.result = BacktestResult(str(row.get('condition_id', '')), str(row.get('param_type', '')))
+        self._reward_rate = 0.0  # USDC/s com a fatia atual
+        self._reward_t: Optional[float] = None
+
+    # ============ Estado ============
+
+    def _set_order(self, token: int, side: str, order: Optional[SimOrder]):
+        previous = self.orders[token][side]
+        if previous is not None:
+            self.resting.remove(previous)
+        self.orders[token][side] = order
+        if order is not None:
+            self.resting.append(order)
+
+    def _orders_view(self, token: int) -> Dict:
+        """Mesmo formato de get_order (data_utils)."""
+        view = _empty_orders()
+        for side, order in self.orders[token].items():
+            if order is not None:
+                view[side] = {'price': order.price, 'size': order.remaining}
+        return view
+
+    def _cancel(self, token: int):
+        self._set_order(token, 'buy', None)
+        self._set_order(token, 'sell', None)
+
+    def _place(self, token: int, side: str, price: float, size: float, t: float):
+        order = SimOrder(token, side, price, size, t)
+        self._set_order(token, side, order)
+        self.fill_model.on_place(order, self.book)
+        self.result.orders_placed += 1
+        self.result.size_placed += size
+
+    def _fill(self, order: SimOrder, qty: float, price: float):
+        token = order.token
+        if order.side == 'sell':
+            # Sem venda a descoberto: o CLOB rejeita vendas acima do saldo
+            qty = min(qty, self.positions[token])
+        if qty <= 0:
+            if order.side == 'sell':
+                self._set_order(token, 'sell', None)
+            return
+        if order.filled == 0:
+            self.result.orders_filled += 1
+        order.filled += qty
+        self._trade(token, order.side, qty, price)
+        self.result.fills += 1
+        self.result.size_filled += qty
+        if order.remaining <= 1e-9:
+            self._set_order(token, order.side, None)
+
+    def _trade(self, token: int, side: str, qty: float, price: float):
+        position, avg = self.positions[token], self.avg_prices[token]
+        if side == 'buy':
+            self.avg_prices[token] = (avg * position + price * qty) / (position + qty)
+            self.positions[token] = position + qty
+            self.result.cash -= price * qty
+        else:
+            self.positions[token] = position - qty
+            self.result.cash += price * qty
+            self.result.realized_pnl += (price - avg) * qty
+            if self.positions[token] <= 1e-9:
+                self.positions[token] = 0.0
+                self.avg_prices[token] = 0.0
+        self.result.max_inventory = max(self.result.max_inventory, self.positions[0] + self.positions[1])
+
+    def _merge(self):
+        amount = min(self.positions)
+        if amount <= CONSTANTS.MIN_MERGE_SIZE:
+            return
+        amount = round_down(amount, 6)
+        self.result.realized_pnl += amount * (1 - self.avg_prices[0] - self.avg_prices[1])
+        self.result.cash += amount
+        self.positions = [self.positions[0] - amount, self.positions[1] - amount]
+        self.result.merges += 1
+        self.result.merged_size += amount
+
+    # ============ Volatilidade e recompensas ============
+
+    def _volatility_3h(self) -> float:
+        """Mesma escolha de LiveVolatility.volatility_3h (LIVE_VOLATILITY)."""
+        try:
+            sheet_value = float(self.row.get('3_hour', 0) or 0)
+        except (TypeError, ValueError):
+            sheet_value = 0.0
+        if math.isnan(sheet_value) or LIVE_VOLATILITY == 'sheet':
+            return 0.0 if math.isnan(sheet_value) else sheet_value
+        live = self.volatility.window_volatility() if self.volatility.n >= LIVE_VOL_MIN_SAMPLES else None
+        if live is None:
+            return sheet_value
+        return live if LIVE_VOLATILITY == 'live' else max(live, sheet_value)
+
+    def _update_rewards(self, t: float):
+        if self._reward_t is not None:
+            self.result.rewards += self._reward_rate * (t - self._reward_t)
+        self._reward_t = t
+        self._reward_rate = 0.0
+        mid = self.book.mid()
+        daily_rate = float(self.row.get('rewards_daily_rate', 0) or 0)
+        v = float(self.row.get('max_spread', 0) or 0) / 100
+        if mid is None or daily_rate <= 0 or v <= 0:
+            return
+        min_size = float(self.row.get('min_size', 0) or 0)
+        ours = 0.0
+        for order in self.resting:
+            s = abs(order.tick / TICK_SCALE - mid)
+            if s < v and order.remaining >= min_size:
+                ours += ((v - s) / v) ** 2 * order.remaining
+        if ours <= 0:
+            return
+        book = 0.0
+        lo = max(0, int(math.ceil((mid - v) * TICK_SCALE)))
+        hi = min(TICK_SCALE, int((mid + v) * TICK_SCALE))
+        bids, asks = self.book.bids, self.book.asks
+        for tick in range(lo, hi + 1):
+            size = bids[tick] + asks[tick]
+            if size > 0:
+                s = abs(tick / TICK_SCALE - mid)
+                if s < v:
+                    book += ((v - s) / v) ** 2 * size
+        self._reward_rate = daily_rate / 86400 * ours / (ours + book)
+
+    # ============ Decisão (espelho do perform_trade) ============
+
+    def _deets(self, name: str, size: float) -> Dict:
+        return book_deets(self.book.bid_view, self.book.ask_view, name, size, 0.1)
+
+    def _send_buy(self, token: int, orders: Dict, price: float, size: float, mid_price: float, t: float):
+        """Regras de send_buy_order."""
+        existing = orders['buy']
+        if existing['size'] > 0:
+            price_diff = abs(existing['price'] - price)
+            size_diff = abs(existing['size'] - size)
+            if not (price_diff > 0.015 or size_diff > size * 0.25):
+                return
+            self._cancel(token)
+        if price < mid_price - self.row['max_spread'] / 100:
+            return
+        if 0.1 <= price < 0.9:
+            self._place(token, 'buy', price, size, t)
+
+    def _send_sell(self, token: int, orders: Dict, price: float, size: float, t: float):
+        """Regras de send_sell_order."""
+        existing = orders['sell']
+        if existing['size'] > 0:
+            price_diff = abs(existing['price'] - price)
+            size_diff = abs(existing['size'] - size)
+            if not (price_diff > 0.05 or size_diff > size * 0.30):
+                return
+            self._cancel(token)
+        self._place(token, 'sell', price, size, t)
+
+    def _decide(self, t: float):
+        self.result.decisions += 1
+        row, params, rl = self.row, self.params, self.round_length
+        self._merge()
+        volatility_3h = self._volatility_3h()
+
+        for token, name in enumerate(TOKEN_NAMES):
+            # Snapshot das ordens no início, como get_order no perform_trade
+            orders = self._orders_view(token)
+            deets = self._deets(name, 100)
+            if deets['best_bid'] is None or deets['best_ask'] is None or deets['best_bid_size'] is None \
+                    or deets['best_ask_size'] is None:
+                deets = self._deets(name, 20)
+            if deets['best_bid'] is None or deets['best_ask'] is None or deets['top_bid'] is None \
+                    or deets['top_ask'] is None:
+                continue
+
+            best_bid = round(deets['best_bid'], rl)
+            best_ask = round(deets['best_ask'], rl)
+            top_bid = round(deets['top_bid'], rl)
+            top_ask = round(deets['top_ask'], rl)
+            position = round_down(self.positions[token], 2)
+            avgPrice = self.avg_prices[token]
+
+            bid_price, ask_price = get_order_prices(best_bid, deets['best_bid_size'], top_bid, best_ask,
+                                                    deets['best_ask_size'], top_ask, avgPrice, row)
+            bid_price = round(bid_price, rl)
+            ask_price = round(ask_price, rl)
+            mid_price = (top_bid + top_ask) / 2
+            other_position = self.positions[1 - token]
+            buy_amount, sell_amount = get_buy_sell_amount(position, bid_price, row, other_position)
+            max_size = row.get('max_size', row['trade_size'])
+
+            # ------- STOP-LOSS -------
+            if sell_amount > 0 and (avgPrice > 0 or self.two_sided):
+                n_deets = self._deets(name, 100)
+                if n_deets['best_bid'] is not None and n_deets['best_ask'] is not None:
+                    n_mid = round_up((n_deets['best_bid'] + n_deets['best_ask']) / 2, rl)
+                    spread = round(n_deets['best_ask'] - n_deets['best_bid'], 2)
+                    pnl = (n_mid - avgPrice) / avgPrice * 100 if avgPrice > 0 else 0.0
+                    if should_stop_loss(pnl, spread, volatility_3h, params):
+                        qty = min(sell_amount, self.positions[token])
+                        if qty > 0:
+                            self._trade(token, 'sell', qty, n_deets['best_bid'])
+                        self.result.stop_losses += 1
+                        self._cancel(0)
+                        self._cancel(1)
+                        self.risk_off_until = t + params['sleep_period'] * 3600
+                        continue
+
+            # ------- COMPRA -------
+            if (position < max_size and position < 250 and buy_amount > 0 and buy_amount >= row['min_size']
+                    and self._reward_check_passed() and t >= self.risk_off_until):
+                price_change = abs(bid_price - top_bid)
+                if volatility_3h > params['volatility_threshold'] * 2 or price_change >= 0.15:
+                    self._cancel(token)
+                elif self.positions[1 - token] > row['min_size']:
+                    # Posição reversa: não compra mais (e o perform_trade pula a venda)
+                    if orders['buy']['size'] > CONSTANTS.MIN_MERGE_SIZE:
+                        self._cancel(token)
+                    continue
+                elif (best_bid > orders['buy']['price']
+                      or position + orders['buy']['size'] < 0.95 * max_size
+                      or orders['buy']['size'] > buy_amount * 1.01):
+                    self._send_buy(token, orders, bid_price, buy_amount, mid_price, t)
+
+            # ------- TAKE PROFIT / VENDA -------
+            if sell_amount > 0:
+                if self.two_sided and avgPrice == 0:
+                    price = round_up(ask_price, rl)
+                    tp_price = ask_price
+                else:
+                    tp_price = round_up(avgPrice + (avgPrice * params['take_profit_threshold'] / 100), rl)
+                    price = round_up(tp_price, rl)
+                tp_price = float(tp_price)
+                if orders['sell']['size'] == 0:
+                    self._send_sell(token, orders, price, sell_amount, t)
+                else:
+                    diff = abs(orders['sell']['price'] - tp_price) / tp_price * 100 if tp_price > 0 else 100
+                    if diff > 2 or orders['sell']['size'] < position * 0.97:
+                        self._send_sell(token, orders, price, sell_amount, t)
+
+    def _reward_check_passed(self) -> bool:
+        try:
+            gm_reward = float(self.row.get('gm_reward_per_100', 0) or 0)
+        except (ValueError, TypeError):
+            gm_reward = 0
+        return not (0 < gm_reward < 0.5)
+
+    # ============ Loop ============
+
+    def run(self, tape: MarketTape) -> BacktestResult:
+        started = time.perf_counter()
+        book, fill_model, result, resting = self.book, self.fill_model, self.result, self.resting
+        tracks_levels = fill_model.tracks_levels
+        t_arr, kind_arr, tick_arr, size_arr = tape.t, tape.kind, tape.tick, tape.size
+        last_decision = None
+        snapshot = False
+        t = 0.0
+
+        for i in range(len(kind_arr)):
+            kind = kind_arr[i]
+            t = t_arr[i]
+            if kind == KIND_BID or kind == KIND_ASK:
+                side = BID if kind == KIND_BID else ASK
+                tick = tick_arr[i]
+                new_size = size_arr[i]
+                old_size = book.set_level(side, tick, new_size)
+                if tracks_levels and resting:
+                    for order in resting:
+                        if order.tick == tick and order.book_side == side:
+                            fill_model.on_level(order, old_size, new_size)
+            elif kind == KIND_COMMIT:
+                result.events += 1
+                if snapshot and tracks_levels:
+                    for order in resting:
+                        fill_model.on_snapshot(order, book)
+                mid = book.mid()
+                if mid is not None:
+                    self.volatility.update(mid, t)
+                    for order in resting[:]:
+                        qty = fill_model.on_cross(order, book)
+                        if qty > 0:
+                            self._fill(order, qty, order.price)
+                if self._reward_t is None or t - self._reward_t >= self.reward_sample_s:
+                    self._update_rewards(t)
+                if mid is not None and (snapshot or last_decision is None
+                                        or t - last_decision >= self.decision_interval_s):
+                    last_decision = t
+                    snapshot = False
+                    self._decide(t)
+                    self._update_rewards(t)
+            elif kind == KIND_SNAPSHOT:
+                book.clear()
+                snapshot = True
+            else:
+                result.events += 1
+                tick = tick_arr[i]
+                if kind == KIND_TRADE:
+                    mid = book.mid()
+                    taker_buy = mid is not None and tick >= mid * TICK_SCALE
+                else:
+                    taker_buy = kind == KIND_TRADE_BUY
+                for order in resting[:]:
+                    qty = fill_model.on_trade(order, taker_buy, tick, size_arr[i])
+                    if qty > 0:
+                        self._fill(order, qty, order.price)
+
+        self._update_rewards(t)
+        result.span_s = tape.span_s()
+        result.positions = list(self.positions)
+        result.avg_prices = list(self.avg_prices)
+        result.final_mid = self.book.mid()
+        result.elapsed_s = time.perf_counter() - started
+        return result
+
+
+def run_backtest(tape: MarketTape, row: Dict, params: Dict, fill_model=None, **kwargs) -> BacktestResult:
+    """Atalho: um backtest de `row` (linha do mercado) com `params` (um tipo de Hyperparameters)."""
+    return Backtest(row, params, fill_model=fill_model, **kwargs).run(tape)
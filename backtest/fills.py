@@ -0,0 +1,134 @@
+"""
+Ordens simuladas e modelos de preenchimento do backtest.
+
+Toda ordem é posicionada no book do token1: compra do token1 no bid ao
+preço p, venda no ask; compra do token2 a q fica no ask a 1 - q, venda do
+token2 no bid a 1 - q (mesmo espelhamento do fake_clob/matching.py).
+
+O modelo de preenchimento decide quanto de uma ordem em repouso executa:
+- on_trade: trade do feed no tick (lado do taker)
+- on_cross: o book passou através do preço da ordem
+- on_level: mudança de tamanho no nível da ordem (modelos com fila)
+- on_snapshot: book recarregado por um snapshot (modelos com fila)
+"""
+from backtest.book import ArrayBook, BID, ASK, TICK_SCALE, to_tick
+
+
+class SimOrder:
+    """Ordem em repouso do backtest."""
+
+    __slots__ = ('token', 'side', 'price', 'size', 'filled', 'book_side', 'tick', 'placed_at',
+                 'queue_ahead', 'level_traded')
+
+    def __init__(self, token: int, side: str, price: float, size: float, placed_at: float):
+        self.token = token  # 0 = token1, 1 = token2
+        self.side = side  # 'buy' / 'sell' do token
+        self.price = price
+        self.size = size
+        self.filled = 0.0
+        self.placed_at = placed_at
+        self.queue_ahead = 0.0  # tamanho à frente no nível (QueuePositionFillModel)
+        self.level_traded = 0.0  # volume negociado no nível ainda não refletido no book
+        tick = to_tick(price)
+        if token == 0:
+            self.book_side, self.tick = (BID, tick) if side == 'buy' else (ASK, tick)
+        else:
+            self.book_side, self.tick = (ASK, TICK_SCALE - tick) if side == 'buy' else (BID, TICK_SCALE - tick)
+
+    @property
+    def remaining(self) -> float:
+        return self.size - self.filled
+
+
+class TouchFillModel:
+    """Preenche quando um trade toca o preço da ordem ou o book a atravessa.
+
+    Otimista: ignora a fila à frente da ordem no nível.
+    """
+
+    tracks_levels = False
+
+    def on_place(self, order: SimOrder, book: ArrayBook):
+        pass
+
+    def on_level(self, order: SimOrder, old_size: float, new_size: float):
+        pass
+
+    def on_snapshot(self, order: SimOrder, book: ArrayBook):
+        pass
+
+    def on_trade(self, order: SimOrder, taker_buy: bool, tick: int, size: float) -> float:
+        if order.book_side == BID:
+            hit = not taker_buy and tick <= order.tick
+        else:
+            hit = taker_buy and tick >= order.tick
+        return min(size, order.remaining) if hit else 0.0
+
+    def on_cross(self, order: SimOrder, book: ArrayBook) -> float:
+        if order.book_side == BID:
+            crossed = book.best_ask <= order.tick
+        else:
+            crossed = book.best_bid >= order.tick
+        return order.remaining if crossed else 0.0
+
+
+class QueuePositionFillModel(TouchFillModel):
+    """Preenche só depois que a fila à frente da ordem no nível se esgota.
+
+    - Ao entrar, a ordem fica atrás de todo o tamanho visível no nível.
+    - Trade no nível: consome primeiro a fila à frente; o excedente executa a
+      ordem. O volume fica em level_traded para não ser descontado de novo
+      quando o price_change correspondente reduzir o nível.
+    - Redução do nível além do volume negociado = cancelamentos, atribuídos
+      à frente na proporção queue_ahead / tamanho do nível (fila uniforme).
+    - Aumentos entram atrás da ordem. A fila nunca passa do tamanho do nível.
+    - Trade com preço além do nível ou book atravessando a ordem: o nível
+      inteiro foi consumido, a ordem executa (até o tamanho do trade).
+    """
+
+    tracks_levels = True
+
+    def on_place(self, order: SimOrder, book: ArrayBook):
+        order.queue_ahead = book.size_at(order.book_side, order.tick)
+        order.level_traded = 0.0
+
+    def on_level(self, order: SimOrder, old_size: float, new_size: float):
+        if new_size >= old_size:
+            return
+        decrease = old_size - new_size
+        traded = min(decrease, order.level_traded)
+        order.level_traded -= traded
+        cancelled = decrease - traded
+        if cancelled > 0 and old_size > 0:
+            order.queue_ahead -= cancelled * order.queue_ahead / old_size
+        if order.queue_ahead > new_size:
+            order.queue_ahead = new_size
+        if order.queue_ahead < 1e-9:
+            order.queue_ahead = 0.0
+
+    def on_snapshot(self, order: SimOrder, book: ArrayBook):
+        order.queue_ahead = min(order.queue_ahead, book.size_at(order.book_side, order.tick))
+        order.level_traded = 0.0
+
+    def on_trade(self, order: SimOrder, taker_buy: bool, tick: int, size: float) -> float:
+        if order.book_side == BID:
+            if taker_buy or tick > order.tick:
+                return 0.0
+        elif not taker_buy or tick < order.tick:
+            return 0.0
+        if tick != order.tick:
+            order.queue_ahead = 0.0
+            return min(size, order.remaining)
+        order.level_traded += size
+        ahead = order.queue_ahead
+        if size <= ahead:
+            order.queue_ahead = ahead - size
+            return 0.0
+        order.queue_ahead = 0.0
+        return min(size - ahead, order.remaining)
+
+
+FILL_MODELS = {
+    'touch': TouchFillModel,
+    'queue': QueuePositionFillModel,
+}
@@ -0,0 +1,193 @@
+"""
+Sweep de parâmetros em vários núcleos sobre gravações do feed.
+
+1. prepare_tapes decodifica a gravação uma vez e grava uma fita binária por
+   mercado (tape.save_tape).
+2. Cada job (mercado × conjunto de parâmetros) vai para um pool de
+   processos levando só o caminho da fita, a linha do mercado e os
+   parâmetros; o worker mapeia a fita com mmap (open_tape, cacheada por
+   processo), então os dados gravados não são copiados nem serializados.
+3. Os resultados chegam fora de ordem (imap_unordered) e são gravados linha a
+   linha num CSV à medida que terminam.
+4. best_param_set agrega por conjunto (soma sobre os mercados; conjuntos
+   com erro em algum mercado ficam de fora) e
+   hyperparameter_rows gera as linhas type/param/value da aba Hyperparameters
+   (o formato que get_sheet_df/build_config lê; também serve como
+   hyperparameters.csv do CONFIG_SOURCE=local).
+
+Eixos da grade que são colunas de Selected Markets (trade_size, max_size)
+sobrescrevem a linha do mercado; os demais vão para os parâmetros.
+"""
+import csv
+import itertools
+import logging
+import multiprocessing
+import os
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from poly_data.feed_recorder import list_segments
+from backtest.engine import run_backtest, BacktestResult
+from backtest.fills import FILL_MODELS
+from backtest.tape import load_tapes, open_tape, save_tape, tape_path, MarketTape
+
+logger = logging.getLogger(__name__)
+
+SWEEP_WORKERS = int(os.getenv('SWEEP_WORKERS', '0'))  # 0 = os.cpu_count()
+# Colunas de Selected Markets que podem variar no sweep
+ROW_KEYS = ('trade_size', 'max_size')
+
+# Fitas já mapeadas neste processo (worker)
+_tapes: Dict[str, MarketTape] = {}
+
+
+def param_grid(base: Dict, axes: Dict[str, Iterable], prefix: str = 'sweep') -> Dict[str, Dict]:
+    """Produto cartesiano dos eixos sobre `base`. Devolve {nome: valores}."""
+    names = sorted(axes)
+    grid = {}
+    for i, values in enumerate(itertools.product(*(list(axes[name]) for name in names)), 1):
+        combo = dict(base)
+        combo.update(zip(names, values))
+        combo.pop('description', None)
+        grid[f"{prefix}_{i:03d}"] = combo
+    return grid
+
+
+def prepare_tapes(recording: str, tape_dir: str, rows: Dict[str, Dict]) -> Dict[str, str]:
+    """Decodifica a gravação e grava as fitas dos mercados de `rows`. Devolve {mercado: caminho}.
+
+    Fitas já existentes e mais novas que a gravação são reaproveitadas.
+    """
+    os.makedirs(tape_dir, exist_ok=True)
+    recording_mtime = max(os.path.getmtime(segment) for segment in list_segments(recording))
+    paths = {market: tape_path(tape_dir, market) for market in rows}
+    missing = [market for market, path in paths.items()
+               if not os.path.exists(path) or os.path.getmtime(path) < recording_mtime]
+    if missing:
+        token1 = {market: str(rows[market]['token1']) for market in missing if rows[market].get('token1')}
+        tapes = load_tapes(recording, markets=missing, token1=token1)
+        for market in missing:
+            tape = tapes.get(market)
+            if tape is None or not len(tape):
+                logger.warning(f"Sem eventos de {market[:20]}... na gravação")
+                paths.pop(market)
+                continue
+            save_tape(tape, paths[market])
+    return paths
+
+
+def split_params(combo: Dict) -> Tuple[Dict, Dict]:
+    """(sobrescritas da linha do mercado, hyperparâmetros)"""
+    overrides = {k: v for k, v in combo.items() if k in ROW_KEYS}
+    params = {k: v for k, v in combo.items() if k not in ROW_KEYS}
+    return overrides, params
+
+
+def _run_job(job: Tuple) -> Dict:
+    path, row, name, combo, fill_model, kwargs = job
+    tape = _tapes.get(path)
+    if tape is None:
+        tape = _tapes[path] = open_tape(path)
+    overrides, params = split_params(combo)
+    try:
+        result = run_backtest(tape, dict(row, param_type=name, **overrides), params,
+                              fill_model=FILL_MODELS[fill_model](), **kwargs)
+        out = result.to_dict()
+    except Exception as e:
+        out = {'market': row.get('condition_id', ''), 'param_type': name, 'error': str(e)}
+    out.update({f"p_{k}": v for k, v in combo.items()})
+    return out
+
+
+def iter_sweep(tape_paths: Dict[str, str], rows: Dict[str, Dict], param_sets: Dict[str, Dict],
+               workers: int = SWEEP_WORKERS, fill_model: str = 'queue', **kwargs) -> Iterator[Dict]:
+    """Roda todos os jobs (mercado × conjunto) no pool e devolve os resultados conforme terminam."""
+    jobs = [(path, rows[market], name, combo, fill_model, kwargs)
+            for market, path in tape_paths.items() for name, combo in param_sets.items()]
+    if not jobs:
+        return
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for job in jobs:
+            yield _run_job(job)
+        return
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with multiprocessing.Pool(processes=min(workers, len(jobs))) as pool:
+        for out in pool.imap_unordered(_run_job, jobs, chunksize=chunksize):
+            yield out
+
+
+def run_sweep(tape_paths: Dict[str, str], rows: Dict[str, Dict], param_sets: Dict[str, Dict],
+              results_path: Optional[str] = None, workers: int = SWEEP_WORKERS,
+              fill_model: str = 'queue', **kwargs) -> List[Dict]:
+    """iter_sweep gravando cada resultado no CSV `results_path` assim que chega."""
+    results = []
+    total = len(tape_paths) * len(param_sets)
+    started = time.time()
+    writer = None
+    f = open(results_path, 'w', newline='') if results_path else None
+    try:
+        for out in iter_sweep(tape_paths, rows, param_sets, workers=workers, fill_model=fill_model, **kwargs):
+            results.append(out)
+            if f is not None:
+                if writer is None:
+                    fields = list(BacktestResult('').to_dict()) + ['error'] + sorted(
+                        {f"p_{k}" for combo in param_sets.values() for k in combo})
+                    writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+                    writer.writeheader()
+                writer.writerow(out)
+                f.flush()
+            if len(results) % 50 == 0 or len(results) == total:
+                logger.info(f"Sweep: {len(results)}/{total} jobs em {time.time() - started:.1f}s")
+    finally:
+        if f is not None:
+            f.close()
+    return results
+
+
+def failed_param_sets(results: List[Dict]) -> Dict[str, int]:
+    """{conjunto: mercados com erro} dos conjuntos que falharam em algum mercado."""
+    failures: Dict[str, int] = {}
+    for out in results:
+        if out.get('error'):
+            failures[out['param_type']] = failures.get(out['param_type'], 0) + 1
+    return failures
+
+
+def rank_param_sets(results: List[Dict], metric: str = 'total') -> List[Tuple[str, float, int]]:
+    """[(conjunto, soma da métrica nos mercados, mercados)] do melhor para o pior.
+
+    Só entram conjuntos que terminaram todos os mercados: somar apenas os que
+    não deram erro premiaria um conjunto que quebra justamente nos mercados
+    em que perde (ver failed_param_sets).
+    """
+    failed = failed_param_sets(results)
+    totals: Dict[str, List[float]] = {}
+    for out in results:
+        if out['param_type'] in failed or metric not in out:
+            continue
+        totals.setdefault(out['param_type'], []).append(float(out[metric]))
+    ranked = [(name, sum(values), len(values)) for name, values in totals.items()]
+    ranked.sort(key=lambda item: item[1], reverse=True)
+    return ranked
+
+
+def best_param_set(results: List[Dict], param_sets: Dict[str, Dict], metric: str = 'total') -> Optional[Tuple[str, Dict]]:
+    ranked = rank_param_sets(results, metric)
+    if not ranked:
+        return None
+    name = ranked[0][0]
+    return name, param_sets[name]
+
+
+def hyperparameter_rows(param_type: str, combo: Dict) -> List[Dict]:
+    """Linhas type/param/value da aba Hyperparameters (como create_hyperparameter_dataframe)."""
+    _, params = split_params(combo)
+    return [{'type': param_type, 'param': name, 'value': value} for name, value in params.items()]
+
+
+def write_hyperparameters_csv(path: str, param_type: str, combo: Dict):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['type', 'param', 'value'])
+        writer.writeheader()
+        writer.writerows(hyperparameter_rows(param_type, combo))
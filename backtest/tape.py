@@ -0,0 +1,178 @@
+"""
+Fita de eventos por mercado, decodificada uma única vez das gravações do feed.
+
+Cada frame gravado (poly_data/feed_recorder.py) vira linhas em arrays
+paralelos (t, kind, tick, size), sem dicts nem JSON no loop do backtest:
+- 'book' -> SNAPSHOT, uma linha BID/ASK por nível, COMMIT
+- 'price_change' -> uma linha BID/ASK por mudança, COMMIT
+- 'last_trade_price' -> TRADE_BUY/TRADE_SELL (lado do taker) ou TRADE
+  (lado ausente; o motor infere pelo mid)
+
+O book é o do token1 (como em global_state.all_data). Se o token1 do
+mercado for informado, níveis de outros assets são ignorados e trades do
+token2 são espelhados (1 - p, lado invertido).
+
+save_tape/open_tape gravam e mapeiam (mmap, somente leitura) a fita num
+arquivo binário com os arrays em sequência: processos do sweep abrem a
+mesma fita sem decodificar JSON nem receber cópias por pickle.
+"""
+import logging
+import mmap
+import os
+import struct
+from array import array
+from typing import Dict, Iterable, Optional
+
+from poly_data.feed_recorder import iter_frames
+from backtest.book import to_tick, TICK_SCALE
+
+logger = logging.getLogger(__name__)
+
+KIND_SNAPSHOT = 0
+KIND_BID = 1
+KIND_ASK = 2
+KIND_TRADE_BUY = 3
+KIND_TRADE_SELL = 4
+KIND_TRADE = 5
+KIND_COMMIT = 6
+
+TAPE_MAGIC = b'BTTAPE1\n'
+TAPE_SUFFIX = '.tape'
+_HEADER = struct.Struct('<8sQ')
+
+
+class MarketTape:
+    """Eventos de um mercado em arrays paralelos (t em segundos desde o início da gravação).
+
+    Numa fita aberta com open_tape os arrays são memoryviews do arquivo mapeado.
+    """
+
+    __slots__ = ('market', 't', 'kind', 'tick', 'size', '_mmap')
+
+    def __init__(self, market: str):
+        self.market = market
+        self.t = array('d')
+        self.kind = array('b')
+        self.tick = array('l')
+        self.size = array('d')
+        self._mmap = None
+
+    def append(self, t: float, kind: int, tick: int = 0, size: float = 0.0):
+        self.t.append(t)
+        self.kind.append(kind)
+        self.tick.append(tick)
+        self.size.append(size)
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    def span_s(self) -> float:
+        return self.t[-1] - self.t[0] if len(self.t) > 1 else 0.0
+
+
+def save_tape(tape: MarketTape, path: str):
+    """Grava a fita (cabeçalho + t, tick, size, kind) de forma atômica."""
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(TAPE_MAGIC, len(tape)))
+        for column in (tape.t, tape.tick, tape.size, tape.kind):
+            f.write(bytes(column))
+    os.replace(tmp, path)
+
+
+def open_tape(path: str) -> MarketTape:
+    """Mapeia uma fita gravada por save_tape (sem cópia; páginas compartilhadas entre processos)."""
+    market = os.path.basename(path)[:-len(TAPE_SUFFIX)] if path.endswith(TAPE_SUFFIX) else path
+    tape = MarketTape(market)
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, n = _HEADER.unpack_from(mm, 0)
+    if magic != TAPE_MAGIC:
+        mm.close()
+        raise ValueError(f"{path} não é uma fita de backtest")
+    view = memoryview(mm)
+    offset = _HEADER.size
+    for name, fmt in (('t', 'd'), ('tick', 'l'), ('size', 'd'), ('kind', 'b')):
+        width = struct.calcsize(fmt)
+        setattr(tape, name, view[offset:offset + n * width].cast(fmt))
+        offset += n * width
+    tape._mmap = mm
+    return tape
+
+
+def tape_path(directory: str, market: str) -> str:
+    return os.path.join(directory, market + TAPE_SUFFIX)
+
+
+def _level_kind(side: str) -> int:
+    return KIND_BID if side in ('BUY', 'bids') else KIND_ASK
+
+
+def _add_trade(tape: MarketTape, t: float, event: Dict, mirrored: bool):
+    try:
+        tick = to_tick(event['price'])
+        size = float(event.get('size') or 0)
+    except (KeyError, TypeError, ValueError):
+        return
+    side = str(event.get('side') or '').upper()
+    if mirrored:
+        tick = TICK_SCALE - tick
+        side = {'BUY': 'SELL', 'SELL': 'BUY'}.get(side, side)
+    kind = KIND_TRADE_BUY if side == 'BUY' else KIND_TRADE_SELL if side == 'SELL' else KIND_TRADE
+    tape.append(t, kind, tick, size)
+
+
+def load_tapes(path: str, markets: Optional[Iterable[str]] = None,
+               token1: Optional[Dict[str, str]] = None) -> Dict[str, MarketTape]:
+    """Decodifica uma gravação em fitas por mercado (condition_id).
+
+    Args:
+        path: Diretório da gravação ou segmento .frames.gz
+        markets: Só estes mercados (None = todos)
+        token1: condition_id -> token1, para filtrar/espelhar eventos de outros assets
+    """
+    wanted = set(markets) if markets is not None else None
+    token1 = {k: str(v) for k, v in (token1 or {}).items()}
+    tapes: Dict[str, MarketTape] = {}
+    first_ns = None
+
+    for recv_ns, events in iter_frames(path):
+        if first_ns is None:
+            first_ns = recv_ns
+        t = (recv_ns - first_ns) / 1e9
+        for event in events:
+            market = event.get('market')
+            if not market or (wanted is not None and market not in wanted):
+                continue
+            tape = tapes.get(market)
+            if tape is None:
+                tape = tapes[market] = MarketTape(market)
+            own = token1.get(market)
+            event_type = event.get('event_type')
+
+            if event_type == 'book':
+                if own and str(event.get('asset_id', own)) != own:
+                    continue
+                tape.append(t, KIND_SNAPSHOT)
+                for side in ('bids', 'asks'):
+                    kind = _level_kind(side)
+                    for level in event.get(side, []):
+                        tape.append(t, kind, to_tick(level['price']), float(level['size']))
+                tape.append(t, KIND_COMMIT)
+            elif event_type == 'price_change':
+                changes = event.get('price_changes') or event.get('changes', [])
+                applied = False
+                for change in changes:
+                    if own and str(change.get('asset_id', event.get('asset_id', own))) != own:
+                        continue
+                    tape.append(t, _level_kind(change['side']), to_tick(change['price']), float(change['size']))
+                    applied = True
+                if applied:
+                    tape.append(t, KIND_COMMIT)
+            elif event_type == 'last_trade_price':
+                asset = str(event.get('asset_id', own or ''))
+                _add_trade(tape, t, event, mirrored=bool(own) and asset != own)
+
+    for tape in tapes.values():
+        logger.info(f"Fita {tape.market[:20]}...: {len(tape)} linhas, {tape.span_s():.0f}s")
+    return tapes
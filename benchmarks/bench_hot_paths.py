@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks dos hot paths de book, pricing e payload.
+
+Cobre:
+- BookState.initialize_from_snapshot / apply_delta
+- process_data sobre frames gravados (ou sintéticos)
+- get_best_bid_ask_deets
+- get_order_prices / get_buy_sell_amount
+- compute_spread_fast (Cython vs fallback Python)
+- build_order_payload_fast (Cython vs fallback Python)
+- SenderTask (throughput com client mock)
+- Scoring de maker rewards do data_updater (referência pandas vs lote NumPy)
+- Volatilidade multi-horizonte do data_updater (referência pandas vs kernel cumsum)
+
+Usage:
+    python -m benchmarks.bench_hot_paths
+    python -m benchmarks.bench_hot_paths --json bench_fase8.json
+    python -m benchmarks.bench_hot_paths --baseline bench_fase8.json --filter book
+    python -m benchmarks.bench_hot_paths --frames frames.jsonl
+    python -m benchmarks.bench_hot_paths --frames feed_records/
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import (BenchResult, run_case, run_async_case, skipped, summarize,
+                                format_results, save_results, load_baseline)
+
+BENCH_MARKET = 'bench-market-0'
+LEVELS_PER_SIDE = 50
+
+
+def make_levels(rng: random.Random, mid: float = 0.5, levels: int = LEVELS_PER_SIDE,
+                tick: float = 0.01) -> Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]:
+    """Gera um book sintético (price, size) em torno de `mid`."""
+    bids = [(round(mid - tick * (i + 1), 3), float(rng.randint(5, 5000))) for i in range(levels)]
+    asks = [(round(mid + tick * (i + 1), 3), float(rng.randint(5, 5000))) for i in range(levels)]
+    bids = [(p, s) for p, s in bids if p > 0]
+    asks = [(p, s) for p, s in asks if p < 1]
+    return bids, asks
+
+
+def make_frames(rng: random.Random, markets: List[str], count: int) -> List[Dict]:
+    """Gera frames no formato do canal market (1 book por mercado + price_changes)."""
+    frames = []
+    for market in markets:
+        bids, asks = make_levels(rng)
+        frames.append({
+            'event_type': 'book',
+            'market': market,
+            'bids': [{'price': str(p), 'size': str(s)} for p, s in bids],
+            'asks': [{'price': str(p), 'size': str(s)} for p, s in asks],
+        })
+    while len(frames) < count:
+        market = rng.choice(markets)
+        side = rng.choice(['BUY', 'SELL'])
+        price = round(0.5 - 0.01 * rng.randint(1, 20), 2) if side == 'BUY' else round(0.5 + 0.01 * rng.randint(1, 20), 2)
+        size = 0 if rng.random() < 0.2 else rng.randint(5, 5000)
+        frames.append({
+            'event_type': 'price_change',
+            'market': market,
+            'price_changes': [{'side': side, 'price': str(price), 'size': str(size)}],
+        })
+    return frames
+
+
+# ============ Casos ============
+
+def bench_book_state(rng: random.Random, iterations: int) -> List[BenchResult]:
+    from poly_data.book_state import BookState
+
+    bids, asks = make_levels(rng)
+    book = BookState(BENCH_MARKET)
+    results = [run_case('book_state.initialize_from_snapshot',
+                        lambda: book.initialize_from_snapshot(bids, asks),
+                        iterations=iterations, inner=1)]
+
+    deltas = []
+    for _ in range(1024):
+        side = rng.choice(['bids', 'asks'])
+        price = round(0.5 - 0.01 * rng.randint(1, 50), 2) if side == 'bids' else round(0.5 + 0.01 * rng.randint(1, 50), 2)
+        size = 0 if rng.random() < 0.2 else rng.randint(5, 5000)
+        deltas.append({side: [{'price': str(price), 'size': str(size)}]})
+
+    state = {'i': 0}
+
+    def apply_one():
+        # apply_delta não faz await internamente: dirigir a coroutine evita o custo do loop
+        delta = deltas[state['i'] & 1023]
+        state['i'] += 1
+        coro = book.apply_delta(delta)
+        try:
+            coro.send(None)
+        except StopIteration:
+            pass
+
+    results.append(run_case('book_state.apply_delta', apply_one, iterations=iterations))
+    return results
+
+
+def bench_process_data(rng: random.Random, iterations: int, frames_path: str = None) -> List[BenchResult]:
+    import poly_data.global_state as global_state
+    from poly_data.data_processing import process_data
+    from poly_data.feed_recorder import load_frames
+
+    if frames_path:
+        frames = load_frames(frames_path)
+        label = 'process_data (frames gravados)'
+    else:
+        frames = make_frames(rng, [f'bench-market-{i}' for i in range(10)], 4096)
+        label = 'process_data (frames sintéticos)'
+    if not frames:
+        return [skipped(label, 'nenhum frame')]
+
+    for frame in frames:
+        if frame.get('market'):
+            global_state.subscribed_assets.add(frame['market'])
+
+    state = {'i': 0}
+    n_frames = len(frames)
+
+    def next_frame():
+        frame = frames[state['i'] % n_frames]
+        state['i'] += 1
+        return process_data([frame], trade=False)
+
+    return [run_async_case(label, next_frame, iterations=max(iterations, n_frames), warmup=min(200, n_frames))]
+
+
+def bench_pricing(rng: random.Random, iterations: int) -> List[BenchResult]:
+    from sortedcontainers import SortedDict
+    import poly_data.global_state as global_state
+    from poly_data.trading_utils import get_best_bid_ask_deets, get_order_prices, get_buy_sell_amount
+
+    bids, asks = make_levels(rng)
+    global_state.all_data[BENCH_MARKET] = {'bids': SortedDict(dict(bids)), 'asks': SortedDict(dict(asks))}
+
+    row = {
+        'max_spread': 3.0, 'tick_size': 0.01, 'min_size': 50, 'trade_size': 100,
+        'max_size': 250, 'multiplier': '',
+    }
+
+    results = [
+        run_case('get_best_bid_ask_deets (token1)',
+                 lambda: get_best_bid_ask_deets(BENCH_MARKET, 'token1', 100, 0.1), iterations=iterations),
+        run_case('get_best_bid_ask_deets (token2)',
+                 lambda: get_best_bid_ask_deets(BENCH_MARKET, 'token2', 100, 0.1), iterations=iterations),
+    ]
+
+    deets = get_best_bid_ask_deets(BENCH_MARKET, 'token1', 100, 0.1)
+    args = (deets['best_bid'], deets['best_bid_size'], deets['top_bid'],
+            deets['best_ask'], deets['best_ask_size'], deets['top_ask'], 0.45, row)
+    results.append(run_case('get_order_prices', lambda: get_order_prices(*args), iterations=iterations))
+    results.append(run_case('get_buy_sell_amount',
+                            lambda: get_buy_sell_amount(120, 0.45, row, 30), iterations=iterations))
+    return results
+
+
+def bench_cython(rng: random.Random, iterations: int) -> List[BenchResult]:
+    from poly_data import cython_wrapper
+
+    bids, asks = make_levels(rng)
+    results = [run_case('compute_spread (python)',
+                        lambda: cython_wrapper.compute_spread_py(bids, asks), iterations=iterations)]
+    if cython_wrapper.CYTHON_AVAILABLE:
+        results.append(run_case('compute_spread (cython)',
+                                lambda: cython_wrapper.book_cython.compute_spread_fast(bids, asks),
+                                iterations=iterations))
+    else:
+        results.append(skipped('compute_spread (cython)', 'módulo não compilado'))
+
+    results.append(run_case('build_order_payload (python)',
+                            lambda: cython_wrapper.build_order_payload_py(BENCH_MARKET, 'BUY', 0.45, 100.0),
+                            iterations=iterations))
+    if cython_wrapper.CYTHON_AVAILABLE:
+        results.append(run_case('build_order_payload (cython)',
+                                lambda: cython_wrapper.payload_builder_cython.build_order_payload_fast(
+                                    BENCH_MARKET, 'BUY', 0.45, 100.0, 1000),
+                                iterations=iterations))
+    else:
+        results.append(skipped('build_order_payload (cython)', 'módulo não compilado'))
+    return results
+
+
+def make_reward_markets(rng: random.Random, count: int):
+    """Linhas de sampling-markets + books sintéticos para o scoring do data_updater."""
+    rows, books = [], []
+    for i in range(count):
+        tick = 0.01 if rng.random() < 0.8 else 0.001
+        mid = round(rng.uniform(0.1, 0.9), 2)
+        bids, asks = make_levels(rng, mid=mid, levels=rng.randint(0, 20), tick=tick)
+        rows.append({
+            'question': f'bench question {i}', 'neg_risk': False, 'condition_id': f'cond-{i}',
+            'tokens': [{'outcome': 'Yes', 'token_id': f'tok-{i}-1'}, {'outcome': 'No', 'token_id': f'tok-{i}-2'}],
+            'rewards': {'min_size': 50, 'max_spread': rng.choice([1.5, 2.0, 3.0, 3.5, 4.5]),
+                        'rates': [{'asset_address': '0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174',
+                                   'rewards_daily_rate': rng.choice([5, 10, 25, 50, 100, 250])}]},
+            'minimum_tick_size': tick, 'end_date_iso': '2030-01-01T00:00:00Z', 'market_slug': f'bench-{i}',
+        })
+        # Books da CLOB: bids crescentes, asks decrescentes (melhor preço no fim)
+        books.append(SimpleNamespace(
+            bids=[{'price': str(p), 'size': str(s)} for p, s in sorted(bids)],
+            asks=[{'price': str(p), 'size': str(s)} for p, s in sorted(asks, reverse=True)]))
+    return rows, books
+
+
+def bench_rewards(rng: random.Random, iterations: int, markets: int = 500) -> List[BenchResult]:
+    from data_updater.reward_scoring import score_market, score_markets_batch, compare_with_reference
+
+    rows, books = make_reward_markets(rng, markets)
+    mismatches = compare_with_reference(rows, books)
+    if mismatches:
+        print(f"⚠️  score_markets_batch diverge da referência em {len(mismatches)} campos, ex: {mismatches[:3]}")
+    rounds = max(1, iterations // 200)
+    return [
+        run_case(f'score_market (referência, {markets} mercados)',
+                 lambda: [score_market(r, b) for r, b in zip(rows, books)], iterations=rounds, inner=1, warmup=1),
+        run_case(f'score_markets_batch ({markets} mercados)',
+                 lambda: score_markets_batch(rows, books), iterations=rounds, inner=1, warmup=1),
+    ]
+
+
+def make_price_series(rng: random.Random, count: int, points: int = 4000):
+    """Séries de /prices-history sintéticas (fidelity 10 min, passeio aleatório em log)."""
+    series = []
+    for _ in range(count):
+        n = rng.randint(0, points)
+        start = 1_700_000_000 + rng.randint(0, 600)
+        t, p, price = [], [], rng.uniform(0.05, 0.95)
+        for i in range(n):
+            price = min(0.99, max(0.01, price * (1 + rng.gauss(0, 0.02))))
+            t.append(start + i * 600)
+            p.append(price)
+        series.append((t, p))
+    return series
+
+
+def bench_volatility(rng: random.Random, iterations: int, tokens: int = 200) -> List[BenchResult]:
+    import numpy as np
+    from data_updater.volatility import volatility_frame, volatility_batch, compare_with_reference
+
+    series = [(np.array(t, dtype=np.int64), np.array(p)) for t, p in make_price_series(rng, tokens)]
+    mismatches = compare_with_reference(series)
+    if mismatches:
+        print(f"⚠️  volatility_batch diverge da referência em {len(mismatches)} campos, ex: {mismatches[:3]}")
+    rounds = max(1, iterations // 200)
+    return [
+        run_case(f'volatility_frame (referência, {tokens} tokens)',
+                 lambda: [volatility_frame(t, p) for t, p in series], iterations=rounds, inner=1, warmup=1),
+        run_case(f'volatility_batch ({tokens} tokens)',
+                 lambda: volatility_batch(series), iterations=rounds, inner=1, warmup=1),
+    ]
+
+
+class MockClient:
+    """Client mock para o SenderTask (registra o instante de cada envio)."""
+
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.sent_ns: List[int] = []
+
+    def create_order(self, market, side, price, size, neg_risk=False):
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        self.sent_ns.append(time.monotonic_ns())
+        return {'orderID': f'mock-{len(self.sent_ns)}'}
+
+
+def bench_sender_task(rng: random.Random, iterations: int, markets: int = 20) -> List[BenchResult]:
+    from poly_data.order_intent import OrderIntent
+    from poly_data.sender_task import SenderTask
+
+    name = f'sender_task ({markets} mercados, client mock)'
+
+    async def _run():
+        client = MockClient()
+        sender = SenderTask(client, max_inflight_per_market=2, flush_window_ms=1)
+        await sender.start()
+        intents = []
+        start = time.monotonic_ns()
+        for i in range(iterations):
+            intent = OrderIntent(f'bench-market-{i % markets}', 'BUY', 0.45, 100)
+            intents.append(intent)
+            await sender.submit(intent)
+        while len(client.sent_ns) < iterations:
+            await asyncio.sleep(0.001)
+        elapsed = time.monotonic_ns() - start
+        await sender.stop()
+        # Latência intent criado -> request entregue ao client (ordem de envio != ordem de criação)
+        samples = sorted(sent - intent.timestamp for sent, intent in zip(sorted(client.sent_ns), intents))
+        return summarize(name, samples, iterations, elapsed)
+
+    loop = asyncio.new_event_loop()
+    try:
+        return [loop.run_until_complete(_run())]
+    finally:
+        loop.close()
+
+
+CASES: Dict[str, Callable] = {
+    'book': bench_book_state,
+    'process_data': bench_process_data,
+    'pricing': bench_pricing,
+    'cython': bench_cython,
+    'sender': bench_sender_task,
+    'rewards': bench_rewards,
+    'volatility': bench_volatility,
+}
+
+
+def run_all(iterations: int, frames_path: str = None, only: str = None, seed: int = 42) -> List[BenchResult]:
+    results = []
+    for group, fn in CASES.items():
+        if only and only not in group:
+            continue
+        rng = random.Random(seed)
+        try:
+            if group == 'process_data':
+                results.extend(fn(rng, iterations, frames_path))
+            elif group == 'sender':
+                results.extend(fn(rng, min(iterations, 5000)))
+            else:
+                results.extend(fn(rng, iterations))
+        except ImportError as e:
+            results.append(skipped(group, f'dependência ausente: {e.name}'))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks dos hot paths do bot")
+    parser.add_argument('--iterations', type=int, default=2000, help='Lotes medidos por caso (padrão: 2000)')
+    parser.add_argument('--filter', type=str, default=None,
+                        help=f"Executa apenas grupos que contêm o texto ({', '.join(CASES)})")
+    parser.add_argument('--frames', type=str, default=None,
+                        help='JSONL com frames brutos do canal market ou gravação do feed_recorder (diretório/.frames.gz)')
+    parser.add_argument('--json', type=str, default=None, help='Salva resultados em JSON (baseline)')
+    parser.add_argument('--baseline', type=str, default=None, help='Compara p50 com um JSON salvo antes')
+    parser.add_argument('--with-logging', action='store_true',
+                        help='Mantém logs INFO ativos (por padrão são desativados para não medir I/O de log)')
+    args = parser.parse_args()
+
+    if not args.with_logging:
+        logging.disable(logging.INFO)
+
+    results = run_all(args.iterations, args.frames, args.filter)
+    baseline = load_baseline(args.baseline) if args.baseline else None
+    print(format_results(results, baseline))
+
+    if args.json:
+        save_results(results, args.json)
+        print(f"Resultados salvos em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Teste de escala: cresce o número de mercados sinteticamente e mede RSS,
+memória por mercado (memory_accounting) e CPU por evento.
+
+Para cada degrau de --markets os mercados novos são criados pelo mesmo
+caminho do bot (snapshot 'book' via process_data), e as estruturas que o
+bot preenche ao operar são levadas ao estado estacionário: deques de
+LatencyMetrics cheias, asyncio.Lock em trading.market_locks e templates de
+payload BUY/SELL. Em seguida --events price_changes aleatórios (espalhados
+por todos os mercados) medem tempo de parede e CPU (thread_time) por evento,
+incluindo as tasks de apply_delta disparadas por cada evento.
+
+Usage:
+    python -m benchmarks.bench_scaling
+    python -m benchmarks.bench_scaling --markets 100,500,1000,2000,4000 --events 20000
+    python -m benchmarks.bench_scaling --json scaling.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_hot_paths import make_levels
+from benchmarks.harness import _percentile
+
+DEFAULT_STEPS = '10,100,250,500,1000,2000'
+
+
+def _book_frame(rng: random.Random, market: str, levels: int) -> Dict:
+    mid = round(rng.uniform(0.2, 0.8), 2)
+    bids, asks = make_levels(rng, mid=mid, levels=levels)
+    return {
+        'event_type': 'book',
+        'market': market,
+        'bids': [{'price': str(p), 'size': str(s)} for p, s in bids],
+        'asks': [{'price': str(p), 'size': str(s)} for p, s in asks],
+    }
+
+
+def _price_change(rng: random.Random, market: str) -> Dict:
+    side = rng.choice(['BUY', 'SELL'])
+    offset = 0.01 * rng.randint(1, 20)
+    price = round(0.5 - offset, 2) if side == 'BUY' else round(0.5 + offset, 2)
+    size = 0 if rng.random() < 0.2 else rng.randint(5, 5000)
+    return {
+        'event_type': 'price_change',
+        'market': market,
+        'price_changes': [{'side': side, 'price': str(price), 'size': str(size)}],
+    }
+
+
+async def _add_markets(rng: random.Random, markets: List[str], levels: int, fill_metrics: bool):
+    import poly_data.global_state as global_state
+    from poly_data.data_processing import process_data
+    from poly_data.latency_metrics import metrics
+    from poly_data.payload_template import get_payload_template
+    from trading import market_locks
+
+    for market in markets:
+        global_state.subscribed_assets.add(market)
+        await process_data([_book_frame(rng, market, levels)], trade=False)
+        market_locks[market] = asyncio.Lock()
+        get_payload_template(market, 'BUY')
+        get_payload_template(market, 'SELL')
+        if fill_metrics:
+            for _ in range(metrics.buffer_size):
+                metrics.record_decision(market, rng.randint(10_000, 500_000))
+                metrics.record_send(market, rng.randint(10_000, 500_000))
+                metrics.record_ack(market, rng.randint(1_000_000, 80_000_000))
+    await asyncio.sleep(0)
+
+
+async def _measure_events(rng: random.Random, markets: List[str], events: int) -> Dict[str, float]:
+    from poly_data.data_processing import process_data
+
+    frames = [_price_change(rng, rng.choice(markets)) for _ in range(events)]
+    perf = time.perf_counter_ns
+    cpu = time.thread_time_ns
+    wall_ns, cpu_ns = [], []
+    for frame in frames:
+        t0, c0 = perf(), cpu()
+        await process_data([frame], trade=False)
+        await asyncio.sleep(0)  # tasks de apply_delta disparadas pelo evento
+        cpu_ns.append(cpu() - c0)
+        wall_ns.append(perf() - t0)
+    wall_ns.sort()
+    cpu_ns.sort()
+    return {
+        'wall_p50_us': _percentile(wall_ns, 50) / 1000,
+        'wall_p99_us': _percentile(wall_ns, 99) / 1000,
+        'cpu_p50_us': _percentile(cpu_ns, 50) / 1000,
+        'cpu_p99_us': _percentile(cpu_ns, 99) / 1000,
+        'cpu_mean_us': sum(cpu_ns) / len(cpu_ns) / 1000 if cpu_ns else 0.0,
+    }
+
+
+async def run_scaling(steps: List[int], events: int, levels: int, fill_metrics: bool,
+                      sample_markets: int, seed: int = 42) -> List[Dict]:
+    from poly_data.memory_accounting import MemoryAccountant, current_rss_bytes
+
+    rng = random.Random(seed)
+    accountant = MemoryAccountant(sample_markets=sample_markets)
+    markets: List[str] = []
+    gc.collect()
+    base_rss = current_rss_bytes()
+    rows = []
+    for target in sorted(steps):
+        new = [f'scale-market-{i}' for i in range(len(markets), target)]
+        await _add_markets(rng, new, levels, fill_metrics)
+        markets.extend(new)
+
+        gc.collect()
+        rss = current_rss_bytes()
+        measured = accountant.sample()
+        timings = await _measure_events(rng, markets, events)
+        accounted = measured['accounted_bytes']
+        row = {
+            'markets': len(markets),
+            'rss_mb': rss / 1024 / 1024,
+            'rss_delta_mb': (rss - base_rss) / 1024 / 1024,
+            'rss_per_market_kb': (rss - base_rss) / len(markets) / 1024,
+            'accounted_mb': accounted / 1024 / 1024,
+            'bytes_per_market': {name: round(s['mean_bytes'])
+                                 for name, s in measured['structures'].items()},
+        }
+        row.update(timings)
+        rows.append(row)
+        print(f"  {len(markets):>6} mercados: RSS {row['rss_mb']:.1f} MiB, "
+              f"CPU/evento p50 {row['cpu_p50_us']:.1f} µs", flush=True)
+    return rows
+
+
+def format_rows(rows: List[Dict]) -> str:
+    lines = []
+    header = (f"{'mercados':>9} {'RSS MiB':>9} {'ΔRSS KiB/mkt':>13} {'contab. MiB':>12} "
+              f"{'CPU p50 µs':>11} {'CPU p99 µs':>11} {'wall p99 µs':>12}")
+    lines.append("=" * len(header))
+    lines.append(header)
+    lines.append("=" * len(header))
+    for r in rows:
+        lines.append(f"{r['markets']:>9} {r['rss_mb']:>9.1f} {r['rss_per_market_kb']:>13.1f} "
+                     f"{r['accounted_mb']:>12.2f} {r['cpu_p50_us']:>11.1f} {r['cpu_p99_us']:>11.1f} "
+                     f"{r['wall_p99_us']:>12.1f}")
+    lines.append("=" * len(header))
+    if rows:
+        lines.append("Bytes por mercado (último degrau):")
+        for name, size in sorted(rows[-1]['bytes_per_market'].items(), key=lambda kv: kv[1], reverse=True):
+            lines.append(f"  {name:<20} {size:>10,}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de escala do bot (RSS e CPU por evento vs nº de mercados)")
+    parser.add_argument('--markets', type=str, default=DEFAULT_STEPS,
+                        help=f'Degraus de nº de mercados separados por vírgula (padrão: {DEFAULT_STEPS})')
+    parser.add_argument('--events', type=int, default=5000, help='price_changes medidos por degrau (padrão: 5000)')
+    parser.add_argument('--levels', type=int, default=50, help='Níveis por lado em cada book (padrão: 50)')
+    parser.add_argument('--sample-markets', type=int, default=200,
+                        help='Mercados medidos pelo memory_accounting por degrau (padrão: 200)')
+    parser.add_argument('--no-fill-metrics', action='store_true',
+                        help='Não preenche as deques de LatencyMetrics (padrão: cheias, como em regime)')
+    parser.add_argument('--json', type=str, default=None, help='Salva resultados em JSON')
+    parser.add_argument('--with-logging', action='store_true',
+                        help='Mantém logs INFO ativos (por padrão são desativados para não medir I/O de log)')
+    args = parser.parse_args()
+
+    if not args.with_logging:
+        logging.disable(logging.INFO)
+
+    steps = [int(s) for s in args.markets.split(',') if s.strip()]
+    loop = asyncio.new_event_loop()
+    try:
+        rows = loop.run_until_complete(run_scaling(steps, args.events, args.levels,
+                                                   not args.no_fill_metrics, args.sample_markets))
+    finally:
+        loop.close()
+    print(format_rows(rows))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'events': args.events,
+                'levels': args.levels,
+                'rows': rows,
+            }, f, indent=2)
+        print(f"Resultados salvos em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
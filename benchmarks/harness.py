@@ -0,0 +1,159 @@
+"""
+Harness de microbenchmarks (estilo asv) para os hot paths do bot.
+
+Cada caso é executado em lotes de `inner` chamadas; a latência por chamada
+é a média do lote (reduz o overhead do relógio para funções sub-µs).
+Reporta ops/s, p50 e p99 por caso e permite comparar com um baseline JSON
+salvo numa execução anterior (ex: antes/depois de uma fase de otimização).
+"""
+import asyncio
+import json
+import platform
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class BenchResult:
+    """Resultado de um caso de benchmark (latências em microssegundos)."""
+    __slots__ = ['name', 'iterations', 'ops_per_sec', 'p50_us', 'p99_us', 'mean_us', 'skipped']
+
+    def __init__(self, name: str, iterations: int = 0, ops_per_sec: float = 0.0,
+                 p50_us: float = 0.0, p99_us: float = 0.0, mean_us: float = 0.0,
+                 skipped: Optional[str] = None):
+        self.name = name
+        self.iterations = iterations
+        self.ops_per_sec = ops_per_sec
+        self.p50_us = p50_us
+        self.p99_us = p99_us
+        self.mean_us = mean_us
+        self.skipped = skipped
+
+    def to_dict(self) -> Dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+def _percentile(sorted_vals: List[float], p: float) -> float:
+    """Mesmo critério de índice usado em LatencyMetrics.get_percentiles."""
+    if not sorted_vals:
+        return 0.0
+    idx = min(int(len(sorted_vals) * p / 100), len(sorted_vals) - 1)
+    return sorted_vals[idx]
+
+
+def summarize(name: str, samples_ns: List[float], total_ops: int, elapsed_ns: int) -> BenchResult:
+    """Constrói um BenchResult a partir das amostras (ns por operação)."""
+    if not samples_ns or elapsed_ns <= 0:
+        return BenchResult(name, skipped='sem amostras')
+    sorted_vals = sorted(samples_ns)
+    return BenchResult(
+        name,
+        iterations=total_ops,
+        ops_per_sec=total_ops / (elapsed_ns / 1e9),
+        p50_us=_percentile(sorted_vals, 50) / 1000,
+        p99_us=_percentile(sorted_vals, 99) / 1000,
+        mean_us=(sum(sorted_vals) / len(sorted_vals)) / 1000,
+    )
+
+
+def run_case(name: str, fn: Callable[[], object], iterations: int = 2000,
+             inner: int = 10, warmup: int = 200) -> BenchResult:
+    """Executa um caso síncrono.
+
+    Args:
+        name: Nome do caso
+        fn: Função sem argumentos (prepare o estado via closure)
+        iterations: Número de lotes medidos
+        inner: Chamadas por lote
+        warmup: Chamadas descartadas antes de medir
+    """
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    perf = time.perf_counter_ns
+    start = perf()
+    for _ in range(iterations):
+        t0 = perf()
+        for _ in range(inner):
+            fn()
+        samples.append((perf() - t0) / inner)
+    elapsed = perf() - start
+    return summarize(name, samples, iterations * inner, elapsed)
+
+
+def run_async_case(name: str, coro_fn: Callable[[], object], iterations: int = 2000,
+                   warmup: int = 200, loop: Optional[asyncio.AbstractEventLoop] = None) -> BenchResult:
+    """Executa um caso assíncrono dentro de um event loop (uma medição por await).
+
+    Necessário quando o código medido usa asyncio.create_task (ex: process_data).
+    """
+    async def _runner():
+        for _ in range(warmup):
+            await coro_fn()
+        samples = []
+        perf = time.perf_counter_ns
+        start = perf()
+        for _ in range(iterations):
+            t0 = perf()
+            await coro_fn()
+            samples.append(perf() - t0)
+        elapsed = perf() - start
+        # Deixar tasks filhas (ex: apply_delta) terminarem fora da medição
+        await asyncio.sleep(0)
+        return summarize(name, samples, iterations, elapsed)
+
+    own_loop = loop is None
+    if own_loop:
+        loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(_runner())
+    finally:
+        if own_loop:
+            loop.close()
+
+
+def skipped(name: str, reason: str) -> BenchResult:
+    return BenchResult(name, skipped=reason)
+
+
+def format_results(results: List[BenchResult], baseline: Optional[Dict[str, Dict]] = None) -> str:
+    """Formata os resultados como tabela (com delta de p50 contra o baseline, se houver)."""
+    lines = []
+    header = f"{'caso':<48} {'ops/s':>14} {'p50 (µs)':>11} {'p99 (µs)':>11}"
+    if baseline:
+        header += f" {'Δp50':>9}"
+    lines.append("=" * len(header))
+    lines.append(header)
+    lines.append("=" * len(header))
+    for r in results:
+        if r.skipped:
+            lines.append(f"{r.name:<48} {'(skip: ' + r.skipped + ')':>38}")
+            continue
+        line = f"{r.name:<48} {r.ops_per_sec:>14,.0f} {r.p50_us:>11.3f} {r.p99_us:>11.3f}"
+        if baseline:
+            base = baseline.get(r.name)
+            if base and not base.get('skipped') and base.get('p50_us'):
+                delta = (r.p50_us - base['p50_us']) / base['p50_us'] * 100
+                line += f" {delta:>+8.1f}%"
+            else:
+                line += f" {'n/a':>9}"
+        lines.append(line)
+    lines.append("=" * len(header))
+    return "\n".join(lines)
+
+
+def save_results(results: List[BenchResult], path: str):
+    """Salva resultados em JSON (usado como baseline em execuções futuras)."""
+    payload = {
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': {r.name: r.to_dict() for r in results},
+    }
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2)
+
+
+def load_baseline(path: str) -> Dict[str, Dict]:
+    with open(path) as f:
+        return json.load(f).get('results', {})
@@ -13,6 +13,7 @@ import os
 import sys
 from dotenv import load_dotenv
 from poly_data.polymarket_client import PolymarketClient
+from poly_data.book_reader import BookReader
 import pandas as pd
 import requests
 from datetime import datetime
@@ -49,10 +50,21 @@ def check_balances(client):
     except Exception as e:
         print(f"❌ Error getting total balance: {e}")
 
+def bot_mid(reader, pos):
+    """Live mid for the position's token from the running bot's shared-memory books, if fresh."""
+    book = reader.read(str(pos.get('conditionId', '')))
+    if book is None or book.mid is None or book.age_s > 60:
+        return None
+    asset = str(pos.get('asset', ''))
+    if asset == book.token2:
+        return 1 - book.mid
+    return book.mid if asset == book.token1 else None
+
 def check_positions(client):
     """Check current positions."""
     print_section("CURRENT POSITIONS")
 
+    reader = BookReader()
     try:
         positions = client.get_all_positions()
 
@@ -87,6 +99,9 @@ def check_positions(client):
             print(f"  Size: {size:.2f} shares")
             print(f"  Avg Price: ${avg_price:.4f}")
             print(f"  Market Price: ${market_price:.4f}")
+            live_mid = bot_mid(reader, pos)
+            if live_mid is not None:
+                print(f"  Bot Mid (live): ${live_mid:.4f}")
 
             pnl_symbol = "📈" if total_pnl >= 0 else "📉"
             print(f"  {pnl_symbol} P&L: ${total_pnl:+.2f} ({pnl_percent:+.2f}%)")
@@ -97,6 +112,8 @@ def check_positions(client):
         print(f"❌ Error getting positions: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        reader.close()
 
 def check_orders(client):
     """Check active orders."""
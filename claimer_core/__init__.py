@@ -14,6 +14,10 @@ from .position_fetcher import fetchPositions
 from .claim_filter import filterClaimables
 from .tx_builder import buildRedeemTx
 from .tx_sender import submitToSafe, submitDirect
+from .tx_batcher import submitBatchToSafe, encodeMultiSend
+from .tx_manager import TxManager, getTxManager
+from .receipt_tracker import ReceiptTracker, trackReceipts
+from .claim_scanner import ClaimScanner
 
 __all__ = [
     'fetchPositions',
@@ -21,6 +25,13 @@ __all__ = [
     'buildRedeemTx',
     'submitToSafe',
     'submitDirect',
+    'submitBatchToSafe',
+    'encodeMultiSend',
+    'TxManager',
+    'getTxManager',
+    'ReceiptTracker',
+    'trackReceipts',
+    'ClaimScanner',
 ]
 
 
@@ -113,3 +113,17 @@ def filterClaimables(positions: List[Dict], debug: bool = False) -> List[Dict]:
     return claimables
 
 
+def redeemableAmount(pos: Dict) -> float:
+    """
+    USD value of a claimable position (currentValue, or size * curPrice as fallback).
+    """
+    redeemable = pos.get('currentValue') or 0
+    try:
+        if not redeemable or float(redeemable) == 0:
+            size = pos.get('size', 0)
+            cur_price = pos.get('curPrice', 0)
+            if size and cur_price and float(cur_price) > 0:
+                redeemable = float(size) * float(cur_price)
+        return float(redeemable) if redeemable else 0.0
+    except (ValueError, TypeError):
+        return 0.0
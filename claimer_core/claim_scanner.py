@@ -0,0 +1,195 @@
+"""
+Module (H): Incremental Claimable-Position Scanner
+
+Long-running replacement for "download every position, filter, sum" on each
+monitor interval. The scanner keeps the claimable set and a cache of
+claimed conditions, and refreshes only what changed:
+
+- Startup (and every CLAIM_SCAN_FULL_RESYNC_S as a safety net): one
+  paginated /positions download rebuilds the claimable set.
+- Each scan:
+  1. /activity since the last seen timestamp (paginated) -> REDEEM events
+     mark their conditions as claimed (by us or the UI).
+  2. /positions?redeemable=true (paginated, usually a handful of rows) ->
+     the current claimable set. Markets resolving is not wallet activity,
+     so this is how new claims show up.
+- A condition is cached as claimed only on a REDEEM activity, or when a
+  full resync confirms it is no longer redeemable; one short or empty
+  redeemable response only drops it from the current set until it shows up
+  again. Between full resyncs, claimed conditions stay out of the claimable
+  set even while the API still lists them as redeemable. A full resync
+  un-claims conditions that are redeemable again. The cache is persisted
+  to CLAIM_SCAN_CACHE_PATH so restarts keep it.
+- Claimable totals are kept incrementally (per position) instead of being
+  recomputed from the full list.
+
+A scan costs two small requests when nothing changed, so the monitor
+interval can drop to seconds.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Set
+
+import requests
+
+from .position_fetcher import create_session, fetchPositionsPaged, fetchActivity, POSITIONS_PAGE_SIZE
+from .claim_filter import filterClaimables, redeemableAmount
+
+logger = logging.getLogger(__name__)
+
+CLAIM_SCAN_FULL_RESYNC_S = float(os.getenv('CLAIM_SCAN_FULL_RESYNC_S', '3600'))
+CLAIM_SCAN_CACHE_PATH = os.getenv('CLAIM_SCAN_CACHE_PATH', 'data/claim_scanner.json')
+
+
+def _condition_id(pos: Dict) -> str:
+    return str(pos.get('conditionId') or pos.get('condition_id') or '').lower()
+
+
+def _position_key(pos: Dict) -> str:
+    return str(pos.get('asset') or pos.get('tokenId') or '')
+
+
+class ClaimScanner:
+    """Claimable set + claimed condition cache for one wallet."""
+
+    def __init__(self, wallet_address: str, session: Optional[requests.Session] = None,
+                 cache_path: str = CLAIM_SCAN_CACHE_PATH, full_resync_s: float = CLAIM_SCAN_FULL_RESYNC_S):
+        self.wallet_address = wallet_address
+        self.session = session or create_session()
+        self.cache_path = cache_path
+        self.full_resync_s = full_resync_s
+        self.claimables: Dict[str, Dict] = {}  # asset -> claimable position
+        self.amounts: Dict[str, float] = {}  # asset -> redeemable amount
+        self.total = 0.0
+        self.claimed: Set[str] = set()
+        self.last_activity_ts = 0
+        self.last_full_sync = 0.0
+        self.requests = 0
+        self._load_cache()
+
+    # ============ Cache ============
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path) as f:
+                cache = json.load(f)
+            if cache.get('wallet', '').lower() != self.wallet_address.lower():
+                return
+            self.claimed = set(cache.get('claimed', []))
+            logger.info(f"Loaded claim cache: {len(self.claimed)} claimed conditions")
+        except Exception as e:
+            logger.warning(f"Could not read claim cache {self.cache_path}: {e}")
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        try:
+            directory = os.path.dirname(self.cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.cache_path + '.tmp', 'w') as f:
+                json.dump({'wallet': self.wallet_address, 'claimed': sorted(self.claimed)}, f)
+            os.replace(self.cache_path + '.tmp', self.cache_path)
+        except Exception as e:
+            logger.warning(f"Could not write claim cache {self.cache_path}: {e}")
+
+    # ============ Index updates ============
+
+    def _set_claimable(self, pos: Dict):
+        key = _position_key(pos)
+        amount = redeemableAmount(pos)
+        self.total += amount - self.amounts.get(key, 0.0)
+        self.amounts[key] = amount
+        self.claimables[key] = pos
+
+    def _drop_claimable(self, key: str):
+        self.total -= self.amounts.pop(key, 0.0)
+        self.claimables.pop(key, None)
+
+    def _apply_redeemable(self, redeemable: List[Dict], confirmed: bool = False):
+        """Sync the claimable set with the API's redeemable positions.
+
+        Positions that left the set are dropped; their conditions are cached as claimed
+        only if `confirmed` (a full resync), since one response may be short or empty.
+        """
+        claimables = filterClaimables([pos for pos in redeemable if _condition_id(pos) not in self.claimed])
+        current = {_position_key(pos): pos for pos in claimables}
+        for key in list(self.claimables):
+            if key not in current:
+                if confirmed:
+                    # Was claimable, the full resync no longer has it: claimed (by us or the UI)
+                    self.claimed.add(_condition_id(self.claimables[key]))
+                self._drop_claimable(key)
+        for key, pos in current.items():
+            self._set_claimable(pos)
+
+    def _drop_condition(self, cid: str):
+        for key in [key for key, pos in self.claimables.items() if _condition_id(pos) == cid]:
+            self._drop_claimable(key)
+
+    # ============ Scans ============
+
+    def fullSync(self):
+        """Rebuild the claimable set from every position (startup and periodic safety net)."""
+        positions = fetchPositionsPaged(self.wallet_address, self.session)
+        self.requests += 1 + len(positions) // POSITIONS_PAGE_SIZE
+        redeemable = [pos for pos in positions if str(pos.get('redeemable', '')).lower() in ('true', '1')]
+        # Redeemable again (claim that never went through, or a stale cache entry): claim it
+        reopened = {_condition_id(pos) for pos in filterClaimables(redeemable)} & self.claimed
+        if reopened:
+            logger.info(f"{len(reopened)} cached-as-claimed conditions are redeemable again")
+            self.claimed -= reopened
+        self._apply_redeemable(redeemable, confirmed=True)
+        self.last_full_sync = time.time()
+        if not self.last_activity_ts:
+            self.last_activity_ts = int(self.last_full_sync)
+        logger.info(f"✓ Full sync: {len(positions)} positions, {len(self.claimables)} claimable (${self.total:.2f})")
+
+    def _apply_activity(self):
+        """REDEEM activity since the last scan marks those conditions as claimed."""
+        # Inclusive start: events sharing the last seen second are re-read (marking claimed is idempotent)
+        activity = fetchActivity(self.wallet_address, self.session, start=self.last_activity_ts)
+        self.requests += 1 + len(activity) // POSITIONS_PAGE_SIZE
+        for item in activity:
+            cid = _condition_id(item)
+            if cid and str(item.get('type', '')).upper() == 'REDEEM':
+                self.claimed.add(cid)
+                self._drop_condition(cid)
+            self.last_activity_ts = max(self.last_activity_ts, int(item.get('timestamp') or 0))
+
+    def scan(self) -> bool:
+        """
+        Refresh what changed since the last scan.
+
+        Returns:
+            True if the claimable set or total changed
+        """
+        before = (set(self.claimables), round(self.total, 2), len(self.claimed))
+        if not self.last_full_sync or time.time() - self.last_full_sync > self.full_resync_s:
+            self.fullSync()
+        else:
+            self._apply_activity()
+            redeemable = fetchPositionsPaged(self.wallet_address, self.session, redeemable=True)
+            self.requests += 1
+            self._apply_redeemable(redeemable)
+
+        after = (set(self.claimables), round(self.total, 2), len(self.claimed))
+        if after != before:
+            self._save_cache()
+        return after[:2] != before[:2]
+
+    def claimableList(self) -> List[Dict]:
+        return sorted(self.claimables.values(), key=redeemableAmount, reverse=True)
+
+    def snapshot(self) -> Dict:
+        return {
+            'claimable': len(self.claimables),
+            'total': round(self.total, 2),
+            'claimed_cached': len(self.claimed),
+            'requests': self.requests,
+        }
@@ -15,6 +15,8 @@ logger = logging.getLogger(__name__)
 # Polymarket API endpoints
 POLYMARKET_DATA_API = "https://data-api.polymarket.com"
 POSITIONS_ENDPOINT = f"{POLYMARKET_DATA_API}/positions"
+ACTIVITY_ENDPOINT = f"{POLYMARKET_DATA_API}/activity"
+POSITIONS_PAGE_SIZE = 500  # API maximum per request
 
 def create_session() -> requests.Session:
     """Create a requests session with retry strategy."""
@@ -67,4 +69,72 @@ def fetchPositions(wallet_address: str, session: Optional[requests.Session] = No
         logger.error(f"❌ Unexpected error fetching positions: {e}")
         raise
 
+def fetchPositionsPaged(
+    wallet_address: str,
+    session: Optional[requests.Session] = None,
+    page_size: int = POSITIONS_PAGE_SIZE,
+    **filters
+) -> List[Dict]:
+    """
+    Fetch positions page by page (limit/offset), with optional API filters.
+    
+    Args:
+        wallet_address: Ethereum wallet address (checksummed)
+        session: Optional requests session (will create one if not provided)
+        page_size: Positions per request
+        **filters: Extra query params, e.g. redeemable=True, market="0xabc,0xdef"
+    
+    Returns:
+        List of position dictionaries from the API
+    """
+    if session is None:
+        session = create_session()
+    
+    params = {"user": wallet_address, "limit": page_size}
+    for key, value in filters.items():
+        params[key] = str(value).lower() if isinstance(value, bool) else value
+    
+    positions = []
+    offset = 0
+    while True:
+        params["offset"] = offset
+        response = session.get(POSITIONS_ENDPOINT, params=params, timeout=30)
+        response.raise_for_status()
+        page = response.json()
+        positions.extend(page)
+        if len(page) < page_size:
+            return positions
+        offset += page_size
+
+def fetchActivity(
+    wallet_address: str,
+    session: Optional[requests.Session] = None,
+    start: Optional[int] = None,
+    page_size: int = POSITIONS_PAGE_SIZE
+) -> List[Dict]:
+    """
+    Fetch on-chain activity (trades, merges, redeems...) since `start` (unix seconds).
 
+    Paginated like fetchPositionsPaged (limit/offset until a short page), so a
+    burst of more than one page of events is not cut off.
+    
+    Returns:
+        List of activity dictionaries (each has conditionId, type and timestamp), oldest first
+    """
+    if session is None:
+        session = create_session()
+    
+    params = {"user": wallet_address, "limit": page_size, "sortDirection": "ASC"}
+    if start is not None:
+        params["start"] = int(start)
+    activity = []
+    offset = 0
+    while True:
+        params["offset"] = offset
+        response = session.get(ACTIVITY_ENDPOINT, params=params, timeout=30)
+        response.raise_for_status()
+        page = response.json()
+        activity.extend(page)
+        if len(page) < page_size:
+            return activity
+        offset += page_size
@@ -0,0 +1,254 @@
+"""
+Module (G): Concurrent Receipt Tracking
+
+Watches many in-flight transactions at once instead of waiting on each
+receipt in turn, so a claim run finishes about one block after the last send
+rather than after N confirmation times.
+
+Two modes (RECEIPT_TRACK_MODE):
+- 'blocks' (default): one eth_blockNumber per RECEIPT_POLL_S. Each new block
+  is fetched once (with transactions) and matched against the pending set by
+  hash and by (sender, nonce). Receipts are only requested for transactions
+  that were actually included.
+- 'poll': every RECEIPT_POLL_S, request all pending receipts concurrently.
+
+Replacements are handled in both modes. A speed-up/cancel registered with
+replace(), or any transaction from the same sender with the same nonce seen
+in a block, resolves the entry with that transaction's receipt; the result
+then records 'replaced_tx_hash'. In 'poll' mode a nonce that got consumed
+without any of the known hashes being mined is reported as 'replaced'.
+Entries still unresolved after RECEIPT_TIMEOUT_S stay 'pending' with a timeout
+error.
+
+Web3 calls are synchronous and run in the default executor, so the tracker
+works with the same HTTP Web3 instance (or local node) as the senders.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from functools import partial
+from typing import Dict, List, Optional, Sequence
+
+from web3 import Web3
+
+from .tx_manager import hexHash
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_TRACK_MODE = os.getenv('RECEIPT_TRACK_MODE', 'blocks').lower()
+RECEIPT_POLL_S = float(os.getenv('RECEIPT_POLL_S', '1'))
+RECEIPT_TIMEOUT_S = float(os.getenv('RECEIPT_TIMEOUT_S', '300'))
+# Blocks scanned per round at most (a long RPC stall falls back to receipt lookups)
+RECEIPT_MAX_BLOCKS_PER_ROUND = int(os.getenv('RECEIPT_MAX_BLOCKS_PER_ROUND', '10'))
+
+
+class PendingTx:
+    """One tracked transaction (plus any replacements registered for it)."""
+
+    __slots__ = ('tx_hash', 'hashes', 'result', 'sender', 'nonce', 'added_at')
+
+    def __init__(self, tx_hash: str, result: Dict, sender: Optional[str] = None, nonce: Optional[int] = None):
+        self.tx_hash = hexHash(tx_hash)
+        self.hashes = {self.tx_hash}
+        self.result = result
+        self.sender = sender.lower() if sender else None
+        self.nonce = nonce
+        self.added_at = time.time()
+
+
+class ReceiptTracker:
+    """Resolves many pending transactions concurrently (block scanning or receipt polling)."""
+
+    def __init__(self, web3: Web3, timeout: float = RECEIPT_TIMEOUT_S, poll_s: float = RECEIPT_POLL_S,
+                 mode: str = RECEIPT_TRACK_MODE, tx_manager=None):
+        self.web3 = web3
+        self.timeout = timeout
+        self.poll_s = poll_s
+        self.mode = mode
+        self.tx_manager = tx_manager
+        self._pending: Dict[str, PendingTx] = {}  # any known hash -> entry
+        self._last_block: Optional[int] = None
+        self.rpc_calls = 0
+
+    def add(self, tx_hash: str, result: Dict, sender: Optional[str] = None, nonce: Optional[int] = None):
+        """Track tx_hash; `result` is updated in place when it resolves."""
+        entry = PendingTx(tx_hash, result, sender, nonce)
+        self._pending[entry.tx_hash] = entry
+
+    def replace(self, old_hash: str, new_hash: str):
+        """Register a speed-up/cancel of old_hash; whichever lands resolves the entry."""
+        entry = self._pending.get(hexHash(old_hash))
+        if entry is not None:
+            entry.hashes.add(hexHash(new_hash))
+            self._pending[hexHash(new_hash)] = entry
+
+    def _entries(self) -> List[PendingTx]:
+        return list({id(entry): entry for entry in self._pending.values()}.values())
+
+    async def _call(self, fn, *args, **kwargs):
+        self.rpc_calls += 1
+        return await asyncio.get_running_loop().run_in_executor(None, partial(fn, *args, **kwargs))
+
+    async def _receipt(self, tx_hash: str):
+        try:
+            return await self._call(self.web3.eth.get_transaction_receipt, tx_hash)
+        except Exception:
+            # Not mined yet (TransactionNotFound) or a transient RPC error
+            return None
+
+    def _resolve(self, entry: PendingTx, receipt, mined_hash: str):
+        result = entry.result
+        result['status'] = 'success' if receipt['status'] == 1 else 'failed'
+        result['receipt'] = dict(receipt)
+        result['gas_used'] = receipt.get('gasUsed')
+        if mined_hash != entry.tx_hash:
+            result['replaced_tx_hash'] = entry.tx_hash
+            result['tx_hash'] = mined_hash
+        if self.tx_manager is not None:
+            for tx_hash in entry.hashes | {mined_hash}:
+                self.tx_manager.confirm(tx_hash)
+        for tx_hash in entry.hashes:
+            self._pending.pop(tx_hash, None)
+        logger.info(f"✓ Transaction {result['status']}: {mined_hash}")
+
+    async def _fill_nonces(self, entries: Sequence[PendingTx]):
+        """Sender/nonce of entries added without them (needed to spot replacements)."""
+        missing = [entry for entry in entries if entry.nonce is None]
+        if not missing:
+            return
+        txs = await asyncio.gather(*(self._call(self.web3.eth.get_transaction, entry.tx_hash)
+                                     for entry in missing), return_exceptions=True)
+        for entry, tx in zip(missing, txs):
+            if isinstance(tx, Exception) or tx is None:
+                continue
+            entry.sender = str(tx['from']).lower()
+            entry.nonce = tx['nonce']
+
+    async def _poll_round(self, entries: Sequence[PendingTx]):
+        """Ask for every known hash of every entry at once."""
+        lookups = [(entry, tx_hash) for entry in entries for tx_hash in entry.hashes]
+        receipts = await asyncio.gather(*(self._receipt(tx_hash) for _, tx_hash in lookups))
+        for (entry, tx_hash), receipt in zip(lookups, receipts):
+            if receipt is not None and entry.tx_hash in self._pending:
+                self._resolve(entry, receipt, tx_hash)
+
+    async def _check_replaced(self, entries: Sequence[PendingTx]):
+        """'poll' mode: nonce consumed by some transaction we never saw."""
+        senders = list({entry.sender for entry in entries if entry.sender and entry.nonce is not None})
+        counts = dict(zip(senders, await asyncio.gather(
+            *(self._call(self.web3.eth.get_transaction_count, Web3.to_checksum_address(sender), 'latest')
+              for sender in senders), return_exceptions=True)))
+        for entry in entries:
+            count = counts.get(entry.sender)
+            if entry.tx_hash not in self._pending or not isinstance(count, int) or count <= entry.nonce:
+                continue
+            # One last lookup: the nonce may have been used by one of our own hashes
+            await self._poll_round([entry])
+            if entry.tx_hash in self._pending:
+                entry.result['status'] = 'replaced'
+                entry.result['error'] = f"nonce {entry.nonce} used by an unknown transaction"
+                for tx_hash in entry.hashes:
+                    self._pending.pop(tx_hash, None)
+                logger.warning(f"⚠️  Transaction {entry.tx_hash} replaced by an unknown transaction")
+
+    async def _block_round(self):
+        """'blocks' mode: scan new blocks for our hashes or (sender, nonce) pairs."""
+        head = await self._call(lambda: self.web3.eth.block_number)
+        if self._last_block is not None and head <= self._last_block:
+            return
+        first = head if self._last_block is None else self._last_block + 1
+        if head - first >= RECEIPT_MAX_BLOCKS_PER_ROUND:
+            # Too far behind to scan block by block: look the receipts up directly
+            self._last_block = head
+            await self._poll_round(self._entries())
+            return
+        blocks = await asyncio.gather(*(self._call(self.web3.eth.get_block, number, full_transactions=True)
+                                        for number in range(first, head + 1)), return_exceptions=True)
+        self._last_block = head
+
+        by_nonce = {(entry.sender, entry.nonce): entry for entry in self._entries()
+                    if entry.sender and entry.nonce is not None}
+        mined = []
+        for block in blocks:
+            if isinstance(block, Exception) or block is None:
+                continue
+            for tx in block['transactions']:
+                tx_hash = hexHash(tx['hash'])
+                entry = self._pending.get(tx_hash) or by_nonce.get((str(tx['from']).lower(), tx['nonce']))
+                if entry is not None:
+                    mined.append((entry, tx_hash))
+        receipts = await asyncio.gather(*(self._receipt(tx_hash) for _, tx_hash in mined))
+        for (entry, tx_hash), receipt in zip(mined, receipts):
+            if receipt is not None and entry.tx_hash in self._pending:
+                self._resolve(entry, receipt, tx_hash)
+
+    def _expire(self):
+        now = time.time()
+        for entry in self._entries():
+            if now - entry.added_at > self.timeout:
+                entry.result.setdefault('status', 'pending')
+                entry.result['error'] = f"receipt not seen after {self.timeout:.0f}s"
+                for tx_hash in entry.hashes:
+                    self._pending.pop(tx_hash, None)
+                logger.warning(f"Receipt wait timed out for {entry.tx_hash}")
+
+    async def run(self) -> int:
+        """Track until every entry resolves or times out. Returns the number of RPC calls made."""
+        if not self._pending:
+            return self.rpc_calls
+        entries = self._entries()
+        await self._fill_nonces(entries)
+        if self.mode != 'poll':
+            # Head read before the lookups: every later block is scanned by _block_round
+            self._last_block = await self._call(lambda: self.web3.eth.block_number)
+        # Anything mined before tracking started is found by a direct lookup
+        await self._poll_round(entries)
+        while self._pending:
+            self._expire()
+            if not self._pending:
+                break
+            await asyncio.sleep(self.poll_s)
+            if self.mode == 'poll':
+                await self._poll_round(self._entries())
+                await self._check_replaced(self._entries())
+            else:
+                await self._block_round()
+        return self.rpc_calls
+
+
+def trackReceipts(
+    web3: Web3,
+    results: List[Dict],
+    tx_manager=None,
+    timeout: float = RECEIPT_TIMEOUT_S,
+    mode: str = RECEIPT_TRACK_MODE
+) -> List[Dict]:
+    """
+    Resolve every 'pending' result that has a tx_hash, concurrently.
+
+    Args:
+        web3: Web3 instance used to send the transactions
+        results: Result dictionaries (as returned by submitDirect(wait=False)); updated in place
+        tx_manager: Optional TxManager; its in-flight nonces are reused and cleared on confirmation
+        timeout: Seconds before an unresolved transaction is given up on
+
+    Returns:
+        The same results list
+    """
+    tracker = ReceiptTracker(web3, timeout=timeout, mode=mode, tx_manager=tx_manager)
+    nonces = {hexHash(tx_hash): nonce for nonce, tx_hash in tx_manager.in_flight.items()} if tx_manager else {}
+    sender = tx_manager.sender if tx_manager else None
+    tracked = 0
+    for result in results:
+        if result.get('status') == 'pending' and result.get('tx_hash'):
+            nonce = nonces.get(hexHash(result['tx_hash']))
+            tracker.add(result['tx_hash'], result, sender if nonce is not None else None, nonce)
+            tracked += 1
+    if not tracked:
+        return results
+    started = time.time()
+    rpc_calls = asyncio.run(tracker.run())
+    logger.info(f"Tracked {tracked} transactions in {time.time() - started:.1f}s ({rpc_calls} RPC calls)")
+    return results
@@ -0,0 +1,252 @@
+"""
+Module (E): Batch Redeem Transactions through a Gnosis Safe multiSend
+
+Packs many redeem transactions (from buildRedeemTx) into one Safe
+execTransaction that DELEGATECALLs MultiSendCallOnly, so N claims cost one
+nonce, one gas estimate and one receipt instead of N of each.
+
+Batches are capped by gas: a batch whose estimate exceeds max_gas (by default
+CLAIM_BATCH_GAS_FRACTION of the latest block gas limit) is split in half,
+recursively. A batch whose estimate reverts is also split until the failing
+redeem is isolated; it is reported as an error and the rest still go out.
+
+The Safe is signed the same way poly_merger/safe-helpers.js does it (owner
+eth_sign of getTransactionHash, v + 4), so the signer must be an owner of a
+threshold-1 Safe. Everything goes through the injected Web3 instance, so a
+local node (e.g. an anvil fork of Polygon) can stand in for mainnet.
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from web3 import Web3
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from eth_utils import to_checksum_address
+
+from .tx_manager import TxManager, getTxManager
+from .receipt_tracker import trackReceipts
+
+logger = logging.getLogger(__name__)
+
+# Safe v1.3.0 canonical deployment (same address on Polygon)
+MULTISEND_CALL_ONLY_ADDRESS = os.getenv('MULTISEND_ADDRESS', '0x40A2aCCbd92BCA938b02010E17A5b8929b49130D')
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+CLAIM_BATCH_MAX_SIZE = int(os.getenv('CLAIM_BATCH_MAX_SIZE', '50'))
+CLAIM_BATCH_GAS_FRACTION = float(os.getenv('CLAIM_BATCH_GAS_FRACTION', '0.5'))
+CLAIM_BATCH_MAX_GAS = int(os.getenv('CLAIM_BATCH_MAX_GAS', '0'))  # 0 = derive from block gas limit
+
+OPERATION_CALL = 0
+OPERATION_DELEGATECALL = 1
+MULTISEND_SELECTOR = bytes.fromhex('8d80ff0a')  # multiSend(bytes)
+
+SAFE_ABI = [
+    {"inputs": [], "name": "nonce", "outputs": [{"name": "", "type": "uint256"}],
+     "stateMutability": "view", "type": "function"},
+    {"inputs": [], "name": "getThreshold", "outputs": [{"name": "", "type": "uint256"}],
+     "stateMutability": "view", "type": "function"},
+    {"inputs": [{"name": "owner", "type": "address"}], "name": "isOwner",
+     "outputs": [{"name": "", "type": "bool"}], "stateMutability": "view", "type": "function"},
+    {"inputs": [
+        {"name": "to", "type": "address"}, {"name": "value", "type": "uint256"},
+        {"name": "data", "type": "bytes"}, {"name": "operation", "type": "uint8"},
+        {"name": "safeTxGas", "type": "uint256"}, {"name": "baseGas", "type": "uint256"},
+        {"name": "gasPrice", "type": "uint256"}, {"name": "gasToken", "type": "address"},
+        {"name": "refundReceiver", "type": "address"}, {"name": "_nonce", "type": "uint256"}],
+     "name": "getTransactionHash", "outputs": [{"name": "", "type": "bytes32"}],
+     "stateMutability": "view", "type": "function"},
+    {"inputs": [
+        {"name": "to", "type": "address"}, {"name": "value", "type": "uint256"},
+        {"name": "data", "type": "bytes"}, {"name": "operation", "type": "uint8"},
+        {"name": "safeTxGas", "type": "uint256"}, {"name": "baseGas", "type": "uint256"},
+        {"name": "gasPrice", "type": "uint256"}, {"name": "gasToken", "type": "address"},
+        {"name": "refundReceiver", "type": "address"}, {"name": "signatures", "type": "bytes"}],
+     "name": "execTransaction", "outputs": [{"name": "success", "type": "bool"}],
+     "stateMutability": "payable", "type": "function"},
+]
+
+
+def _to_bytes(data) -> bytes:
+    if data is None:
+        raise ValueError("Transaction data is not encoded (call buildRedeemTx with a Web3 instance)")
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data)
+    data = str(data)
+    return bytes.fromhex(data[2:] if data.startswith('0x') else data)
+
+
+def encodeMultiSend(tx_datas: Sequence[Dict]) -> bytes:
+    """
+    Encode multiSend(bytes transactions) calldata.
+
+    Each transaction is packed as operation (uint8), to (address), value
+    (uint256), data length (uint256) and data, as MultiSendCallOnly expects.
+    """
+    packed = b''.join(
+        OPERATION_CALL.to_bytes(1, 'big')
+        + _to_bytes(to_checksum_address(tx['to']))
+        + int(tx.get('value', 0)).to_bytes(32, 'big')
+        + len(_to_bytes(tx['data'])).to_bytes(32, 'big')
+        + _to_bytes(tx['data'])
+        for tx in tx_datas
+    )
+    # ABI encoding of a single dynamic `bytes` argument: offset, length, right-padded data
+    padding = (-len(packed)) % 32
+    return (MULTISEND_SELECTOR + (32).to_bytes(32, 'big') + len(packed).to_bytes(32, 'big')
+            + packed + b'\x00' * padding)
+
+
+def signSafeTxHash(tx_hash: bytes, private_key: str) -> bytes:
+    """eth_sign signature of a Safe transaction hash (v + 4 marks it as eth_sign for the Safe)."""
+    signed = Account.sign_message(encode_defunct(primitive=bytes(tx_hash)), private_key)
+    v = signed.v + 4 if signed.v in (27, 28) else signed.v + 31
+    return signed.r.to_bytes(32, 'big') + signed.s.to_bytes(32, 'big') + bytes([v])
+
+
+class SafeBatcher:
+    """Builds, sizes and sends multiSend batches through one Safe."""
+
+    def __init__(self, web3: Web3, safe_address: str, private_key: str,
+                 multisend_address: str = MULTISEND_CALL_ONLY_ADDRESS, tx_manager: Optional[TxManager] = None):
+        self.web3 = web3
+        self.tx_manager = tx_manager or getTxManager(web3, private_key)
+        self.safe = web3.eth.contract(address=to_checksum_address(safe_address), abi=SAFE_ABI)
+        self.private_key = private_key
+        self.sender = to_checksum_address(Account.from_key(private_key).address)
+        self.multisend_address = to_checksum_address(multisend_address)
+
+    def checkOwner(self):
+        if not self.safe.functions.isOwner(self.sender).call():
+            raise ValueError(f"{self.sender} is not an owner of Safe {self.safe.address}")
+        threshold = self.safe.functions.getThreshold().call()
+        if threshold != 1:
+            raise ValueError(f"Safe {self.safe.address} needs {threshold} signatures; batch mode supports threshold 1")
+
+    def _exec_call(self, tx_datas: Sequence[Dict], safe_nonce: int):
+        data = encodeMultiSend(tx_datas)
+        args = (self.multisend_address, 0, data, OPERATION_DELEGATECALL, 0, 0, 0, ZERO_ADDRESS, ZERO_ADDRESS)
+        safe_tx_hash = self.safe.functions.getTransactionHash(*args, safe_nonce).call()
+        return self.safe.functions.execTransaction(*args, signSafeTxHash(safe_tx_hash, self.private_key))
+
+    def sendCall(self, to: str, data, gas_price: Optional[int] = None) -> str:
+        """Execute one plain CALL through the Safe (e.g. a merge); returns the tx hash without waiting."""
+        data = _to_bytes(data)
+        args = (to_checksum_address(to), 0, data, OPERATION_CALL, 0, 0, 0, ZERO_ADDRESS, ZERO_ADDRESS)
+        with self.tx_manager.safeLock(self.safe.address):
+            safe_nonce = self.tx_manager.nextSafeNonce(self.safe.address, self.safe.functions.nonce().call())
+            safe_tx_hash = self.safe.functions.getTransactionHash(*args, safe_nonce).call()
+            exec_call = self.safe.functions.execTransaction(*args, signSafeTxHash(safe_tx_hash, self.private_key))
+            tx_hash = self.tx_manager.send(
+                {'to': self.safe.address, 'data': exec_call._encode_transaction_data(), 'value': 0},
+                gas_price=gas_price,
+                # Gas depends on the inner call, not on execTransaction
+                cache_key=f"safe:{str(to).lower()}:{data[:4].hex()}"
+            )
+            self.tx_manager.sentSafeTx(self.safe.address, safe_nonce, tx_hash)
+        return tx_hash
+
+    def estimateGas(self, tx_datas: Sequence[Dict], safe_nonce: int) -> int:
+        return self._exec_call(tx_datas, safe_nonce).estimate_gas({'from': self.sender})
+
+    def defaultMaxGas(self) -> int:
+        if CLAIM_BATCH_MAX_GAS:
+            return CLAIM_BATCH_MAX_GAS
+        return int(self.web3.eth.get_block('latest')['gasLimit'] * CLAIM_BATCH_GAS_FRACTION)
+
+    def planBatches(self, tx_datas: Sequence[Dict], max_gas: int,
+                    max_size: int = CLAIM_BATCH_MAX_SIZE) -> Tuple[List[Tuple[List[Dict], int]], List[Tuple[Dict, str]]]:
+        """
+        Split into batches that estimate under max_gas.
+
+        Returns ([(batch, estimated_gas)], [(tx_data, error)]) where the second
+        list holds single redeems whose estimate reverts.
+        """
+        safe_nonce = self.safe.functions.nonce().call()
+        planned, failed = [], []
+
+        def plan(batch: List[Dict]):
+            try:
+                gas = self.estimateGas(batch, safe_nonce)
+            except Exception as e:
+                if len(batch) == 1:
+                    failed.append((batch[0], str(e)))
+                    return
+                gas = None
+            if gas is not None and gas <= max_gas:
+                planned.append((batch, gas))
+                return
+            if len(batch) == 1:
+                failed.append((batch[0], f"estimated gas {gas} exceeds batch limit {max_gas}"))
+                return
+            middle = len(batch) // 2
+            plan(batch[:middle])
+            plan(batch[middle:])
+
+        for start in range(0, len(tx_datas), max_size):
+            plan(list(tx_datas[start:start + max_size]))
+        return planned, failed
+
+    def sendBatches(self, planned: Sequence[Tuple[List[Dict], int]], gas_price: Optional[int] = None,
+                    receipt_timeout: int = 300) -> List[Dict]:
+        """Send every batch back to back (consecutive nonces), then track the receipts together."""
+        if not planned:
+            return []
+        sent = []
+        with self.tx_manager.safeLock(self.safe.address):
+            safe_nonce = self.tx_manager.nextSafeNonce(self.safe.address, self.safe.functions.nonce().call())
+            for i, (batch, gas) in enumerate(planned):
+                exec_call = self._exec_call(batch, safe_nonce + i)
+                tx_hash = self.tx_manager.send(
+                    {'to': self.safe.address, 'data': exec_call._encode_transaction_data(), 'value': 0},
+                    gas_limit=int(gas * 1.2),
+                    gas_price=gas_price
+                )
+                self.tx_manager.sentSafeTx(self.safe.address, safe_nonce + i, tx_hash)
+                logger.info(f"✓ Batch {i + 1}/{len(planned)} sent ({len(batch)} redeems): {tx_hash}")
+                sent.append((batch, tx_hash))
+
+        results = [{'status': 'pending', 'tx_hash': tx_hash, 'positions': [tx.get('position_info', {}) for tx in batch]}
+                   for batch, tx_hash in sent]
+        trackReceipts(self.web3, results, tx_manager=self.tx_manager, timeout=receipt_timeout)
+        for result in results:
+            logger.info(f"✓ Batch {result['status']}: {result['tx_hash']} ({len(result['positions'])} redeems)")
+        return results
+
+
+def submitBatchToSafe(
+    tx_datas: Sequence[Dict],
+    safe_address: str,
+    web3: Web3,
+    private_key: str,
+    max_gas: Optional[int] = None,
+    multisend_address: str = MULTISEND_CALL_ONLY_ADDRESS,
+    tx_manager: Optional[TxManager] = None
+) -> List[Dict]:
+    """
+    Redeem all positions through one (or a few) Safe multiSend transactions.
+
+    Args:
+        tx_datas: Transactions from buildRedeemTx() (with encoded data)
+        safe_address: Safe holding the positions (signer must be an owner, threshold 1)
+        web3: Web3 instance (Polygon or a local stand-in node)
+        private_key: Owner private key
+        max_gas: Gas cap per batch (default: CLAIM_BATCH_GAS_FRACTION of the block gas limit)
+        tx_manager: Optional shared TxManager (default: the one for private_key)
+
+    Returns:
+        One result per batch ({'status', 'tx_hash', 'positions', 'gas_used'}) plus
+        one {'status': 'error', 'error', 'positions'} per redeem that could not be batched
+    """
+    batcher = SafeBatcher(web3, safe_address, private_key, multisend_address, tx_manager)
+    batcher.checkOwner()
+    max_gas = max_gas or batcher.defaultMaxGas()
+    planned, failed = batcher.planBatches(list(tx_datas), max_gas)
+    logger.info(f"Planned {len(planned)} multiSend batches for {sum(len(b) for b, _ in planned)} redeems "
+                f"(gas cap {max_gas}), {len(failed)} redeems excluded")
+    for tx, error in failed:
+        logger.error(f"❌ Redeem excluded from batch ({tx.get('position_info', {}).get('asset')}): {error}")
+    results = batcher.sendBatches(planned)
+    results.extend({'status': 'error', 'error': error, 'positions': [tx.get('position_info', {})]}
+                   for tx, error in failed)
+    return results
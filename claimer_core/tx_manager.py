@@ -0,0 +1,276 @@
+"""
+Module (F): Shared Transaction Manager (local nonces + cached gas)
+
+One TxManager per signing key, shared by the claimer and the Python merge
+backend. It removes the per-transaction RPC round trips that used to
+serialize claims:
+
+- Nonces are tracked locally: the first send reads the pending count once,
+  every later send reserves the next nonce under a lock, so several
+  transactions can be in flight without colliding. A "nonce too low" /
+  "already known" error resyncs from the node and retries once.
+- Safe nonces (SafeBatcher) are tracked the same way: while this manager
+  has execTransactions of a Safe in flight, the next Safe nonce comes from
+  the local counter instead of nonce().call(), so a merge and a claim batch
+  sent back to back sign different nonces. With nothing in flight (or only
+  transactions older than TX_SAFE_PENDING_S) the on-chain nonce is used, so
+  a reverted or dropped execTransaction does not leave a gap.
+- Gas price is refreshed by a background thread every TX_GAS_REFRESH_S and
+  read from memory on send (TX_GAS_PRICE_MULTIPLIER applied on top).
+- Gas estimates are cached per call signature (target address + 4-byte
+  selector, e.g. redeemPositions, mergePositions) for TX_GAS_ESTIMATE_TTL_S.
+  The cached value is the largest estimate seen, plus the usual 20% buffer.
+
+Everything goes through the injected Web3 instance, so a local node (anvil
+or hardhat) can stand in for Polygon.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from web3 import Web3
+from eth_account import Account
+from eth_utils import to_checksum_address
+
+logger = logging.getLogger(__name__)
+
+TX_GAS_REFRESH_S = float(os.getenv('TX_GAS_REFRESH_S', '15'))
+TX_GAS_PRICE_MULTIPLIER = float(os.getenv('TX_GAS_PRICE_MULTIPLIER', '1.0'))
+TX_GAS_ESTIMATE_TTL_S = float(os.getenv('TX_GAS_ESTIMATE_TTL_S', '600'))
+TX_DEFAULT_GAS = int(os.getenv('TX_DEFAULT_GAS', '500000'))
+# execTransactions older than this no longer hold the local Safe nonce (dropped or never tracked)
+TX_SAFE_PENDING_S = float(os.getenv('TX_SAFE_PENDING_S', '600'))
+
+_RATE_LIMIT_MARKERS = ('rate limit', 'too many requests')
+_NONCE_MARKERS = ('nonce too low', 'already known', 'replacement transaction underpriced', 'invalid nonce')
+
+
+def _raw(signed_tx):
+    return signed_tx.raw_transaction if hasattr(signed_tx, 'raw_transaction') else signed_tx.rawTransaction
+
+
+def hexHash(value) -> str:
+    """Transaction hash as lowercase '0x'-prefixed hex, whatever hexbytes/web3 version produced it."""
+    if isinstance(value, (bytes, bytearray)):
+        return '0x' + bytes(value).hex()
+    if hasattr(value, 'hex') and not isinstance(value, str):
+        value = value.hex()
+    value = str(value).lower()
+    return value if value.startswith('0x') else '0x' + value
+
+
+def _selector(data) -> str:
+    if data is None:
+        return ''
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data[:4]).hex()
+    data = str(data)
+    return (data[2:10] if data.startswith('0x') else data[:8]).lower()
+
+
+class TxManager:
+    """Signs and sends transactions for one key with local nonces and cached gas data."""
+
+    def __init__(self, web3: Web3, private_key: str, gas_refresh_s: float = TX_GAS_REFRESH_S,
+                 estimate_ttl_s: float = TX_GAS_ESTIMATE_TTL_S):
+        self.web3 = web3
+        self.account = Account.from_key(private_key)
+        self.sender = to_checksum_address(self.account.address)
+        self.gas_refresh_s = gas_refresh_s
+        self.estimate_ttl_s = estimate_ttl_s
+        self._lock = threading.Lock()
+        self._next_nonce: Optional[int] = None
+        self._chain_id: Optional[int] = None
+        self._gas_price: Optional[int] = None
+        self._gas_price_at = 0.0
+        self._estimates: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        self._refresher: Optional[threading.Thread] = None
+        self.in_flight: Dict[int, str] = {}  # nonce -> tx hash
+        self._safe_locks: Dict[str, threading.Lock] = {}
+        self._safe_next: Dict[str, int] = {}  # safe -> next local Safe nonce
+        self._safe_pending: Dict[str, Dict[str, float]] = {}  # safe -> {tx hash: sent at}
+        self.sent = 0
+        self.resyncs = 0
+        self.estimate_hits = 0
+        self.estimate_misses = 0
+
+    # ============ Nonces ============
+
+    def reserveNonce(self) -> int:
+        with self._lock:
+            if self._next_nonce is None:
+                self._next_nonce = self.web3.eth.get_transaction_count(self.sender, 'pending')
+            nonce = self._next_nonce
+            self._next_nonce += 1
+            return nonce
+
+    def resyncNonce(self):
+        """Forgets the local counter; the next reservation reads the pending count again."""
+        with self._lock:
+            self._next_nonce = None
+            self.resyncs += 1
+
+    # ============ Safe nonces ============
+
+    def safeLock(self, safe_address: str) -> threading.Lock:
+        """Held from reading the Safe nonce until the execTransaction is sent (sentSafeTx)."""
+        with self._lock:
+            return self._safe_locks.setdefault(safe_address.lower(), threading.Lock())
+
+    def nextSafeNonce(self, safe_address: str, on_chain: int) -> int:
+        """Next Safe nonce to sign, given the on-chain nonce (call with safeLock held)."""
+        safe = safe_address.lower()
+        now = time.time()
+        in_flight = {hexHash(tx_hash) for tx_hash in self.in_flight.values()}
+        pending = {tx_hash: sent_at for tx_hash, sent_at in self._safe_pending.get(safe, {}).items()
+                   if tx_hash in in_flight and now - sent_at < TX_SAFE_PENDING_S}
+        self._safe_pending[safe] = pending
+        local = self._safe_next.get(safe)
+        if not pending or local is None or local < on_chain:
+            return on_chain
+        return local
+
+    def sentSafeTx(self, safe_address: str, safe_nonce: int, tx_hash: str):
+        """Records an execTransaction sent with safe_nonce (the next one is safe_nonce + 1)."""
+        safe = safe_address.lower()
+        self._safe_next[safe] = safe_nonce + 1
+        self._safe_pending.setdefault(safe, {})[hexHash(tx_hash)] = time.time()
+
+    # ============ Gas ============
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                self._refresh_gas_price()
+            except Exception as e:
+                logger.warning(f"Gas price refresh failed: {e}")
+            time.sleep(self.gas_refresh_s)
+
+    def _refresh_gas_price(self):
+        self._gas_price = int(self.web3.eth.gas_price * TX_GAS_PRICE_MULTIPLIER)
+        self._gas_price_at = time.time()
+
+    def start(self):
+        """Starts the background gas price refresher (idempotent)."""
+        if self._refresher is None:
+            self._refresher = threading.Thread(target=self._refresh_loop, name='gas-oracle', daemon=True)
+            self._refresher.start()
+
+    def gasPrice(self) -> int:
+        # Falls back to a synchronous read before the first refresh or if the refresher stalled
+        if self._gas_price is None or time.time() - self._gas_price_at > 3 * self.gas_refresh_s:
+            self._refresh_gas_price()
+        return self._gas_price
+
+    def chainId(self) -> int:
+        if self._chain_id is None:
+            self._chain_id = self.web3.eth.chain_id
+        return self._chain_id
+
+    def estimateGas(self, tx: Dict, cache_key: Optional[str] = None) -> int:
+        """Gas limit for tx (20% buffer), cached per (to, selector) or per cache_key."""
+        key = (str(tx['to']).lower(), cache_key or _selector(tx.get('data')))
+        cached = self._estimates.get(key)
+        now = time.time()
+        if cached is not None and now - cached[1] < self.estimate_ttl_s:
+            self.estimate_hits += 1
+            return int(cached[0] * 1.2)
+        self.estimate_misses += 1
+        call = {k: tx[k] for k in ('to', 'data', 'value') if k in tx}
+        call['from'] = self.sender
+        try:
+            estimated = self.web3.eth.estimate_gas(call)
+        except Exception as e:
+            logger.warning(f"Gas estimation failed: {e}, using default {TX_DEFAULT_GAS}")
+            return TX_DEFAULT_GAS
+        previous = cached[0] if cached is not None else 0
+        self._estimates[key] = (max(estimated, previous), now)
+        return int(max(estimated, previous) * 1.2)
+
+    # ============ Sending ============
+
+    def send(self, tx_data: Dict, gas_limit: Optional[int] = None, gas_price: Optional[int] = None,
+             cache_key: Optional[str] = None) -> str:
+        """
+        Signs and sends tx_data ({'to', 'data', 'value'}) without waiting for the receipt.
+
+        cache_key overrides the gas estimate cache key (e.g. the inner call of a Safe execTransaction).
+
+        Returns:
+            Transaction hash (hex)
+        """
+        tx = {
+            'to': to_checksum_address(tx_data['to']),
+            'data': tx_data['data'],
+            'value': tx_data.get('value', 0),
+            'from': self.sender,
+            'chainId': self.chainId(),
+            'gasPrice': gas_price or self.gasPrice(),
+        }
+        tx['gas'] = gas_limit or self.estimateGas(tx, cache_key)
+
+        for attempt in range(3):
+            tx['nonce'] = self.reserveNonce()
+            try:
+                tx_hash = self.web3.eth.send_raw_transaction(_raw(self.account.sign_transaction(tx)))
+            except Exception as e:
+                error_msg = str(e).lower()
+                # A failed send leaves a gap in the local counter: read it back from the node
+                self.resyncNonce()
+                if attempt < 2 and any(marker in error_msg for marker in _NONCE_MARKERS):
+                    logger.warning(f"Nonce {tx['nonce']} rejected ({e}), resyncing")
+                    continue
+                if attempt < 2 and any(marker in error_msg for marker in _RATE_LIMIT_MARKERS):
+                    wait_time = 2 * (attempt + 1)
+                    logger.warning(f"Rate limit hit, waiting {wait_time}s before retry {attempt + 1}/3...")
+                    time.sleep(wait_time)
+                    continue
+                raise
+            tx_hash_hex = hexHash(tx_hash)
+            self.in_flight[tx['nonce']] = tx_hash_hex
+            self.sent += 1
+            logger.info(f"✓ Transaction sent (nonce {tx['nonce']}): {tx_hash_hex}")
+            return tx_hash_hex
+        raise RuntimeError("Transaction not sent after retries")
+
+    def confirm(self, tx_hash: str):
+        """Drops a mined transaction from the in-flight set."""
+        tx_hash = hexHash(tx_hash)
+        for nonce, pending_hash in list(self.in_flight.items()):
+            if pending_hash == tx_hash:
+                self.in_flight.pop(nonce, None)
+
+    def waitForReceipt(self, tx_hash: str, timeout: int = 300) -> Dict:
+        receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+        self.confirm(tx_hash)
+        return receipt
+
+    def snapshot(self) -> Dict:
+        return {
+            'sender': self.sender,
+            'next_nonce': self._next_nonce,
+            'in_flight': len(self.in_flight),
+            'sent': self.sent,
+            'resyncs': self.resyncs,
+            'gas_price_gwei': round(self._gas_price / 1e9, 2) if self._gas_price else None,
+            'estimate_hits': self.estimate_hits,
+            'estimate_misses': self.estimate_misses,
+        }
+
+
+_managers: Dict[str, TxManager] = {}
+_managers_lock = threading.Lock()
+
+
+def getTxManager(web3: Web3, private_key: str) -> TxManager:
+    """Shared TxManager for a key (one nonce counter per sender per process)."""
+    sender = to_checksum_address(Account.from_key(private_key).address)
+    with _managers_lock:
+        manager = _managers.get(sender)
+        if manager is None:
+            manager = _managers[sender] = TxManager(web3, private_key)
+            manager.start()
+        return manager
@@ -11,6 +11,8 @@ from web3 import Web3
 from eth_account import Account
 from eth_utils import to_checksum_address
 
+from .tx_manager import TxManager
+
 logger = logging.getLogger(__name__)
 
 def submitToSafe(
@@ -49,12 +51,42 @@ def submitToSafe(
         'message': 'Safe submission requires Safe SDK implementation'
     }
 
+def _check_matic_balance(web3: Web3, sender_address: str):
+    """Fail early when the sender has no MATIC for gas."""
+    try:
+        matic_balance = web3.eth.get_balance(sender_address)
+        matic_balance_eth = web3.from_wei(matic_balance, 'ether')
+        logger.info(f"MATIC balance: {matic_balance_eth:.6f} MATIC")
+            
+        if matic_balance == 0:
+            logger.error("=" * 80)
+            logger.error("❌ ERRO: Sem saldo MATIC!")
+            logger.error("=" * 80)
+            logger.error("Você precisa de MATIC na carteira para pagar as taxas de gas.")
+            logger.error("O claim em si é gratuito, mas a transação precisa de MATIC.")
+            logger.error("")
+            logger.error("Solução:")
+            logger.error("1. Envie MATIC para sua carteira: " + sender_address)
+            logger.error("2. Você precisa de pelo menos 0.01 MATIC (~$0.01)")
+            logger.error("3. Pode comprar MATIC em exchanges ou usar uma bridge")
+            logger.error("=" * 80)
+            raise ValueError("Insufficient MATIC balance for gas")
+        elif matic_balance < web3.to_wei(0.001, 'ether'):
+            logger.warning(f"⚠️  Saldo MATIC baixo ({matic_balance_eth:.6f} MATIC). Pode falhar.")
+    except ValueError:
+        # Re-raise ValueError (insufficient balance)
+        raise
+    except Exception as e:
+        logger.warning(f"Could not check MATIC balance: {e}")
+
 def submitDirect(
     tx_data: Dict,
     web3: Web3,
     private_key: str,
     gas_price: Optional[int] = None,
-    gas_limit: Optional[int] = None
+    gas_limit: Optional[int] = None,
+    tx_manager: Optional[TxManager] = None,
+    wait: bool = True
 ) -> Dict:
     """
     Execute transaction directly (not through Safe).
@@ -68,6 +100,8 @@ def submitDirect(
         private_key: Private key for signing
         gas_price: Optional gas price (will use web3.eth.gas_price if not provided)
         gas_limit: Optional gas limit (will estimate if not provided)
+        tx_manager: Optional shared TxManager (local nonce, cached gas price/estimates)
+        wait: If False, return right after sending with status 'pending'
     
     Returns:
         Dictionary with transaction hash and status
@@ -79,32 +113,13 @@ def submitDirect(
         
         logger.info(f"Executing transaction from {sender_address}")
         
-        # Check MATIC balance for gas
-        try:
-            matic_balance = web3.eth.get_balance(sender_address)
-            matic_balance_eth = web3.from_wei(matic_balance, 'ether')
-            logger.info(f"MATIC balance: {matic_balance_eth:.6f} MATIC")
-            
-            if matic_balance == 0:
-                logger.error("=" * 80)
-                logger.error("❌ ERRO: Sem saldo MATIC!")
-                logger.error("=" * 80)
-                logger.error("Você precisa de MATIC na carteira para pagar as taxas de gas.")
-                logger.error("O claim em si é gratuito, mas a transação precisa de MATIC.")
-                logger.error("")
-                logger.error("Solução:")
-                logger.error("1. Envie MATIC para sua carteira: " + sender_address)
-                logger.error("2. Você precisa de pelo menos 0.01 MATIC (~$0.01)")
-                logger.error("3. Pode comprar MATIC em exchanges ou usar uma bridge")
-                logger.error("=" * 80)
-                raise ValueError("Insufficient MATIC balance for gas")
-            elif matic_balance < web3.to_wei(0.001, 'ether'):
-                logger.warning(f"⚠️  Saldo MATIC baixo ({matic_balance_eth:.6f} MATIC). Pode falhar.")
-        except ValueError:
-            # Re-raise ValueError (insufficient balance)
-            raise
-        except Exception as e:
-            logger.warning(f"Could not check MATIC balance: {e}")
+        # Check MATIC balance for gas (once per manager when one is shared)
+        if tx_manager is None or tx_manager.sent == 0:
+            _check_matic_balance(web3, sender_address)
+        
+        if tx_manager is not None:
+            tx_hash_hex = tx_manager.send(tx_data, gas_limit=gas_limit, gas_price=gas_price)
+            return _finish(web3, tx_hash_hex, tx_data, wait, tx_manager)
         
         # Build transaction
         tx = {
@@ -191,28 +206,47 @@ def submitDirect(
         tx_hash_hex = tx_hash.hex()
         logger.info(f"✓ Transaction sent: {tx_hash_hex}")
         
-        # Wait for receipt (optional - can be done separately)
-        try:
-            receipt = web3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
-            status = 'success' if receipt.status == 1 else 'failed'
-            logger.info(f"✓ Transaction {status}: {tx_hash_hex}")
-            
-            return {
-                'status': status,
-                'tx_hash': tx_hash_hex,
-                'receipt': dict(receipt),
-                'position_info': tx_data.get('position_info', {})
-            }
-        except Exception as e:
-            logger.warning(f"Transaction sent but receipt wait failed: {e}")
-            return {
-                'status': 'pending',
-                'tx_hash': tx_hash_hex,
-                'position_info': tx_data.get('position_info', {})
-            }
+        return _finish(web3, tx_hash_hex, tx_data, wait)
     
     except Exception as e:
         logger.error(f"❌ Failed to execute transaction: {e}")
         raise
 
+def _finish(
+    web3: Web3,
+    tx_hash_hex: str,
+    tx_data: Dict,
+    wait: bool,
+    tx_manager: Optional[TxManager] = None
+) -> Dict:
+    """Wait for the receipt (unless wait=False) and build the result dictionary."""
+    if not wait:
+        return {
+            'status': 'pending',
+            'tx_hash': tx_hash_hex,
+            'position_info': tx_data.get('position_info', {})
+        }
+    
+    # Wait for receipt (optional - can be done separately)
+    try:
+        receipt = web3.eth.wait_for_transaction_receipt(tx_hash_hex, timeout=300)
+        if tx_manager is not None:
+            tx_manager.confirm(tx_hash_hex)
+        status = 'success' if receipt.status == 1 else 'failed'
+        logger.info(f"✓ Transaction {status}: {tx_hash_hex}")
+        
+        return {
+            'status': status,
+            'tx_hash': tx_hash_hex,
+            'receipt': dict(receipt),
+            'position_info': tx_data.get('position_info', {})
+        }
+    except Exception as e:
+        logger.warning(f"Transaction sent but receipt wait failed: {e}")
+        return {
+            'status': 'pending',
+            'tx_hash': tx_hash_hex,
+            'position_info': tx_data.get('position_info', {})
+        }
+
 
@@ -8,12 +8,14 @@ the proxy wallet authentication.
 import logging
 from typing import Dict, Optional
 from poly_data.polymarket_client import PolymarketClient
+from .tx_manager import TxManager
 
 logger = logging.getLogger(__name__)
 
 def submitViaPolymarketClient(
     claimable: Dict,
-    client: Optional[PolymarketClient] = None
+    client: Optional[PolymarketClient] = None,
+    tx_manager: Optional[TxManager] = None
 ) -> Dict:
     """
     Execute claim using PolymarketClient (works with Magic Link).
@@ -24,6 +26,7 @@ def submitViaPolymarketClient(
     Args:
         claimable: Claimable position dictionary from filterClaimables()
         client: Optional PolymarketClient instance (will create one if not provided)
+        tx_manager: Optional shared TxManager (used when its key owns the wallet)
     
     Returns:
         Dictionary with transaction hash and status
@@ -120,22 +123,29 @@ def submitViaPolymarketClient(
         # Get wallet address
         wallet_address = client.browser_wallet
         
+        use_manager = tx_manager is not None and tx_manager.sender.lower() == wallet_address.lower()
+        
         # Build transaction
-        tx = function_call.build_transaction({
-            'from': wallet_address,
-            'nonce': client.web3.eth.get_transaction_count(wallet_address),
-            'gas': 500000,  # Default gas limit
-            'gasPrice': client.web3.eth.gas_price,
-            'chainId': 137,  # Polygon
-        })
-        
-        # Try to estimate gas
-        try:
-            estimated_gas = client.web3.eth.estimate_gas(tx)
-            tx['gas'] = int(estimated_gas * 1.2)
-            logger.info(f"Estimated gas: {estimated_gas}, using {tx['gas']}")
-        except Exception as e:
-            logger.warning(f"Gas estimation failed: {e}, using default 500000")
+        if use_manager:
+            # Nonce, gas price and gas estimate come from the shared manager
+            tx = {'to': to_checksum_address(conditional_tokens_address),
+                  'data': function_call._encode_transaction_data(), 'value': 0}
+        else:
+            tx = function_call.build_transaction({
+                'from': wallet_address,
+                'nonce': client.web3.eth.get_transaction_count(wallet_address),
+                'gas': 500000,  # Default gas limit
+                'gasPrice': client.web3.eth.gas_price,
+                'chainId': 137,  # Polygon
+            })
+            
+            # Try to estimate gas
+            try:
+                estimated_gas = client.web3.eth.estimate_gas(tx)
+                tx['gas'] = int(estimated_gas * 1.2)
+                logger.info(f"Estimated gas: {estimated_gas}, using {tx['gas']}")
+            except Exception as e:
+                logger.warning(f"Gas estimation failed: {e}, using default 500000")
         
         # For Magic Link, we need to use the ClobClient's signing mechanism
         # or try to send via the client's web3 instance
@@ -154,7 +164,19 @@ def submitViaPolymarketClient(
             
             private_key = os.getenv('PK') or os.getenv('CLAIMER_PRIVATE_KEY')
             
-            if private_key:
+            if use_manager:
+                tx_hash_hex = tx_manager.send(tx)
+                return {
+                    'status': 'pending',
+                    'tx_hash': tx_hash_hex,
+                    'position_info': {
+                        'asset': asset,
+                        'conditionId': condition_id,
+                        'redeemable': claimable.get('redeemable', 0),
+                        'market': claimable.get('market') or claimable.get('title', 'Unknown'),
+                    }
+                }
+            elif private_key:
                 from eth_account import Account
                 account = Account.from_key(private_key)
                 
@@ -15,8 +15,16 @@ import gspread
 from gspread_dataframe import set_with_dataframe
 import urllib.parse
 import logging
+import sys
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_updater.market_pipeline import run_market_pipeline
+from data_updater.reward_scoring import score_market, score_markets_batch
+from data_updater.volatility import volatility_batch
+from data_updater.sheet_writer import sheet_writer
+from poly_data.price_history import price_history_store
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -31,6 +39,10 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 warnings.filterwarnings("ignore")
 
+# 'async' = overlapped pipeline (market_pipeline.py); 'threads' = legacy per-stage thread pools
+DATA_UPDATER_PIPELINE = os.getenv('DATA_UPDATER_PIPELINE', 'async').lower()
+DATA_UPDATER_INTERVAL_S = float(os.getenv('DATA_UPDATER_INTERVAL_S', str(60 * 60)))
+
 def get_clob_client():
     logger.info("Attempting to create ClobClient")
     host = "https://clob.polymarket.com"
@@ -168,147 +180,13 @@ def get_all_markets(client):
     logger.info(f"Fetched {len(all_df)} total markets")
     return all_df
 
-def get_bid_ask_range(ret, TICK_SIZE):
-    bid_from = ret['midpoint'] - ret['max_spread'] / 100
-    bid_to = ret['best_ask']
-    if bid_to == 0:
-        bid_to = ret['midpoint']
-    if bid_to - TICK_SIZE > ret['midpoint']:
-        bid_to = ret['best_bid'] + (TICK_SIZE + 0.1 * TICK_SIZE)
-    if bid_from > bid_to:
-        bid_from = bid_to - (TICK_SIZE + 0.1 * TICK_SIZE)
-    ask_to = ret['midpoint'] + ret['max_spread'] / 100
-    ask_from = ret['best_bid']
-    if ask_from == 0:
-        ask_from = ret['midpoint']
-    if ask_from + TICK_SIZE < ret['midpoint']:
-        ask_from = ret['best_ask'] - (TICK_SIZE + 0.1 * TICK_SIZE)
-    if ask_from > ask_to:
-        ask_to = ask_from + (TICK_SIZE + 0.1 * TICK_SIZE)
-    bid_from = round(bid_from, 3)
-    bid_to = round(bid_to, 3)
-    ask_from = round(ask_from, 3)
-    ask_to = round(ask_to, 3)
-    if bid_from < 0:
-        bid_from = 0
-    if ask_from < 0:
-        ask_from = 0
-    return bid_from, bid_to, ask_from, ask_to
-
-def generate_numbers(start, end, TICK_SIZE):
-    rounded_start = (int(start * 100) + 1) / 100 if start * 100 % 1 != 0 else start + TICK_SIZE
-    rounded_end = int(end * 100) / 100
-    numbers = []
-    current = rounded_start
-    while current < end:
-        numbers.append(current)
-        current += TICK_SIZE
-        current = round(current, len(str(TICK_SIZE).split('.')[1]) if '.' in str(TICK_SIZE) else 0)
-    return numbers
-
-def add_formula_params(curr_df, midpoint, v, daily_reward):
-    if curr_df.empty:
-        return curr_df
-    curr_df = curr_df.copy()
-    curr_df['s'] = (curr_df['price'] - midpoint).abs()
-    curr_df['S'] = ((v - curr_df['s']) / v) ** 2
-    curr_df['100'] = 1 / curr_df['price'] * 100
-    curr_df['size'] = curr_df['size'] + curr_df['100']
-    curr_df['Q'] = curr_df['S'] * curr_df['size']
-    total_Q = curr_df['Q'].sum()
-    if total_Q > 0:
-        curr_df['reward_per_100'] = (curr_df['Q'] / total_Q) * daily_reward / 2 / curr_df['size'] * curr_df['100']
-    else:
-        num_rows = len(curr_df)
-        curr_df['reward_per_100'] = (daily_reward / 2) / num_rows if num_rows > 0 else 0
-    curr_df['reward_per_100'] = curr_df['reward_per_100'].replace([np.inf, -np.inf], 0).fillna(0)
-    return curr_df
-
 def process_single_row(row, client):
-    ret = {}
-    ret['question'] = row['question']
-    ret['neg_risk'] = row['neg_risk']
-    ret['answer1'] = row['tokens'][0]['outcome']
-    ret['answer2'] = row['tokens'][1]['outcome']
-    ret['min_size'] = row['rewards']['min_size']
-    ret['max_spread'] = row['rewards']['max_spread']
     token1 = row['tokens'][0]['token_id']
-    token2 = row['tokens'][1]['token_id']
-    rate = 0
-    for rate_info in row['rewards']['rates']:
-        if rate_info['asset_address'].lower() == '0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174'.lower():
-            rate = rate_info['rewards_daily_rate']
-            break
-    ret['rewards_daily_rate'] = rate
     try:
         book = client.get_order_book(token1)
     except:
         book = type('obj', (object,), {'bids': [], 'asks': []})()
-    bids = pd.DataFrame()
-    asks = pd.DataFrame()
-    try:
-        bids = pd.DataFrame(book.bids).astype(float)
-    except:
-        pass
-    try:
-        asks = pd.DataFrame(book.asks).astype(float)
-    except:
-        pass
-    try:
-        ret['best_bid'] = bids.iloc[-1]['price'] if not bids.empty else 0
-    except:
-        ret['best_bid'] = 0
-    try:
-        ret['best_ask'] = asks.iloc[-1]['price'] if not asks.empty else 0
-    except:
-        ret['best_ask'] = 0
-    ret['midpoint'] = (ret['best_bid'] + ret['best_ask']) / 2
-    if ret['midpoint'] == 0 or pd.isna(ret['midpoint']):
-        ret['midpoint'] = 0.5
-        ret['best_bid'] = 0.49
-        ret['best_ask'] = 0.51
-    TICK_SIZE = row['minimum_tick_size']
-    ret['tick_size'] = TICK_SIZE
-    bid_from, bid_to, ask_from, ask_to = get_bid_ask_range(ret, TICK_SIZE)
-    v = round((ret['max_spread'] / 100), 2)
-    bids_df = pd.DataFrame({'price': generate_numbers(bid_from, bid_to, TICK_SIZE), 'size': 0})
-    asks_df = pd.DataFrame({'price': generate_numbers(ask_from, ask_to, TICK_SIZE), 'size': 0})
-    try:
-        bids_df = bids_df.merge(bids, on='price', how='left', suffixes=('', '_book')).fillna(0)
-        if 'size_book' in bids_df.columns:
-            bids_df['size'] = bids_df['size'].fillna(0) + bids_df['size_book'].fillna(0)
-            bids_df.drop(columns=['size_book'], inplace=True)
-    except Exception as merge_err:
-        logger.error(f"Merge error for bids: {merge_err}", exc_info=True)
-    try:
-        asks_df = asks_df.merge(asks, on='price', how='left', suffixes=('', '_book')).fillna(0)
-        if 'size_book' in asks_df.columns:
-            asks_df['size'] = asks_df['size'].fillna(0) + asks_df['size_book'].fillna(0)
-            asks_df.drop(columns=['size_book'], inplace=True)
-    except Exception as merge_err:
-        logger.error(f"Merge error for asks: {merge_err}", exc_info=True)
-    best_bid_reward = 0
-    try:
-        ret_bid = add_formula_params(bids_df, ret['midpoint'], v, rate)
-        best_bid_reward = round(ret_bid['reward_per_100'].max(), 2) if not ret_bid.empty else 0
-    except:
-        pass
-    best_ask_reward = 0
-    try:
-        ret_ask = add_formula_params(asks_df, ret['midpoint'], v, rate)
-        best_ask_reward = round(ret_ask['reward_per_100'].max(), 2) if not ret_ask.empty else 0
-    except:
-        pass
-    ret['bid_reward_per_100'] = best_bid_reward
-    ret['ask_reward_per_100'] = best_ask_reward
-    ret['sm_reward_per_100'] = round((best_bid_reward + best_ask_reward) / 2, 2)
-    ret['gm_reward_per_100'] = round((best_bid_reward * best_ask_reward) ** 0.5, 2)
-    ret['end_date_iso'] = row['end_date_iso']
-    ret['market_slug'] = row['market_slug']
-    ret['token1'] = token1
-    ret['token2'] = token2
-    ret['condition_id'] = row['condition_id']
-    return ret
+    return score_market(row, book)
 
 def get_all_results(all_df, client, max_workers=5):
     logger.info("Processing all market results")
@@ -341,45 +219,37 @@ def get_combined_markets(new_df, new_markets, sel_df):
     all_markets = all_markets.sort_values('gm_reward_per_100', ascending=False)
     return all_markets
 
-def calculate_annualized_volatility(df, hours):
-    if df.empty:
-        return 0
-    end_time = df['t'].max()
-    start_time = end_time - pd.Timedelta(hours=hours)
-    window_df = df[df['t'] >= start_time]
-    if window_df.empty:
-        return 0
-    volatility = window_df['log_return'].std()
-    annualized_volatility = volatility * np.sqrt(60 * 24 * 252)
-    return round(annualized_volatility, 2)
-
 def add_volatility(row):
     logger.info(f"Adding volatility for token: {row.get('token1', 'unknown')}")
     try:
-        res = requests.get(f'https://clob.polymarket.com/prices-history?interval=1m&market={row["token1"]}&fidelity=10', timeout=10)
-        price_df = pd.DataFrame(res.json()['history'])
-        price_df['t'] = pd.to_datetime(price_df['t'], unit='s')
-        price_df['p'] = price_df['p'].round(2)
-        price_df.to_csv(f'data/{row["token1"]}.csv', index=False)
-        price_df['log_return'] = np.log(price_df['p'] / price_df['p'].shift(1))
-        row_dict = row.copy()
-        stats = {
-            '1_hour': calculate_annualized_volatility(price_df, 1),
-            '3_hour': calculate_annualized_volatility(price_df, 3),
-            '6_hour': calculate_annualized_volatility(price_df, 6),
-            '12_hour': calculate_annualized_volatility(price_df, 12),
-            '24_hour': calculate_annualized_volatility(price_df, 24),
-            '7_day': calculate_annualized_volatility(price_df, 24 * 7),
-            '30_day': calculate_annualized_volatility(price_df, 24 * 30),
-            'volatility_price': price_df['p'].iloc[-1] if not price_df.empty else 0
-        }
-        new_dict = {**row_dict, **stats}
+        res = requests.get('https://clob.polymarket.com/prices-history',
+                           params=price_history_store.history_params(row['token1']), timeout=10)
+        new_dict = {**row.copy(), **volatility_stats(row, res.json()['history'])}
         logger.info(f"Volatility calculated for token: {row['token1']}")
         return new_dict
     except Exception as e:
         logger.error(f"Error adding volatility for token {row.get('token1', 'unknown')}: {e}", exc_info=True)
         return row
 
+HISTORY_WINDOW_S = 31 * 24 * 60 * 60
+
+def store_history(row, history):
+    # history holds only the points newer than what the store already has
+    price_history_store.append(row['token1'], history)
+    return {}
+
+def load_histories(tokens):
+    start = int(time.time()) - HISTORY_WINDOW_S
+    series = []
+    for token in tokens:
+        records = price_history_store.load(token, start=start)
+        series.append((records['t'], records['p']))
+    return series
+
+def volatility_stats(row, history):
+    store_history(row, history)
+    return volatility_batch(load_histories([row['token1']]))[0]
+
 def add_volatility_to_df(df, max_workers=3):
     if df.empty:
         logger.warning("Empty DataFrame, skipping volatility calculation")
@@ -431,6 +301,32 @@ def get_markets(all_results, sel_df, maker_reward=0.75):
     logger.info(f"Processed {len(all_markets)} markets for output")
     return all_data, all_markets
 
+def fetch_markets_async(sel_df, maker_reward=0.75):
+    """Pages, books and price history overlapped in one pipeline (see market_pipeline.py).
+
+    Returns the same (m_data, all_markets, new_df) as the legacy
+    get_all_markets -> get_all_results -> get_markets -> add_volatility_to_df chain.
+    """
+    selected = set(sel_df['question']) if not sel_df.empty and 'question' in sel_df.columns else set()
+
+    def qualifies(ret):
+        # Same selection as get_markets: selected markets plus those above maker_reward
+        return ret['question'] in selected or ret['gm_reward_per_100'] >= maker_reward
+
+    # The pipeline only stores history; volatility is computed for all fetched tokens in one batch
+    all_results, fetched = run_market_pipeline(score_markets_batch, qualifies, store_history,
+                                               history_params=price_history_store.history_params)
+    m_data, all_markets = get_markets(all_results, sel_df, maker_reward=maker_reward)
+    rows = [row for row in all_markets.to_dict('records') if row['condition_id'] in fetched]
+    volatility = {row['condition_id']: stats for row, stats in
+                  zip(rows, volatility_batch(load_histories([row['token1'] for row in rows])))}
+    new_df = pd.DataFrame([{**row, **volatility.get(row['condition_id'], {})}
+                           for row in all_markets.to_dict('records')])
+    logger.info(f"Added volatility to {sum(cid in volatility for cid in all_markets['condition_id'])} "
+                f"of {len(all_markets)} markets")
+    logger.info(f"Price history store: {price_history_store.stats()}")
+    return m_data, all_markets, new_df
+
 def update_sheet(data, worksheet, filename):
     if data.empty:
         logger.warning(f"Empty data for {filename}, skipping save")
@@ -443,19 +339,9 @@ def update_sheet(data, worksheet, filename):
     try:
         logger.info(f"Preparing to update sheet: {worksheet.title}")
         logger.info(f"DataFrame shape: {data.shape}, columns: {list(data.columns)}")
-        all_values = worksheet.get_all_values()
-        existing_num_rows = len(all_values)
-        existing_num_cols = len(all_values[0]) if all_values else 0
-        logger.info(f"Existing sheet dimensions: {existing_num_rows} rows, {existing_num_cols} columns")
-        num_rows, num_cols = data.shape
-        max_rows = max(num_rows, existing_num_rows)
-        max_cols = max(num_cols, existing_num_cols)
-        padded_data = pd.DataFrame('', index=range(max_rows), columns=range(max_cols))
-        padded_data.iloc[:num_rows, :num_cols] = data.values
-        padded_data.columns = list(data.columns) + [''] * (max_cols - num_cols)
-        logger.info(f"Attempting to write {num_rows} rows and {num_cols} columns to sheet: {worksheet.title}")
-        set_with_dataframe(worksheet, padded_data, include_index=False, include_column_header=True, resize=True)
-        logger.info(f"Successfully updated sheet: {worksheet.title} with {num_rows} rows and {num_cols} columns")
+        result = sheet_writer.write(worksheet, data)
+        logger.info(f"Successfully updated sheet: {worksheet.title} with {data.shape[0]} rows and {data.shape[1]} columns "
+                    f"({result['mode']} write: {result['cells']} cells in {result['ranges']} ranges)")
     except Exception as e:
         logger.error(f"Failed to update sheet {worksheet.title}: {e}. Saving to {filename} instead.", exc_info=True)
         data.to_csv(filename, index=False)
@@ -502,10 +388,6 @@ def fetch_and_process_data():
         logger.info("Starting fetch_and_process_data")
         logger.info("Environment variables loaded: SPREADSHEET_URL, PK, API_KEY, API_SECRET, API_PASSPHRASE, DRY_RUN")
         spreadsheet = get_spreadsheet(read_only=False)
-        client = get_clob_client()
-        if client is None:
-            logger.error("Failed to create ClobClient")
-            raise ValueError("Failed to create ClobClient. Check PK and API credentials.")
         logger.info("Initializing worksheets")
         wk_all = spreadsheet.worksheet("All Markets") if spreadsheet else None
         wk_vol = spreadsheet.worksheet("Volatility Markets") if spreadsheet else None
@@ -514,14 +396,24 @@ def fetch_and_process_data():
                     f"Volatility Markets: {'Initialized' if wk_vol else 'None'}, "
                     f"Full Markets: {'Initialized' if wk_full else 'None'}")
         sel_df = get_sel_df(spreadsheet, "Selected Markets")
-        all_df = get_all_markets(client)
-        logger.info("Got all markets")
-        all_results = get_all_results(all_df, client)
-        logger.info("Got all results")
-        m_data, all_markets = get_markets(all_results, sel_df, maker_reward=0.75)
-        logger.info("Got all orderbook data")
-        logger.info(f"Fetched all markets data of length {len(all_markets)}")
-        new_df = add_volatility_to_df(all_markets)
+        refresh_start = time.time()
+        if DATA_UPDATER_PIPELINE == 'async':
+            m_data, all_markets, new_df = fetch_markets_async(sel_df, maker_reward=0.75)
+            logger.info(f"Fetched all markets data of length {len(all_markets)}")
+        else:
+            client = get_clob_client()
+            if client is None:
+                logger.error("Failed to create ClobClient")
+                raise ValueError("Failed to create ClobClient. Check PK and API credentials.")
+            all_df = get_all_markets(client)
+            logger.info("Got all markets")
+            all_results = get_all_results(all_df, client)
+            logger.info("Got all results")
+            m_data, all_markets = get_markets(all_results, sel_df, maker_reward=0.75)
+            logger.info("Got all orderbook data")
+            logger.info(f"Fetched all markets data of length {len(all_markets)}")
+            new_df = add_volatility_to_df(all_markets)
+        logger.info(f"Universe refresh ({DATA_UPDATER_PIPELINE}) took {time.time() - refresh_start:.1f}s")
         if '24_hour' in new_df.columns and '7_day' in new_df.columns and '30_day' in new_df.columns:
             new_df['volatility_sum'] = new_df['24_hour'] + new_df['7_day'] + new_df['30_day']
         else:
@@ -554,7 +446,7 @@ if __name__ == "__main__":
             logger.info("Starting data fetch loop")
             fetch_and_process_data()
             logger.info("Data fetch complete. Check Google Sheets or 'data/*.csv' files for results.")
-            time.sleep(60 * 60)  # Sleep for 1 hour
+            time.sleep(DATA_UPDATER_INTERVAL_S)  # Default: 1 hour
         except Exception as e:
             logger.error(f"Error in main loop: {e}", exc_info=True)
             time.sleep(60)  # Retry after 1 minute
\ No newline at end of file
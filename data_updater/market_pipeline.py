@@ -0,0 +1,260 @@
+"""
+Async market discovery pipeline for the data updater.
+
+Overlaps the three network stages of a full-universe refresh under one
+shared concurrency/rate budget:
+
+1. sampling-markets pages (a cursor chain, so sequential by nature)
+2. order books, fetched in bulk with POST /books (BOOKS_BATCH_SIZE tokens per
+   request, falling back to GET /book per token if the bulk call fails)
+3. price history for the markets that qualify for the volatility stage
+   (incremental when a `history_params` callable says what is already stored)
+
+Each page is split into book batches as soon as it arrives, and every scored
+market that qualifies is queued for its history right away, so scoring
+streams instead of waiting for the previous stage to finish.
+
+HTTP goes through a pooled requests.Session on a thread pool (there is no
+async HTTP client among the dependencies); asyncio orchestrates the stages
+and enforces the budget.
+
+Configuration: CLOB_HOST, PIPELINE_CONCURRENCY (default 16),
+PIPELINE_RATE_PER_S (default 40, 0 = unlimited), BOOKS_BATCH_SIZE
+(default 50), PIPELINE_TIMEOUT_S (default 10).
+"""
+import asyncio
+import concurrent.futures
+import logging
+import os
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+CLOB_HOST = os.getenv('CLOB_HOST', 'https://clob.polymarket.com').rstrip('/')
+PIPELINE_CONCURRENCY = int(os.getenv('PIPELINE_CONCURRENCY', '16'))
+PIPELINE_RATE_PER_S = float(os.getenv('PIPELINE_RATE_PER_S', '40'))
+BOOKS_BATCH_SIZE = int(os.getenv('BOOKS_BATCH_SIZE', '50'))
+PIPELINE_TIMEOUT_S = float(os.getenv('PIPELINE_TIMEOUT_S', '10'))
+
+# Cursor values that mark the last page of /sampling-markets
+END_CURSORS = (None, '', 'LTE=')
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+def full_history_params(token_id: str) -> Dict:
+    return {'interval': '1m', 'market': token_id, 'fidelity': 10}
+
+
+class RequestBudget:
+    """Shared budget: at most `concurrency` requests in flight, started at most `rate_per_s` per second."""
+
+    def __init__(self, concurrency: int, rate_per_s: float):
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._interval = 1.0 / rate_per_s if rate_per_s > 0 else 0.0
+        self._next_slot = 0.0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        if self._interval:
+            now = asyncio.get_running_loop().time()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+            if slot > now:
+                await asyncio.sleep(slot - now)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+
+
+class PipelineStats:
+    def __init__(self):
+        self.pages = 0
+        self.markets = 0
+        self.book_requests = 0
+        self.book_fallbacks = 0
+        self.history_requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.started = time.monotonic()
+        self.first_scored_s: Optional[float] = None
+
+    def summary(self) -> str:
+        elapsed = time.monotonic() - self.started
+        first = f"{self.first_scored_s:.1f}s" if self.first_scored_s is not None else 'n/a'
+        return (f"{self.markets} markets from {self.pages} pages in {elapsed:.1f}s "
+                f"(first market scored after {first}); requests: {self.book_requests} book, "
+                f"{self.book_fallbacks} book fallback, {self.history_requests} history; "
+                f"{self.retries} retries, {self.errors} errors")
+
+
+class MarketPipeline:
+    """Runs the three refresh stages concurrently and collects scored markets and history stats.
+
+    Args:
+        score_markets: (rows, books) -> scored dicts for a book batch; `books[i]` has
+            .bids/.asks lists of {'price', 'size'}
+        qualifies: scored dict -> bool, whether the market needs the history stage
+        history_stats: (scored dict, history list) -> dict of volatility columns
+        history_params: token id -> query params for /prices-history (defaults to the
+            full one-month series)
+    """
+
+    def __init__(self, score_markets: Callable, qualifies: Callable, history_stats: Callable,
+                 host: str = CLOB_HOST, concurrency: int = PIPELINE_CONCURRENCY,
+                 rate_per_s: float = PIPELINE_RATE_PER_S, batch_size: int = BOOKS_BATCH_SIZE,
+                 timeout_s: float = PIPELINE_TIMEOUT_S, history_params: Optional[Callable] = None):
+        self.score_markets = score_markets
+        self.qualifies = qualifies
+        self.history_stats = history_stats
+        self.history_params = history_params or full_history_params
+        self.host = host
+        self.concurrency = concurrency
+        self.rate_per_s = rate_per_s
+        self.batch_size = batch_size
+        self.timeout_s = timeout_s
+        self.stats = PipelineStats()
+        self.results: List[Dict] = []
+        self.volatility: Dict[str, Dict] = {}
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+    # ============ HTTP ============
+
+    def _request(self, method: str, path: str, **kwargs):
+        response = self._session.request(method, f"{self.host}{path}", timeout=self.timeout_s, **kwargs)
+        if response.status_code in RETRY_STATUS:
+            return response.status_code, None
+        response.raise_for_status()
+        return response.status_code, response.json()
+
+    async def _call(self, method: str, path: str, retries: int = 3, **kwargs):
+        loop = asyncio.get_running_loop()
+        for attempt in range(retries + 1):
+            async with self._budget:
+                status, data = await loop.run_in_executor(
+                    self._executor, lambda: self._request(method, path, **kwargs))
+            if data is not None:
+                return data
+            if attempt < retries:
+                self.stats.retries += 1
+                await asyncio.sleep(0.5 * 2 ** attempt)
+        raise RuntimeError(f"{method} {path} failed with HTTP {status} after {retries} retries")
+
+    # ============ Stages ============
+
+    async def _fetch_pages(self, book_queue: asyncio.Queue):
+        cursor = ''
+        while True:
+            try:
+                page = await self._call('GET', '/sampling-markets', params={'next_cursor': cursor})
+            except Exception as e:
+                logger.error(f"Error fetching markets page: {e}")
+                self.stats.errors += 1
+                break
+            rows = page.get('data') or []
+            self.stats.pages += 1
+            self.stats.markets += len(rows)
+            for i in range(0, len(rows), self.batch_size):
+                await book_queue.put(rows[i:i + self.batch_size])
+            cursor = page.get('next_cursor')
+            logger.info(f"Fetched market page with {len(rows)} markets, next_cursor: {cursor}")
+            if cursor in END_CURSORS:
+                break
+
+    async def _fetch_books(self, token_ids: List[str]) -> Dict[str, Dict]:
+        try:
+            self.stats.book_requests += 1
+            books = await self._call('POST', '/books', json=[{'token_id': t} for t in token_ids])
+            return {str(b.get('asset_id')): b for b in books}
+        except Exception as e:
+            logger.warning(f"Bulk /books failed ({e}); falling back to one request per token")
+
+        async def one(token_id):
+            self.stats.book_fallbacks += 1
+            try:
+                return token_id, await self._call('GET', '/book', params={'token_id': token_id})
+            except Exception:
+                self.stats.errors += 1
+                return token_id, None
+        return {token_id: book for token_id, book in await asyncio.gather(*(one(t) for t in token_ids)) if book}
+
+    async def _book_worker(self, book_queue: asyncio.Queue, history_queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            rows = await book_queue.get()
+            if rows is None:
+                return
+            books = await self._fetch_books([str(row['tokens'][0]['token_id']) for row in rows])
+            batch = []
+            for row in rows:
+                book = books.get(str(row['tokens'][0]['token_id'])) or {}
+                batch.append(SimpleNamespace(bids=book.get('bids', []), asks=book.get('asks', [])))
+            try:
+                scored_batch = await loop.run_in_executor(self._executor, self.score_markets, rows, batch)
+            except Exception as e:
+                logger.error(f"Error scoring batch of {len(rows)} markets: {e}")
+                self.stats.errors += 1
+                continue
+            if self.stats.first_scored_s is None:
+                self.stats.first_scored_s = time.monotonic() - self.stats.started
+            for scored in scored_batch:
+                self.results.append(scored)
+                if self.qualifies(scored):
+                    await history_queue.put(scored)
+            if len(self.results) % (self.batch_size * 10) < len(rows):
+                logger.info(f"Processed {len(self.results)} of {self.stats.markets} markets so far")
+
+    async def _history_worker(self, history_queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            scored = await history_queue.get()
+            if scored is None:
+                return
+            try:
+                self.stats.history_requests += 1
+                params = await loop.run_in_executor(self._executor, self.history_params, scored['token1'])
+                data = await self._call('GET', '/prices-history', params=params)
+                stats = await loop.run_in_executor(self._executor, self.history_stats, scored, data['history'])
+                self.volatility[scored['condition_id']] = stats
+            except Exception as e:
+                logger.error(f"Error adding volatility for token {scored.get('token1', 'unknown')}: {e}")
+                self.stats.errors += 1
+
+    async def run(self):
+        self._budget = RequestBudget(self.concurrency, self.rate_per_s)
+        # Threads do the blocking HTTP and pandas work; the budget caps requests in flight
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency + 2,
+                                                               thread_name_prefix='pipeline')
+        book_queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        history_queue: asyncio.Queue = asyncio.Queue()
+        try:
+            book_workers = [asyncio.ensure_future(self._book_worker(book_queue, history_queue))
+                            for _ in range(self.concurrency)]
+            history_workers = [asyncio.ensure_future(self._history_worker(history_queue))
+                               for _ in range(self.concurrency)]
+            await self._fetch_pages(book_queue)
+            for _ in book_workers:
+                await book_queue.put(None)
+            await asyncio.gather(*book_workers)
+            for _ in history_workers:
+                await history_queue.put(None)
+            await asyncio.gather(*history_workers)
+        finally:
+            self._executor.shutdown(wait=False)
+            self._session.close()
+        logger.info(f"Market pipeline: {self.stats.summary()}")
+        return self.results, self.volatility
+
+
+def run_market_pipeline(score_markets: Callable, qualifies: Callable, history_stats: Callable, **kwargs):
+    """Synchronous entry point. Returns (scored results, {condition_id: volatility columns})."""
+    pipeline = MarketPipeline(score_markets, qualifies, history_stats, **kwargs)
+    return asyncio.run(pipeline.run())
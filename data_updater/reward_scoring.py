@@ -0,0 +1,336 @@
+"""
+Maker-reward scoring for the data updater.
+
+score_market is the original per-market implementation (pandas, one tick
+grid and several DataFrames per side) and is kept as the parity reference.
+score_markets_batch scores a whole batch at once: every market's bid and ask
+tick grids are laid out as padded NumPy arrays, book sizes are matched onto
+them, and the S = ((v - s) / v)^2 Q-scores, reward shares and gm/sm
+aggregates are computed for all markets in a few array operations.
+compare_with_reference runs both and reports any differences.
+"""
+import logging
+import math
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+USDC_ADDRESS = '0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174'.lower()
+
+REWARD_FIELDS = ('bid_reward_per_100', 'ask_reward_per_100', 'sm_reward_per_100', 'gm_reward_per_100',
+                 'best_bid', 'best_ask', 'midpoint')
+
+
+# ============ Reference implementation ============
+
+def get_bid_ask_range(ret, TICK_SIZE):
+    bid_from = ret['midpoint'] - ret['max_spread'] / 100
+    bid_to = ret['best_ask']
+    if bid_to == 0:
+        bid_to = ret['midpoint']
+    if bid_to - TICK_SIZE > ret['midpoint']:
+        bid_to = ret['best_bid'] + (TICK_SIZE + 0.1 * TICK_SIZE)
+    if bid_from > bid_to:
+        bid_from = bid_to - (TICK_SIZE + 0.1 * TICK_SIZE)
+    ask_to = ret['midpoint'] + ret['max_spread'] / 100
+    ask_from = ret['best_bid']
+    if ask_from == 0:
+        ask_from = ret['midpoint']
+    if ask_from + TICK_SIZE < ret['midpoint']:
+        ask_from = ret['best_ask'] - (TICK_SIZE + 0.1 * TICK_SIZE)
+    if ask_from > ask_to:
+        ask_to = ask_from + (TICK_SIZE + 0.1 * TICK_SIZE)
+    bid_from = round(bid_from, 3)
+    bid_to = round(bid_to, 3)
+    ask_from = round(ask_from, 3)
+    ask_to = round(ask_to, 3)
+    if bid_from < 0:
+        bid_from = 0
+    if ask_from < 0:
+        ask_from = 0
+    return bid_from, bid_to, ask_from, ask_to
+
+def generate_numbers(start, end, TICK_SIZE):
+    rounded_start = (int(start * 100) + 1) / 100 if start * 100 % 1 != 0 else start + TICK_SIZE
+    rounded_end = int(end * 100) / 100
+    numbers = []
+    current = rounded_start
+    while current < end:
+        numbers.append(current)
+        current += TICK_SIZE
+        current = round(current, len(str(TICK_SIZE).split('.')[1]) if '.' in str(TICK_SIZE) else 0)
+    return numbers
+
+def add_formula_params(curr_df, midpoint, v, daily_reward):
+    if curr_df.empty:
+        return curr_df
+    curr_df = curr_df.copy()
+    curr_df['s'] = (curr_df['price'] - midpoint).abs()
+    curr_df['S'] = ((v - curr_df['s']) / v) ** 2
+    curr_df['100'] = 1 / curr_df['price'] * 100
+    curr_df['size'] = curr_df['size'] + curr_df['100']
+    curr_df['Q'] = curr_df['S'] * curr_df['size']
+    total_Q = curr_df['Q'].sum()
+    if total_Q > 0:
+        curr_df['reward_per_100'] = (curr_df['Q'] / total_Q) * daily_reward / 2 / curr_df['size'] * curr_df['100']
+    else:
+        num_rows = len(curr_df)
+        curr_df['reward_per_100'] = (daily_reward / 2) / num_rows if num_rows > 0 else 0
+    curr_df['reward_per_100'] = curr_df['reward_per_100'].replace([np.inf, -np.inf], 0).fillna(0)
+    return curr_df
+
+def market_fields(row):
+    ret = {}
+    ret['question'] = row['question']
+    ret['neg_risk'] = row['neg_risk']
+    ret['answer1'] = row['tokens'][0]['outcome']
+    ret['answer2'] = row['tokens'][1]['outcome']
+    ret['min_size'] = row['rewards']['min_size']
+    ret['max_spread'] = row['rewards']['max_spread']
+    rate = 0
+    for rate_info in row['rewards']['rates']:
+        if rate_info['asset_address'].lower() == USDC_ADDRESS:
+            rate = rate_info['rewards_daily_rate']
+            break
+    ret['rewards_daily_rate'] = rate
+    return ret
+
+def add_market_ids(ret, row):
+    ret['end_date_iso'] = row['end_date_iso']
+    ret['market_slug'] = row['market_slug']
+    ret['token1'] = row['tokens'][0]['token_id']
+    ret['token2'] = row['tokens'][1]['token_id']
+    ret['condition_id'] = row['condition_id']
+    return ret
+
+def score_market(row, book):
+    """Reference scorer (one market, pandas). Kept as the parity baseline for score_markets_batch."""
+    ret = market_fields(row)
+    rate = ret['rewards_daily_rate']
+    bids = pd.DataFrame()
+    asks = pd.DataFrame()
+    try:
+        bids = pd.DataFrame(book.bids).astype(float)
+    except:
+        pass
+    try:
+        asks = pd.DataFrame(book.asks).astype(float)
+    except:
+        pass
+    try:
+        ret['best_bid'] = bids.iloc[-1]['price'] if not bids.empty else 0
+    except:
+        ret['best_bid'] = 0
+    try:
+        ret['best_ask'] = asks.iloc[-1]['price'] if not asks.empty else 0
+    except:
+        ret['best_ask'] = 0
+    ret['midpoint'] = (ret['best_bid'] + ret['best_ask']) / 2
+    if ret['midpoint'] == 0 or pd.isna(ret['midpoint']):
+        ret['midpoint'] = 0.5
+        ret['best_bid'] = 0.49
+        ret['best_ask'] = 0.51
+    TICK_SIZE = row['minimum_tick_size']
+    ret['tick_size'] = TICK_SIZE
+    bid_from, bid_to, ask_from, ask_to = get_bid_ask_range(ret, TICK_SIZE)
+    v = round((ret['max_spread'] / 100), 2)
+    bids_df = pd.DataFrame({'price': generate_numbers(bid_from, bid_to, TICK_SIZE), 'size': 0})
+    asks_df = pd.DataFrame({'price': generate_numbers(ask_from, ask_to, TICK_SIZE), 'size': 0})
+    try:
+        bids_df = bids_df.merge(bids, on='price', how='left', suffixes=('', '_book')).fillna(0)
+        if 'size_book' in bids_df.columns:
+            bids_df['size'] = bids_df['size'].fillna(0) + bids_df['size_book'].fillna(0)
+            bids_df.drop(columns=['size_book'], inplace=True)
+    except Exception as merge_err:
+        logger.error(f"Merge error for bids: {merge_err}", exc_info=True)
+    try:
+        asks_df = asks_df.merge(asks, on='price', how='left', suffixes=('', '_book')).fillna(0)
+        if 'size_book' in asks_df.columns:
+            asks_df['size'] = asks_df['size'].fillna(0) + asks_df['size_book'].fillna(0)
+            asks_df.drop(columns=['size_book'], inplace=True)
+    except Exception as merge_err:
+        logger.error(f"Merge error for asks: {merge_err}", exc_info=True)
+    best_bid_reward = 0
+    try:
+        ret_bid = add_formula_params(bids_df, ret['midpoint'], v, rate)
+        best_bid_reward = round(ret_bid['reward_per_100'].max(), 2) if not ret_bid.empty else 0
+    except:
+        pass
+    best_ask_reward = 0
+    try:
+        ret_ask = add_formula_params(asks_df, ret['midpoint'], v, rate)
+        best_ask_reward = round(ret_ask['reward_per_100'].max(), 2) if not ret_ask.empty else 0
+    except:
+        pass
+    ret['bid_reward_per_100'] = best_bid_reward
+    ret['ask_reward_per_100'] = best_ask_reward
+    ret['sm_reward_per_100'] = round((best_bid_reward + best_ask_reward) / 2, 2)
+    ret['gm_reward_per_100'] = round((best_bid_reward * best_ask_reward) ** 0.5, 2)
+    return add_market_ids(ret, row)
+
+
+# ============ Batch (NumPy) implementation ============
+
+def _tick_decimals(tick):
+    """Decimals used by generate_numbers to round the grid."""
+    return len(str(tick).split('.')[1]) if '.' in str(tick) else 0
+
+def _grid_start(start, tick):
+    """First grid value, exactly as generate_numbers computes it."""
+    return (int(start * 100) + 1) / 100 if start * 100 % 1 != 0 else start + tick
+
+def _levels(entries):
+    """Book side as (prices, sizes) float lists; accepts dicts or objects with .price/.size."""
+    prices, sizes = [], []
+    try:
+        for entry in entries or ():
+            if isinstance(entry, dict):
+                price, size = entry['price'], entry['size']
+            else:
+                price, size = entry.price, entry.size
+            prices.append(float(price))
+            sizes.append(float(size))
+    except (KeyError, AttributeError, TypeError, ValueError):
+        return [], []
+    return prices, sizes
+
+def _grid_matrix(starts, ends, ticks, decimals) -> Tuple[np.ndarray, np.ndarray]:
+    """Padded tick grids (m x L) and validity mask, matching generate_numbers value for value.
+
+    When the first value lies on the tick's decimal grid, every later value is
+    the nearest grid point to start + k * tick, so the grid is built directly.
+    Otherwise (exotic ticks) the row falls back to generate_numbers.
+    """
+    m = len(starts)
+    first = np.array([_grid_start(s, t) for s, t in zip(starts, ticks)], dtype=float)
+    tick = np.asarray(ticks, dtype=float)
+    end = np.asarray(ends, dtype=float)
+    scale = 10.0 ** np.asarray(decimals, dtype=float)
+    valid_tick = tick > 0
+    on_grid = valid_tick & (np.abs(first * scale - np.rint(first * scale)) < 1e-6)
+
+    with np.errstate(all='ignore'):
+        steps = np.where(valid_tick, np.floor((end - first) / np.where(valid_tick, tick, 1.0)) + 2, 0)
+    width = int(max(1, np.nanmax(np.clip(steps, 0, None)) if m else 1))
+    fallback = {}
+    for i in np.nonzero(valid_tick & ~on_grid)[0]:
+        fallback[i] = generate_numbers(starts[i], ends[i], ticks[i])
+        width = max(width, len(fallback[i]) + 1)
+
+    k = np.arange(width, dtype=float)
+    grid = np.rint((first[:, None] + k[None, :] * tick[:, None]) * scale[:, None]) / scale[:, None]
+    grid[:, 0] = first  # generate_numbers does not round the first value
+    mask = (grid < end[:, None]) & valid_tick[:, None]
+    for i, values in fallback.items():
+        grid[i, :] = 1.0
+        grid[i, :len(values)] = values
+        mask[i, :] = False
+        mask[i, :len(values)] = True
+    grid[~mask] = 1.0  # padding (ignored, but keeps the arithmetic finite)
+    return grid, mask
+
+def _match_sizes(grid, mask, book_prices: Sequence[List[float]], book_sizes: Sequence[List[float]]) -> np.ndarray:
+    """Book size at each grid price (exact price match, like the reference left-merge)."""
+    m, width = grid.shape
+    depth = max((len(p) for p in book_prices), default=0)
+    sizes = np.zeros((m, width))
+    if depth == 0:
+        return sizes
+    prices = np.full((m, depth), np.nan)
+    amounts = np.zeros((m, depth))
+    for i, (p, s) in enumerate(zip(book_prices, book_sizes)):
+        prices[i, :len(p)] = p
+        amounts[i, :len(s)] = s
+    for col in range(width):
+        sizes[:, col] = np.where(prices == grid[:, col:col + 1], amounts, 0.0).sum(axis=1)
+    sizes[~mask] = 0.0
+    return sizes
+
+def _side_rewards(grid, mask, book_sizes, midpoint, v, rate) -> np.ndarray:
+    """Best reward_per_100 per market for one side (same arithmetic as add_formula_params)."""
+    n = mask.sum(axis=1)
+    with np.errstate(all='ignore'):
+        s = np.abs(grid - midpoint[:, None])
+        S = ((v[:, None] - s) / v[:, None]) ** 2
+        c100 = 1 / grid * 100
+        size = book_sizes + c100
+        Q = S * size
+        total_q = np.nansum(np.where(mask, Q, 0.0), axis=1)
+        shared = (Q / total_q[:, None]) * rate[:, None] / 2 / size * c100
+        flat = (rate / 2) / np.maximum(n, 1)
+        reward = np.where((total_q > 0)[:, None], shared, flat[:, None])
+    reward = np.where(np.isfinite(reward), reward, 0.0)
+    best = np.where(mask, reward, -np.inf).max(axis=1)
+    return np.where(n > 0, np.round(best, 2), 0.0)
+
+def score_markets_batch(rows: Sequence, books: Sequence) -> List[Dict]:
+    """Scores many markets at once. `books[i]` is the token1 book of `rows[i]` (.bids/.asks)."""
+    results = []
+    bid_args = ([], [], [], [])
+    ask_args = ([], [], [], [])
+    bid_books = ([], [])
+    ask_books = ([], [])
+    midpoints, spreads, rates = [], [], []
+    for row, book in zip(rows, books):
+        ret = market_fields(row)
+        bid_prices, bid_sizes = _levels(getattr(book, 'bids', None))
+        ask_prices, ask_sizes = _levels(getattr(book, 'asks', None))
+        # np.float64 like the reference's DataFrame.iloc: round() on it breaks ties the NumPy way
+        ret['best_bid'] = np.float64(bid_prices[-1]) if bid_prices else 0
+        ret['best_ask'] = np.float64(ask_prices[-1]) if ask_prices else 0
+        ret['midpoint'] = (ret['best_bid'] + ret['best_ask']) / 2
+        if ret['midpoint'] == 0 or math.isnan(ret['midpoint']):
+            ret['midpoint'] = 0.5
+            ret['best_bid'] = 0.49
+            ret['best_ask'] = 0.51
+        tick = row['minimum_tick_size']
+        ret['tick_size'] = tick
+        bid_from, bid_to, ask_from, ask_to = get_bid_ask_range(ret, tick)
+        decimals = _tick_decimals(tick)
+        for args, (start, end) in ((bid_args, (bid_from, bid_to)), (ask_args, (ask_from, ask_to))):
+            args[0].append(start)
+            args[1].append(end)
+            args[2].append(tick)
+            args[3].append(decimals)
+        bid_books[0].append(bid_prices)
+        bid_books[1].append(bid_sizes)
+        ask_books[0].append(ask_prices)
+        ask_books[1].append(ask_sizes)
+        midpoints.append(ret['midpoint'])
+        spreads.append(round((ret['max_spread'] / 100), 2))
+        rates.append(ret['rewards_daily_rate'])
+        results.append(add_market_ids(ret, row))
+    if not results:
+        return results
+
+    midpoint = np.asarray(midpoints, dtype=float)
+    v = np.asarray(spreads, dtype=float)
+    rate = np.asarray(rates, dtype=float)
+    side_best = []
+    for args, (prices, sizes) in ((bid_args, bid_books), (ask_args, ask_books)):
+        grid, mask = _grid_matrix(*args)
+        matched = _match_sizes(grid, mask, prices, sizes)
+        side_best.append(_side_rewards(grid, mask, matched, midpoint, v, rate))
+    bid_best, ask_best = side_best
+    sm = np.round((bid_best + ask_best) / 2, 2)
+    gm = np.round((bid_best * ask_best) ** 0.5, 2)
+    for i, ret in enumerate(results):
+        ret['bid_reward_per_100'] = float(bid_best[i])
+        ret['ask_reward_per_100'] = float(ask_best[i])
+        ret['sm_reward_per_100'] = float(sm[i])
+        ret['gm_reward_per_100'] = float(gm[i])
+    return results
+
+def compare_with_reference(rows: Sequence, books: Sequence, tol: float = 1e-9) -> List[Tuple[str, str, float, float]]:
+    """Runs both scorers; returns (condition_id, field, reference, batch) for every difference above `tol`."""
+    batch = score_markets_batch(rows, books)
+    mismatches = []
+    for row, book, fast in zip(rows, books, batch):
+        ref = score_market(row, book)
+        for field in REWARD_FIELDS:
+            if abs(float(ref[field]) - float(fast[field])) > tol:
+                mismatches.append((str(row['condition_id']), field, float(ref[field]), float(fast[field])))
+    return mismatches
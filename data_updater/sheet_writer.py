@@ -0,0 +1,164 @@
+"""
+Diff-based worksheet writer for the data updater.
+
+Keeps the last grid written to each worksheet (header row + data rows, as
+comparable cell strings) and on the next write sends only the cells that
+changed: changed cells are grouped into one span per row, consecutive rows
+with the same span are merged into one A1 range, and all ranges go out in a
+single values batch_update. Changed cells are sent as the same values
+gspread_dataframe sends on a full write (numbers as JSON numbers, so Sheets
+does not re-parse them with the spreadsheet's locale). The grid is resized
+only when the row count changes (before growing, after shrinking).
+
+A full write (set_with_dataframe with resize, as before) is used only when
+the header or column count changes, or nothing is known about the sheet. On the first write
+of a process the current contents are read once, so restarts don't rewrite
+everything either.
+"""
+import logging
+import math
+from numbers import Real
+from typing import Dict, List, Optional, Tuple
+
+from gspread.utils import rowcol_to_a1
+from gspread_dataframe import set_with_dataframe
+
+logger = logging.getLogger(__name__)
+
+Grid = List[List[str]]
+
+
+def _value(value):
+    """Value as gspread_dataframe sends it: '' for nulls, numbers as Python numbers, str otherwise."""
+    if value is None:
+        return ''
+    if type(value).__module__ == 'numpy':
+        value = value.item()
+    if isinstance(value, float):
+        return '' if math.isnan(value) else value
+    try:
+        if value != value:  # pd.NA / NaT
+            return ''
+    except (TypeError, ValueError):
+        return ''
+    return value if isinstance(value, Real) else str(value)
+
+
+def _cell(value) -> str:
+    """Comparable text of a cell: repr for floats (exact), str otherwise."""
+    value = _value(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def to_values(data) -> List[list]:
+    """DataFrame -> [header] + rows, as the values sent to Sheets."""
+    values = [[str(col) for col in data.columns]]
+    values.extend([_value(value) for value in row] for row in data.itertuples(index=False, name=None))
+    return values
+
+
+def to_grid(values: List[list]) -> Grid:
+    """Values from to_values() -> cell strings, for comparison with the last write."""
+    return [[_cell(value) for value in row] for row in values]
+
+
+def _normalize(values: Grid, width: int) -> Grid:
+    """Sheet contents -> rectangular grid of cell strings without trailing empty rows."""
+    grid = [[_cell(value) for value in row[:width]] + [''] * (width - len(row[:width])) for row in values]
+    while grid and not any(grid[-1]):
+        grid.pop()
+    return grid
+
+
+def diff_ranges(old: Grid, new: Grid, values: Optional[List[list]] = None) -> List[Dict]:
+    """A1 ranges covering every cell of `new` that differs from `old` (same width).
+
+    The values sent are taken from `values` (same shape as `new`; default: `new` itself).
+    Rows of `old` past the end of `new` are not blanked; the caller shrinks the grid.
+    """
+    if values is None:
+        values = new
+    width = len(new[0]) if new else 0
+    spans: List[Tuple[int, int, int]] = []  # (row, first col, last col), 0-based
+    for i, row in enumerate(new):
+        prev = old[i] if i < len(old) else None
+        if prev is None:
+            changed = [j for j, value in enumerate(row) if value != '']
+        else:
+            changed = [j for j in range(width) if row[j] != prev[j]]
+        if changed:
+            spans.append((i, changed[0], changed[-1]))
+
+    ranges = []
+    k = 0
+    while k < len(spans):
+        row, lo, hi = spans[k]
+        end = k
+        while end + 1 < len(spans) and spans[end + 1] == (spans[end][0] + 1, lo, hi):
+            end += 1
+        last_row = spans[end][0]
+        ranges.append({'range': f"{rowcol_to_a1(row + 1, lo + 1)}:{rowcol_to_a1(last_row + 1, hi + 1)}",
+                       'values': [values[r][lo:hi + 1] for r in range(row, last_row + 1)]})
+        k = end + 1
+    return ranges
+
+
+class SheetWriter:
+    """Writes DataFrames to worksheets, sending only what changed since the last write."""
+
+    def __init__(self):
+        self._last: Dict[int, Grid] = {}  # worksheet id -> last written grid
+
+    def _read_current(self, worksheet, width: int) -> Optional[Grid]:
+        try:
+            values = worksheet.get_all_values(value_render_option='UNFORMATTED_VALUE')
+        except TypeError:
+            values = worksheet.get_all_values()
+        return _normalize(values, width) if values else None
+
+    def _full_write(self, worksheet, data, grid: Grid) -> Dict:
+        self._last.pop(worksheet.id, None)
+        set_with_dataframe(worksheet, data, include_index=False, include_column_header=True, resize=True)
+        self._last[worksheet.id] = grid
+        return {'mode': 'full', 'cells': len(grid) * len(grid[0]), 'ranges': 1}
+
+    def write(self, worksheet, data) -> Dict:
+        """Writes `data` (with header row). Returns {'mode': 'full'|'diff'|'noop', 'cells', 'ranges'}."""
+        values = to_values(data)
+        grid = to_grid(values)
+        width = len(grid[0])
+        old = self._last.get(worksheet.id)
+        if old is None:
+            old = self._read_current(worksheet, width)
+        if not old or old[0] != grid[0] or worksheet.col_count != width:
+            return self._full_write(worksheet, data, grid)
+
+        ranges = diff_ranges(old, grid, values)
+        if not ranges and len(grid) == worksheet.row_count:
+            self._last[worksheet.id] = grid
+            return {'mode': 'noop', 'cells': 0, 'ranges': 0}
+        try:
+            if len(grid) > worksheet.row_count:
+                worksheet.resize(rows=len(grid))
+            if ranges:
+                worksheet.batch_update(ranges, value_input_option='USER_ENTERED')
+            if len(grid) < worksheet.row_count:
+                worksheet.resize(rows=len(grid))
+        except Exception:
+            # Unknown state on the sheet: re-read it next time
+            self._last.pop(worksheet.id, None)
+            raise
+        self._last[worksheet.id] = grid
+        cells = sum(len(r['values']) * len(r['values'][0]) for r in ranges)
+        return {'mode': 'diff', 'cells': cells, 'ranges': len(ranges)}
+
+    def forget(self, worksheet=None):
+        """Drops the cached grid (one worksheet or all), forcing a re-read before the next diff."""
+        if worksheet is None:
+            self._last.clear()
+        else:
+            self._last.pop(worksheet.id, None)
+
+
+# Instância global
+sheet_writer = SheetWriter()
@@ -0,0 +1,134 @@
+"""
+Multi-horizon price volatility for the data updater.
+
+calculate_annualized_volatility / volatility_frame are the original pandas
+implementation (one filtered slice and std() per horizon) and are kept as the
+parity reference. volatility_batch computes every horizon for many tokens in
+one pass: all series are laid out back to back, log returns and their squares
+are prefix-summed once, and each (token, horizon) window is a searchsorted
+start index plus two cumsum differences. compare_with_reference runs both and
+reports any differences.
+"""
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Output column -> window length in hours
+HORIZONS = (('1_hour', 1), ('3_hour', 3), ('6_hour', 6), ('12_hour', 12), ('24_hour', 24),
+            ('7_day', 24 * 7), ('30_day', 24 * 30))
+ANNUALIZATION = np.sqrt(60 * 24 * 252)
+
+# Token offset in the combined sort key; larger than any window or timestamp span
+_SEGMENT_SHIFT = np.int64(1) << 40
+
+
+# ============ Reference implementation ============
+
+def calculate_annualized_volatility(df, hours):
+    if df.empty:
+        return 0
+    end_time = df['t'].max()
+    start_time = end_time - pd.Timedelta(hours=hours)
+    window_df = df[df['t'] >= start_time]
+    if window_df.empty:
+        return 0
+    volatility = window_df['log_return'].std()
+    annualized_volatility = volatility * np.sqrt(60 * 24 * 252)
+    return round(annualized_volatility, 2)
+
+
+def volatility_frame(t, p) -> Dict:
+    """Reference: t in epoch seconds, p raw prices."""
+    price_df = pd.DataFrame({'t': pd.to_datetime(np.asarray(t), unit='s'), 'p': np.asarray(p, dtype=float)})
+    price_df['p'] = price_df['p'].round(2)
+    price_df['log_return'] = np.log(price_df['p'] / price_df['p'].shift(1))
+    ret = {name: calculate_annualized_volatility(price_df, hours) for name, hours in HORIZONS}
+    ret['volatility_price'] = price_df['p'].iloc[-1] if not price_df.empty else 0
+    return ret
+
+
+# ============ Batch kernel ============
+
+def volatility_batch(series: Sequence[Tuple[np.ndarray, np.ndarray]]) -> List[Dict]:
+    """Volatility columns for many tokens at once.
+
+    Args:
+        series: one (t, p) pair per token; t in epoch seconds sorted ascending, p raw prices
+
+    Returns one dict per token with the HORIZONS columns and volatility_price,
+    matching volatility_frame (NaN where pandas std() is undefined).
+    """
+    if not series:
+        return []
+    lengths = np.array([len(t) for t, _ in series], dtype=np.int64)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    n = int(ends[-1]) if len(ends) else 0
+    t = np.concatenate([np.asarray(t, dtype=np.int64) for t, _ in series]) if n else np.empty(0, np.int64)
+    p = np.concatenate([np.asarray(p, dtype=float) for _, p in series]) if n else np.empty(0)
+    p = np.round(p, 2)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.empty(n)
+        if n:
+            r[0] = np.nan
+            r[1:] = np.log(p[1:] / p[:-1])
+    r[starts[lengths > 0]] = np.nan  # first point of each token has no return
+
+    # pandas std() skips NaN but any inf turns it into NaN
+    valid = np.isfinite(r)
+    infinite = np.isinf(r)
+    # Centering on the mean keeps the sum-of-squares difference well conditioned
+    mean = r[valid].mean() if valid.any() else 0.0
+    x = np.where(valid, r - mean, 0.0)
+    c_n = np.concatenate([[0], np.cumsum(valid)])
+    c_inf = np.concatenate([[0], np.cumsum(infinite)])
+    c_s1 = np.concatenate([[0.0], np.cumsum(x)])
+    c_s2 = np.concatenate([[0.0], np.cumsum(x * x)])
+
+    seg = np.repeat(np.arange(len(series), dtype=np.int64), lengths)
+    keys = t + seg * _SEGMENT_SHIFT
+    nonempty = lengths > 0
+    last_t = np.where(nonempty, t[np.maximum(ends - 1, 0)] if n else 0, 0)
+    seg_ids = np.arange(len(series), dtype=np.int64)
+
+    columns = {}
+    for name, hours in HORIZONS:
+        window_start = np.searchsorted(keys, last_t - hours * 3600 + seg_ids * _SEGMENT_SHIFT, side='left')
+        window_start = np.maximum(window_start, starts)
+        count = c_n[ends] - c_n[window_start]
+        s1 = c_s1[ends] - c_s1[window_start]
+        s2 = c_s2[ends] - c_s2[window_start]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var = np.maximum(s2 - s1 * s1 / count, 0.0) / (count - 1)
+            vol = np.round(np.sqrt(var) * ANNUALIZATION, 2)
+        vol = np.where(count < 2, np.nan, vol)
+        vol = np.where(c_inf[ends] - c_inf[window_start] > 0, np.nan, vol)
+        columns[name] = np.where(nonempty, vol, 0)
+
+    price = np.where(nonempty, p[np.maximum(ends - 1, 0)] if n else 0, 0)
+    return [dict({name: float(columns[name][i]) for name, _ in HORIZONS}, volatility_price=float(price[i]))
+            for i in range(len(series))]
+
+
+def compare_with_reference(series: Sequence[Tuple[np.ndarray, np.ndarray]],
+                           tol: float = 0.011) -> List[Tuple[int, str, float, float]]:
+    """Runs both implementations; returns (index, field, reference, batch) for every difference above `tol`.
+
+    The default tolerance allows one unit in the last rounded decimal.
+    """
+    batch = volatility_batch(series)
+    mismatches = []
+    for i, ((t, p), fast) in enumerate(zip(series, batch)):
+        ref = volatility_frame(t, p)
+        for field, ref_value in ref.items():
+            ref_value, fast_value = float(ref_value), float(fast[field])
+            if np.isnan(ref_value) and np.isnan(fast_value):
+                continue
+            if not abs(ref_value - fast_value) <= tol:
+                mismatches.append((i, field, ref_value, fast_value))
+    return mismatches
@@ -0,0 +1,4 @@
+"""
+Fake CLOB local (REST + WebSocket) para testes de latência ponta a ponta.
+"""
+from fake_clob.matching import MatchingEngine, FakeMarket
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Probe de latência contra o fake CLOB (sem py_clob_client e sem assinatura).
+
+Para cada N-ésimo frame do canal market, envia uma ordem passiva (não cruza)
+e mede:
+- frame_to_ack: frame recebido -> resposta do POST /order
+- frame_to_event: frame recebido -> evento PLACEMENT no canal user
+É o piso de latência da infraestrutura local; compare com as métricas do bot
+rodando contra o mesmo servidor (mesma --rate) para isolar o custo do pipeline.
+
+Usage:
+    python -m fake_clob.server --markets 5 --rate 500 &
+    python -m fake_clob.latency_probe --duration 30 --order-every 10
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+import websockets
+
+PROBE_OWNER = '0x00000000000000000000000000000000000000b0'
+
+
+def _percentiles(values, percentiles=(50, 90, 99)):
+    if not values:
+        return {}
+    sorted_vals = sorted(values)
+    return {f'p{p}': sorted_vals[min(int(len(sorted_vals) * p / 100), len(sorted_vals) - 1)] / 1_000_000
+            for p in percentiles}
+
+
+class _Rest:
+    """Conexão HTTP/1.1 persistente (uma por thread de envio)."""
+
+    def __init__(self, base_url: str):
+        url = urlparse(base_url)
+        self.conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=10)
+
+    def request(self, method: str, path: str, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if data else {}
+        self.conn.request(method, path, body=data, headers=headers)
+        return json.loads(self.conn.getresponse().read())
+
+
+async def run_probe(rest_url: str, ws_url: str, duration: float, order_every: int):
+    rest = _Rest(rest_url)
+    markets = rest.request('GET', '/sampling-markets')['data']
+    token_to_market = {m['tokens'][0]['token_id']: m['condition_id'] for m in markets}
+    market_to_token = {v: k for k, v in token_to_market.items()}
+    best_bid = {}
+
+    frame_to_ack = deque(maxlen=100000)
+    frame_to_event = deque(maxlen=100000)
+    pending = {}  # orderID -> t_frame_ns
+    frames_seen = 0
+
+    async with websockets.connect(f"{ws_url}/ws/market") as market_ws, \
+            websockets.connect(f"{ws_url}/ws/user") as user_ws:
+        await market_ws.send(json.dumps({'assets_ids': list(token_to_market)}))
+        await user_ws.send(json.dumps({'type': 'user', 'auth': {}}))
+
+        async def user_reader():
+            async for raw in user_ws:
+                now = time.monotonic_ns()
+                for event in (lambda d: d if isinstance(d, list) else [d])(json.loads(raw)):
+                    if event.get('event_type') == 'order' and event.get('type') == 'PLACEMENT':
+                        t_frame = pending.pop(event.get('id'), None)
+                        if t_frame:
+                            frame_to_event.append(now - t_frame)
+
+        reader = asyncio.create_task(user_reader())
+        deadline = time.monotonic() + duration
+        try:
+            while time.monotonic() < deadline:
+                raw = await asyncio.wait_for(market_ws.recv(), timeout=max(0.01, deadline - time.monotonic()))
+                t_frame = time.monotonic_ns()
+                data = json.loads(raw)
+                for frame in data if isinstance(data, list) else [data]:
+                    if frame.get('event_type') == 'book' and frame.get('bids'):
+                        best_bid[frame['market']] = float(frame['bids'][-1]['price'])
+                    frames_seen += 1
+                    market = frame.get('market')
+                    if frames_seen % order_every or market not in best_bid:
+                        continue
+                    # Ordem passiva 5 ticks abaixo do melhor bid (não gera fill)
+                    price = max(0.01, round(best_bid[market] - 0.05, 2))
+                    size = 10
+                    order = {'order': {'tokenId': market_to_token[market], 'side': 'BUY', 'maker': PROBE_OWNER,
+                                       'makerAmount': str(int(price * size * 1e6)),
+                                       'takerAmount': str(int(size * 1e6))},
+                             'owner': 'probe', 'orderType': 'GTC'}
+                    resp = await asyncio.to_thread(rest.request, 'POST', '/order', order)
+                    frame_to_ack.append(time.monotonic_ns() - t_frame)
+                    if resp.get('orderID'):
+                        pending[resp['orderID']] = t_frame
+                    if len(frame_to_ack) % 50 == 0:
+                        await asyncio.to_thread(rest.request, 'DELETE', '/cancel-all', {})
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            await asyncio.sleep(0.2)
+            reader.cancel()
+            await asyncio.to_thread(rest.request, 'DELETE', '/cancel-all', {})
+
+    print("=" * 80)
+    print(f"📊 LATENCY PROBE ({frames_seen} frames, {len(frame_to_ack)} ordens em {duration:.0f}s)")
+    print("=" * 80)
+    for name, values in (('frame_to_ack', frame_to_ack), ('frame_to_event', frame_to_event)):
+        pct = _percentiles(values)
+        print(f"{name}: " + (", ".join(f"{k}={v:.2f}ms" for k, v in pct.items()) or "Sem dados"))
+    print("exchange: " + json.dumps(rest.request('GET', '/stats')))
+    print("=" * 80)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Probe de latência frame -> ack contra o fake CLOB")
+    parser.add_argument('--rest', default='http://127.0.0.1:8080')
+    parser.add_argument('--ws', default='ws://127.0.0.1:8081')
+    parser.add_argument('--duration', type=float, default=30.0, help='Segundos de medição')
+    parser.add_argument('--order-every', type=int, default=10, help='Envia uma ordem a cada N frames')
+    args = parser.parse_args()
+    asyncio.run(run_probe(args.rest, args.ws, args.duration, max(1, args.order_every)))
+
+
+if __name__ == "__main__":
+    main()
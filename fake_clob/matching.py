@@ -0,0 +1,469 @@
+"""
+Motor de matching simplificado do fake CLOB.
+
+O book de cada mercado é mantido em termos do token1 (como o bot faz em
+global_state.all_data) com preços em ticks inteiros. O token2 é o espelho
+(preço 1 - p, lados invertidos). A liquidez "sintética" vem do stream
+(random walk ou frames gravados); as ordens do bot ficam em repouso no book
+e são executadas:
+- como taker, ao chegarem cruzando a liquidez sintética;
+- como maker, quando o stream move o book através do preço delas.
+"""
+import hashlib
+import itertools
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+BUY = 'BUY'
+SELL = 'SELL'
+
+# Endereço usado como contraparte sintética nos eventos de trade
+SYNTHETIC_MAKER = '0x0000000000000000000000000000000000000001'
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.4f}".rstrip('0').rstrip('.') or '0'
+
+
+class FakeMarket:
+    """Mercado binário (token1/token2) com book de liquidez sintética em ticks."""
+
+    def __init__(self, condition_id: str, token1: str, token2: Optional[str] = None,
+                 answer1: str = 'Yes', answer2: str = 'No', tick_size: float = 0.01,
+                 question: str = ''):
+        self.condition_id = condition_id
+        self.token1 = token1
+        self.token2 = token2
+        self.answer1 = answer1
+        self.answer2 = answer2
+        self.tick_size = tick_size
+        self.question = question or f'Fake market {condition_id[:10]}'
+        self.ticks = int(round(1 / tick_size))
+        self.bids: Dict[int, float] = {}  # ticks -> size
+        self.asks: Dict[int, float] = {}
+
+    def to_price(self, ticks: int) -> float:
+        return round(ticks * self.tick_size, 6)
+
+    def to_ticks(self, price: float) -> int:
+        return int(round(float(price) / self.tick_size))
+
+    def best_bid(self) -> Optional[int]:
+        return max(self.bids) if self.bids else None
+
+    def best_ask(self) -> Optional[int]:
+        return min(self.asks) if self.asks else None
+
+    def seed(self, rng: random.Random, mid: float = 0.5, depth: int = 10):
+        """Gera um book inicial em torno de `mid` (spread de 2 ticks)."""
+        mid_t = self.to_ticks(mid)
+        self.bids = {t: float(rng.randint(20, 2000)) for t in range(mid_t - depth, mid_t) if 0 < t < self.ticks}
+        self.asks = {t: float(rng.randint(20, 2000)) for t in range(mid_t + 1, mid_t + depth + 1) if 0 < t < self.ticks}
+
+    def to_dict(self) -> Dict:
+        return {
+            'condition_id': self.condition_id, 'token1': self.token1, 'token2': self.token2,
+            'answer1': self.answer1, 'answer2': self.answer2, 'tick_size': self.tick_size,
+            'question': self.question,
+        }
+
+
+class RestingOrder:
+    """Ordem do bot em repouso. Preço/lado guardados como enviados e em termos do token1."""
+    __slots__ = ['id', 'market', 'token', 'side', 'price', 'original_size', 'size_matched',
+                 'owner', 'created_at', 'side1', 'ticks1']
+
+    def __init__(self, order_id: str, market: FakeMarket, token: str, side: str, price: float,
+                 size: float, owner: str):
+        self.id = order_id
+        self.market = market
+        self.token = token
+        self.side = side
+        self.price = price
+        self.original_size = size
+        self.size_matched = 0.0
+        self.owner = owner
+        self.created_at = int(time.time())
+        if token == market.token1:
+            self.side1 = side
+            self.ticks1 = market.to_ticks(price)
+        else:
+            # Comprar token2 a p equivale a vender token1 a 1 - p
+            self.side1 = SELL if side == BUY else BUY
+            self.ticks1 = market.ticks - market.to_ticks(price)
+
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.original_size - self.size_matched)
+
+    def outcome(self) -> str:
+        return self.market.answer1 if self.token == self.market.token1 else self.market.answer2
+
+    def to_dict(self) -> Dict:
+        """Formato de /data/orders (mesmos campos lidos por update_orders)."""
+        return {
+            'id': self.id,
+            'status': 'LIVE' if self.remaining > 0 else 'MATCHED',
+            'owner': self.owner,
+            'maker_address': self.owner,
+            'market': self.market.condition_id,
+            'asset_id': self.token,
+            'side': self.side,
+            'original_size': _fmt(self.original_size),
+            'size_matched': _fmt(self.size_matched),
+            'price': _fmt(self.price),
+            'outcome': self.outcome(),
+            'created_at': self.created_at,
+            'order_type': 'GTC',
+            'associate_trades': [],
+        }
+
+
+class MatchingEngine:
+    """Estado do fake exchange: mercados, ordens, posições e saldo USDC.
+
+    Thread-safe (o REST roda em threads e o stream no event loop). Toda mutação
+    devolve a lista de eventos gerados para o canal market (`frames`) e para o
+    canal user (`user_events`); quem chama decide como publicá-los.
+    """
+
+    def __init__(self, seed: int = 42, initial_usdc: float = 10_000.0):
+        self.rng = random.Random(seed)
+        self.lock = threading.RLock()
+        self.markets: Dict[str, FakeMarket] = {}
+        self.token_index: Dict[str, FakeMarket] = {}
+        self.orders: Dict[str, RestingOrder] = {}
+        self.positions: Dict[str, Dict[str, Dict[str, float]]] = {}  # owner -> token -> {size, avgPrice}
+        self.usdc: Dict[str, float] = {}
+        self.initial_usdc = initial_usdc
+        self._ids = itertools.count(1)
+
+    # ============ Mercados ============
+
+    def add_market(self, market: FakeMarket):
+        with self.lock:
+            self.markets[market.condition_id] = market
+            self.token_index[market.token1] = market
+            if market.token2:
+                self.token_index[market.token2] = market
+
+    def generate_markets(self, count: int, mid_range: Tuple[float, float] = (0.2, 0.8)):
+        """Cria `count` mercados sintéticos com ids no formato da Polymarket."""
+        for i in range(count):
+            digest = hashlib.sha256(f'fake-market-{i}'.encode()).hexdigest()
+            market = FakeMarket(
+                condition_id='0x' + digest,
+                token1=str(int(digest[:30], 16)),
+                token2=str(int(digest[30:60], 16)),
+                question=f'Fake market #{i}',
+            )
+            market.seed(self.rng, mid=round(self.rng.uniform(*mid_range), 2))
+            self.add_market(market)
+
+    def resolve(self, asset_id: str) -> Optional[FakeMarket]:
+        """Aceita condition_id, token1 ou token2."""
+        return self.markets.get(asset_id) or self.token_index.get(asset_id)
+
+    def _next_id(self, prefix: str = '0x') -> str:
+        return f"{prefix}{next(self._ids):064x}"
+
+    # ============ Frames do canal market ============
+
+    def _level_size(self, market: FakeMarket, side1: str, ticks: int) -> float:
+        """Liquidez sintética + ordens do bot em repouso no nível."""
+        book = market.bids if side1 == BUY else market.asks
+        size = book.get(ticks, 0.0)
+        for order in self.orders.values():
+            if order.market is market and order.side1 == side1 and order.ticks1 == ticks:
+                size += order.remaining
+        return size
+
+    def book_frame(self, market: FakeMarket, token: Optional[str] = None) -> Dict:
+        """Snapshot no formato do evento 'book' (também usado por GET /book)."""
+        token = token or market.token1
+        bid_ticks = set(market.bids)
+        ask_ticks = set(market.asks)
+        for order in self.orders.values():
+            if order.market is market:
+                (bid_ticks if order.side1 == BUY else ask_ticks).add(order.ticks1)
+        bids = [(t, self._level_size(market, BUY, t)) for t in bid_ticks]
+        asks = [(t, self._level_size(market, SELL, t)) for t in ask_ticks]
+        if token != market.token1:
+            # Espelho: bids do token2 = 1 - asks do token1
+            bids, asks = ([(market.ticks - t, s) for t, s in asks],
+                          [(market.ticks - t, s) for t, s in bids])
+        # Mesma ordenação da API: melhor nível no fim da lista
+        bids.sort()
+        asks.sort(reverse=True)
+        return {
+            'event_type': 'book',
+            'market': market.condition_id,
+            'asset_id': token,
+            'timestamp': str(int(time.time() * 1000)),
+            'hash': '',
+            'bids': [{'price': _fmt(market.to_price(t)), 'size': _fmt(s)} for t, s in bids if s > 0],
+            'asks': [{'price': _fmt(market.to_price(t)), 'size': _fmt(s)} for t, s in asks if s > 0],
+        }
+
+    def _price_change(self, market: FakeMarket, changes: List[Tuple[str, int]]) -> Dict:
+        return {
+            'event_type': 'price_change',
+            'market': market.condition_id,
+            'asset_id': market.token1,
+            'timestamp': str(int(time.time() * 1000)),
+            'price_changes': [{
+                'asset_id': market.token1,
+                'side': side1,
+                'price': _fmt(market.to_price(ticks)),
+                'size': _fmt(self._level_size(market, side1, ticks)),
+            } for side1, ticks in changes],
+        }
+
+    # ============ Stream (random walk / replay) ============
+
+    def random_step(self, market: Optional[FakeMarket] = None) -> Tuple[List[Dict], List[Dict]]:
+        """Um passo do random walk: move o mid em 1 tick ou altera o tamanho de um nível."""
+        with self.lock:
+            market = market or self.rng.choice(list(self.markets.values()))
+            changes: List[Tuple[str, int]] = []
+            roll = self.rng.random()
+            bb, ba = market.best_bid(), market.best_ask()
+            if bb is None or ba is None:
+                market.seed(self.rng)
+                return [self.book_frame(market)], []
+
+            if roll < 0.15 and ba + 1 < market.ticks:
+                # Compra agressiva consome o melhor ask; bid sobe 1 tick
+                del market.asks[ba]
+                changes.append((SELL, ba))
+                if bb + 1 < market.best_ask():
+                    market.bids[bb + 1] = float(self.rng.randint(20, 2000))
+                    changes.append((BUY, bb + 1))
+                far = max(market.asks) + 1
+                if far < market.ticks:
+                    market.asks[far] = float(self.rng.randint(20, 2000))
+                    changes.append((SELL, far))
+            elif roll < 0.30 and bb - 1 > 0:
+                # Venda agressiva consome o melhor bid; ask desce 1 tick
+                del market.bids[bb]
+                changes.append((BUY, bb))
+                if ba - 1 > market.best_bid():
+                    market.asks[ba - 1] = float(self.rng.randint(20, 2000))
+                    changes.append((SELL, ba - 1))
+                far = min(market.bids) - 1
+                if far > 0:
+                    market.bids[far] = float(self.rng.randint(20, 2000))
+                    changes.append((BUY, far))
+            else:
+                side1 = self.rng.choice([BUY, SELL])
+                book = market.bids if side1 == BUY else market.asks
+                ticks = self.rng.choice(list(book))
+                book[ticks] = float(self.rng.randint(0, 2000)) or 1.0
+                changes.append((side1, ticks))
+
+            user_events = self._cross_resting(market)
+            return [self._price_change(market, changes)], user_events
+
+    def apply_frame(self, frame: Dict) -> List[Dict]:
+        """Aplica um frame gravado à liquidez sintética (modo replay)."""
+        asset = frame.get('market')
+        if not asset:
+            return []
+        with self.lock:
+            market = self.resolve(asset)
+            if market is None:
+                market = FakeMarket(asset, frame.get('asset_id') or asset)
+                self.add_market(market)
+            if frame.get('event_type') == 'book':
+                market.bids = {market.to_ticks(e['price']): float(e['size']) for e in frame.get('bids', [])}
+                market.asks = {market.to_ticks(e['price']): float(e['size']) for e in frame.get('asks', [])}
+            elif frame.get('event_type') == 'price_change':
+                for change in frame.get('price_changes') or frame.get('changes', []):
+                    book = market.bids if change['side'] == BUY else market.asks
+                    ticks = market.to_ticks(change['price'])
+                    size = float(change['size'])
+                    if size == 0:
+                        book.pop(ticks, None)
+                    else:
+                        book[ticks] = size
+            return self._cross_resting(market)
+
+    # ============ Ordens do bot ============
+
+    def place_order(self, token: str, side: str, price: float, size: float,
+                    owner: str) -> Tuple[Optional[RestingOrder], List[Dict], List[Dict], str]:
+        """Recebe uma ordem GTC. Retorna (ordem, frames, user_events, status)."""
+        with self.lock:
+            market = self.token_index.get(token)
+            if market is None:
+                return None, [], [], 'unknown token'
+            order = RestingOrder(self._next_id(), market, token, side, price, size, owner)
+            self._ensure_owner(owner)
+            user_events = [self._order_event(order, 'PLACEMENT')]
+            frames: List[Dict] = []
+
+            # Cruzar contra liquidez sintética (bot como taker)
+            book = market.asks if order.side1 == BUY else market.bids
+            crosses = (lambda t: t <= order.ticks1) if order.side1 == BUY else (lambda t: t >= order.ticks1)
+            changes = []
+            while order.remaining > 0 and book:
+                best = min(book) if order.side1 == BUY else max(book)
+                if not crosses(best):
+                    break
+                fill = min(order.remaining, book[best])
+                book[best] -= fill
+                if book[best] <= 0:
+                    del book[best]
+                changes.append((SELL if order.side1 == BUY else BUY, best))
+                fill_ticks = best if token == market.token1 else market.ticks - best
+                user_events.extend(self._fill(order, fill, market.to_price(fill_ticks), taker=True))
+
+            status = 'matched' if order.remaining <= 0 else 'live'
+            if order.remaining > 0:
+                self.orders[order.id] = order
+                changes.append((order.side1, order.ticks1))
+            if changes:
+                frames.append(self._price_change(market, changes))
+            return order, frames, user_events, status
+
+    def cancel(self, owner: Optional[str] = None, market_id: Optional[str] = None,
+               asset_id: Optional[str] = None, order_ids: Optional[List[str]] = None) -> Tuple[List[str], List[Dict], List[Dict]]:
+        """Cancela ordens por mercado/asset/id. Retorna (ids, frames, user_events)."""
+        with self.lock:
+            cancelled, frames, user_events = [], [], []
+            for order in list(self.orders.values()):
+                if owner and order.owner.lower() != owner.lower():
+                    continue
+                if market_id and order.market.condition_id != market_id:
+                    continue
+                if asset_id and order.token != str(asset_id):
+                    continue
+                if order_ids is not None and order.id not in order_ids:
+                    continue
+                del self.orders[order.id]
+                cancelled.append(order.id)
+                user_events.append(self._order_event(order, 'CANCELLATION'))
+                frames.append(self._price_change(order.market, [(order.side1, order.ticks1)]))
+            return cancelled, frames, user_events
+
+    def open_orders(self, owner: Optional[str] = None, market_id: Optional[str] = None,
+                    asset_id: Optional[str] = None) -> List[Dict]:
+        with self.lock:
+            return [o.to_dict() for o in self.orders.values()
+                    if (not owner or o.owner.lower() == owner.lower())
+                    and (not market_id or o.market.condition_id == market_id)
+                    and (not asset_id or o.token == str(asset_id))]
+
+    def _cross_resting(self, market: FakeMarket) -> List[Dict]:
+        """Executa como maker as ordens do bot que o book sintético atravessou."""
+        events = []
+        bb, ba = market.best_bid(), market.best_ask()
+        for order in list(self.orders.values()):
+            if order.market is not market:
+                continue
+            if (order.side1 == BUY and ba is not None and ba <= order.ticks1) or \
+               (order.side1 == SELL and bb is not None and bb >= order.ticks1):
+                events.extend(self._fill(order, order.remaining, order.price, taker=False))
+                del self.orders[order.id]
+        return events
+
+    # ============ Posições / eventos do canal user ============
+
+    def _ensure_owner(self, owner: str):
+        if owner not in self.usdc:
+            self.usdc[owner] = self.initial_usdc
+            self.positions[owner] = {}
+
+    def _fill(self, order: RestingOrder, size: float, price: float, taker: bool) -> List[Dict]:
+        order.size_matched += size
+        owner = order.owner
+        self._ensure_owner(owner)
+        pos = self.positions[owner].setdefault(order.token, {'size': 0.0, 'avgPrice': 0.0})
+        if order.side == BUY:
+            total = pos['size'] + size
+            pos['avgPrice'] = (pos['avgPrice'] * pos['size'] + price * size) / total if total > 0 else 0.0
+            pos['size'] = total
+            self.usdc[owner] -= price * size
+        else:
+            pos['size'] = max(0.0, pos['size'] - size)
+            self.usdc[owner] += price * size
+
+        trade_id = self._next_id('')
+        market = order.market
+        base = {
+            'event_type': 'trade',
+            'type': 'TRADE',
+            'id': trade_id,
+            'market': market.condition_id,
+            'asset_id': order.token,
+            'outcome': order.outcome(),
+            'timestamp': str(int(time.time() * 1000)),
+            'status': 'MATCHED',
+        }
+        if taker:
+            base.update({'side': order.side, 'size': _fmt(size), 'price': _fmt(price),
+                         'taker_order_id': order.id, 'maker_orders': [{
+                             'maker_address': SYNTHETIC_MAKER, 'matched_amount': _fmt(size),
+                             'price': _fmt(price), 'outcome': order.outcome(), 'asset_id': order.token,
+                         }]})
+        else:
+            # Taker sintético do lado oposto, mesmo outcome (process_user_data inverte o lado)
+            base.update({'side': SELL if order.side == BUY else BUY, 'size': _fmt(size), 'price': _fmt(price),
+                         'taker_order_id': self._next_id(), 'maker_orders': [{
+                             'maker_address': owner, 'order_id': order.id, 'matched_amount': _fmt(size),
+                             'price': _fmt(price), 'outcome': order.outcome(), 'asset_id': order.token,
+                         }]})
+        return [base, self._order_event(order, 'UPDATE')]
+
+    def _order_event(self, order: RestingOrder, event_type: str) -> Dict:
+        event = order.to_dict()
+        event.update({'event_type': 'order', 'type': event_type,
+                      'timestamp': str(int(time.time() * 1000))})
+        if event_type == 'CANCELLATION':
+            event['status'] = 'CANCELED'
+        return event
+
+    def positions_for(self, owner: str) -> List[Dict]:
+        """Formato do data-api /positions (campos lidos por update_positions)."""
+        with self.lock:
+            result = []
+            for token, pos in self.positions.get(owner, {}).items():
+                if pos['size'] <= 0:
+                    continue
+                market = self.token_index.get(token)
+                bb, ba = (market.best_bid(), market.best_ask()) if market else (None, None)
+                mid = market.to_price((bb + ba) / 2) if bb is not None and ba is not None else pos['avgPrice']
+                if market and token != market.token1:
+                    mid = round(1 - mid, 6)
+                result.append({
+                    'proxyWallet': owner,
+                    'asset': token,
+                    'conditionId': market.condition_id if market else '',
+                    'size': pos['size'],
+                    'avgPrice': pos['avgPrice'],
+                    'curPrice': mid,
+                    'currentValue': pos['size'] * mid,
+                    'outcome': market.answer1 if market and token == market.token1 else (market.answer2 if market else ''),
+                    'redeemable': False,
+                })
+            return result
+
+    def portfolio_value(self, owner: str) -> float:
+        return sum(p['currentValue'] for p in self.positions_for(owner))
+
+    def raw_position(self, owner: str, token: str) -> int:
+        """Saldo ERC1155 (6 decimais) usado pela resposta de eth_call."""
+        with self.lock:
+            for wallet, tokens in self.positions.items():
+                if wallet.lower() == owner.lower() and token in tokens:
+                    return int(tokens[token]['size'] * 1e6)
+            return 0
+
+    def raw_usdc(self, owner: str) -> int:
+        with self.lock:
+            for wallet, balance in self.usdc.items():
+                if wallet.lower() == owner.lower():
+                    return int(balance * 1e6)
+            return int(self.initial_usdc * 1e6)
@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+Fake CLOB local (REST + WebSocket) para medir latência ponta a ponta offline.
+
+Serve, a partir de um random walk ou de frames gravados:
+- canais WebSocket /ws/market e /ws/user (mesmo formato da Polymarket);
+- REST do CLOB usado pelo py_clob_client (auth, /book, /tick-size, /neg-risk,
+  /order, /data/orders, cancelamentos);
+- data-api (/positions, /value) e um JSON-RPC mínimo (eth_call balanceOf)
+  para get_usdc_balance/get_position.
+
+Apontar o bot para o fake (ver README):
+    CLOB_HOST=http://127.0.0.1:8080
+    DATA_API_HOST=http://127.0.0.1:8080
+    CLOB_WS_HOST=ws://127.0.0.1:8081
+    POLYGON_RPC_URL=http://127.0.0.1:8080/rpc
+
+Latência medida no lado do exchange (mesmo relógio monotônico do host):
+- tick_to_order: último frame publicado do mercado -> POST /order recebido
+- order_service: tempo de processamento do POST /order no fake
+Disponível em GET /stats e impresso ao encerrar.
+
+Usage:
+    python -m fake_clob.server --markets 5 --rate 200
+    python -m fake_clob.server --replay frames.jsonl --rate 1000 --loop
+    python -m fake_clob.server --markets 5 --export-markets fake_markets.csv
+"""
+import argparse
+import asyncio
+import base64
+import csv
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+import websockets
+
+from fake_clob.matching import MatchingEngine, FakeMarket, BUY, SELL
+from poly_data.feed_recorder import load_frames
+
+logger = logging.getLogger(__name__)
+
+END_CURSOR = 'LTE='
+ERC20_BALANCE_OF = '0x70a08231'
+ERC1155_BALANCE_OF = '0x00fdd58e'
+
+
+class ExchangeStats:
+    """Latências observadas pelo fake exchange (ns), com percentis como em LatencyMetrics."""
+
+    def __init__(self, buffer_size: int = 10000):
+        self.tick_to_order: deque = deque(maxlen=buffer_size)
+        self.order_service: deque = deque(maxlen=buffer_size)
+        self.frames_sent = 0
+        self.orders = 0
+        self.cancels = 0
+
+    @staticmethod
+    def _percentiles(values, percentiles=(50, 90, 99)) -> Dict[str, float]:
+        if not values:
+            return {}
+        sorted_vals = sorted(values)
+        return {f'p{p}': sorted_vals[min(int(len(sorted_vals) * p / 100), len(sorted_vals) - 1)] / 1_000_000
+                for p in percentiles}
+
+    def to_dict(self) -> Dict:
+        return {
+            'frames_sent': self.frames_sent,
+            'orders': self.orders,
+            'cancels': self.cancels,
+            'tick_to_order_ms': self._percentiles(list(self.tick_to_order)),
+            'order_service_ms': self._percentiles(list(self.order_service)),
+        }
+
+    def report(self) -> str:
+        data = self.to_dict()
+        lines = ["=" * 80, "📊 FAKE CLOB - LATÊNCIA OBSERVADA PELO EXCHANGE", "=" * 80,
+                 f"frames: {data['frames_sent']}  orders: {data['orders']}  cancels: {data['cancels']}"]
+        for name in ('tick_to_order_ms', 'order_service_ms'):
+            values = data[name]
+            lines.append(f"{name}: " + (", ".join(f"{k}={v:.2f}ms" for k, v in values.items()) or "Sem dados"))
+        lines.append("=" * 80)
+        return "\n".join(lines)
+
+
+class FakeClobServer:
+    """Servidor fake: REST em thread (ThreadingHTTPServer) + WebSocket no event loop."""
+
+    def __init__(self, engine: MatchingEngine, host: str = '127.0.0.1', http_port: int = 8080,
+                 ws_port: int = 8081, rate: float = 100.0, replay_frames: Optional[List[Dict]] = None,
+                 loop_replay: bool = False, confirm_delay_ms: int = 200):
+        self.engine = engine
+        self.host = host
+        self.http_port = http_port
+        self.ws_port = ws_port
+        self.rate = rate
+        self.replay_frames = replay_frames
+        self.loop_replay = loop_replay
+        self.confirm_delay_ms = confirm_delay_ms
+        self.stats = ExchangeStats()
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._market_clients: Dict[object, set] = {}  # websocket -> condition_ids
+        self._user_clients: set = set()
+        self._queues: Dict[object, asyncio.Queue] = {}
+        self._last_emit_ns: Dict[str, int] = {}
+        self._http: Optional[ThreadingHTTPServer] = None
+
+    # ============ Publicação ============
+
+    def publish(self, frames: List[Dict], user_events: List[Dict]):
+        """Publica eventos a partir de qualquer thread (REST ou stream)."""
+        if not frames and not user_events:
+            return
+        if self.loop is None:
+            return
+        if self._in_loop():
+            self._publish(frames, user_events)
+        else:
+            self.loop.call_soon_threadsafe(self._publish, frames, user_events)
+
+    def _in_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def _publish(self, frames: List[Dict], user_events: List[Dict]):
+        now = time.monotonic_ns()
+        for frame in frames:
+            market = frame['market']
+            self._last_emit_ns[market] = now
+            message = json.dumps(frame)
+            for ws, markets in self._market_clients.items():
+                if market in markets:
+                    self._queues[ws].put_nowait(message)
+                    self.stats.frames_sent += 1
+
+        for event in user_events:
+            message = json.dumps(event)
+            for ws in self._user_clients:
+                self._queues[ws].put_nowait(message)
+            if event.get('event_type') == 'trade' and event.get('status') == 'MATCHED':
+                confirmed = dict(event, status='CONFIRMED')
+                self.loop.call_later(self.confirm_delay_ms / 1000, self._publish, [], [confirmed])
+
+    # ============ WebSocket ============
+
+    async def _ws_handler(self, websocket, path=None):
+        path = path or getattr(websocket, 'path', None) or getattr(getattr(websocket, 'request', None), 'path', '')
+        queue: asyncio.Queue = asyncio.Queue()
+        self._queues[websocket] = queue
+        writer = asyncio.create_task(self._ws_writer(websocket, queue))
+        try:
+            async for raw in websocket:
+                try:
+                    message = json.loads(raw)
+                except json.JSONDecodeError:
+                    continue
+                if path.endswith('/ws/user'):
+                    self._user_clients.add(websocket)
+                    queue.put_nowait(json.dumps({'type': 'authenticated', 'channel': 'user'}))
+                elif path.endswith('/ws/market'):
+                    markets = self._market_clients.setdefault(websocket, set())
+                    snapshots = []
+                    for asset in message.get('assets_ids', []):
+                        market = self.engine.resolve(str(asset))
+                        if market and market.condition_id not in markets:
+                            markets.add(market.condition_id)
+                            with self.engine.lock:
+                                snapshots.append(self.engine.book_frame(market))
+                    if snapshots:
+                        queue.put_nowait(json.dumps(snapshots))
+                    logger.info(f"Cliente market inscrito em {len(markets)} mercados")
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            writer.cancel()
+            self._market_clients.pop(websocket, None)
+            self._user_clients.discard(websocket)
+            self._queues.pop(websocket, None)
+
+    async def _ws_writer(self, websocket, queue: asyncio.Queue):
+        # Uma fila por conexão preserva a ordem dos eventos
+        while True:
+            message = await queue.get()
+            await websocket.send(message)
+
+    # ============ Stream ============
+
+    async def _stream(self):
+        """Emite `rate` eventos/s (random walk ou replay) com correção de drift."""
+        if not self.rate:
+            return
+        start = time.monotonic()
+        emitted = 0
+        idx = 0
+        while True:
+            due = int((time.monotonic() - start) * self.rate)
+            while emitted < due:
+                emitted += 1
+                if self.replay_frames is not None:
+                    if idx >= len(self.replay_frames):
+                        if not self.loop_replay:
+                            logger.info("Replay concluído")
+                            return
+                        idx = 0
+                    frame = self.replay_frames[idx]
+                    idx += 1
+                    user_events = self.engine.apply_frame(frame)
+                    self._publish([frame], user_events)
+                elif self.engine.markets:
+                    frames, user_events = self.engine.random_step()
+                    self._publish(frames, user_events)
+            await asyncio.sleep(0.001)
+
+    # ============ REST ============
+
+    def handle_rest(self, method: str, path: str, query: Dict[str, str], body, headers) -> (int, object):
+        """Roteia uma requisição REST. Retorna (status, payload JSON)."""
+        engine = self.engine
+        if method == 'GET':
+            if path in ('', '/'):
+                return 200, 'OK'
+            if path == '/time':
+                return 200, int(time.time())
+            if path == '/book':
+                market = engine.resolve(query.get('token_id', ''))
+                if market is None:
+                    return 404, {'error': 'No orderbook exists for the requested token id'}
+                with engine.lock:
+                    book = engine.book_frame(market, query['token_id'])
+                book.pop('event_type', None)
+                return 200, book
+            if path == '/tick-size':
+                market = engine.resolve(query.get('token_id', ''))
+                return 200, {'minimum_tick_size': market.tick_size if market else 0.01}
+            if path == '/neg-risk':
+                return 200, {'neg_risk': False}
+            if path == '/fee-rate':
+                return 200, {'base_fee': 0}
+            if path == '/auth/derive-api-key':
+                return 200, self._api_creds(headers)
+            if path == '/data/orders':
+                orders = engine.open_orders(market_id=query.get('market'), asset_id=query.get('asset_id'))
+                if query.get('id'):
+                    orders = [o for o in orders if o['id'] == query['id']]
+                return 200, {'data': orders, 'next_cursor': END_CURSOR, 'limit': len(orders), 'count': len(orders)}
+            if path == '/positions':
+                return 200, engine.positions_for(query.get('user', ''))
+            if path == '/value':
+                user = query.get('user', '')
+                return 200, {'user': user, 'value': engine.portfolio_value(user)}
+            if path in ('/sampling-markets', '/markets'):
+                return 200, {'data': [self._market_info(m) for m in engine.markets.values()],
+                             'next_cursor': END_CURSOR, 'limit': len(engine.markets), 'count': len(engine.markets)}
+            if path == '/stats':
+                return 200, self.stats.to_dict()
+
+        elif method == 'POST':
+            if path == '/auth/api-key':
+                return 200, self._api_creds(headers)
+            if path == '/order':
+                return self._post_order(body)
+            if path == '/rpc':
+                return 200, self._json_rpc(body)
+
+        elif method == 'DELETE':
+            body = body or {}
+            if path == '/cancel-market-orders':
+                return 200, self._cancel(market_id=body.get('market') or None, asset_id=body.get('asset_id') or None)
+            if path == '/cancel-all':
+                return 200, self._cancel()
+            if path == '/order':
+                return 200, self._cancel(order_ids=[body.get('orderID')])
+            if path == '/orders':
+                return 200, self._cancel(order_ids=list(body))
+
+        return 404, {'error': f'{method} {path} não suportado pelo fake CLOB'}
+
+    @staticmethod
+    def _api_creds(headers) -> Dict:
+        address = (headers.get('POLY_ADDRESS') or 'fake').lower()
+        digest = hashlib.sha256(address.encode()).digest()
+        return {
+            'apiKey': hashlib.md5(digest).hexdigest(),
+            'secret': base64.urlsafe_b64encode(digest).decode(),
+            'passphrase': hashlib.sha1(digest).hexdigest(),
+        }
+
+    def _post_order(self, body) -> (int, Dict):
+        t_start = time.monotonic_ns()
+        order = (body or {}).get('order', {})
+        token = str(order.get('tokenId', ''))
+        side = order.get('side')
+        side = BUY if side in (BUY, 0, '0') else SELL
+        maker_amount = float(order.get('makerAmount', 0))
+        taker_amount = float(order.get('takerAmount', 0))
+        if not maker_amount or not taker_amount:
+            return 400, {'error': 'invalid order amounts'}
+        # BUY: maker entrega USDC, recebe shares; SELL: o inverso (ambos com 6 decimais)
+        if side == BUY:
+            size, price = taker_amount / 1e6, maker_amount / taker_amount
+        else:
+            size, price = maker_amount / 1e6, taker_amount / maker_amount
+
+        market = self.engine.token_index.get(token)
+        if market is not None:
+            last = self._last_emit_ns.get(market.condition_id)
+            if last:
+                self.stats.tick_to_order.append(t_start - last)
+            price = round(round(price / market.tick_size) * market.tick_size, 6)
+
+        owner = order.get('maker') or (body or {}).get('owner', '')
+        placed, frames, user_events, status = self.engine.place_order(token, side, price, size, owner)
+        if placed is None:
+            return 400, {'error': f'invalid order: {status}'}
+        self.stats.orders += 1
+        self.publish(frames, user_events)
+        self.stats.order_service.append(time.monotonic_ns() - t_start)
+        return 200, {'success': True, 'errorMsg': '', 'orderID': placed.id,
+                     'transactionsHashes': [], 'status': status}
+
+    def _cancel(self, **kwargs) -> Dict:
+        cancelled, frames, user_events = self.engine.cancel(**kwargs)
+        self.stats.cancels += len(cancelled)
+        self.publish(frames, user_events)
+        return {'canceled': cancelled, 'not_canceled': {}}
+
+    def _json_rpc(self, body) -> object:
+        if isinstance(body, list):
+            return [self._json_rpc(item) for item in body]
+        method = body.get('method')
+        params = body.get('params') or []
+        result = None
+        if method == 'eth_chainId':
+            result = hex(137)
+        elif method == 'net_version':
+            result = '137'
+        elif method == 'eth_blockNumber':
+            result = hex(int(time.time()))
+        elif method == 'eth_gasPrice':
+            result = hex(30 * 10 ** 9)
+        elif method == 'eth_call':
+            data = (params[0] or {}).get('data') or (params[0] or {}).get('input', '')
+            selector, args = data[:10], data[10:]
+            if selector == ERC20_BALANCE_OF:
+                owner = '0x' + args[24:64]
+                result = '0x' + format(self.engine.raw_usdc(owner), '064x')
+            elif selector == ERC1155_BALANCE_OF:
+                owner = '0x' + args[24:64]
+                token = str(int(args[64:128], 16))
+                result = '0x' + format(self.engine.raw_position(owner, token), '064x')
+        if result is None:
+            return {'jsonrpc': '2.0', 'id': body.get('id'),
+                    'error': {'code': -32601, 'message': f'{method} não suportado pelo fake CLOB'}}
+        return {'jsonrpc': '2.0', 'id': body.get('id'), 'result': result}
+
+    @staticmethod
+    def _market_info(market: FakeMarket) -> Dict:
+        return {
+            'condition_id': market.condition_id,
+            'question': market.question,
+            'active': True,
+            'closed': False,
+            'neg_risk': False,
+            'minimum_tick_size': market.tick_size,
+            'minimum_order_size': 5,
+            'rewards': {'min_size': 50, 'max_spread': 3.5, 'rates': [{'rewards_daily_rate': 10}]},
+            'tokens': [{'token_id': market.token1, 'outcome': market.answer1},
+                       {'token_id': market.token2, 'outcome': market.answer2}],
+        }
+
+    # ============ Ciclo de vida ============
+
+    def _start_http(self):
+        app = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive (a sessão do bot reutiliza conexões)
+
+            def _dispatch(self, method):
+                parsed = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                length = int(self.headers.get('Content-Length') or 0)
+                body = None
+                if length:
+                    try:
+                        body = json.loads(self.rfile.read(length))
+                    except json.JSONDecodeError:
+                        body = None
+                try:
+                    status, payload = app.handle_rest(method, parsed.path.rstrip('/') or '/', query, body, self.headers)
+                except Exception as e:
+                    logger.exception(f"Erro em {method} {self.path}")
+                    status, payload = 500, {'error': str(e)}
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def do_DELETE(self):
+                self._dispatch('DELETE')
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self._http = ThreadingHTTPServer((self.host, self.http_port), _Handler)
+        self._http.daemon_threads = True
+        threading.Thread(target=self._http.serve_forever, name='fake-clob-rest', daemon=True).start()
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self._start_http()
+        async with websockets.serve(self._ws_handler, self.host, self.ws_port, ping_interval=None):
+            logger.info(f"Fake CLOB: REST em http://{self.host}:{self.http_port}, "
+                        f"WS em ws://{self.host}:{self.ws_port} ({len(self.engine.markets)} mercados, {self.rate} eventos/s)")
+            try:
+                await self._stream()
+                await asyncio.Future()  # replay terminado: continua servindo REST/WS
+            finally:
+                self._http.shutdown()
+
+
+def load_markets(engine: MatchingEngine, path: str):
+    """Carrega mercados de um JSON (lista de dicts) ou CSV com condition_id/token1/token2."""
+    with open(path) as f:
+        rows = json.load(f) if path.endswith('.json') else list(csv.DictReader(f))
+    for row in rows:
+        market = FakeMarket(row['condition_id'], str(row['token1']), str(row.get('token2') or '') or None,
+                            row.get('answer1') or 'Yes', row.get('answer2') or 'No',
+                            float(row.get('tick_size') or 0.01), row.get('question') or '')
+        market.seed(engine.rng, mid=float(row.get('mid') or row.get('best_bid') or 0.5))
+        engine.add_market(market)
+
+
+def export_markets(engine: MatchingEngine, path: str):
+    """Exporta os mercados no formato de colunas da aba Selected Markets."""
+    fields = ['question', 'answer1', 'answer2', 'condition_id', 'token1', 'token2', 'tick_size', 'neg_risk']
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for market in engine.markets.values():
+            row = market.to_dict()
+            row['neg_risk'] = 'FALSE'
+            writer.writerow({k: row.get(k) for k in fields})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake CLOB local (REST + WebSocket) para testes de latência")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--http-port', type=int, default=8080)
+    parser.add_argument('--ws-port', type=int, default=8081)
+    parser.add_argument('--markets', default='5',
+                        help='Número de mercados sintéticos ou arquivo .json/.csv com condition_id/token1/token2')
+    parser.add_argument('--rate', type=float, default=100.0, help='Eventos do canal market por segundo (0 = parado)')
+    parser.add_argument('--replay', type=str, default=None, help='JSONL ou gravação do feed_recorder (substitui o random walk)')
+    parser.add_argument('--loop', action='store_true', help='Reinicia o replay ao chegar no fim')
+    parser.add_argument('--confirm-delay-ms', type=int, default=200, help='Atraso MATCHED -> CONFIRMED nos trades')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--export-markets', type=str, default=None,
+                        help='Escreve CSV com os mercados (colunas da aba Selected Markets) e continua')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    engine = MatchingEngine(seed=args.seed)
+    if args.markets.isdigit():
+        engine.generate_markets(int(args.markets))
+    else:
+        load_markets(engine, args.markets)
+
+    replay_frames = load_frames(args.replay) if args.replay else None
+    if args.export_markets:
+        export_markets(engine, args.export_markets)
+        logger.info(f"Mercados exportados para {args.export_markets}")
+
+    server = FakeClobServer(engine, args.host, args.http_port, args.ws_port, args.rate,
+                            replay_frames, args.loop, args.confirm_delay_ms)
+    try:
+        asyncio.run(server.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(server.stats.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,4 @@
 import gc  # Garbage collection
-import time  # Time functions
 import asyncio  # Asynchronous I/O
 import traceback  # Exception handling
 import logging  # Logging for debugging
@@ -31,10 +30,20 @@ from poly_data.polymarket_client import PolymarketClient
 from poly_data.data_utils import update_markets, update_positions, update_orders
 from poly_data.websocket_handlers import connect_market_websocket, connect_user_websocket
 import poly_data.global_state as global_state
-from poly_data.data_processing import remove_from_performing
-from poly_data.position_snapshot import log_position_snapshot
+from poly_data.periodic_updates import update_periodically
 from poly_data.book_state import book_state_manager  # FASE 5
 from poly_data.reconcile_task import reconcile_task  # FASE 5
+from poly_data.latency_metrics import metrics
+from poly_data.loop_monitor import loop_monitor, LOOP_MONITOR_ENABLED
+from poly_data.profiler_capture import profiler_capture
+from poly_data.memory_accounting import memory_accountant, MEMORY_ACCOUNTING_ENABLED
+from poly_data.bounded_cache import cache_stats
+from poly_data.live_volatility import live_volatility
+from poly_data.reward_index import reward_index
+from poly_data.config_provider import config_provider
+from poly_data.shard_coordinator import ShardCoordinator, SHARD_WORKERS
+from poly_data.book_export import book_export, BOOK_EXPORT_ENABLED
+from poly_data.state_journal import state_journal, STATE_JOURNAL_ENABLED
 from dotenv import load_dotenv
 from data_updater.google_utils import get_spreadsheet  # Import to access Google Sheet
 
@@ -60,47 +69,15 @@ def update_once():
     update_orders()  # Get current orders from Polymarket
     logger.info(f"Loaded {len(global_state.df)} markets from All Markets sheet")
 
-def remove_from_pending():
+def warm_start():
     """
-    Clean up stale trades that have been pending for too long (>15 seconds).
+    Resume from the state journal: positions, orders, risk state and config are already restored.
+    Only open orders are fetched before quoting (stale orders must be known to be replaced);
+    positions are verified against the exchange in the background by state_journal.verify().
     """
-    try:
-        current_time = time.time()
-        for col in list(global_state.performing.keys()):
-            for trade_id in list(global_state.performing[col]):
-                try:
-                    if current_time - global_state.performing_timestamps[col].get(trade_id, current_time) > 15:
-                        logger.info(f"Removing stale entry {trade_id} from {col} after 15 seconds")
-                        remove_from_performing(col, trade_id)
-                except:
-                    logger.error(f"Error removing trade {trade_id} from {col}: {traceback.format_exc()}")
-    except:
-        logger.error(f"Error in remove_from_pending: {traceback.format_exc()}")
-
-async def update_periodically():
-    """
-    Asynchronous function that periodically updates market data, positions, and orders.
-    - Positions and orders every 10 seconds
-    - Market data every 60 seconds (every 6 cycles)
-    - Position snapshots every 5 minutes (every 30 cycles)
-    - Stale pending trades removed each cycle
-    """
-    i = 1
-    while True:
-        await asyncio.sleep(10)  # Update every 10 seconds
-        try:
-            remove_from_pending()
-            update_positions(avgOnly=True)
-            update_orders()
-            if i % 6 == 0:  # Every 60 seconds
-                update_markets()
-            if i % 30 == 0:  # Every 5 minutes (300 seconds)
-                log_position_snapshot()
-            i += 1
-            if i > 30:
-                i = 1
-        except Exception as e:
-            logger.error(f"Error in update_periodically: {e}")
+    update_markets()  # Restored config version, no sheet read
+    update_orders()
+    logger.info(f"Warm start: {len(global_state.df)} markets from the state journal")
 
 async def main():
     """
@@ -126,10 +103,61 @@ async def main():
         logger.error(traceback.format_exc())
         return
 
+    # Event-loop lag monitor / blocking-call detector
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+        metrics.register_source('event_loop', loop_monitor.snapshot)
+
+    # Per-market memory accounting (bytes per structure, growth over time)
+    if MEMORY_ACCOUNTING_ENABLED:
+        metrics.register_source('memory', memory_accountant.snapshot)
+
+    # Bounded global caches (size, hit/miss, evictions)
+    metrics.register_source('caches', cache_stats)
+
+    # Live 3h volatility from the market feed vs the sheet value
+    metrics.register_source('live_volatility', live_volatility.snapshot)
+
+    # Maker-reward share per market from the incremental Q-score index
+    metrics.register_source('reward_index', reward_index.snapshot)
+
+    # Config versions (sheet sync in the background or local CSV hot reload)
+    metrics.register_source('config', config_provider.snapshot)
+
+    # On-demand profiling capture (SIGUSR1 / PROFILER_PORT)
+    profiler_capture.install()
+
+    # Multi-process mode: this process becomes the coordinator of SHARD_WORKERS market shards
+    if SHARD_WORKERS > 0:
+        logger.info(f"Starting shard coordinator with {SHARD_WORKERS} workers")
+        await ShardCoordinator(SHARD_WORKERS).run()
+        return
+
+    # Top-of-book export to shared memory for local scripts (poly_data/book_reader.py)
+    if BOOK_EXPORT_ENABLED:
+        try:
+            book_export.open()
+            metrics.register_source('book_export', book_export.snapshot)
+        except OSError as e:
+            logger.warning(f"Book export disabled: {e}")
+
+    # Crash-safe state journal: restore the last state instantly, then keep journaling mutations
+    warm = False
+    if STATE_JOURNAL_ENABLED:
+        try:
+            warm = state_journal.restore(global_state.client.browser_wallet)
+            state_journal.open(global_state.client.browser_wallet)
+            metrics.register_source('state_journal', state_journal.snapshot)
+        except OSError as e:
+            logger.warning(f"State journal disabled: {e}")
+
     # Initialize state and fetch initial data
     try:
         global_state.all_tokens = []
-        update_once()
+        if warm:
+            warm_start()
+        else:
+            update_once()
         logger.info(f"After initial updates: orders={global_state.orders}, positions={global_state.positions}")
     except Exception as e:
         logger.error(f"❌ Failed to load initial market data: {e}")
@@ -145,6 +173,10 @@ async def main():
 
     # Start periodic updates as an async task
     asyncio.create_task(update_periodically())
+
+    # Warm start: check restored positions against the exchange without delaying quoting
+    if warm:
+        asyncio.create_task(state_journal.verify())
     
     # FASE 5: Inicializar BookStates com snapshot inicial (HTTP - apenas 1x)
     logger.info("FASE 5: Inicializando BookStates com snapshot inicial...")
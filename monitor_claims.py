@@ -5,6 +5,10 @@ Monitor de Claims - Polymarket
 Monitora posições claimables e envia notificações quando há claims disponíveis.
 Pode rodar em background ou via cron.
 
+Em modo contínuo, o ClaimScanner (claimer_core/claim_scanner.py) mantém o
+conjunto resgatável entre verificações e só busca a atividade nova e as
+posições resgatáveis, então o intervalo pode ser de poucos segundos.
+
 Usage:
     python monitor_claims.py [--interval SECONDS] [--once] [--discord-webhook URL]
 """
@@ -16,8 +20,8 @@ import argparse
 from datetime import datetime
 from dotenv import load_dotenv
 from eth_utils import to_checksum_address
-from claimer_core.position_fetcher import fetchPositions, create_session
-from claimer_core.claim_filter import filterClaimables
+from claimer_core.claim_filter import redeemableAmount
+from claimer_core.claim_scanner import ClaimScanner
 from claimer_core.logger_config import setup_logger
 
 # Load environment variables
@@ -40,6 +44,9 @@ def send_discord_notification(webhook_url: str, message: str):
     except Exception as e:
         logger.warning(f"Falha ao enviar notificação Discord: {e}")
 
+# Scanner reutilizado entre verificações (conjunto resgatável + cache de condições resgatadas)
+_scanner = None
+
 def check_claims(webhook_url: str = None, previous_count: int = 0, previous_total: float = 0.0):
     """
     Verifica claims disponíveis e envia notificações se houver mudanças.
@@ -55,24 +62,14 @@ def check_claims(webhook_url: str = None, previous_count: int = 0, previous_tota
         
         wallet_address = to_checksum_address(wallet_address)
         
-        # Fetch positions
-        session = create_session()
-        positions = fetchPositions(wallet_address, session)
-        
-        # Filter claimables
-        claimables = filterClaimables(positions, debug=False)
-        
-        # Calculate total
-        total_amount = 0.0
-        for claimable in claimables:
-            redeemable = claimable.get('currentValue') or 0
-            if not redeemable or float(redeemable) == 0:
-                size = claimable.get('size', 0)
-                cur_price = claimable.get('curPrice', 0)
-                if size and cur_price and float(cur_price) > 0:
-                    redeemable = float(size) * float(cur_price)
-            total_amount += float(redeemable) if redeemable else 0
+        global _scanner
+        if _scanner is None or _scanner.wallet_address != wallet_address:
+            _scanner = ClaimScanner(wallet_address)
         
+        # Atualiza só o que mudou desde a última verificação
+        _scanner.scan()
+        claimables = _scanner.claimableList()
+        total_amount = _scanner.total
         count = len(claimables)
         
         # Check if there are new claims or amount changed
@@ -88,13 +85,7 @@ def check_claims(webhook_url: str = None, previous_count: int = 0, previous_tota
                 for idx, claimable in enumerate(claimables[:5], 1):  # Limitar a 5 para não ficar muito longo
                     market = claimable.get('title') or claimable.get('market', 'Unknown')
                     outcome = claimable.get('outcome', 'Unknown')
-                    redeemable = claimable.get('currentValue') or 0
-                    if not redeemable or float(redeemable) == 0:
-                        size = claimable.get('size', 0)
-                        cur_price = claimable.get('curPrice', 0)
-                        if size and cur_price and float(cur_price) > 0:
-                            redeemable = float(size) * float(cur_price)
-                    redeemable = float(redeemable) if redeemable else 0
+                    redeemable = redeemableAmount(claimable)
                     message += f"{idx}. {market[:50]}\n"
                     message += f"   Outcome: {outcome} | ${redeemable:.2f}\n"
                 
@@ -114,13 +105,7 @@ def check_claims(webhook_url: str = None, previous_count: int = 0, previous_tota
             for idx, claimable in enumerate(claimables, 1):
                 market = claimable.get('title') or claimable.get('market', 'Unknown')
                 outcome = claimable.get('outcome', 'Unknown')
-                redeemable = claimable.get('currentValue') or 0
-                if not redeemable or float(redeemable) == 0:
-                    size = claimable.get('size', 0)
-                    cur_price = claimable.get('curPrice', 0)
-                    if size and cur_price and float(cur_price) > 0:
-                        redeemable = float(size) * float(cur_price)
-                redeemable = float(redeemable) if redeemable else 0
+                redeemable = redeemableAmount(claimable)
                 logger.info(f"  [{idx}] {market}")
                 logger.info(f"       Outcome: {outcome} | ${redeemable:.2f}")
             logger.info("")
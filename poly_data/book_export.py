@@ -0,0 +1,179 @@
+"""
+Exportação dos books do bot para memória compartilhada (leitura em poly_data/book_reader.py).
+
+check_positions.py, verificar_*.py e dashboards criavam cada um o seu
+PolymarketClient e pediam books à API REST, embora o bot já os tenha.
+Aqui, a cada evento do book (data_processing), o mercado publica no seu
+slot os BOOK_EXPORT_DEPTH (padrão 10) melhores níveis de cada lado do
+book do token1 e os metadados (melhor bid/ask, mid, contagem de eventos,
+posições e ordens dos dois tokens em global_state).
+
+O arquivo (BOOK_EXPORT_PATH, padrão /dev/shm/poly_books) tem
+BOOK_EXPORT_SLOTS slots fixos (padrão 512); cada mercado recebe um slot
+na primeira publicação e o libera em discard(). A escrita usa seqlock: a
+sequência do slot fica ímpar durante a atualização e volta a par no fim,
+e o leitor repete a leitura se ela mudou. Há um único escritor por
+arquivo; no modo multiprocesso cada worker exporta o seu shard com o
+sufixo .<shard> (o BookReader abre todos).
+
+BOOK_EXPORT=false desliga a exportação.
+"""
+import logging
+import mmap
+import os
+import time
+from itertools import islice
+from typing import Dict, Optional
+
+import poly_data.global_state as global_state
+from poly_data.book_reader import (BOOK_EXPORT_PATH, MAGIC, LAYOUT_VERSION, HEADER, HEADER_SIZE, HEADER_PID,
+                                   HEADER_PID_OFFSET, HEARTBEAT, HEARTBEAT_OFFSET, SEQ, META, slot_size,
+                                   levels_struct)
+
+logger = logging.getLogger(__name__)
+
+BOOK_EXPORT_ENABLED = os.getenv('BOOK_EXPORT', 'true').lower() == 'true'
+BOOK_EXPORT_SLOTS = int(os.getenv('BOOK_EXPORT_SLOTS', '512'))
+BOOK_EXPORT_DEPTH = int(os.getenv('BOOK_EXPORT_DEPTH', '10'))
+
+_EMPTY_ORDER = {'price': 0, 'size': 0}
+
+
+class BookExporter:
+    """Escritor único de um arquivo de books compartilhado."""
+
+    def __init__(self, path: str = BOOK_EXPORT_PATH, slots: int = BOOK_EXPORT_SLOTS, depth: int = BOOK_EXPORT_DEPTH):
+        self.path = path
+        self.slots = slots
+        self.depth = depth
+        self.slot_size = slot_size(depth)
+        self.levels = levels_struct(depth)
+        self.mm: Optional[mmap.mmap] = None
+        self._slot_of: Dict[str, int] = {}
+        self._free = list(range(slots - 1, -1, -1))
+        self._tokens: Dict[str, tuple] = {}
+        self._seq = [0] * slots
+        self._events = [0] * slots
+        self._zero_levels = [0.0] * (4 * depth)
+        self.publishes = 0
+        self.full = 0
+        self.publish_ns = 0
+
+    def open(self, suffix: str = ''):
+        """Cria o arquivo (substituindo o anterior) e mapeia para escrita."""
+        path = self.path + suffix
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        size = HEADER_SIZE + self.slots * self.slot_size
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.truncate(size)
+        with open(tmp, 'r+b') as f:
+            self.mm = mmap.mmap(f.fileno(), size)
+        now = time.time_ns()
+        HEADER.pack_into(self.mm, 0, MAGIC, LAYOUT_VERSION, self.slots, self.depth, self.slot_size, now, now)
+        HEADER_PID.pack_into(self.mm, HEADER_PID_OFFSET, os.getpid())
+        os.replace(tmp, path)
+        self.path = path
+        logger.info(f"Books exportados em {path} ({self.slots} slots, {self.depth} níveis, {size // 1024} KiB)")
+
+    def configure(self, market: str, token1: str, token2: str):
+        self._tokens[market] = (str(token1), str(token2))
+
+    def _offset(self, slot: int) -> int:
+        return HEADER_SIZE + slot * self.slot_size
+
+    def _slot(self, market: str) -> Optional[int]:
+        slot = self._slot_of.get(market)
+        if slot is None:
+            if not self._free:
+                self.full += 1
+                return None
+            slot = self._slot_of[market] = self._free.pop()
+            self._events[slot] = 0
+        return slot
+
+    @staticmethod
+    def _token_state(token: str):
+        position = global_state.positions.get(token) or {}
+        orders = global_state.orders.get(token) or {}
+        buy = orders.get('buy') or _EMPTY_ORDER
+        sell = orders.get('sell') or _EMPTY_ORDER
+        return (float(position.get('size') or 0), float(position.get('avgPrice') or 0),
+                float(buy.get('price') or 0), float(buy.get('size') or 0),
+                float(sell.get('price') or 0), float(sell.get('size') or 0))
+
+    def _write(self, slot: int, meta: tuple, levels):
+        mm, offset = self.mm, self._offset(slot)
+        seq = self._seq[slot] + 1
+        SEQ.pack_into(mm, offset, seq)  # ímpar: atualização em curso
+        META.pack_into(mm, offset + SEQ.size, *meta)
+        self.levels.pack_into(mm, offset + SEQ.size + META.size, *levels)
+        self._seq[slot] = seq + 1
+        SEQ.pack_into(mm, offset, seq + 1)
+
+    def publish(self, market: str, book: Dict):
+        """Publica os melhores níveis e metadados de all_data[market] (SortedDicts bids/asks)."""
+        if self.mm is None:
+            return
+        started = time.perf_counter_ns()
+        slot = self._slot(market)
+        if slot is None:
+            return
+        depth = self.depth
+        levels = []
+        bids = book.get('bids') or {}
+        asks = book.get('asks') or {}
+        for price, size in islice(reversed(bids.items()), depth):
+            levels.append(price)
+            levels.append(size)
+        n_bids = len(levels) // 2
+        levels.extend(self._zero_levels[:2 * (depth - n_bids)])
+        for price, size in islice(asks.items(), depth):
+            levels.append(price)
+            levels.append(size)
+        n_asks = len(levels) // 2 - depth
+        levels.extend(self._zero_levels[:2 * (depth - n_asks)])
+
+        best_bid = levels[0] if n_bids else 0.0
+        best_ask = levels[2 * depth] if n_asks else 0.0
+        mid = (best_bid + best_ask) / 2 if n_bids and n_asks else 0.0
+        token1, token2 = self._tokens.get(market, ('', ''))
+        self._events[slot] += 1
+        now = time.time_ns()
+        meta = ((now, self._events[slot], market.encode(), token1.encode(), token2.encode(), best_bid, best_ask, mid)
+                + self._token_state(token1) + self._token_state(token2) + (n_bids, n_asks))
+        self._write(slot, meta, levels)
+        HEARTBEAT.pack_into(self.mm, HEARTBEAT_OFFSET, now)
+        self.publishes += 1
+        self.publish_ns += time.perf_counter_ns() - started
+
+    def discard(self, market: str):
+        """Libera o slot do mercado (leitores passam a não encontrá-lo)."""
+        self._tokens.pop(market, None)
+        slot = self._slot_of.pop(market, None)
+        if slot is None or self.mm is None:
+            return
+        meta = (time.time_ns(), 0, b'', b'', b'', 0.0, 0.0, 0.0) + (0.0,) * 12 + (0, 0)
+        self._write(slot, meta, self._zero_levels)
+        self._free.append(slot)
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+
+    def snapshot(self) -> Dict:
+        return {
+            'path': self.path if self.mm is not None else None,
+            'markets': len(self._slot_of),
+            'free_slots': len(self._free),
+            'slots_full_drops': self.full,
+            'publishes': self.publishes,
+            'avg_publish_us': round(self.publish_ns / self.publishes / 1e3, 1) if self.publishes else None,
+        }
+
+
+# Instância global
+book_export = BookExporter()
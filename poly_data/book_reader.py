@@ -0,0 +1,254 @@
+"""
+Leitura dos books publicados pelo bot em memória compartilhada.
+
+O bot (poly_data/book_export.py) publica, para cada mercado, os
+BOOK_EXPORT_DEPTH melhores níveis de cada lado do book do token1 e
+metadados (melhor bid/ask, mid, nossas posições e ordens nos dois tokens)
+num arquivo mapeado em memória (padrão /dev/shm/poly_books; no modo
+multiprocesso um arquivo por shard, com sufixo .<shard>). Scripts locais
+(check_positions.py, verificar_*.py, dashboards) leem daqui sem criar um
+PolymarketClient nem chamar a API.
+
+Layout (little-endian):
+- cabeçalho de HEADER_SIZE bytes: magic, versão do layout, slots,
+  profundidade, tamanho do slot, pid do escritor, início e heartbeat (ns)
+- slots de tamanho fixo; cada um começa com um contador de sequência
+  (seqlock): ímpar enquanto o escritor atualiza o slot, par quando estável
+
+O leitor lê a sequência, decodifica o slot direto das páginas mapeadas
+(sem cópia intermediária), relê a sequência e repete se ela mudou ou está
+ímpar. Este módulo só depende da biblioteca padrão.
+"""
+import glob
+import mmap
+import os
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+BOOK_EXPORT_PATH = os.getenv('BOOK_EXPORT_PATH', '/dev/shm/poly_books' if os.path.isdir('/dev/shm')
+                             else os.path.join('data', 'poly_books'))
+
+MAGIC = b'PBOOKS1\n'
+LAYOUT_VERSION = 1
+HEADER = struct.Struct('<8sIIIIqq')  # magic, versão, slots, profundidade, tamanho do slot, início, heartbeat
+HEADER_SIZE = 64
+HEADER_PID = struct.Struct('<I')
+HEADER_PID_OFFSET = HEADER.size
+HEARTBEAT = struct.Struct('<q')
+HEARTBEAT_OFFSET = HEADER.size - HEARTBEAT.size
+
+SEQ = struct.Struct('<Q')
+# updated_ns, eventos, mercado, token1, token2, melhor bid, melhor ask, mid,
+# por token (1 e 2): posição, preço médio, buy (preço, tamanho), sell (preço, tamanho), nº de bids, nº de asks
+META = struct.Struct('<qQ80s80s80s3d12dHH')
+KEY_SIZE = 80
+
+# Tentativas de leitura consistente antes de desistir do slot
+READ_RETRIES = 100
+
+
+def slot_size(depth: int) -> int:
+    size = SEQ.size + META.size + 4 * depth * 8
+    return (size + 7) // 8 * 8
+
+
+def levels_struct(depth: int) -> struct.Struct:
+    """bids (preço, tamanho) * depth, asks (preço, tamanho) * depth."""
+    return struct.Struct(f'<{4 * depth}d')
+
+
+def _text(raw: bytes) -> str:
+    return raw.rstrip(b'\0').decode(errors='replace')
+
+
+class BookSnapshot:
+    """Estado consistente de um mercado no instante da leitura."""
+
+    __slots__ = ('market', 'token1', 'token2', 'updated_ns', 'events', 'best_bid', 'best_ask', 'mid',
+                 'bids', 'asks', 'token1_state', 'token2_state')
+
+    def __init__(self, market, token1, token2, updated_ns, events, best_bid, best_ask, mid,
+                 bids, asks, token1_state, token2_state):
+        self.market = market
+        self.token1 = token1
+        self.token2 = token2
+        self.updated_ns = updated_ns
+        self.events = events
+        self.best_bid = best_bid
+        self.best_ask = best_ask
+        self.mid = mid
+        self.bids = bids  # [(preço, tamanho)] do melhor para o pior
+        self.asks = asks
+        self.token1_state = token1_state  # {'position', 'avgPrice', 'buy': (preço, tamanho), 'sell': (...)}
+        self.token2_state = token2_state
+
+    @property
+    def age_s(self) -> float:
+        return (time.time_ns() - self.updated_ns) / 1e9
+
+    @property
+    def spread(self) -> Optional[float]:
+        if self.best_bid is None or self.best_ask is None:
+            return None
+        return self.best_ask - self.best_bid
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _token_state(values) -> Dict:
+    position, avg_price, buy_price, buy_size, sell_price, sell_size = values
+    return {'position': position, 'avgPrice': avg_price,
+            'buy': (buy_price, buy_size), 'sell': (sell_price, sell_size)}
+
+
+class _Region:
+    """Um arquivo exportado (um escritor)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.slots, self.depth, self.slot_size, self.started_ns, _ = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            self.mm.close()
+            raise ValueError(f"{path} não é uma exportação de books compatível")
+        self.levels = levels_struct(self.depth)
+        self.index: Dict[str, int] = {}
+
+    @property
+    def pid(self) -> int:
+        return HEADER_PID.unpack_from(self.mm, HEADER_PID_OFFSET)[0]
+
+    @property
+    def heartbeat_ns(self) -> int:
+        return HEARTBEAT.unpack_from(self.mm, HEARTBEAT_OFFSET)[0]
+
+    def writer_alive(self) -> bool:
+        try:
+            os.kill(self.pid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+    def _offset(self, slot: int) -> int:
+        return HEADER_SIZE + slot * self.slot_size
+
+    def read_slot(self, slot: int) -> Optional[BookSnapshot]:
+        mm, offset = self.mm, self._offset(slot)
+        for _ in range(READ_RETRIES):
+            (seq,) = SEQ.unpack_from(mm, offset)
+            if seq & 1:
+                continue
+            meta = META.unpack_from(mm, offset + SEQ.size)
+            levels = self.levels.unpack_from(mm, offset + SEQ.size + META.size)
+            if SEQ.unpack_from(mm, offset)[0] != seq:
+                continue
+            market = _text(meta[2])
+            if not market:
+                return None
+            n_bids, n_asks = meta[-2], meta[-1]
+            half = 2 * self.depth
+            bids = [(levels[2 * i], levels[2 * i + 1]) for i in range(min(n_bids, self.depth))]
+            asks = [(levels[half + 2 * i], levels[half + 2 * i + 1]) for i in range(min(n_asks, self.depth))]
+            best_bid, best_ask, mid = meta[5], meta[6], meta[7]
+            return BookSnapshot(market, _text(meta[3]), _text(meta[4]), meta[0], meta[1],
+                                best_bid if n_bids else None, best_ask if n_asks else None,
+                                mid if n_bids and n_asks else None, bids, asks,
+                                _token_state(meta[8:14]), _token_state(meta[14:20]))
+        return None
+
+    def slot_market(self, slot: int) -> str:
+        offset = self._offset(slot) + SEQ.size + 16
+        return _text(self.mm[offset:offset + KEY_SIZE])
+
+    def refresh_index(self):
+        self.index = {}
+        for slot in range(self.slots):
+            market = self.slot_market(slot)
+            if market:
+                self.index[market] = slot
+
+    def close(self):
+        self.mm.close()
+
+
+class BookReader:
+    """Leitor dos books exportados (todos os arquivos `path` e `path.<shard>`).
+
+    Usage:
+        with BookReader() as reader:
+            book = reader.read(condition_id)
+            if book is not None and book.age_s < 60:
+                print(book.best_bid, book.best_ask, book.bids[:3])
+    """
+
+    def __init__(self, path: str = BOOK_EXPORT_PATH):
+        self.path = path
+        self.regions: List[_Region] = []
+        for candidate in sorted(set(glob.glob(path) + glob.glob(path + '.*'))):
+            if candidate.endswith('.tmp'):
+                continue
+            try:
+                self.regions.append(_Region(candidate))
+            except (OSError, ValueError, struct.error):
+                continue
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def available(self) -> bool:
+        """Há ao menos uma exportação de um escritor ainda vivo."""
+        return any(region.writer_alive() for region in self.regions)
+
+    def _locate(self, market: str) -> Optional[Tuple[_Region, int]]:
+        for region in self.regions:
+            slot = region.index.get(market)
+            if slot is not None and region.slot_market(slot) == market:
+                return region, slot
+        for region in self.regions:
+            region.refresh_index()
+            if market in region.index:
+                return region, region.index[market]
+        return None
+
+    def markets(self) -> List[str]:
+        markets = []
+        for region in self.regions:
+            region.refresh_index()
+            markets.extend(region.index)
+        return markets
+
+    def read(self, market: str) -> Optional[BookSnapshot]:
+        """Snapshot consistente do mercado (condition_id), ou None se não publicado."""
+        located = self._locate(market)
+        if located is None:
+            return None
+        region, slot = located
+        book = region.read_slot(slot)
+        return book if book is not None and book.market == market else None
+
+    def read_all(self) -> Dict[str, BookSnapshot]:
+        books = {}
+        for region in self.regions:
+            for slot in range(region.slots):
+                book = region.read_slot(slot)
+                if book is not None:
+                    books[book.market] = book
+        return books
+
+    def writers(self) -> List[Dict]:
+        now = time.time_ns()
+        return [{'path': region.path, 'pid': region.pid, 'alive': region.writer_alive(),
+                 'heartbeat_age_s': round((now - region.heartbeat_ns) / 1e9, 1)} for region in self.regions]
+
+    def close(self):
+        for region in self.regions:
+            region.close()
+        self.regions = []
@@ -10,6 +10,11 @@ from collections import OrderedDict
 from sortedcontainers import SortedDict
 import logging
 import asyncio
+import os
+from poly_data.bounded_cache import BoundedCache
+import poly_data.global_state as global_state
+
+BOOK_STATE_MAX_MARKETS = int(os.getenv('BOOK_STATE_MAX_MARKETS', '5000'))
 
 logger = logging.getLogger(__name__)
 
@@ -211,7 +216,11 @@ class BookStateManager:
     """
     
     def __init__(self):
-        self._books: Dict[str, BookState] = {}
+        # Limitado (LRU); mercados que saem da planilha são removidos em update_markets.
+        # Assets inscritos no WebSocket nunca são despejados: o book só é reconstruído
+        # com um novo snapshot, então perder um deles deixaria o mercado sem book
+        self._books: BoundedCache = BoundedCache(maxsize=BOOK_STATE_MAX_MARKETS, name='book_states',
+                                                 pinned=lambda market, book: market in global_state.subscribed_assets)
         self._lock = threading.Lock()
     
     def get_book(self, market: str) -> BookState:
@@ -220,11 +229,13 @@ class BookStateManager:
         FASE 7: Lock apenas para criar book (double-check pattern).
         """
         # FASE 7: Double-check pattern (lock apenas se necessário)
-        if market not in self._books:
+        book = self._books.get(market)
+        if book is None:
             with self._lock:
-                if market not in self._books:  # Double-check
-                    self._books[market] = BookState(market)
-        return self._books[market]
+                book = self._books.get(market)
+                if book is None:  # Double-check
+                    book = self._books[market] = BookState(market)
+        return book
     
     def get_all_books(self) -> Dict[str, BookState]:
         """Retorna todos os BookStates.
@@ -240,8 +251,7 @@ class BookStateManager:
         FASE 7: Lock apenas para remover.
         """
         with self._lock:
-            if market in self._books:
-                del self._books[market]
+            self._books.pop(market, None)
 
 # Instância global
 book_state_manager = BookStateManager()
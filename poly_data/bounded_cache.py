@@ -0,0 +1,192 @@
+"""
+Cache limitado (LRU + TTL) para o estado global do bot.
+
+Substitui os dicts de processo que crescem sem limite (timestamps por
+token, locks por mercado, caches de book/templates, BookStates). Tem a
+interface de um dict (`in`, get, [], setdefault, pop, items...), então o
+código que usa essas estruturas não muda:
+
+- maxsize: ao inserir além do limite, remove o menos usado recentemente
+- ttl: entradas não escritas há mais de `ttl` segundos expiram (na leitura
+  e em purge_expired)
+- pinned: predicado (chave, valor) -> bool; entradas fixadas não são
+  removidas por LRU/TTL (ex: asyncio.Lock em uso)
+
+Contadores de hit/miss/eviction por cache. Caches criados com `name` são
+registrados e expostos em LatencyMetrics como fonte 'caches' (cache_stats).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, MutableMapping, Optional
+
+# Limites padrão do estado por mercado/token. O TTL precisa ser maior que as
+# janelas de rate limit que leem esses timestamps (5s, 30s, 300s).
+STATE_CACHE_MAXSIZE = int(os.getenv('STATE_CACHE_MAXSIZE', '10000'))
+STATE_CACHE_TTL = float(os.getenv('STATE_CACHE_TTL', '3600'))
+
+_MISSING = object()
+
+# Caches nomeados (para relatório)
+_registry: Dict[str, 'BoundedCache'] = {}
+
+
+class BoundedCache(MutableMapping):
+    """Dict com limite de tamanho (LRU) e expiração (TTL) opcionais."""
+
+    def __init__(self, maxsize: Optional[int] = None, ttl: Optional[float] = None,
+                 name: Optional[str] = None, pinned: Optional[Callable[[Any, Any], bool]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.pinned = pinned
+        self._data: OrderedDict = OrderedDict()  # key -> (value, written_at)
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        if name:
+            _registry[name] = self
+
+    # ============ Interface de dict ============
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            if self.maxsize is not None and len(self._data) > self.maxsize:
+                self._evict_lru()
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False
+            if self._expired(key, entry):
+                del self._data[key]
+                self.expirations += 1
+                return False
+            return True
+
+    def __iter__(self) -> Iterator:
+        with self._lock:
+            return iter(list(self._data))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"BoundedCache({dict(self.items())!r})"
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def items(self):
+        with self._lock:
+            return [(k, v) for k, (v, _) in self._data.items()]
+
+    def values(self):
+        with self._lock:
+            return [v for v, _ in self._data.values()]
+
+    def copy(self) -> Dict:
+        """Cópia rasa como dict comum."""
+        return dict(self.items())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    # ============ Internos ============
+
+    def _expired(self, key, entry) -> bool:
+        if self.ttl is None or time.monotonic() - entry[1] <= self.ttl:
+            return False
+        return not (self.pinned and self.pinned(key, entry[0]))
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            if self._expired(key, entry):
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return _MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _evict_lru(self):
+        """Remove as entradas mais antigas (não fixadas) até caber em maxsize."""
+        excess = len(self._data) - self.maxsize
+        for key in list(self._data):
+            if excess <= 0:
+                break
+            value = self._data[key][0]
+            if self.pinned and self.pinned(key, value):
+                continue
+            del self._data[key]
+            self.evictions += 1
+            excess -= 1
+
+    # ============ Manutenção ============
+
+    def purge_expired(self) -> int:
+        """Remove todas as entradas expiradas. Retorna quantas foram removidas."""
+        if self.ttl is None:
+            return 0
+        removed = 0
+        with self._lock:
+            for key, entry in list(self._data.items()):
+                if self._expired(key, entry):
+                    del self._data[key]
+                    removed += 1
+            self.expirations += removed
+        return removed
+
+    def discard_where(self, predicate: Callable[[Any], bool]) -> int:
+        """Remove entradas cuja chave satisfaz `predicate` (ignora `pinned`). Retorna quantas."""
+        with self._lock:
+            keys = [k for k in self._data if predicate(k)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl_s': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+def cache_stats() -> Dict[str, Dict]:
+    """Fonte de métricas (registrada em LatencyMetrics como 'caches')."""
+    return {name: cache.stats() for name, cache in list(_registry.items())}
+
+
+def purge_all_expired() -> int:
+    """Roda purge_expired em todos os caches nomeados."""
+    return sum(cache.purge_expired() for cache in list(_registry.values()))
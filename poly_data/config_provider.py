@@ -0,0 +1,254 @@
+"""
+Fonte de configuração do bot (mercados + hiperparâmetros) com versões.
+
+Antes, update_markets chamava get_sheet_df a cada 60s no event loop:
+credenciais relidas, gspread reautorizado, planilha reaberta, headers
+conferidos (com time.sleep(2)) e três abas baixadas, mesmo sem mudança.
+
+Agora o bot consulta config_provider.poll(), que só devolve algo quando a
+configuração mudou (ConfigSnapshot com versão e diff por mercado). Sem
+mudança, poll() não faz rede nem reconstrói o DataFrame. Backends
+(CONFIG_SOURCE):
+
+- 'sheets' (padrão): thread de fundo abre a planilha uma vez e sincroniza a
+  cada CONFIG_SYNC_INTERVAL_S (padrão 60s); só publica snapshot novo quando
+  o conteúdo das abas muda (hash)
+- 'local': diretório CONFIG_DIR (padrão config/) com selected_markets.csv,
+  all_markets.csv e hyperparameters.csv (mesmas colunas das abas); hot
+  reload por mtime/tamanho dos arquivos, conferido em cada poll()
+
+CONFIG_MIRROR_DIR (opcional) faz o backend 'sheets' gravar cada versão
+nesse diretório no formato do backend 'local' (cópia para edição/offline).
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from poly_data.utils import build_config
+
+logger = logging.getLogger(__name__)
+
+CONFIG_SOURCE = os.getenv('CONFIG_SOURCE', 'sheets').lower()
+CONFIG_DIR = os.getenv('CONFIG_DIR', 'config')
+CONFIG_SYNC_INTERVAL_S = float(os.getenv('CONFIG_SYNC_INTERVAL_S', '60'))
+CONFIG_MIRROR_DIR = os.getenv('CONFIG_MIRROR_DIR', '')
+
+TABLE_FILES = {
+    'selected': 'selected_markets.csv',
+    'all': 'all_markets.csv',
+    'hyper': 'hyperparameters.csv',
+}
+
+
+def _tables_hash(tables: Dict[str, pd.DataFrame]) -> str:
+    digest = hashlib.sha1()
+    for name in sorted(tables):
+        digest.update(name.encode())
+        digest.update(tables[name].to_csv(index=False).encode())
+    return digest.hexdigest()
+
+
+def _market_rows(df: pd.DataFrame) -> Dict[str, Tuple]:
+    if df is None or df.empty or 'condition_id' not in df.columns:
+        return {}
+    return {str(row['condition_id']): tuple(str(v) for v in row.values)
+            for _, row in df.iterrows() if row['condition_id']}
+
+
+class ConfigSnapshot:
+    """Versão publicada da configuração + diff em relação à anterior."""
+
+    def __init__(self, version: int, content_hash: str, df: pd.DataFrame, params: Dict,
+                 previous: Optional['ConfigSnapshot'] = None):
+        self.version = version
+        self.content_hash = content_hash
+        self.df = df
+        self.params = params
+        self.created_at = time.time()
+        old = _market_rows(previous.df) if previous else {}
+        new = _market_rows(df)
+        self.added = [cid for cid in new if cid not in old]
+        self.removed = [cid for cid in old if cid not in new]
+        self.changed = [cid for cid in new if cid in old and new[cid] != old[cid]]
+        self.params_changed = previous is None or previous.params != params
+
+    def summary(self) -> str:
+        return (f"v{self.version}: {len(self.df)} mercados (+{len(self.added)} -{len(self.removed)} "
+                f"~{len(self.changed)}), params {'alterados' if self.params_changed else 'iguais'}")
+
+
+class LocalConfigSource:
+    """Backend 'local': CSVs em um diretório, recarregados quando mtime/tamanho mudam."""
+
+    def __init__(self, directory: str = CONFIG_DIR):
+        self.directory = directory
+        self._stamp = None
+
+    def _paths(self) -> Dict[str, str]:
+        return {name: os.path.join(self.directory, filename) for name, filename in TABLE_FILES.items()}
+
+    def _current_stamp(self):
+        stamp = []
+        for path in self._paths().values():
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def start(self):
+        pass
+
+    def fetch(self, force: bool = False) -> Optional[Dict[str, pd.DataFrame]]:
+        """Tabelas se algum arquivo mudou desde a última leitura (ou force), senão None."""
+        stamp = self._current_stamp()
+        if not force and stamp == self._stamp:
+            return None
+        self._stamp = stamp
+        tables = {}
+        for name, path in self._paths().items():
+            try:
+                tables[name] = pd.read_csv(path, keep_default_na=False)
+            except (FileNotFoundError, pd.errors.EmptyDataError):
+                tables[name] = pd.DataFrame()
+        return tables
+
+
+class SheetsConfigSource:
+    """Backend 'sheets': sincroniza as abas em uma thread de fundo, fora do event loop."""
+
+    def __init__(self, interval_s: float = CONFIG_SYNC_INTERVAL_S):
+        self.interval_s = interval_s
+        self._sheet = None
+        self._pending: Optional[Dict[str, pd.DataFrame]] = None
+        self._last_hash: Optional[str] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.syncs = 0
+        self.errors = 0
+
+    def _sync_once(self):
+        from poly_data.utils import open_sheet, fetch_sheet_tables
+        if self._sheet is None:
+            self._sheet = open_sheet()
+        df_selected, df_all, df_hyper = fetch_sheet_tables(self._sheet)
+        tables = {'selected': df_selected, 'all': df_all, 'hyper': df_hyper}
+        self.syncs += 1
+        # Hash calculado aqui (fora do event loop); só publica se o conteúdo mudou
+        content_hash = _tables_hash(tables)
+        if content_hash != self._last_hash:
+            self._last_hash = content_hash
+            with self._lock:
+                self._pending = tables
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval_s)
+            try:
+                self._sync_once()
+            except Exception as e:
+                self.errors += 1
+                # Reabre a planilha na próxima tentativa (token expirado, rede...)
+                self._sheet = None
+                logger.error(f"Erro ao sincronizar configuração da planilha: {e}")
+
+    def start(self):
+        """Primeira leitura síncrona (o bot não inicia sem configuração), depois em fundo."""
+        if self._thread is None:
+            self._sync_once()
+            self._thread = threading.Thread(target=self._run, name='config-sync', daemon=True)
+            self._thread.start()
+
+    def fetch(self, force: bool = False) -> Optional[Dict[str, pd.DataFrame]]:
+        """Última leitura publicada pela thread de fundo e ainda não consumida, senão None."""
+        with self._lock:
+            tables, self._pending = self._pending, None
+        return tables
+
+
+class ConfigProvider:
+    """Publica snapshots versionados; poll() devolve None quando nada mudou."""
+
+    def __init__(self, source=None, mirror_dir: str = CONFIG_MIRROR_DIR):
+        if source is None:
+            source = LocalConfigSource() if CONFIG_SOURCE == 'local' else SheetsConfigSource()
+        self.source = source
+        self.mirror_dir = mirror_dir
+        self.current: Optional[ConfigSnapshot] = None
+        self._started = False
+        self._restored: Optional[ConfigSnapshot] = None
+
+    def restore(self, version: int, content_hash: str, df: pd.DataFrame, params: Dict):
+        """Versão salva no journal de estado (reinício a quente).
+
+        O próximo poll() a devolve sem esperar a fonte; a fonte inicia em
+        segundo plano e só publica se o conteúdo tiver mudado.
+        """
+        self.current = self._restored = ConfigSnapshot(version, content_hash, df, params)
+
+    def poll(self) -> Optional[ConfigSnapshot]:
+        """Snapshot novo se a configuração mudou desde o último poll, senão None.
+
+        A primeira chamada bloqueia até ter a configuração inicial (exceto
+        depois de restore()).
+        """
+        if self._restored is not None:
+            restored, self._restored = self._restored, None
+            self._started = True
+            threading.Thread(target=self._start_in_background, name='config-start', daemon=True).start()
+            return restored
+        if not self._started:
+            self.source.start()
+            self._started = True
+        tables = self.source.fetch(force=self.current is None)
+        if tables is None:
+            return None
+        content_hash = _tables_hash(tables)
+        if self.current is not None and content_hash == self.current.content_hash:
+            return None
+        df, params = build_config(tables['selected'], tables['all'], tables['hyper'])
+        version = self.current.version + 1 if self.current else 1
+        self.current = ConfigSnapshot(version, content_hash, df, params, previous=self.current)
+        logger.info(f"Nova configuração {self.current.summary()}")
+        if self.mirror_dir:
+            self._mirror(tables)
+        return self.current
+
+    def _start_in_background(self):
+        try:
+            self.source.start()
+        except Exception as e:
+            # O próximo poll() tenta de novo (bloqueando, como na inicialização a frio)
+            self._started = False
+            logger.error(f"Erro ao iniciar a fonte de configuração: {e}")
+
+    def _mirror(self, tables: Dict[str, pd.DataFrame]):
+        try:
+            os.makedirs(self.mirror_dir, exist_ok=True)
+            for name, filename in TABLE_FILES.items():
+                path = os.path.join(self.mirror_dir, filename)
+                tables[name].to_csv(path + '.tmp', index=False)
+                os.replace(path + '.tmp', path)
+        except Exception as e:
+            logger.warning(f"Falha ao espelhar configuração em {self.mirror_dir}: {e}")
+
+    def snapshot(self) -> Dict:
+        current = self.current
+        return {
+            'source': type(self.source).__name__,
+            'version': current.version if current else None,
+            'markets': len(current.df) if current else 0,
+            'age_s': round(time.time() - current.created_at, 1) if current else None,
+            'syncs': getattr(self.source, 'syncs', None),
+            'errors': getattr(self.source, 'errors', None),
+        }
+
+
+# Instância global
+config_provider = ConfigProvider()
@@ -11,19 +11,22 @@ except ImportError:
     book_cython = None
     payload_builder_cython = None
 
+def compute_spread_py(bids_list, asks_list):
+    """Fallback Python puro de compute_spread_fast (também usado nos benchmarks)."""
+    if not bids_list or not asks_list:
+        return (0.0, 0.0, 0.0)
+    
+    best_bid = max(bids_list, key=lambda x: x[0])[0] if bids_list else 0.0
+    best_ask = min(asks_list, key=lambda x: x[0])[0] if asks_list else 0.0
+    spread = best_ask - best_bid if best_ask > 0 and best_bid > 0 else 0.0
+    return (best_bid, best_ask, spread)
+
 def compute_spread_fast(bids_list, asks_list):
     """Calcula spread usando Cython se disponível, senão usa Python puro."""
     if CYTHON_AVAILABLE:
         return book_cython.compute_spread_fast(bids_list, asks_list)
     else:
-        # Fallback Python puro
-        if not bids_list or not asks_list:
-            return (0.0, 0.0, 0.0)
-        
-        best_bid = max(bids_list, key=lambda x: x[0])[0] if bids_list else 0.0
-        best_ask = min(asks_list, key=lambda x: x[0])[0] if asks_list else 0.0
-        spread = best_ask - best_bid if best_ask > 0 and best_bid > 0 else 0.0
-        return (best_bid, best_ask, spread)
+        return compute_spread_py(bids_list, asks_list)
 
 def compute_quote_fast(price, size, best_bid, best_ask, side):
     """Calcula quote usando Cython se disponível, senão usa Python puro."""
@@ -49,18 +52,21 @@ def compute_quote_fast(price, size, best_bid, best_ask, side):
         
         return (price, size, is_maker)
 
+def build_order_payload_py(market_id, action, price, size, price_scale=1000):
+    """Fallback Python puro de build_order_payload_fast (também usado nos benchmarks)."""
+    price_int = int(price * price_scale)
+    size_int = int(size)
+    return {
+        'token_id': market_id,
+        'price': price_int,
+        'size': size_int,
+        'side': action
+    }
+
 def build_order_payload_fast(market_id, action, price, size, price_scale=1000):
     """Constrói payload usando Cython se disponível, senão usa Python puro."""
     if CYTHON_AVAILABLE:
         return payload_builder_cython.build_order_payload_fast(market_id, action, price, size, price_scale)
     else:
-        # Fallback Python puro
-        price_int = int(price * price_scale)
-        size_int = int(size)
-        return {
-            'token_id': market_id,
-            'price': price_int,
-            'size': size_int,
-            'side': action
-        }
+        return build_order_payload_py(market_id, action, price, size, price_scale)
 
@@ -8,6 +8,10 @@ import time
 from trading import perform_trade
 from poly_data.data_utils import set_position, set_order, update_positions
 from poly_data.book_state import book_state_manager  # FASE 5
+from poly_data.profiler_capture import profiler_capture
+from poly_data.live_volatility import live_volatility
+from poly_data.reward_index import reward_index
+from poly_data.book_export import book_export
 
 # FASE 8: Cython para cálculos otimizados
 try:
@@ -87,6 +91,7 @@ def process_price_change(asset, side, price_level, new_size):
             del book[price_level]
     else:
         book[price_level] = new_size
+    reward_index.on_level(asset, side, price_level, new_size)
     
     # FASE 5: Atualizar BookState (WebSocket-first)
     try:
@@ -104,6 +109,7 @@ def process_price_change(asset, side, price_level, new_size):
         logger.error(f"Erro ao atualizar BookState (price_change) para {asset}: {e}")
 
 
+@profiler_capture.track('process_data')
 async def process_data(json_datas, trade=True):
     """Process WebSocket data, handling both single dict and list of dicts."""
     # Ensure json_datas is a list
@@ -149,6 +155,9 @@ async def process_data(json_datas, trade=True):
                 asks_count = len(json_data.get('asks', []))
                 logger.info(f"   Book has {bids_count} bids and {asks_count} asks")
                 process_book_data(asset, json_data)
+                live_volatility.on_book(asset, global_state.all_data[asset])
+                reward_index.on_book(asset, global_state.all_data[asset])
+                book_export.publish(asset, global_state.all_data[asset])
                 if trade:
                     # Always trade on book snapshot (initial data)
                     logger.info(f"🚀 Triggering perform_trade for market: {asset} (book snapshot)")
@@ -166,6 +175,9 @@ async def process_data(json_datas, trade=True):
                     price_level = float(data['price'])
                     new_size = float(data['size'])
                     process_price_change(asset, side, price_level, new_size)
+                live_volatility.on_book(asset, global_state.all_data[asset])
+                reward_index.on_commit(asset)
+                book_export.publish(asset, global_state.all_data[asset])
 
                 # Rate limit trading on price changes to reduce order churn
                 if trade:
@@ -328,6 +340,8 @@ async def process_user_data(json_data):
                     f"ORDER EVENT FOR: {market}, STATUS: {row.get('status')}, TYPE: {row.get('type')}, SIDE: {side}, ORIGINAL SIZE: {row.get('original_size')}, SIZE MATCHED: {row.get('size_matched')}")
                 set_order(token, side, float(row.get('original_size', 0)) - float(row.get('size_matched', 0)),
                           row.get('price', 0))
+                # Our share changed: close the interval at the old rate
+                reward_index.on_commit(market)
                 await asyncio.create_task(perform_trade(market))
             else:
                 logger.warning(f"Unhandled user event_type: {row.get('event_type')}")
@@ -1,12 +1,22 @@
 import poly_data.global_state as global_state
 import poly_data.global_state as global_state
-from poly_data.utils import get_sheet_df
+from poly_data.config_provider import config_provider
+from poly_data.book_state import book_state_manager
+from poly_data.latency_metrics import metrics
+from poly_data.payload_template import discard_templates
+from poly_data.live_volatility import live_volatility
+from poly_data.reward_index import reward_index
+from poly_data.book_export import book_export
+from poly_data.state_journal import state_journal
+import poly_data.reward_tracker as reward_tracker
+import sys
 import time
 import pandas as pd
 
 #sth here seems to be removing the position
-def update_positions(avgOnly=False):
-    pos_df = global_state.client.get_all_positions()
+def update_positions(avgOnly=False, pos_df=None):
+    if pos_df is None:
+        pos_df = global_state.client.get_all_positions()
 
     for idx, row in pos_df.iterrows():
         asset = str(row['asset'])
@@ -44,6 +54,8 @@ def update_positions(avgOnly=False):
     
         global_state.positions[asset] = position
 
+    state_journal.all_positions()
+
 def get_position(token):
     token = str(token)
     if token in global_state.positions:
@@ -87,6 +99,7 @@ def set_position(token, side, size, price, source='websocket'):
     else:
         global_state.positions[token] = {'size': size, 'avgPrice': price}
 
+    state_journal.position(token)
     print(f"Updated position from {source}, set to ", global_state.positions[token])
 
 def update_orders():
@@ -119,6 +132,8 @@ def update_orders():
                             orders[str(token)][type]['size'] = float(curr.iloc[0]['original_size'] - curr.iloc[0]['size_matched'])
 
     global_state.orders = orders
+    state_journal.all_orders()
+    reward_index.on_orders()
 
 def get_order(token):
     token = str(token)
@@ -142,11 +157,79 @@ def set_order(token, side, size, price):
     curr[side]['price'] = float(price)
 
     global_state.orders[str(token)] = curr
+    state_journal.order(token)
     print("Updated order, set to ", curr)
 
 
+def get_market_ids(row):
+    """Return (token1, token2, condition_id) for a sheet row, or None if any is missing."""
+    ids = []
+    # Handle merged columns (may have _x or _y suffix, or be in Selected Markets directly)
+    for name in ['token1', 'token2', 'condition_id']:
+        value = None
+        for col in [name, f'{name}_x', f'{name}_y']:
+            if col in row and pd.notna(row[col]):
+                value = str(row[col])
+                break
+        if not value:
+            return None
+        ids.append(value)
+    return tuple(ids)
+
+def get_loaded_markets(df):
+    """Map condition_id -> (token1, token2) for every valid row of a markets DataFrame."""
+    markets = {}
+    if isinstance(df, pd.DataFrame) and not df.empty:
+        for _, row in df.iterrows():
+            ids = get_market_ids(row)
+            if ids:
+                markets[ids[2]] = (ids[0], ids[1])
+    return markets
+
+def purge_market_state(condition_id, tokens):
+    """Drop the per-market state of a market that left the sheet.
+
+    Positions, open orders and trades still in flight are kept.
+    """
+    keys = (condition_id,) + tuple(tokens)
+    for key in keys:
+        global_state.all_data.pop(key, None)
+        global_state.subscribed_assets.discard(key)
+        global_state.last_trade_action_time.pop(key, None)
+        global_state.last_trade_update.pop(key, None)
+        reward_tracker._last_snapshot_time.pop(key, None)
+        book_state_manager.remove_book(key)
+        metrics.remove_market(key)
+        live_volatility.discard(key)
+        reward_index.discard(key)
+        book_export.discard(key)
+        discard_templates(key)
+        if global_state.client is not None:
+            global_state.client._order_book_cache.pop(key, None)
+
+    trading = sys.modules.get('trading')
+    if trading is not None:
+        lock = trading.market_locks.get(condition_id)
+        if lock is not None and not lock.locked():
+            trading.market_locks.pop(condition_id, None)
+
+    for token in tokens:
+        if token in global_state.all_tokens:
+            global_state.all_tokens.remove(token)
+        global_state.REVERSE_TOKENS.pop(token, None)
+        for col in [f"{token}_buy", f"{token}_sell"]:
+            if not global_state.performing.get(col):
+                global_state.performing.pop(col, None)
+                global_state.performing_timestamps.pop(col, None)
+
 def update_markets():
-    received_df, received_params = get_sheet_df()
+    # Nothing to do unless the config source published a new version
+    snapshot = config_provider.poll()
+    if snapshot is None:
+        return
+    print(f"Applying config {snapshot.summary()}")
+    previous_markets = get_loaded_markets(global_state.df)
+    received_df, received_params = snapshot.df, snapshot.params
     # Ensure global_state.df is a DataFrame
     if not isinstance(global_state.df, pd.DataFrame):
         global_state.df = pd.DataFrame(columns=['question', 'token1', 'token2', 'condition_id'])
@@ -162,34 +245,20 @@ def update_markets():
     # Process markets if not empty
     if not global_state.df.empty:
         for _, row in global_state.df.iterrows():
-            # Handle merged columns (may have _x or _y suffix, or be in Selected Markets directly)
-            token1 = None
-            token2 = None
-            condition_id = None
-            
-            # Try different possible column names
-            for col in ['token1', 'token1_x', 'token1_y']:
-                if col in row and pd.notna(row[col]):
-                    token1 = str(row[col])
-                    break
-            
-            for col in ['token2', 'token2_x', 'token2_y']:
-                if col in row and pd.notna(row[col]):
-                    token2 = str(row[col])
-                    break
-                    
-            for col in ['condition_id', 'condition_id_x', 'condition_id_y']:
-                if col in row and pd.notna(row[col]):
-                    condition_id = str(row[col])
-                    break
+            ids = get_market_ids(row)
             
             # Skip if missing required fields
-            if not token1 or not token2 or not condition_id:
+            if not ids:
                 print(f"Warning: Skipping market {row.get('question', 'Unknown')} - missing token1, token2, or condition_id")
                 continue
+            token1, token2, condition_id = ids
                 
             if token1 not in global_state.all_tokens:
                 global_state.all_tokens.append(token1)
+            live_volatility.seed(condition_id, token1)
+            reward_index.configure(condition_id, token1, token2, row.get('max_spread'),
+                                   row.get('rewards_daily_rate'), row.get('min_size'))
+            book_export.configure(condition_id, token1, token2)
             # Add tokens AND condition_id to subscribed_assets for trading
             # WebSocket subscriptions use token IDs but data comes with condition_id as market field
             global_state.subscribed_assets.add(token1)
@@ -205,4 +274,14 @@ def update_markets():
                     global_state.performing[col2] = set()
         print(f"Loaded {len(global_state.subscribed_assets)} subscribed assets for trading: {global_state.subscribed_assets}")
     else:
-        print("No markets to process (empty DataFrame).")
\ No newline at end of file
+        print("No markets to process (empty DataFrame).")
+    state_journal.config_applied(snapshot)
+
+    # Purge state of markets that left the sheet so per-market structures stay bounded.
+    # An empty sheet is more likely a failed read than every market being removed.
+    current_markets = get_loaded_markets(global_state.df)
+    dropped = [cid for cid in previous_markets if cid not in current_markets] if current_markets else []
+    for condition_id in dropped:
+        purge_market_state(condition_id, previous_markets[condition_id])
+    if dropped:
+        print(f"Purged state for {len(dropped)} markets removed from the sheet")
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""
+Gravador do feed bruto do canal market (append-only, gzip, segmentos rotativos).
+
+Cada linha é `<monotonic_ns>\\t<frame bruto>` com o instante de recebimento.
+A primeira linha de cada segmento é um âncora `#\\t<monotonic_ns>\\t<time_ns>`
+para converter para horário de parede. O hot path só faz um put_nowait numa
+fila; compressão e escrita ficam numa thread dedicada. Segmentos em escrita
+têm sufixo `.part` e são renomeados ao rotacionar (arquivos finais são imutáveis).
+
+Habilitar com FEED_RECORD_DIR=feed_records/ (opcional: FEED_RECORD_SEGMENT_MB,
+FEED_RECORD_SEGMENT_S). Para reproduzir: replay_feed.py.
+"""
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+FEED_RECORD_DIR = os.getenv('FEED_RECORD_DIR', '')
+FEED_RECORD_SEGMENT_MB = int(os.getenv('FEED_RECORD_SEGMENT_MB', '64'))  # bytes descomprimidos por segmento
+FEED_RECORD_SEGMENT_S = int(os.getenv('FEED_RECORD_SEGMENT_S', '3600'))
+FEED_RECORD_FLUSH_S = 1.0  # sync flush do gzip (perda máxima em crash)
+
+SEGMENT_GLOB = 'feed-*.frames.gz'
+
+
+class FeedRecorder:
+    """Grava frames brutos em segmentos gzip numa thread de escrita."""
+
+    def __init__(self, directory: str, segment_bytes: int = FEED_RECORD_SEGMENT_MB * 1024 * 1024,
+                 segment_seconds: int = FEED_RECORD_SEGMENT_S, max_queue: int = 100_000):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.recorded = 0
+        self.dropped = 0
+        self.segments = 0
+
+    def record(self, raw: Union[str, bytes], recv_ns: Optional[int] = None):
+        """Enfileira um frame (não bloqueia; descarta se a fila estiver cheia)."""
+        if recv_ns is None:
+            recv_ns = time.monotonic_ns()
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait((recv_ns, raw))
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name='feed-recorder', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+            logger.info(f"📼 Feed recorder gravando em {self.directory}")
+
+    def stop(self, timeout: float = 5.0):
+        """Drena a fila e fecha o segmento atual."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _open_segment(self) -> Tuple[gzip.GzipFile, str]:
+        name = f"feed-{time.strftime('%Y%m%d-%H%M%S')}-{self.segments:04d}.frames.gz"
+        path = os.path.join(self.directory, name)
+        self.segments += 1
+        # compresslevel=1: CPU mínima na thread de escrita
+        f = gzip.open(path + '.part', 'wb', compresslevel=1)
+        f.write(f"#\t{time.monotonic_ns()}\t{time.time_ns()}\n".encode())
+        return f, path
+
+    @staticmethod
+    def _close_segment(f: gzip.GzipFile, path: str):
+        f.close()
+        os.replace(path + '.part', path)
+
+    def _run(self):
+        f, path = self._open_segment()
+        written = 0
+        opened_at = time.monotonic()
+        last_flush = opened_at
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=FEED_RECORD_FLUSH_S)
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    break
+                if item:
+                    recv_ns, raw = item
+                    if isinstance(raw, str):
+                        raw = raw.encode()
+                    line = b'%d\t%s\n' % (recv_ns, raw.replace(b'\n', b' '))
+                    f.write(line)
+                    written += len(line)
+                    self.recorded += 1
+
+                now = time.monotonic()
+                if written >= self.segment_bytes or now - opened_at >= self.segment_seconds:
+                    self._close_segment(f, path)
+                    f, path = self._open_segment()
+                    written, opened_at = 0, now
+                elif now - last_flush >= FEED_RECORD_FLUSH_S:
+                    f.flush(zlib.Z_SYNC_FLUSH)
+                    last_flush = now
+        except Exception as e:
+            logger.error(f"Erro no feed recorder: {e}")
+        finally:
+            self._close_segment(f, path)
+            logger.info(f"📼 Feed recorder encerrado: {self.recorded} frames, {self.dropped} descartados")
+
+
+def list_segments(path: str) -> List[str]:
+    """Segmentos de uma gravação (diretório ou arquivo), em ordem de gravação."""
+    if os.path.isdir(path):
+        files = glob.glob(os.path.join(path, SEGMENT_GLOB)) + glob.glob(os.path.join(path, SEGMENT_GLOB + '.part'))
+        return sorted(files)
+    return [path]
+
+
+def iter_records(path: str) -> Iterator[Tuple[int, str]]:
+    """Itera (recv_ns, frame bruto) de todos os segmentos.
+
+    Tolera segmentos `.part` truncados (crash durante a gravação).
+    """
+    for segment in list_segments(path):
+        try:
+            with gzip.open(segment, 'rt') as f:
+                for line in f:
+                    if line.startswith('#'):
+                        continue
+                    ts, _, raw = line.rstrip('\n').partition('\t')
+                    if raw:
+                        yield int(ts), raw
+        except (EOFError, OSError) as e:
+            logger.warning(f"Segmento truncado {segment}: {e}")
+
+
+def iter_frames(path: str) -> Iterator[Tuple[int, List[Dict]]]:
+    """Itera (recv_ns, lista de eventos) decodificando cada frame bruto."""
+    for recv_ns, raw in iter_records(path):
+        try:
+            data = json.loads(raw)
+        except json.JSONDecodeError:
+            continue
+        events = data if isinstance(data, list) else [data]
+        yield recv_ns, [e for e in events if isinstance(e, dict)]
+
+
+def is_recording(path: str) -> bool:
+    return os.path.isdir(path) or path.endswith('.gz') or path.endswith('.part')
+
+
+def load_frames(path: str) -> List[Dict]:
+    """Eventos do canal market de uma gravação ou de um JSONL (uma mensagem por linha; listas são achatadas)."""
+    if is_recording(path):
+        return [event for _, events in iter_frames(path) for event in events]
+    frames = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            data = json.loads(line)
+            frames.extend(d for d in (data if isinstance(data, list) else [data]) if isinstance(d, dict))
+    return frames
+
+
+# Instância global (None se FEED_RECORD_DIR não estiver definido)
+feed_recorder = FeedRecorder(FEED_RECORD_DIR) if FEED_RECORD_DIR else None
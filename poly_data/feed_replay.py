@@ -0,0 +1,133 @@
+"""
+Replay determinístico de gravações do feed (ver feed_recorder) para process_data.
+
+Modos:
+- speed=1.0: velocidade original (respeita os intervalos gravados)
+- speed=N: N× mais rápido
+- speed=0: o mais rápido possível (cede o loop a cada frame para as tasks
+  de apply_delta criadas por process_data rodarem)
+
+O digest final do book (global_state.all_data) permite regressões de estado:
+duas execuções sobre a mesma gravação devem produzir o mesmo digest.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Dict, Optional
+
+import poly_data.global_state as global_state
+from poly_data.feed_recorder import iter_frames
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayStats:
+    """Resultado de um replay (latências em ns)."""
+
+    def __init__(self):
+        self.frames = 0
+        self.events = 0
+        self.elapsed_ns = 0
+        self.recorded_span_ns = 0
+        self.process_ns = []
+        self.lag_ns = []  # atraso em relação ao horário agendado (modos temporizados)
+
+    @staticmethod
+    def _pct(values, p) -> float:
+        if not values:
+            return 0.0
+        sorted_vals = sorted(values)
+        return sorted_vals[min(int(len(sorted_vals) * p / 100), len(sorted_vals) - 1)] / 1_000_000
+
+    def report(self) -> str:
+        elapsed_s = self.elapsed_ns / 1e9 if self.elapsed_ns else 0.0
+        lines = ["=" * 80, "📼 REPLAY DO FEED", "=" * 80,
+                 f"frames: {self.frames}  eventos: {self.events}",
+                 f"duração gravada: {self.recorded_span_ns / 1e9:.1f}s  duração do replay: {elapsed_s:.1f}s",
+                 f"throughput: {self.events / elapsed_s:,.0f} eventos/s" if elapsed_s else "throughput: n/a",
+                 f"process_data: p50={self._pct(self.process_ns, 50):.3f}ms "
+                 f"p99={self._pct(self.process_ns, 99):.3f}ms"]
+        if self.lag_ns:
+            lines.append(f"atraso vs agenda: p50={self._pct(self.lag_ns, 50):.3f}ms "
+                         f"p99={self._pct(self.lag_ns, 99):.3f}ms")
+        lines.append("=" * 80)
+        return "\n".join(lines)
+
+
+def book_digest() -> str:
+    """Digest SHA-256 de global_state.all_data (ordenado, preços/tamanhos arredondados)."""
+    h = hashlib.sha256()
+    for market in sorted(global_state.all_data):
+        book = global_state.all_data[market]
+        h.update(market.encode())
+        for side in ('bids', 'asks'):
+            h.update(side.encode())
+            for price, size in book[side].items():
+                h.update(b'%.6f:%.6f;' % (price, size))
+    return h.hexdigest()
+
+
+def book_summary(levels: int = 5) -> Dict:
+    """Top-N níveis por mercado (para inspeção/regressão legível)."""
+    summary = {}
+    for market in sorted(global_state.all_data):
+        book = global_state.all_data[market]
+        summary[market] = {
+            'bids': [list(level) for level in list(book['bids'].items())[-levels:][::-1]],
+            'asks': [list(level) for level in list(book['asks'].items())[:levels]],
+        }
+    return summary
+
+
+async def replay(path: str, speed: float = 1.0, trade: bool = False, subscribe_all: bool = True,
+                 limit: Optional[int] = None) -> ReplayStats:
+    """Alimenta process_data com os frames gravados em `path`.
+
+    Args:
+        path: Diretório da gravação ou segmento .frames.gz
+        speed: 1.0 = original, N = N× mais rápido, 0 = máximo
+        trade: Repassado a process_data (exige client/df configurados)
+        subscribe_all: Adiciona cada mercado visto a subscribed_assets
+        limit: Máximo de frames (None = todos)
+    """
+    # Import tardio: data_processing importa trading (pandas etc.)
+    from poly_data.data_processing import process_data
+
+    stats = ReplayStats()
+    first_recv_ns = None
+    start_ns = time.monotonic_ns()
+
+    for recv_ns, events in iter_frames(path):
+        if limit is not None and stats.frames >= limit:
+            break
+        if first_recv_ns is None:
+            first_recv_ns = recv_ns
+
+        if speed > 0:
+            due_ns = start_ns + int((recv_ns - first_recv_ns) / speed)
+            wait_ns = due_ns - time.monotonic_ns()
+            if wait_ns > 0:
+                await asyncio.sleep(wait_ns / 1e9)
+            stats.lag_ns.append(max(0, time.monotonic_ns() - due_ns))
+
+        if subscribe_all:
+            for event in events:
+                market = event.get('market')
+                if market:
+                    global_state.subscribed_assets.add(market)
+
+        t0 = time.monotonic_ns()
+        await process_data(events, trade=trade)
+        stats.process_ns.append(time.monotonic_ns() - t0)
+        stats.frames += 1
+        stats.events += len(events)
+        stats.recorded_span_ns = recv_ns - first_recv_ns
+
+        if speed <= 0:
+            await asyncio.sleep(0)
+
+    # Deixar as tasks de apply_delta pendentes terminarem
+    await asyncio.sleep(0)
+    stats.elapsed_ns = time.monotonic_ns() - start_ns
+    return stats
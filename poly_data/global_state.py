@@ -1,5 +1,6 @@
 import threading
 import pandas as pd
+from poly_data.bounded_cache import BoundedCache, STATE_CACHE_MAXSIZE, STATE_CACHE_TTL
 
 # ============ Market Data ============
 
@@ -37,14 +38,17 @@ performing = {}
 
 # Timestamps for when trades were added to performing
 # Used to clear stale trades
-performing_timestamps = {}
+# Columns with trades still in flight are never evicted
+performing_timestamps = BoundedCache(maxsize=STATE_CACHE_MAXSIZE, name='performing_timestamps',
+                                     pinned=lambda col, ids: bool(ids))
 
 # Timestamps for when positions were last updated
-last_trade_update = {}
+last_trade_update = BoundedCache(maxsize=STATE_CACHE_MAXSIZE, ttl=STATE_CACHE_TTL, name='last_trade_update')
 
 # Timestamps for when perform_trade was last called for each market
 # Used to rate-limit trading actions and reduce order churn
-last_trade_action_time = {}
+last_trade_action_time = BoundedCache(maxsize=STATE_CACHE_MAXSIZE, ttl=STATE_CACHE_TTL,
+                                      name='last_trade_action_time')
 
 # Current open orders for each token
 # Format: {token_id: {'buy': {price, size}, 'sell': {price, size}}}
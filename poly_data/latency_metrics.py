@@ -6,7 +6,7 @@ Mede t_decision, t_send, t_ack para análise de performance
 import time
 import threading
 from collections import deque
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 import json
 
 class LatencyMetrics:
@@ -24,6 +24,8 @@ class LatencyMetrics:
         # Para simplicidade, mantemos um lock, mas reduzimos tempo de lock
         self._lock = threading.Lock()
         self.enabled = True
+        # Fontes externas (ex: loop_monitor) incluídas no relatório
+        self._sources: Dict[str, Callable[[], Dict]] = {}
     
     def record_decision(self, market: str, duration_ns: int):
         """Registra t_decision para um mercado.
@@ -105,6 +107,20 @@ class LatencyMetrics:
                     't_ack': self.get_percentiles(all_ack)
                 }
     
+    def register_source(self, name: str, fn: Callable[[], Dict]):
+        """Registra uma fonte de métricas externa (função sem argumentos que retorna um dict)."""
+        self._sources[name] = fn
+    
+    def get_source_metrics(self) -> Dict[str, Dict]:
+        """Coleta as métricas de todas as fontes registradas."""
+        result = {}
+        for name, fn in list(self._sources.items()):
+            try:
+                result[name] = fn()
+            except Exception as e:
+                result[name] = {'error': str(e)}
+        return result
+    
     def report(self, market: Optional[str] = None):
         """Gera relatório de métricas."""
         metrics = self.get_all_metrics(market)
@@ -121,9 +137,26 @@ class LatencyMetrics:
             else:
                 report.append(f"\n{metric_name.upper()}: Sem dados")
         
+        if not market:
+            for source_name, values in self.get_source_metrics().items():
+                report.append(f"\n{source_name.upper()}:")
+                for key, value in values.items():
+                    if isinstance(value, list):
+                        report.append(f"  {key}:")
+                        report.extend(f"    {json.dumps(item, default=str)}" for item in value)
+                    else:
+                        report.append(f"  {key}: {json.dumps(value, default=str)}")
+        
         report.append("=" * 80)
         return "\n".join(report)
     
+    def remove_market(self, market: str):
+        """Descarta as séries de um mercado (ex: mercado removido da planilha)."""
+        with self._lock:
+            self.t_decision.pop(market, None)
+            self.t_send.pop(market, None)
+            self.t_ack.pop(market, None)
+    
     def reset(self):
         """Limpa todas as métricas."""
         with self._lock:
@@ -0,0 +1,202 @@
+"""
+Volatilidade realizada ao vivo, calculada a partir do feed de mercado.
+
+O '3_hour' da planilha é escrito pelo data_updater até 1h antes, então o
+stop-loss por volatilidade reage com atraso. Aqui cada mercado mantém um
+RollingVolatility alimentado pelo mid-price do book do WebSocket:
+- o mid é amostrado a cada LIVE_VOL_SAMPLE_S (padrão 600s, igual à
+  fidelity=10 do /prices-history) e arredondado a 2 casas, como na planilha
+- janela deslizante de LIVE_VOL_WINDOW_S (padrão 3h) com Welford
+  (inclusão/remoção O(1)) -> mesmo número que o '3_hour' da planilha
+- EWMA da variância (meia-vida LIVE_VOL_EWMA_HALFLIFE_S, padrão 1h) para
+  reagir mais rápido a picos
+Ambos anualizados como calculate_annualized_volatility (sqrt(60 * 24 * 252)).
+
+volatility_3h() devolve o valor usado pelo perform_trade conforme
+LIVE_VOLATILITY: 'max' (padrão, maior entre ao vivo e planilha), 'live'
+(ao vivo, planilha enquanto a janela não aquece) ou 'sheet' (comportamento
+antigo). Cada consulta registra a diferença ao vivo vs planilha, exposta em
+snapshot() no relatório de métricas.
+
+Na carga dos mercados, seed() aquece a janela com o histórico local
+(poly_data/price_history.py), se o data_updater roda na mesma máquina.
+"""
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from poly_data.bounded_cache import BoundedCache, STATE_CACHE_MAXSIZE
+
+logger = logging.getLogger(__name__)
+
+LIVE_VOLATILITY = os.getenv('LIVE_VOLATILITY', 'max').lower()
+LIVE_VOL_SAMPLE_S = float(os.getenv('LIVE_VOL_SAMPLE_S', '600'))
+LIVE_VOL_WINDOW_S = float(os.getenv('LIVE_VOL_WINDOW_S', str(3 * 60 * 60)))
+LIVE_VOL_EWMA_HALFLIFE_S = float(os.getenv('LIVE_VOL_EWMA_HALFLIFE_S', '3600'))
+# Retornos mínimos na janela para o valor ao vivo ser usado
+LIVE_VOL_MIN_SAMPLES = int(os.getenv('LIVE_VOL_MIN_SAMPLES', '6'))
+
+ANNUALIZATION = math.sqrt(60 * 24 * 252)
+
+
+class RollingVolatility:
+    """Volatilidade de log-retornos amostrados: janela (Welford) + EWMA, O(1) por update."""
+
+    __slots__ = ('sample_s', 'window_s', 'alpha', 'returns', 'n', 'mean', 'm2',
+                 'ewma_var', 'last_price', 'last_sample_t', 'updated_at', 'seeded')
+
+    def __init__(self, sample_s: float = LIVE_VOL_SAMPLE_S, window_s: float = LIVE_VOL_WINDOW_S,
+                 halflife_s: float = LIVE_VOL_EWMA_HALFLIFE_S):
+        self.sample_s = sample_s
+        self.window_s = window_s
+        self.alpha = 1 - 0.5 ** (sample_s / halflife_s) if halflife_s > 0 else 1.0
+        self.returns: deque = deque()  # (t, log_return)
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.ewma_var: Optional[float] = None
+        self.last_price: Optional[float] = None
+        self.last_sample_t = 0.0
+        self.updated_at = 0.0
+        self.seeded = False
+
+    def _add(self, r: float):
+        self.n += 1
+        delta = r - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (r - self.mean)
+
+    def _remove(self, r: float):
+        self.n -= 1
+        if self.n == 0:
+            self.mean = self.m2 = 0.0
+            return
+        delta = r - self.mean
+        self.mean -= delta / self.n
+        self.m2 = max(self.m2 - delta * (r - self.mean), 0.0)
+
+    def update(self, price: float, now: float):
+        """Registra um preço; só vira retorno quando passou sample_s desde a última amostra."""
+        self.updated_at = now
+        price = round(price, 2)
+        if price <= 0:
+            return
+        if self.last_price is None:
+            self.last_price, self.last_sample_t = price, now
+            return
+        if now - self.last_sample_t < self.sample_s:
+            return
+        r = math.log(price / self.last_price)
+        self.last_price, self.last_sample_t = price, now
+        self.returns.append((now, r))
+        self._add(r)
+        self.ewma_var = r * r if self.ewma_var is None else (1 - self.alpha) * self.ewma_var + self.alpha * r * r
+        cutoff = now - self.window_s
+        while self.returns and self.returns[0][0] < cutoff:
+            self._remove(self.returns.popleft()[1])
+
+    def window_volatility(self) -> Optional[float]:
+        if self.n < 2:
+            return None
+        return round(math.sqrt(self.m2 / (self.n - 1)) * ANNUALIZATION, 2)
+
+    def ewma_volatility(self) -> Optional[float]:
+        if self.ewma_var is None:
+            return None
+        return round(math.sqrt(self.ewma_var) * ANNUALIZATION, 2)
+
+
+class LiveVolatility:
+    """Estimadores por mercado (condition_id) + comparação com o valor da planilha."""
+
+    def __init__(self, mode: str = LIVE_VOLATILITY, min_samples: int = LIVE_VOL_MIN_SAMPLES):
+        self.mode = mode
+        self.min_samples = min_samples
+        self._estimators: BoundedCache = BoundedCache(maxsize=STATE_CACHE_MAXSIZE, name='live_volatility')
+        self._sheet: BoundedCache = BoundedCache(maxsize=STATE_CACHE_MAXSIZE)
+
+    def _get(self, market: str) -> RollingVolatility:
+        estimator = self._estimators.get(market)
+        if estimator is None:
+            estimator = self._estimators[market] = RollingVolatility()
+        return estimator
+
+    def on_book(self, market: str, book: Dict):
+        """Atualiza com o mid do book local (all_data[market]: SortedDicts bids/asks)."""
+        bids, asks = book.get('bids'), book.get('asks')
+        if not bids or not asks:
+            return
+        mid = (bids.peekitem(-1)[0] + asks.peekitem(0)[0]) / 2
+        self._get(market).update(mid, time.time())
+
+    def seed(self, market: str, token: str):
+        """Aquece a janela com o histórico local do token (se existir e o mercado ainda não tiver amostras)."""
+        estimator = self._get(market)
+        if estimator.seeded or estimator.last_price is not None:
+            return
+        estimator.seeded = True
+        try:
+            from poly_data.price_history import price_history_store
+            now = time.time()
+            records = price_history_store.load(str(token), start=int(now - estimator.window_s - estimator.sample_s))
+        except Exception as e:
+            logger.debug(f"Sem histórico local para {market[:20]}...: {e}")
+            return
+        for t, p in zip(records['t'].tolist(), records['p'].tolist()):
+            estimator.update(p, t)
+
+    def live_3h(self, market: str) -> Optional[float]:
+        estimator = self._estimators.get(market)
+        if estimator is None or estimator.n < self.min_samples:
+            return None
+        return estimator.window_volatility()
+
+    def volatility_3h(self, market: str, sheet_value) -> float:
+        """Valor de volatilidade 3h usado no stop-loss, conforme LIVE_VOLATILITY."""
+        try:
+            sheet_value = float(sheet_value)
+        except (TypeError, ValueError):
+            sheet_value = 0.0
+        if math.isnan(sheet_value):
+            sheet_value = 0.0
+        self._sheet[market] = sheet_value
+        if self.mode == 'sheet':
+            return sheet_value
+        live = self.live_3h(market)
+        if live is None:
+            return sheet_value
+        if self.mode == 'live':
+            return live
+        return max(live, sheet_value)
+
+    def discard(self, market: str):
+        self._estimators.pop(market, None)
+        self._sheet.pop(market, None)
+
+    def snapshot(self) -> Dict:
+        """Resumo para o relatório: mercados aquecidos e divergência ao vivo vs planilha."""
+        rows = []
+        for market, estimator in self._estimators.items():
+            live = estimator.window_volatility() if estimator.n >= self.min_samples else None
+            sheet = self._sheet.get(market)
+            if live is None or sheet is None:
+                continue
+            rows.append({'market': market[:20], 'live_3h': live, 'sheet_3h': sheet,
+                         'ewma': estimator.ewma_volatility(), 'diff': round(live - sheet, 2)})
+        diffs = sorted(abs(row['diff']) for row in rows)
+        rows.sort(key=lambda row: -abs(row['diff']))
+        return {
+            'mode': self.mode,
+            'markets': len(self._estimators),
+            'warm': len(rows),
+            'abs_diff_p50': diffs[min(int(len(diffs) * 50 / 100), len(diffs) - 1)] if diffs else None,
+            'abs_diff_p90': diffs[min(int(len(diffs) * 90 / 100), len(diffs) - 1)] if diffs else None,
+            'top_divergent': rows[:5],
+        }
+
+
+# Instância global
+live_volatility = LiveVolatility()
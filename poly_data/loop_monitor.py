@@ -0,0 +1,210 @@
+"""
+Monitor de lag do event loop e detector de chamadas bloqueantes.
+
+Duas peças:
+- uma task de probe que dorme `interval` e mede o atraso ao acordar (lag do
+  loop) e atualiza um heartbeat;
+- uma thread watchdog que, quando o heartbeat fica parado por mais de
+  `threshold`, captura a stack da thread do loop via sys._current_frames()
+  e atribui o bloqueio ao call site do projeto mais interno da stack
+  (ex: polymarket_client.py:get_position -> web3 .call()).
+
+Os call sites são agregados (ocorrências, tempo total/máximo bloqueado) e
+expostos em LatencyMetrics como fonte 'event_loop'.
+
+Configuração: LOOP_MONITOR (true/false), LOOP_LAG_INTERVAL_MS (padrão 100),
+LOOP_BLOCK_THRESHOLD_MS (padrão 100).
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LOOP_MONITOR_ENABLED = os.getenv('LOOP_MONITOR', 'true').lower() == 'true'
+LOOP_LAG_INTERVAL_MS = float(os.getenv('LOOP_LAG_INTERVAL_MS', '100'))
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv('LOOP_BLOCK_THRESHOLD_MS', '100'))
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Frames do próprio loop: se a stack termina aqui o loop está ocioso, não bloqueado
+_LOOP_INTERNALS = ('asyncio' + os.sep + 'base_events.py', 'asyncio' + os.sep + 'runners.py',
+                   'selectors.py', 'uvloop')
+
+
+def _is_project_frame(filename: str) -> bool:
+    return (filename.startswith(_PROJECT_ROOT) and 'site-packages' not in filename
+            and os.path.abspath(filename) != os.path.abspath(__file__))
+
+
+def _frame_label(frame_summary: traceback.FrameSummary) -> str:
+    filename = frame_summary.filename
+    if filename.startswith(_PROJECT_ROOT):
+        filename = os.path.relpath(filename, _PROJECT_ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{frame_summary.lineno} {frame_summary.name}"
+
+
+class BlockingSite:
+    """Agregado de bloqueios atribuídos a um call site."""
+    __slots__ = ['site', 'innermost', 'count', 'total_ns', 'max_ns', 'stack']
+
+    def __init__(self, site: str, innermost: str, stack: str):
+        self.site = site
+        self.innermost = innermost
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.stack = stack
+
+    def to_dict(self) -> Dict:
+        return {
+            'site': self.site,
+            'innermost': self.innermost,
+            'count': self.count,
+            'total_ms': round(self.total_ns / 1_000_000, 1),
+            'max_ms': round(self.max_ns / 1_000_000, 1),
+        }
+
+
+class LoopMonitor:
+    """Mede lag do loop e agrega call sites que o bloqueiam."""
+
+    def __init__(self, interval_ms: float = LOOP_LAG_INTERVAL_MS,
+                 threshold_ms: float = LOOP_BLOCK_THRESHOLD_MS, buffer_size: int = 3000):
+        self.interval_s = interval_ms / 1000
+        self.threshold_ns = int(threshold_ms * 1_000_000)
+        self.lag_ns: deque = deque(maxlen=buffer_size)
+        self.sites: Dict[str, BlockingSite] = {}
+        self.stalls = 0
+        self._heartbeat_ns = 0
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Inicia probe + watchdog. Deve ser chamado de dentro do event loop."""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat_ns = time.monotonic_ns()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+        logger.info(f"⏱️  Loop monitor iniciado (intervalo={self.interval_s * 1000:.0f}ms, "
+                    f"limiar={self.threshold_ns / 1e6:.0f}ms)")
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _probe(self):
+        interval = self.interval_s
+        while True:
+            t0 = time.monotonic_ns()
+            self._heartbeat_ns = t0
+            await asyncio.sleep(interval)
+            lag = time.monotonic_ns() - t0 - int(interval * 1e9)
+            self.lag_ns.append(max(0, lag))
+
+    # ============ Watchdog ============
+
+    def _capture(self) -> Optional[Tuple[str, str, str]]:
+        """Captura a stack da thread do loop. Retorna (site, innermost, stack) ou None se ocioso."""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        stack = traceback.extract_stack(frame)
+        if not stack:
+            return None
+        innermost = stack[-1]
+        if any(part in innermost.filename for part in _LOOP_INTERNALS):
+            return None
+        site = next((fs for fs in reversed(stack) if _is_project_frame(fs.filename)), innermost)
+        return _frame_label(site), _frame_label(innermost), ''.join(traceback.format_list(stack[-15:]))
+
+    def _watch(self):
+        check_s = max(0.005, self.threshold_ns / 4e9)
+        stall_start_ns = 0
+        samples: Dict[str, int] = {}
+        captures: Dict[str, Tuple[str, str]] = {}
+        while not self._stop.wait(check_s):
+            heartbeat = self._heartbeat_ns
+            stalled_ns = time.monotonic_ns() - heartbeat - int(self.interval_s * 1e9)
+            if stalled_ns > self.threshold_ns:
+                if not stall_start_ns:
+                    stall_start_ns = heartbeat
+                captured = self._capture()
+                if captured:
+                    site, innermost, stack = captured
+                    samples[site] = samples.get(site, 0) + 1
+                    captures.setdefault(site, (innermost, stack))
+            elif stall_start_ns:
+                # Loop voltou: atribuir a duração ao site com mais amostras
+                duration_ns = max(0, heartbeat - stall_start_ns - int(self.interval_s * 1e9))
+                if samples:
+                    site = max(samples, key=samples.get)
+                    self._record(site, captures[site][0], captures[site][1], duration_ns)
+                stall_start_ns = 0
+                samples.clear()
+                captures.clear()
+
+    def _record(self, site: str, innermost: str, stack: str, duration_ns: int):
+        with self._lock:
+            self.stalls += 1
+            entry = self.sites.get(site)
+            first = entry is None
+            if first:
+                entry = self.sites[site] = BlockingSite(site, innermost, stack)
+            entry.count += 1
+            entry.total_ns += duration_ns
+            entry.max_ns = max(entry.max_ns, duration_ns)
+        if first:
+            logger.warning(f"⚠️  Event loop bloqueado {duration_ns / 1e6:.0f}ms em {site} ({innermost})\n{stack}")
+        else:
+            logger.warning(f"⚠️  Event loop bloqueado {duration_ns / 1e6:.0f}ms em {site}")
+
+    # ============ Relatórios ============
+
+    def get_lag_percentiles(self, percentiles=(50, 90, 99)) -> Dict[str, float]:
+        values = sorted(self.lag_ns)
+        if not values:
+            return {}
+        result = {f'p{p}': values[min(int(len(values) * p / 100), len(values) - 1)] / 1_000_000
+                  for p in percentiles}
+        result['max'] = values[-1] / 1_000_000
+        return result
+
+    def top_sites(self, n: int = 10) -> List[Dict]:
+        with self._lock:
+            ranked = sorted(self.sites.values(), key=lambda s: s.total_ns, reverse=True)
+            return [s.to_dict() for s in ranked[:n]]
+
+    def snapshot(self) -> Dict:
+        """Fonte de métricas (registrada em LatencyMetrics como 'event_loop')."""
+        return {
+            'lag_ms': self.get_lag_percentiles(),
+            'stalls': self.stalls,
+            'blocking_sites': self.top_sites(),
+        }
+
+    def reset(self):
+        with self._lock:
+            self.lag_ns.clear()
+            self.sites.clear()
+            self.stalls = 0
+
+
+# Instância global
+loop_monitor = LoopMonitor()
@@ -0,0 +1,266 @@
+"""
+Contabilidade de memória por mercado.
+
+Mede quantos bytes cada mercado ocupa em cada estrutura de estado do bot:
+- all_data: par de SortedDicts em global_state.all_data
+- book_state: BookState (SortedDicts + snapshot imutável)
+- latency_metrics: deques t_decision/t_send/t_ack em LatencyMetrics
+- market_locks: asyncio.Lock em trading.market_locks
+- order_book_cache: PolymarketClient._order_book_cache (DataFrames)
+- payload_templates: payload_template._template_cache
+
+O tamanho é profundo (objetos alcançáveis, sem contar módulos, funções, o
+event loop etc.). Com mais de MEMORY_SAMPLE_MARKETS mercados, apenas uma
+amostra é medida e os totais são extrapolados pela média por estrutura, para
+o relatório não bloquear o loop. Cada snapshot entra num histórico usado para
+calcular o crescimento (MB/h) de RSS e da memória contabilizada.
+
+Exposto em LatencyMetrics como fonte 'memory'. Estruturas novas podem ser
+incluídas com memory_accountant.register_structure().
+
+Configuração: MEMORY_ACCOUNTING (true/false), MEMORY_SAMPLE_MARKETS
+(padrão 100), MEMORY_HISTORY (padrão 288 snapshots).
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import types
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MEMORY_ACCOUNTING_ENABLED = os.getenv('MEMORY_ACCOUNTING', 'true').lower() == 'true'
+MEMORY_SAMPLE_MARKETS = int(os.getenv('MEMORY_SAMPLE_MARKETS', '100'))
+MEMORY_HISTORY = int(os.getenv('MEMORY_HISTORY', '288'))
+
+_ATOMIC = (str, bytes, int, float, bool, complex, type(None))
+# Não percorrer: compartilhados pelo processo todo, não pertencem ao mercado
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+           asyncio.AbstractEventLoop, logging.Logger, threading.Thread)
+
+# Coletor: retorna pares (chave, objeto); a chave é mapeada para o mercado
+Collector = Callable[[], Iterable[Tuple[str, object]]]
+
+
+def deep_sizeof(obj, seen: Optional[set] = None) -> int:
+    """Tamanho profundo de `obj` em bytes (containers, __dict__ e __slots__)."""
+    if seen is None:
+        seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen or isinstance(o, _OPAQUE):
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, _ATOMIC):
+            continue
+        if hasattr(o, 'memory_usage') and hasattr(o, 'dtypes'):
+            # pandas: __sizeof__ já é profundo
+            continue
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset, deque)):
+            stack.extend(o)
+        attrs = getattr(o, '__dict__', None)
+        if attrs is not None:
+            stack.append(attrs)
+        for cls in type(o).__mro__:
+            slots = cls.__dict__.get('__slots__', ())
+            for slot in ((slots,) if isinstance(slots, str) else slots):
+                value = getattr(o, slot, None)
+                if value is not None:
+                    stack.append(value)
+    return total
+
+
+def current_rss_bytes() -> int:
+    """RSS atual do processo (Linux: /proc/self/statm; fallback: pico via getrusage)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+# ============ Coletores das estruturas do bot ============
+
+def _collect_all_data():
+    import poly_data.global_state as global_state
+    return list(global_state.all_data.items())
+
+
+def _collect_book_state():
+    from poly_data.book_state import book_state_manager
+    return list(book_state_manager.get_all_books().items())
+
+
+def _collect_latency_metrics():
+    from poly_data.latency_metrics import metrics
+    pairs = []
+    for series in (metrics.t_decision, metrics.t_send, metrics.t_ack):
+        pairs.extend(list(series.items()))
+    return pairs
+
+
+def _collect_market_locks():
+    # Não importar trading aqui (dependências pesadas); só medir se já carregado
+    trading = sys.modules.get('trading')
+    return list(getattr(trading, 'market_locks', {}).items())
+
+
+def _collect_order_book_cache():
+    import poly_data.global_state as global_state
+    cache = getattr(global_state.client, '_order_book_cache', None) or {}
+    return list(cache.items())
+
+
+def _collect_payload_templates():
+    from poly_data.payload_template import _template_cache
+    # Chave: "market:side:order_type"
+    return [(key.split(':', 1)[0], template) for key, template in list(_template_cache.items())]
+
+
+class MemoryAccountant:
+    """Mede bytes por mercado por estrutura e mantém o histórico de crescimento."""
+
+    def __init__(self, sample_markets: int = MEMORY_SAMPLE_MARKETS, history_size: int = MEMORY_HISTORY):
+        self.sample_markets = sample_markets
+        self.history: deque = deque(maxlen=history_size)
+        self._structures: Dict[str, Collector] = {}
+        self._lock = threading.Lock()
+
+        self.register_structure('all_data', _collect_all_data)
+        self.register_structure('book_state', _collect_book_state)
+        self.register_structure('latency_metrics', _collect_latency_metrics)
+        self.register_structure('market_locks', _collect_market_locks)
+        self.register_structure('order_book_cache', _collect_order_book_cache)
+        self.register_structure('payload_templates', _collect_payload_templates)
+
+    def register_structure(self, name: str, collector: Collector):
+        """Registra uma estrutura por mercado (coletor sem argumentos que retorna pares (chave, objeto))."""
+        self._structures[name] = collector
+
+    @staticmethod
+    def _token_to_market() -> Dict[str, str]:
+        """Mapa token -> condition_id (estruturas indexadas por token)."""
+        import poly_data.global_state as global_state
+        df = global_state.df
+        mapping = {}
+        if df is None or 'condition_id' not in getattr(df, 'columns', ()):
+            return mapping
+        for col in ('token1', 'token2'):
+            if col in df.columns:
+                mapping.update({str(t): str(m) for t, m in zip(df[col], df['condition_id'])})
+        return mapping
+
+    def measure(self) -> Dict:
+        """Mede todas as estruturas. Retorna bytes por estrutura e por mercado (amostrados)."""
+        try:
+            token_map = self._token_to_market()
+        except Exception as e:
+            logger.debug(f"Memória: mapa token -> mercado indisponível: {e}")
+            token_map = {}
+        grouped: Dict[str, Dict[str, List[object]]] = {}
+        markets = set()
+        for name, collector in list(self._structures.items()):
+            try:
+                pairs = collector()
+            except Exception as e:
+                logger.debug(f"Memória: coletor {name} falhou: {e}")
+                pairs = []
+            per_market = grouped[name] = {}
+            for key, obj in pairs:
+                market = token_map.get(str(key), str(key))
+                per_market.setdefault(market, []).append(obj)
+                markets.add(market)
+
+        ordered = sorted(markets)
+        if len(ordered) > self.sample_markets > 0:
+            stride = len(ordered) / self.sample_markets
+            sampled = [ordered[int(i * stride)] for i in range(self.sample_markets)]
+        else:
+            sampled = ordered
+
+        per_structure = {}
+        per_market_total: Dict[str, int] = {}
+        for name, per_market in grouped.items():
+            measured = [m for m in sampled if m in per_market]
+            sizes = []
+            for market in measured:
+                seen = set()
+                size = sum(deep_sizeof(obj, seen) for obj in per_market[market])
+                sizes.append(size)
+                per_market_total[market] = per_market_total.get(market, 0) + size
+            mean = sum(sizes) / len(sizes) if sizes else 0.0
+            per_structure[name] = {
+                'markets': len(per_market),
+                'mean_bytes': mean,
+                'total_bytes': mean * len(per_market),
+            }
+
+        return {
+            'markets': len(ordered),
+            'sampled': len(sampled),
+            'structures': per_structure,
+            'per_market': per_market_total,
+        }
+
+    def sample(self) -> Dict:
+        """Mede, registra no histórico e retorna o resultado."""
+        measured = self.measure()
+        accounted = sum(s['total_bytes'] for s in measured['structures'].values())
+        measured['accounted_bytes'] = accounted
+        measured['rss_bytes'] = current_rss_bytes()
+        with self._lock:
+            self.history.append((time.time(), measured['markets'], accounted, measured['rss_bytes']))
+        return measured
+
+    def growth(self) -> Dict[str, float]:
+        """Crescimento entre o primeiro e o último snapshot do histórico."""
+        with self._lock:
+            if len(self.history) < 2:
+                return {}
+            t0, markets0, accounted0, rss0 = self.history[0]
+            t1, markets1, accounted1, rss1 = self.history[-1]
+        if t1 - t0 < 60:
+            return {}
+        hours = (t1 - t0) / 3600
+        return {
+            'window_min': round(hours * 60, 1),
+            'markets_delta': markets1 - markets0,
+            'accounted_mb_per_hour': round((accounted1 - accounted0) / 1024 / 1024 / hours, 3),
+            'rss_mb_per_hour': round((rss1 - rss0) / 1024 / 1024 / hours, 3),
+        }
+
+    def snapshot(self) -> Dict:
+        """Fonte de métricas (registrada em LatencyMetrics como 'memory')."""
+        measured = self.sample()
+        structures = measured['structures']
+        top = sorted(measured['per_market'].items(), key=lambda kv: kv[1], reverse=True)[:5]
+        return {
+            'markets': measured['markets'],
+            'sampled': measured['sampled'],
+            'rss_mb': round(measured['rss_bytes'] / 1024 / 1024, 1),
+            'accounted_mb': round(measured['accounted_bytes'] / 1024 / 1024, 2),
+            'bytes_per_market': {name: round(s['mean_bytes']) for name, s in structures.items()},
+            'total_mb': {name: round(s['total_bytes'] / 1024 / 1024, 3) for name, s in structures.items()},
+            'growth': self.growth(),
+            'top_markets': [{'market': market, 'bytes': size} for market, size in top],
+        }
+
+    def reset(self):
+        with self._lock:
+            self.history.clear()
+
+
+# Instância global
+memory_accountant = MemoryAccountant()
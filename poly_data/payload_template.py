@@ -4,6 +4,7 @@ Prealloc e reuse de estruturas
 """
 from typing import Dict, Any
 from poly_data.fixed_point import FixedPointPrice, FixedPointSize, USE_FIXED_POINT
+from poly_data.bounded_cache import BoundedCache, STATE_CACHE_MAXSIZE
 
 class PayloadTemplate:
     """Template de payload pré-definido (só trocar price/size).
@@ -64,7 +65,7 @@ class PayloadTemplate:
         return self.build(price_int, size_int)
 
 # FASE 6: Cache de templates (reutilizar templates por market/side)
-_template_cache: Dict[str, PayloadTemplate] = {}
+_template_cache: BoundedCache = BoundedCache(maxsize=STATE_CACHE_MAXSIZE, name='payload_templates')
 
 def get_payload_template(market: str, side: str, order_type: str = 'GTC') -> PayloadTemplate:
     """Retorna ou cria template (com cache para reutilização).
@@ -73,10 +74,16 @@ def get_payload_template(market: str, side: str, order_type: str = 'GTC') -> Pay
     """
     cache_key = f"{market}:{side}:{order_type}"
     
-    if cache_key not in _template_cache:
-        _template_cache[cache_key] = PayloadTemplate(market, side, order_type)
+    template = _template_cache.get(cache_key)
+    if template is None:
+        template = _template_cache[cache_key] = PayloadTemplate(market, side, order_type)
     
-    return _template_cache[cache_key]
+    return template
+
+def discard_templates(market: str) -> int:
+    """Remove os templates de um market (token) que saiu da planilha."""
+    prefix = f"{market}:"
+    return _template_cache.discard_where(lambda key: key.startswith(prefix))
 
 # Importar USE_FIXED_POINT
 from poly_data.fixed_point import USE_FIXED_POINT
@@ -0,0 +1,69 @@
+"""
+Atualizações periódicas do bot (posições, ordens, mercados e métricas).
+
+Usadas pelo processo único (main.py) e pelos workers de shard
+(shard_worker.py). Ficam fora de main.py para que os workers não reimportem
+o ponto de entrada (logging.basicConfig em main.log, política do uvloop).
+"""
+import asyncio
+import logging
+import time
+import traceback
+
+import poly_data.global_state as global_state
+from poly_data.data_utils import update_markets, update_positions, update_orders
+from poly_data.data_processing import remove_from_performing
+from poly_data.position_snapshot import log_position_snapshot
+from poly_data.latency_metrics import metrics
+from poly_data.profiler_capture import profiler_capture
+from poly_data.bounded_cache import purge_all_expired
+
+logger = logging.getLogger(__name__)
+
+
+def remove_from_pending():
+    """
+    Clean up stale trades that have been pending for too long (>15 seconds).
+    """
+    try:
+        current_time = time.time()
+        for col in list(global_state.performing.keys()):
+            for trade_id in list(global_state.performing[col]):
+                try:
+                    if current_time - global_state.performing_timestamps[col].get(trade_id, current_time) > 15:
+                        logger.info(f"Removing stale entry {trade_id} from {col} after 15 seconds")
+                        remove_from_performing(col, trade_id)
+                except:
+                    logger.error(f"Error removing trade {trade_id} from {col}: {traceback.format_exc()}")
+    except:
+        logger.error(f"Error in remove_from_pending: {traceback.format_exc()}")
+
+@profiler_capture.track('update_periodically', always=True)
+async def update_periodically(snapshots=True):
+    """
+    Asynchronous function that periodically updates market data, positions, and orders.
+    - Positions and orders every 10 seconds
+    - Market data each cycle (applied only when the config provider has a new version)
+    - Position snapshots and latency/event-loop/memory metrics report every 5 minutes (every 30 cycles)
+    - Stale pending trades and expired cache entries removed each cycle
+
+    Shard workers pass snapshots=False: the coordinator logs the wallet-wide position snapshot.
+    """
+    i = 1
+    while True:
+        await asyncio.sleep(10)  # Update every 10 seconds
+        try:
+            remove_from_pending()
+            purge_all_expired()
+            update_positions(avgOnly=True)
+            update_orders()
+            update_markets()
+            if i % 30 == 0:  # Every 5 minutes (300 seconds)
+                if snapshots:
+                    log_position_snapshot()
+                logger.info(metrics.report())
+            i += 1
+            if i > 30:
+                i = 1
+        except Exception as e:
+            logger.error(f"Error in update_periodically: {e}")
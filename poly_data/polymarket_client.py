@@ -1,7 +1,7 @@
 from dotenv import load_dotenv
 import os
 from py_clob_client.client import ClobClient
-from py_clob_client.clob_types import OrderArgs, BalanceAllowanceParams, AssetType, PartialCreateOrderOptions
+from py_clob_client.clob_types import OrderArgs, BalanceAllowanceParams, AssetType, PartialCreateOrderOptions, OpenOrderParams
 from py_clob_client.constants import POLYGON
 from web3 import Web3
 try:
@@ -17,18 +17,39 @@ from urllib3.util.retry import Retry
 import pandas as pd
 import json
 import subprocess
+import time
 from poly_data.abis import NegRiskAdapterABI, ConditionalTokenABI, erc20_abi
 
 # FASE 6: Fixed-point e payload templates
 from poly_data.fixed_point import FixedPointPrice, FixedPointSize, USE_FIXED_POINT, PRICE_SCALE
 from poly_data.payload_template import get_payload_template
 from poly_data.cython_wrapper import build_order_payload_fast as cython_build_payload
+from poly_data.latency_metrics import metrics
+from poly_data.bounded_cache import BoundedCache
+
+# FASE 2: Parsers JSON rápidos (opcionais)
+try:
+    import orjson
+    _USE_ORJSON = True
+except ImportError:
+    _USE_ORJSON = False
+try:
+    import ujson
+    _USE_UJSON = True
+except ImportError:
+    _USE_UJSON = False
 
 load_dotenv()
 
 # FASE 3: Variável de ambiente para controlar verbosidade (reduz I/O de logs)
 _VERBOSE = os.getenv('VERBOSE', 'true').lower() == 'true'
 
+# Máximo de order books (DataFrames) no cache de get_order_book
+ORDER_BOOK_CACHE_MAXSIZE = int(os.getenv('ORDER_BOOK_CACHE_MAXSIZE', '256'))
+
+# Merge de posições: 'node' (poly_merger/merge.js, padrão) ou 'python' (web3 + TxManager compartilhado)
+MERGE_BACKEND = os.getenv('MERGE_BACKEND', 'node').lower()
+
 def _log(message, level='info'):
     """FASE 3: Logging condicional para reduzir overhead de I/O."""
     if _VERBOSE or level == 'error':
@@ -36,7 +57,9 @@ def _log(message, level='info'):
 
 class PolymarketClient:
     def __init__(self, pk='default') -> None:
-        self.host = "https://clob.polymarket.com"
+        # Endpoints configuráveis (ex: apontar para o fake_clob local)
+        self.host = os.getenv("CLOB_HOST", "https://clob.polymarket.com").rstrip('/')
+        self.data_api_host = os.getenv("DATA_API_HOST", "https://data-api.polymarket.com").rstrip('/')
         self.key = os.getenv("PK")
         self.browser_address = os.getenv("BROWSER_ADDRESS")
 
@@ -60,8 +83,9 @@ class PolymarketClient:
 
         # FASE 2: Inicializar cache antes de usar
         self._creds_cache = None  # Cache de credenciais
-        self._order_book_cache = {}  # Cache de order books
         self._order_book_cache_ttl = 0.5  # TTL de 500ms para order book cache
+        self._order_book_cache = BoundedCache(maxsize=ORDER_BOOK_CACHE_MAXSIZE, ttl=self._order_book_cache_ttl,
+                                              name='order_book_cache')  # Cache de order books
 
         try:
             self.client = ClobClient(
@@ -190,7 +214,10 @@ class PolymarketClient:
             return {}
 
         try:
+            t_post = time.monotonic_ns()
             resp = self.client.post_order(signed_order)
+            # t_ack: request enviado -> resposta do CLOB
+            metrics.record_ack(str(marketId), time.monotonic_ns() - t_post)
             return resp
         except Exception as ex:
             error_str = str(ex)
@@ -217,15 +244,10 @@ class PolymarketClient:
         """
         # FASE 2: Cache de order book para reduzir requisições
         if use_cache:
-            import time
-            current_time = time.time()
-            
-            # Verificar se temos cache válido
-            if market in self._order_book_cache:
-                cached_data, cache_time = self._order_book_cache[market]
-                if current_time - cache_time < self._order_book_cache_ttl:
-                    # Retornar cache se ainda válido
-                    return cached_data
+            # Verificar se temos cache válido (entradas expiradas saem no get)
+            cached_data = self._order_book_cache.get(market)
+            if cached_data is not None:
+                return cached_data
         
         # Buscar order book
         orderBook = self.client.get_order_book(market)
@@ -234,8 +256,7 @@ class PolymarketClient:
         
         # FASE 2: Atualizar cache
         if use_cache:
-            import time
-            self._order_book_cache[market] = (result, time.time())
+            self._order_book_cache[market] = result
         
         return result
 
@@ -244,7 +265,7 @@ class PolymarketClient:
 
     def get_pos_balance(self):
         # FASE 1: Usar sessão reutilizável em vez de requests.get
-        res = self.session.get(f'https://data-api.polymarket.com/value?user={self.browser_wallet}')
+        res = self.session.get(f'{self.data_api_host}/value?user={self.browser_wallet}')
         # FASE 2: Otimizar parsing JSON
         if _USE_ORJSON:
             data = orjson.loads(res.content)
@@ -259,7 +280,7 @@ class PolymarketClient:
 
     def get_all_positions(self):
         # FASE 1: Usar sessão reutilizável em vez de requests.get
-        res = self.session.get(f'https://data-api.polymarket.com/positions?user={self.browser_wallet}')
+        res = self.session.get(f'{self.data_api_host}/positions?user={self.browser_wallet}')
         # FASE 2: Otimizar parsing JSON
         if _USE_ORJSON:
             data = orjson.loads(res.content)
@@ -300,6 +321,8 @@ class PolymarketClient:
         self.client.cancel_market_orders(market=marketId)
 
     def merge_positions(self, amount_to_merge, condition_id, is_neg_risk_market):
+        if MERGE_BACKEND == 'python':
+            return self._merge_positions_web3(amount_to_merge, condition_id, is_neg_risk_market)
         amount_to_merge_str = str(amount_to_merge)
         node_command = f'node poly_merger/merge.js {amount_to_merge_str} {condition_id} {"true" if is_neg_risk_market else "false"}'
         _log(node_command)
@@ -308,4 +331,30 @@ class PolymarketClient:
             _log(f"Error: {result.stderr}", 'error')
             raise Exception(f"Error in merging positions: {result.stderr}")
         _log("Done merging")
-        return result.stdout
\ No newline at end of file
+        return result.stdout
+
+    def _merge_positions_web3(self, amount_to_merge, condition_id, is_neg_risk_market):
+        """Mesmo merge do merge.js (via Safe em BROWSER_ADDRESS), sem subprocess Node.
+
+        Nonce, gas price e estimativa de gas vêm do TxManager compartilhado
+        (claimer_core/tx_manager.py), o mesmo usado pelo auto_claim.
+        """
+        from claimer_core.tx_batcher import SafeBatcher
+
+        if getattr(self, '_safe_batcher', None) is None:
+            self._safe_batcher = SafeBatcher(self.web3, self.browser_wallet, self.key)
+        condition_id_bytes = bytes.fromhex(str(condition_id).replace('0x', '').rjust(64, '0'))
+        if is_neg_risk_market:
+            to = self.addresses['neg_risk_adapter']
+            call = self.neg_risk_adapter.functions.mergePositions(condition_id_bytes, int(amount_to_merge))
+        else:
+            to = self.addresses['conditional_tokens']
+            call = self.conditional_tokens.functions.mergePositions(
+                self.addresses['collateral'], b'\x00' * 32, condition_id_bytes, [1, 2], int(amount_to_merge))
+        _log(f"Merging {amount_to_merge} of {condition_id} (neg_risk={is_neg_risk_market}) via web3")
+        tx_hash = self._safe_batcher.sendCall(to, call._encode_transaction_data())
+        receipt = self._safe_batcher.tx_manager.waitForReceipt(tx_hash)
+        if receipt.status != 1:
+            raise Exception(f"Error in merging positions: transaction {tx_hash} reverted")
+        _log(f"Done merging {tx_hash}")
+        return tx_hash
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+Store local de histórico de preços por token (colunar, em disco).
+
+Cada token tem:
+- <token>.npy: base compactada, array estruturado (t int64 segundos, p float64)
+  ordenado por t, lido via memmap (np.load(mmap_mode='r'))
+- <token>.tail: registros novos no mesmo dtype, só com append
+
+append() grava apenas pontos mais novos que o último timestamp guardado; com
+PRICE_HISTORY_COMPACT_ROWS registros no tail, compact() funde tail + base,
+descarta o que passou de PRICE_HISTORY_RETENTION_DAYS e troca a base de forma
+atômica (os.replace). history_params() monta os parâmetros de
+/prices-history: incremental (startTs) se já houver histórico recente, ou a
+série completa (interval=1m) na primeira vez.
+
+Usado pelo data_updater (volatilidade) e pelo bot (consultas por intervalo
+com load()). Sobrevive a reinícios: o próximo refresh busca só o que falta.
+
+Configuração: PRICE_HISTORY_DIR (padrão data/history),
+PRICE_HISTORY_RETENTION_DAYS (padrão 35), PRICE_HISTORY_COMPACT_ROWS
+(padrão 1000).
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PRICE_HISTORY_DIR = os.getenv('PRICE_HISTORY_DIR', os.path.join('data', 'history'))
+PRICE_HISTORY_RETENTION_DAYS = float(os.getenv('PRICE_HISTORY_RETENTION_DAYS', '35'))
+PRICE_HISTORY_COMPACT_ROWS = int(os.getenv('PRICE_HISTORY_COMPACT_ROWS', '1000'))
+
+HISTORY_DTYPE = np.dtype([('t', '<i8'), ('p', '<f8')])
+
+
+def _to_records(points) -> np.ndarray:
+    """Converte a resposta de /prices-history ([{'t', 'p'}, ...]) ou um array estruturado."""
+    if isinstance(points, np.ndarray) and points.dtype == HISTORY_DTYPE:
+        return points
+    points = list(points or ())
+    records = np.empty(len(points), dtype=HISTORY_DTYPE)
+    for i, point in enumerate(points):
+        records[i] = (int(point['t']), float(point['p']))
+    return records
+
+
+def _dedup_sorted(records: np.ndarray) -> np.ndarray:
+    """Ordena por t e mantém o último valor de cada timestamp."""
+    if len(records) < 2:
+        return records
+    records = records[np.argsort(records['t'], kind='stable')]
+    keep = np.ones(len(records), dtype=bool)
+    keep[:-1] = records['t'][1:] != records['t'][:-1]
+    return records[keep]
+
+
+class PriceHistoryStore:
+    """Histórico de preços por token com fetch incremental e compactação."""
+
+    def __init__(self, root: str = PRICE_HISTORY_DIR, retention_days: float = PRICE_HISTORY_RETENTION_DAYS,
+                 compact_rows: int = PRICE_HISTORY_COMPACT_ROWS):
+        self.root = root
+        self.retention_s = int(retention_days * 86400)
+        self.compact_rows = compact_rows
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.full_fetches = 0
+        self.incremental_fetches = 0
+        self.points_appended = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _lock(self, token: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._locks.get(token)
+            if lock is None:
+                lock = self._locks[token] = threading.Lock()
+            return lock
+
+    def _base_path(self, token: str) -> str:
+        return os.path.join(self.root, f"{token}.npy")
+
+    def _tail_path(self, token: str) -> str:
+        return os.path.join(self.root, f"{token}.tail")
+
+    # ============ Leitura ============
+
+    def _read_base(self, token: str) -> np.ndarray:
+        try:
+            return np.load(self._base_path(token), mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            return np.empty(0, dtype=HISTORY_DTYPE)
+
+    def _read_tail(self, token: str) -> np.ndarray:
+        try:
+            with open(self._tail_path(token), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return np.empty(0, dtype=HISTORY_DTYPE)
+        # Ignora um registro parcial no fim (escrita concorrente de outro processo)
+        whole = len(data) - len(data) % HISTORY_DTYPE.itemsize
+        return np.frombuffer(data[:whole], dtype=HISTORY_DTYPE)
+
+    def _read(self, token: str) -> np.ndarray:
+        base = self._read_base(token)
+        tail = self._read_tail(token)
+        if not len(tail):
+            return base
+        if len(base) and tail['t'][0] <= base['t'][-1]:
+            # Tail já fundido numa compactação concorrente: deduplicar
+            return _dedup_sorted(np.concatenate([base, tail]))
+        return np.concatenate([base, tail])
+
+    def last_timestamp(self, token: str) -> Optional[int]:
+        tail = self._read_tail(token)
+        if len(tail):
+            return int(tail['t'][-1])
+        base = self._read_base(token)
+        return int(base['t'][-1]) if len(base) else None
+
+    def load(self, token: str, start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+        """Pontos com start <= t <= end (segundos). Retorna cópia (array estruturado t/p)."""
+        records = self._read(token)
+        lo = int(np.searchsorted(records['t'], start, side='left')) if start is not None else 0
+        hi = int(np.searchsorted(records['t'], end, side='right')) if end is not None else len(records)
+        return np.array(records[lo:hi])
+
+    def tokens(self) -> List[str]:
+        names = set()
+        for name in os.listdir(self.root):
+            stem, ext = os.path.splitext(name)
+            if ext in ('.npy', '.tail'):
+                names.add(stem)
+        return sorted(names)
+
+    # ============ Escrita ============
+
+    def history_params(self, token: str, fidelity: int = 10, now: Optional[int] = None) -> Dict:
+        """Parâmetros de /prices-history: incremental se o histórico guardado ainda é recente."""
+        now = int(now or time.time())
+        last = self.last_timestamp(token)
+        if last is None or now - last > self.retention_s:
+            self.full_fetches += 1
+            return {'market': token, 'interval': '1m', 'fidelity': fidelity}
+        self.incremental_fetches += 1
+        return {'market': token, 'startTs': last + 1, 'endTs': now, 'fidelity': fidelity}
+
+    def append(self, token: str, points: Iterable) -> int:
+        """Acrescenta os pontos mais novos que o último guardado. Retorna quantos foram gravados."""
+        records = _dedup_sorted(_to_records(points))
+        with self._lock(token):
+            last = self.last_timestamp(token)
+            if last is not None:
+                records = records[records['t'] > last]
+            if not len(records):
+                return 0
+            with open(self._tail_path(token), 'ab') as f:
+                f.write(records.tobytes())
+            self.points_appended += len(records)
+            if len(self._read_tail(token)) >= self.compact_rows:
+                self._compact_locked(token)
+        return len(records)
+
+    def compact(self, token: str):
+        """Funde tail + base, aplica a retenção e troca a base atomicamente."""
+        with self._lock(token):
+            self._compact_locked(token)
+
+    def _compact_locked(self, token: str):
+        merged = _dedup_sorted(np.array(self._read(token)))
+        if len(merged):
+            cutoff = int(merged['t'][-1]) - self.retention_s
+            merged = merged[merged['t'] >= cutoff]
+        tmp_path = self._base_path(token) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, merged)
+        os.replace(tmp_path, self._base_path(token))
+        try:
+            os.remove(self._tail_path(token))
+        except FileNotFoundError:
+            pass
+
+    def compact_all(self) -> int:
+        tokens = self.tokens()
+        for token in tokens:
+            self.compact(token)
+        return len(tokens)
+
+    def stats(self) -> Dict:
+        return {
+            'full_fetches': self.full_fetches,
+            'incremental_fetches': self.incremental_fetches,
+            'points_appended': self.points_appended,
+        }
+
+
+# Instância global
+price_history_store = PriceHistoryStore()
@@ -0,0 +1,290 @@
+"""
+Captura de profiling sob demanda para o bot em execução.
+
+Disparada por SIGUSR1 (`kill -USR1 <pid>`) ou, se PROFILER_PORT estiver
+definido, por `curl http://127.0.0.1:<porta>/profile?seconds=30`. Durante
+PROFILE_SECONDS (padrão 30) grava em profiles/<timestamp>/:
+
+- stacks.folded: amostragem de todas as threads (formato folded/collapsed,
+  abre no speedscope.app ou flamegraph.pl)
+- coroutines.json / coroutines.txt: tempo de parede ativo (passos no loop),
+  CPU e tempo de vida por corrotina instrumentada (perform_trade,
+  process_data, reconcile_task, update_periodically)
+- allocations.tracemalloc / allocations.txt: snapshot do tracemalloc
+  (tracemalloc.Snapshot.load) e top alocações por linha. Roda numa segunda
+  fase (PROFILE_TRACEMALLOC_SECONDS, padrão 10) para o overhead do
+  tracemalloc não distorcer os tempos da primeira fase; mostra o que foi
+  alocado e continua vivo nessa janela.
+
+Ocioso, o custo é só um teste de flag por chamada das corrotinas quentes;
+corrotinas de vida longa (loops periódicos) são sempre envolvidas, mas só
+registram durante a captura.
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_SECONDS = float(os.getenv('PROFILE_SECONDS', '30'))
+PROFILE_SAMPLE_MS = float(os.getenv('PROFILE_SAMPLE_MS', '5'))
+PROFILER_PORT = int(os.getenv('PROFILER_PORT', '0'))  # 0 = sem endpoint HTTP
+TRACEMALLOC_FRAMES = int(os.getenv('PROFILE_TRACEMALLOC_FRAMES', '10'))
+TRACEMALLOC_SECONDS = float(os.getenv('PROFILE_TRACEMALLOC_SECONDS', '10'))
+
+
+class CoroutineStats:
+    """Agregado por corrotina (ns)."""
+    __slots__ = ['name', 'calls', 'steps', 'active_ns', 'cpu_ns', 'lifetime_ns', 'max_step_ns']
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.steps = 0
+        self.active_ns = 0
+        self.cpu_ns = 0
+        self.lifetime_ns = 0
+        self.max_step_ns = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'steps': self.steps,
+            'active_ms': round(self.active_ns / 1e6, 3),
+            'cpu_ms': round(self.cpu_ns / 1e6, 3),
+            'lifetime_ms': round(self.lifetime_ns / 1e6, 3),
+            'max_step_ms': round(self.max_step_ns / 1e6, 3),
+            'mean_active_ms': round(self.active_ns / self.calls / 1e6, 3) if self.calls else 0.0,
+        }
+
+
+@types.coroutine
+def _drive(coro, capture: 'ProfilerCapture', name: str):
+    """Executa `coro` passo a passo medindo parede e CPU de cada send/throw."""
+    perf = time.perf_counter_ns
+    cpu = time.thread_time_ns
+    started = perf()
+    send_value, error = None, None
+    while True:
+        t0, c0 = perf(), cpu()
+        try:
+            if error is not None:
+                yielded = coro.throw(error)
+            else:
+                yielded = coro.send(send_value)
+        except StopIteration as stop:
+            capture._record_step(name, perf() - t0, cpu() - c0, perf() - started)
+            return stop.value
+        except BaseException:
+            capture._record_step(name, perf() - t0, cpu() - c0, perf() - started)
+            raise
+        capture._record_step(name, perf() - t0, cpu() - c0, None)
+        try:
+            send_value, error = (yield yielded), None
+        except GeneratorExit:
+            coro.close()
+            raise
+        except BaseException as e:
+            send_value, error = None, e
+
+
+class ProfilerCapture:
+    """Controla capturas (uma por vez) e a instrumentação de corrotinas."""
+
+    def __init__(self, output_dir: str = PROFILE_DIR, sample_ms: float = PROFILE_SAMPLE_MS):
+        self.output_dir = output_dir
+        self.sample_s = sample_ms / 1000
+        self.active = False  # registrando tempos de corrotinas (fase 1)
+        self._running = False  # captura em andamento (fases 1 e 2)
+        self._coroutines: Dict[str, CoroutineStats] = {}
+        self._stacks: Counter = Counter()
+        self._lock = threading.Lock()
+        self._http: Optional[ThreadingHTTPServer] = None
+
+    # ============ Instrumentação ============
+
+    def track(self, name: Optional[str] = None, always: bool = False):
+        """Decorator para corrotinas.
+
+        Args:
+            name: Nome no relatório (padrão: __qualname__)
+            always: Envolve mesmo fora de captura (para loops de vida longa
+                iniciados antes do disparo, ex: update_periodically)
+        """
+        def decorator(fn):
+            label = name or fn.__qualname__
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                coro = fn(*args, **kwargs)
+                if not (always or self.active):
+                    return await coro
+                return await _drive(coro, self, label)
+            return wrapper
+        return decorator
+
+    def _record_step(self, name: str, wall_ns: int, cpu_ns: int, lifetime_ns: Optional[int]):
+        if not self.active:
+            return
+        stats = self._coroutines.get(name)
+        if stats is None:
+            stats = self._coroutines[name] = CoroutineStats(name)
+        stats.steps += 1
+        stats.active_ns += wall_ns
+        stats.cpu_ns += cpu_ns
+        if wall_ns > stats.max_step_ns:
+            stats.max_step_ns = wall_ns
+        if lifetime_ns is not None:
+            stats.calls += 1
+            stats.lifetime_ns += lifetime_ns
+
+    # ============ Disparo ============
+
+    def install(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Instala SIGUSR1 (Unix) e, se PROFILER_PORT > 0, o endpoint HTTP local."""
+        loop = loop or asyncio.get_running_loop()
+        if hasattr(signal, 'SIGUSR1'):
+            try:
+                loop.add_signal_handler(signal.SIGUSR1, self.trigger)
+                logger.info(f"🔬 Profiler: kill -USR1 {os.getpid()} captura {PROFILE_SECONDS:.0f}s em {self.output_dir}/")
+            except (NotImplementedError, RuntimeError) as e:
+                logger.warning(f"Profiler: SIGUSR1 indisponível ({e})")
+        if PROFILER_PORT:
+            self._start_http(PROFILER_PORT)
+
+    def trigger(self, seconds: float = PROFILE_SECONDS) -> Optional[str]:
+        """Inicia uma captura em background. Retorna o diretório de saída (None se já houver uma)."""
+        with self._lock:
+            if self._running:
+                logger.warning("Profiler: captura já em andamento")
+                return None
+            path = os.path.join(self.output_dir, time.strftime('%Y%m%d-%H%M%S'))
+            os.makedirs(path, exist_ok=True)
+            self._coroutines = {}
+            self._stacks = Counter()
+            self._running = True
+            self.active = True
+        threading.Thread(target=self._capture, args=(path, seconds), name='profiler-capture', daemon=True).start()
+        logger.info(f"🔬 Profiler: capturando {seconds:.0f}s em {path}")
+        return path
+
+    def _start_http(self, port: int):
+        capture = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path != '/profile':
+                    self.send_error(404)
+                    return
+                query = parse_qs(parsed.query)
+                seconds = float(query.get('seconds', [PROFILE_SECONDS])[0])
+                path = capture.trigger(seconds)
+                body = json.dumps({'output': path, 'seconds': seconds, 'busy': path is None}).encode()
+                self.send_response(200 if path else 409)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        # Apenas localhost: o endpoint não tem autenticação
+        self._http = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        threading.Thread(target=self._http.serve_forever, name='profiler-http', daemon=True).start()
+        logger.info(f"🔬 Profiler: GET http://127.0.0.1:{port}/profile?seconds=N")
+
+    # ============ Captura ============
+
+    def _capture(self, path: str, seconds: float):
+        started_tracemalloc = False
+        try:
+            # Fase 1: amostragem de stacks + tempos das corrotinas
+            samples = self._sample(seconds)
+            self.active = False
+            self._write_stacks(path)
+            self._write_coroutines(path, seconds)
+
+            # Fase 2: alocações (tracemalloc tem overhead alto, por isso separado)
+            started_tracemalloc = not tracemalloc.is_tracing()
+            if started_tracemalloc:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            time.sleep(min(seconds, TRACEMALLOC_SECONDS))
+            self._write_allocations(path)
+            logger.info(f"🔬 Profiler: captura concluída ({samples} amostras) em {path}")
+        except Exception as e:
+            logger.error(f"Profiler: erro na captura: {e}", exc_info=True)
+        finally:
+            self.active = False
+            if started_tracemalloc:
+                tracemalloc.stop()
+            self._running = False
+
+    def _sample(self, seconds: float) -> int:
+        """Amostra a stack de todas as threads a cada `sample_s`."""
+        me = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + seconds
+        samples = 0
+        while time.monotonic() < deadline:
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self._stacks[';'.join(reversed(stack))] += 1
+            samples += 1
+            time.sleep(self.sample_s)
+        return samples
+
+    def _write_stacks(self, path: str):
+        with open(os.path.join(path, 'stacks.folded'), 'w') as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def _write_coroutines(self, path: str, seconds: float):
+        rows = sorted((s.to_dict() for s in self._coroutines.values()), key=lambda r: r['active_ms'], reverse=True)
+        with open(os.path.join(path, 'coroutines.json'), 'w') as f:
+            json.dump({'seconds': seconds, 'coroutines': rows}, f, indent=2)
+        with open(os.path.join(path, 'coroutines.txt'), 'w') as f:
+            f.write(f"{'coroutine':<40} {'calls':>8} {'steps':>8} {'active ms':>11} {'cpu ms':>10} "
+                    f"{'max step ms':>12} {'mean ms':>9}\n")
+            for r in rows:
+                f.write(f"{r['name']:<40} {r['calls']:>8} {r['steps']:>8} {r['active_ms']:>11.1f} "
+                        f"{r['cpu_ms']:>10.1f} {r['max_step_ms']:>12.2f} {r['mean_active_ms']:>9.3f}\n")
+
+    @staticmethod
+    def _write_allocations(path: str):
+        snapshot = tracemalloc.take_snapshot()
+        snapshot.dump(os.path.join(path, 'allocations.tracemalloc'))
+        stats = snapshot.statistics('lineno')
+        with open(os.path.join(path, 'allocations.txt'), 'w') as f:
+            total = sum(s.size for s in stats)
+            f.write(f"Total rastreado: {total / 1024 / 1024:.1f} MiB em {len(stats)} linhas\n\n")
+            for stat in stats[:50]:
+                f.write(f"{stat}\n")
+
+
+# Instância global
+profiler_capture = ProfilerCapture()
@@ -7,11 +7,13 @@ import logging
 from typing import Dict
 from poly_data.book_state import book_state_manager
 from poly_data.polymarket_client import PolymarketClient
+from poly_data.profiler_capture import profiler_capture
 
 logger = logging.getLogger(__name__)
 
 RECONCILE_INTERVAL_S = 15  # Reconciliar a cada 15 segundos
 
+@profiler_capture.track('reconcile_task', always=True)
 async def reconcile_task(client: PolymarketClient):
     """Task de reconciliação (fora do hot path - FASE 5).
     
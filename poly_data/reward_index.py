@@ -0,0 +1,390 @@
+"""
+Índice incremental do Q-score de recompensas de maker e acúmulo ao vivo.
+
+Na fórmula da Polymarket cada ordem dentro de max_spread do mid pontua
+S(s) = ((v - s) / v)^2 * tamanho, com s = |preço - mid| e v = max_spread.
+O reward_tracker estimava a fatia de uma ordem como Q / (Q + 1000), com a
+concorrência fixa. Aqui cada mercado mantém o book do token1 em ticks de
+1/TICK_SCALE com três árvores de Fenwick por lado (Σs, Σp·s, Σp²·s). Como
+S(p) * s expande para (Σp²s - 2cΣps + c²Σs) / v² com c = mid ∓ v, o Q da
+janela [mid - v, mid] / [mid, mid + v] sai em O(log n) para qualquer mid:
+- mudança de nível com o mid parado: Q do lado ajustado em O(1)
+- mid mudou: o lado é recalculado pelas somas das árvores, O(log n)
+
+Nossas ordens (global_state.orders) são mapeadas no book do token1 como no
+backtest: buy token1 / sell token2 no bid, sell token1 / buy token2 no ask.
+Só contam ordens com tamanho >= min_size. O Q da concorrência é o do book
+menos o nosso, e a nossa fatia aplica a regra de dois lados da Polymarket:
+Q_min = min(Q_bid, Q_ask) fora de [0.10, 0.90]; dentro, max(min, max / 3),
+tratando a concorrência agregada como um único maker.
+
+A cada evento do book, e quando nossas ordens mudam (evento de ordem do
+canal do usuário ou update_orders), o mercado acumula
+daily_rate / 86400 * fatia * dt com a fatia em vigor desde o evento
+anterior (integral por partes constantes). snapshot() expõe fatia, taxa e acumulado no relatório de
+métricas; expected_reward() alimenta o reward_tracker, e competitor_q() e
+expected_reward() ficam disponíveis para a precificação (que ainda não os usa).
+"""
+import logging
+import math
+import os
+import time
+from array import array
+from typing import Dict, Optional, Tuple
+
+import poly_data.global_state as global_state
+from poly_data.bounded_cache import BoundedCache, STATE_CACHE_MAXSIZE
+
+logger = logging.getLogger(__name__)
+
+TICK_SCALE = 1000
+BID = 0
+ASK = 1
+# Fator de ordens de um lado só com o mid em [0.10, 0.90]
+REWARD_SINGLE_SIDED_FACTOR = float(os.getenv('REWARD_SINGLE_SIDED_FACTOR', '3.0'))
+SECONDS_PER_DAY = 86400.0
+
+
+def to_tick(price: float) -> int:
+    return int(round(float(price) * TICK_SCALE))
+
+
+def order_book_side(token_name: str, side: str) -> int:
+    """Lado no book do token1 de uma ordem ('token1'/'token2', 'buy'/'sell')."""
+    buying = side.lower() == 'buy'
+    return BID if buying == (token_name == 'token1') else ASK
+
+
+class FenwickTree:
+    """Somas de prefixo com atualização pontual, ambas O(log n)."""
+
+    __slots__ = ('n', 'tree')
+
+    def __init__(self, n: int):
+        self.n = n
+        self.tree = array('d', [0.0]) * (n + 1)
+
+    def add(self, i: int, delta: float):
+        i += 1
+        tree, n = self.tree, self.n
+        while i <= n:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i: int) -> float:
+        """Soma de [0, i]."""
+        total = 0.0
+        i = min(i, self.n - 1) + 1
+        tree = self.tree
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def range(self, lo: int, hi: int) -> float:
+        """Soma de [lo, hi]."""
+        if hi < lo:
+            return 0.0
+        return self.prefix(hi) - (self.prefix(lo - 1) if lo > 0 else 0.0)
+
+    def clear(self):
+        self.tree[:] = array('d', [0.0]) * (self.n + 1)
+
+
+class MarketRewardIndex:
+    """Book do token1 com Q da janela de recompensas por lado e acúmulo da nossa fatia."""
+
+    __slots__ = ('token1', 'token2', 'v', 'daily_rate', 'min_size', 'sizes', 'sums',
+                 'best_bid', 'best_ask', 'mid2', 'q', 'q_dirty', 'accrued', 'rate',
+                 'last_t', 'time_in_window', 'started_at')
+
+    def __init__(self, token1: str = '', token2: str = '', max_spread: float = 0.0,
+                 daily_rate: float = 0.0, min_size: float = 0.0):
+        self.token1 = token1
+        self.token2 = token2
+        self.v = max_spread / 100
+        self.daily_rate = daily_rate
+        self.min_size = min_size
+        self.sizes = (array('d', [0.0]) * (TICK_SCALE + 1), array('d', [0.0]) * (TICK_SCALE + 1))
+        # Por lado: Σs, Σp·s, Σp²·s
+        self.sums = tuple(tuple(FenwickTree(TICK_SCALE + 1) for _ in range(3)) for _ in (BID, ASK))
+        self.best_bid = -1
+        self.best_ask = TICK_SCALE + 1
+        self.mid2 = -1  # best_bid + best_ask (mid em meios ticks); -1 = sem mid
+        self.q = [0.0, 0.0]  # Q do book por lado no mid atual
+        self.q_dirty = True
+        self.accrued = 0.0
+        self.rate = 0.0  # USDC/s em vigor desde last_t
+        self.last_t: Optional[float] = None
+        self.time_in_window = 0.0
+        self.started_at = time.time()
+
+    # --- book ---
+
+    def clear(self):
+        for sizes in self.sizes:
+            sizes[:] = array('d', [0.0]) * (TICK_SCALE + 1)
+        for side_sums in self.sums:
+            for tree in side_sums:
+                tree.clear()
+        self.best_bid = -1
+        self.best_ask = TICK_SCALE + 1
+        self.mid2 = -1
+        self.q = [0.0, 0.0]
+        self.q_dirty = True
+
+    def set_level(self, side: int, tick: int, size: float):
+        if tick < 0 or tick > TICK_SCALE:
+            return
+        size = max(size, 0.0)
+        sizes = self.sizes[side]
+        delta = size - sizes[tick]
+        if delta == 0:
+            return
+        sizes[tick] = size
+        p = tick / TICK_SCALE
+        s_tree, ps_tree, p2s_tree = self.sums[side]
+        s_tree.add(tick, delta)
+        ps_tree.add(tick, p * delta)
+        p2s_tree.add(tick, p * p * delta)
+
+        if side == BID:
+            if size > 0:
+                if tick > self.best_bid:
+                    self.best_bid = tick
+            elif tick == self.best_bid:
+                best = tick - 1
+                while best >= 0 and sizes[best] <= 0:
+                    best -= 1
+                self.best_bid = best
+        else:
+            if size > 0:
+                if tick < self.best_ask:
+                    self.best_ask = tick
+            elif tick == self.best_ask:
+                best = tick + 1
+                while best <= TICK_SCALE and sizes[best] <= 0:
+                    best += 1
+                self.best_ask = best
+
+        mid2 = self.best_bid + self.best_ask if self.has_mid() else -1
+        if mid2 != self.mid2:
+            self.mid2 = mid2
+            self.q_dirty = True
+        elif not self.q_dirty and mid2 >= 0:
+            self.q[side] += self.score(side, p) * delta
+
+    def has_mid(self) -> bool:
+        return self.best_bid >= 0 and self.best_ask <= TICK_SCALE
+
+    def mid(self) -> Optional[float]:
+        return self.mid2 / (2 * TICK_SCALE) if self.mid2 >= 0 else None
+
+    def score(self, side: int, price: float) -> float:
+        """S(s) de um preço do lado `side` no mid atual (0 fora da janela)."""
+        mid = self.mid()
+        if mid is None or self.v <= 0:
+            return 0.0
+        s = mid - price if side == BID else price - mid
+        if s < 0 or s >= self.v:
+            return 0.0
+        return ((self.v - s) / self.v) ** 2
+
+    def _window_q(self, side: int) -> float:
+        mid = self.mid()
+        if mid is None or self.v <= 0:
+            return 0.0
+        if side == BID:
+            c = mid - self.v
+            lo, hi = math.ceil(c * TICK_SCALE - 1e-9), self.mid2 // 2
+        else:
+            c = mid + self.v
+            lo, hi = (self.mid2 + 1) // 2, math.floor(c * TICK_SCALE + 1e-9)
+        lo, hi = max(lo, 0), min(hi, TICK_SCALE)
+        s_tree, ps_tree, p2s_tree = self.sums[side]
+        q = (p2s_tree.range(lo, hi) - 2 * c * ps_tree.range(lo, hi) + c * c * s_tree.range(lo, hi)) / (self.v * self.v)
+        return max(q, 0.0)
+
+    def book_q(self) -> Tuple[float, float]:
+        """(Q bid, Q ask) de todo o book dentro da janela, incluindo nossas ordens."""
+        if self.q_dirty:
+            self.q = [self._window_q(BID), self._window_q(ASK)]
+            self.q_dirty = False
+        return max(self.q[BID], 0.0), max(self.q[ASK], 0.0)
+
+    # --- nossas ordens e fatia ---
+
+    def our_q(self) -> Tuple[float, float]:
+        ours = [0.0, 0.0]
+        for token_name, token in (('token1', self.token1), ('token2', self.token2)):
+            orders = global_state.orders.get(token)
+            if not orders:
+                continue
+            for side in ('buy', 'sell'):
+                order = orders.get(side) or {}
+                size = float(order.get('size') or 0)
+                if size <= 0 or size < self.min_size:
+                    continue
+                price = float(order.get('price') or 0)
+                book_side = order_book_side(token_name, side)
+                if token_name == 'token2':
+                    price = 1 - price
+                ours[book_side] += self.score(book_side, price) * size
+        return ours[BID], ours[ASK]
+
+    def competitor_q(self) -> Tuple[float, float]:
+        book_bid, book_ask = self.book_q()
+        our_bid, our_ask = self.our_q()
+        return max(book_bid - our_bid, 0.0), max(book_ask - our_ask, 0.0)
+
+    def q_min(self, q_bid: float, q_ask: float) -> float:
+        low, high = min(q_bid, q_ask), max(q_bid, q_ask)
+        mid = self.mid()
+        if mid is not None and 0.10 <= mid <= 0.90:
+            return max(low, high / REWARD_SINGLE_SIDED_FACTOR)
+        return low
+
+    def share(self) -> float:
+        if self.mid2 < 0:
+            return 0.0
+        ours = self.q_min(*self.our_q())
+        if ours <= 0:
+            return 0.0
+        competitors = self.q_min(*self.competitor_q())
+        return ours / (ours + competitors)
+
+    def accrue(self, now: float):
+        """Acumula a taxa em vigor até `now` e recalcula a taxa pelo estado atual."""
+        if self.last_t is not None and now > self.last_t:
+            dt = now - self.last_t
+            self.accrued += self.rate * dt
+            if self.rate > 0:
+                self.time_in_window += dt
+        self.last_t = now
+        self.rate = self.daily_rate / SECONDS_PER_DAY * self.share()
+
+
+class RewardIndex:
+    """Índices por mercado (condition_id), alimentados pelo feed em data_processing."""
+
+    def __init__(self):
+        self._markets: BoundedCache = BoundedCache(maxsize=STATE_CACHE_MAXSIZE, name='reward_index')
+
+    def configure(self, market: str, token1: str, token2: str, max_spread, daily_rate, min_size=0):
+        """Registra/atualiza os parâmetros de recompensa do mercado (linha de Selected Markets)."""
+        try:
+            max_spread, daily_rate = float(max_spread or 0), float(daily_rate or 0)
+            min_size = float(min_size or 0)
+        except (TypeError, ValueError):
+            return
+        index = self._markets.get(market)
+        if index is None:
+            self._markets[market] = MarketRewardIndex(str(token1), str(token2), max_spread, daily_rate, min_size)
+            return
+        index.accrue(time.time())
+        index.token1, index.token2 = str(token1), str(token2)
+        if max_spread / 100 != index.v:
+            index.v = max_spread / 100
+            index.q_dirty = True
+        index.daily_rate, index.min_size = daily_rate, min_size
+
+    def get(self, market: str) -> Optional[MarketRewardIndex]:
+        return self._markets.get(market)
+
+    def on_book(self, market: str, book: Dict):
+        """Snapshot completo: recarrega o índice a partir de all_data[market] (SortedDicts)."""
+        index = self._markets.get(market)
+        if index is None:
+            return
+        index.accrue(time.time())
+        index.clear()
+        for side, levels in ((BID, book.get('bids') or {}), (ASK, book.get('asks') or {})):
+            for price, size in levels.items():
+                index.set_level(side, to_tick(price), size)
+        index.accrue(time.time())
+
+    def on_level(self, market: str, side: str, price: float, size: float):
+        """Mudança de um nível ('bids'/'asks'); o acúmulo fica para on_commit."""
+        index = self._markets.get(market)
+        if index is not None:
+            index.set_level(BID if side == 'bids' else ASK, to_tick(price), size)
+
+    def on_commit(self, market: str):
+        """Fim de um evento: fecha o intervalo anterior e fixa a nova taxa."""
+        index = self._markets.get(market)
+        if index is not None:
+            index.accrue(time.time())
+
+    def on_orders(self):
+        """Ledger de ordens recarregado (update_orders): refaz a taxa de todos os mercados."""
+        now = time.time()
+        for index in list(self._markets.values()):
+            index.accrue(now)
+
+    def competitor_q(self, market: str, book_side: int) -> Optional[float]:
+        """Q da concorrência no lado `book_side` (BID/ASK do token1), ou None sem índice/mid."""
+        index = self._markets.get(market)
+        if index is None or index.mid2 < 0:
+            return None
+        return index.competitor_q()[book_side]
+
+    def mid(self, market: str) -> Optional[float]:
+        index = self._markets.get(market)
+        return index.mid() if index is not None else None
+
+    def expected_reward(self, market: str, token_name: str, side: str, price: float, size: float) -> Optional[float]:
+        """USDC/dia estimados se nossa ordem deste lado fosse (price, size), com as demais como estão."""
+        index = self._markets.get(market)
+        if index is None or index.mid2 < 0:
+            return None
+        book_side = order_book_side(token_name, side)
+        if token_name == 'token2':
+            price = 1 - price
+        ours = list(index.our_q())
+        token = index.token1 if token_name == 'token1' else index.token2
+        current = (global_state.orders.get(token) or {}).get(side.lower()) or {}
+        current_size = float(current.get('size') or 0)
+        if current_size >= max(index.min_size, 1e-12):
+            current_price = float(current.get('price') or 0)
+            if token_name == 'token2':
+                current_price = 1 - current_price
+            ours[book_side] -= index.score(book_side, current_price) * current_size
+        competitors = index.competitor_q()
+        if size >= index.min_size:
+            ours[book_side] += index.score(book_side, price) * size
+        q_ours = index.q_min(max(ours[BID], 0.0), max(ours[ASK], 0.0))
+        if q_ours <= 0:
+            return 0.0
+        return index.daily_rate * q_ours / (q_ours + index.q_min(*competitors))
+
+    def discard(self, market: str):
+        self._markets.pop(market, None)
+
+    def snapshot(self) -> Dict:
+        """Resumo para o relatório: fatia e taxa atuais, acumulado por mercado e total."""
+        now = time.time()
+        rows = []
+        for market, index in self._markets.items():
+            index.accrue(now)
+            elapsed = max(now - index.started_at, 1e-9)
+            book_bid, book_ask = index.book_q()
+            rows.append({
+                'market': market[:20],
+                'share': round(index.share(), 4),
+                'rate_per_day': round(index.rate * SECONDS_PER_DAY, 4),
+                'accrued': round(index.accrued, 4),
+                'in_window_pct': round(100 * index.time_in_window / elapsed, 1),
+                'book_q': (round(book_bid, 1), round(book_ask, 1)),
+            })
+        rows.sort(key=lambda row: -row['rate_per_day'])
+        return {
+            'markets': len(rows),
+            'earning': sum(1 for row in rows if row['share'] > 0),
+            'rate_per_day': round(sum(row['rate_per_day'] for row in rows), 4),
+            'accrued': round(sum(row['accrued'] for row in rows), 4),
+            'top': rows[:5],
+        }
+
+
+# Instância global
+reward_index = RewardIndex()
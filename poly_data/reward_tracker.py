@@ -6,15 +6,25 @@ import time
 from datetime import datetime
 import poly_data.global_state as global_state
 from poly_data.gspread import get_spreadsheet
+from poly_data.bounded_cache import BoundedCache, STATE_CACHE_MAXSIZE, STATE_CACHE_TTL
+from poly_data.reward_index import reward_index
 import traceback
 
 _reward_worksheet = None
 _reward_spreadsheet = None
-_last_snapshot_time = {}
+_last_snapshot_time = BoundedCache(maxsize=STATE_CACHE_MAXSIZE, ttl=STATE_CACHE_TTL, name='reward_snapshot_time')
 
 
-def estimate_order_reward(price, size, mid_price, max_spread, daily_rate):
-    """Estimate maker rewards for a single order based on Polymarket's formula."""
+# Competitor Q assumed when the market has no live reward index yet
+DEFAULT_COMPETITOR_Q = 1000
+
+
+def estimate_order_reward(price, size, mid_price, max_spread, daily_rate, competitor_q=None):
+    """Estimate maker rewards for a single order based on Polymarket's formula.
+
+    competitor_q is the Q-score of the rest of the book on the order's side
+    (reward_index.competitor_q); without it a fixed DEFAULT_COMPETITOR_Q is used.
+    """
     try:
         s = abs(price - mid_price)
         v = max_spread / 100
@@ -23,13 +33,31 @@ def estimate_order_reward(price, size, mid_price, max_spread, daily_rate):
         S = ((v - s) / v) ** 2
         Q = S * size
         hourly_rate = daily_rate / 24
-        estimated_reward = (Q / (Q + 1000)) * hourly_rate
+        if competitor_q is None:
+            competitor_q = DEFAULT_COMPETITOR_Q
+        if Q <= 0:
+            return 0
+        estimated_reward = (Q / (Q + competitor_q)) * hourly_rate
         return max(0, estimated_reward)
     except Exception as e:
         print(f"Error calculating reward: {e}")
         return 0
 
 
+def order_reward(market_id, token_name, side, price, size, mid_price, max_spread, daily_rate):
+    """Estimated hourly reward of one of our orders.
+
+    Uses reward_index.expected_reward, which maps token2 orders onto the token1
+    book (price -> 1 - price, buy <-> sell side) and applies the two-sided
+    Q_min. estimate_order_reward is only the fallback when the market has no
+    live index yet.
+    """
+    expected = reward_index.expected_reward(market_id, token_name, side, price, size)
+    if expected is not None:
+        return expected / 24
+    return estimate_order_reward(price, size, mid_price, max_spread, daily_rate)
+
+
 def log_market_snapshot(market_id, market_name):
     """Log a snapshot of current orders and estimate rewards for a market."""
     global _reward_worksheet, _reward_spreadsheet, _last_snapshot_time
@@ -67,17 +95,15 @@ def log_market_snapshot(market_id, market_name):
                 ]
                 _reward_worksheet.update('A1', [headers])
 
-        if market_id in global_state.all_data:
-            bids = global_state.all_data[market_id]['bids']
-            asks = global_state.all_data[market_id]['asks']
-            if len(bids) > 0 and len(asks) > 0:
-                best_bid = list(bids.keys())[-1]
-                best_ask = list(asks.keys())[-1]
-                mid_price = (best_bid + best_ask) / 2
-            else:
-                mid_price = 0.5
-        else:
+        # Mid from the live reward index; falls back to the local book
+        mid_price = reward_index.mid(market_id)
+        if mid_price is None:
             mid_price = 0.5
+            if market_id in global_state.all_data:
+                bids = global_state.all_data[market_id]['bids']
+                asks = global_state.all_data[market_id]['asks']
+                if len(bids) > 0 and len(asks) > 0:
+                    mid_price = (bids.peekitem(-1)[0] + asks.peekitem(0)[0]) / 2
 
         for token_name in ['token1', 'token2']:
             token_id = str(market_row[token_name])
@@ -86,9 +112,9 @@ def log_market_snapshot(market_id, market_name):
             position = global_state.positions.get(token_id, {'size': 0, 'avgPrice': 0})
 
             if orders['buy']['size'] > 0:
-                buy_reward = estimate_order_reward(
-                    orders['buy']['price'], orders['buy']['size'], mid_price,
-                    market_row['max_spread'], market_row['rewards_daily_rate']
+                buy_reward = order_reward(
+                    market_id, token_name, 'buy', orders['buy']['price'], orders['buy']['size'],
+                    mid_price, market_row['max_spread'], market_row['rewards_daily_rate']
                 )
                 # Convert all values to native Python types for JSON serialization
                 row = [
@@ -102,9 +128,9 @@ def log_market_snapshot(market_id, market_name):
                 _reward_worksheet.append_row(row, value_input_option='USER_ENTERED')
 
             if orders['sell']['size'] > 0:
-                sell_reward = estimate_order_reward(
-                    orders['sell']['price'], orders['sell']['size'], mid_price,
-                    market_row['max_spread'], market_row['rewards_daily_rate']
+                sell_reward = order_reward(
+                    market_id, token_name, 'sell', orders['sell']['price'], orders['sell']['size'],
+                    mid_price, market_row['max_spread'], market_row['rewards_daily_rate']
                 )
                 # Convert all values to native Python types for JSON serialization
                 row = [
@@ -0,0 +1,291 @@
+"""
+Coordenador do modo multiprocesso (SHARD_WORKERS > 0).
+
+Com um único event loop o número de mercados fica limitado a um núcleo
+(parsing do WebSocket, books, decisões, assinatura e HTTP no mesmo
+processo). Com SHARD_WORKERS = N, main() vira o coordenador:
+- os mercados são particionados por shard_of(condition_id) entre N
+  processos (poly_data/shard_worker.py); cada worker tem os books, o
+  WebSocket de mercado e o perform_trade do seu shard
+- o coordenador fica com a sessão do exchange (PolymarketClient), a
+  configuração (config_provider) e o WebSocket do usuário
+- eventos do usuário são roteados ao worker dono do mercado (MSG_USER)
+- intenções de ordem dos workers (MSG_INTENT) são executadas no
+  coordenador numa thread do executor, em ordem por worker (cancelamento
+  antes da nova ordem), e o resultado volta em MSG_RESULT
+- o ledger (posições e ordens abertas da API) é lido a cada
+  SHARD_LEDGER_INTERVAL_S e cada worker recebe as linhas dos seus tokens
+- a cada nova versão da configuração cada worker recebe só as linhas do
+  seu shard (MSG_CONFIG)
+Um worker que morre é reiniciado e recebe de novo configuração e ledger.
+snapshot() expõe o estado dos shards no relatório de métricas.
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+import poly_data.global_state as global_state
+from poly_data.config_provider import config_provider
+from poly_data.data_utils import get_market_ids
+from poly_data.latency_metrics import metrics
+from poly_data.position_snapshot import log_position_snapshot
+from poly_data.shard_ipc import (MSG_CONFIG, MSG_USER, MSG_POSITIONS, MSG_ORDERS, MSG_RESULT,
+                                 MSG_INTENT, MSG_STATUS, OP_CREATE, OP_CANCEL_ASSET, OP_CANCEL_MARKET, OP_MERGE,
+                                 frame, read_frame, shard_of, decode_intent, encode_result, encode_positions,
+                                 encode_orders, encode_config, decode_status)
+from poly_data.shard_worker import run_worker
+
+logger = logging.getLogger(__name__)
+
+SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', '0'))  # 0 = processo único (modo antigo)
+SHARD_LEDGER_INTERVAL_S = float(os.getenv('SHARD_LEDGER_INTERVAL_S', '10'))
+SHARD_SUPERVISE_INTERVAL_S = 5
+
+
+class WorkerHandle:
+    """Processo de um shard e o seu lado do canal."""
+
+    __slots__ = ('shard', 'process', 'reader', 'writer', 'status', 'status_at', 'executed',
+                 'failed', 'exec_ns', 'restarts', 'started_at')
+
+    def __init__(self, shard: int):
+        self.shard = shard
+        self.process = None
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.status: Dict = {}
+        self.status_at = 0.0
+        self.executed = 0
+        self.failed = 0
+        self.exec_ns = 0
+        self.restarts = -1
+        self.started_at = 0.0
+
+    def send(self, kind: int, payload: bytes = b''):
+        if self.writer is not None and not self.writer.is_closing():
+            self.writer.write(frame(kind, payload))
+
+
+class ShardCoordinator:
+    """Processos dos shards, roteamento de eventos do usuário e execução das intenções."""
+
+    def __init__(self, shards: int):
+        self.shards = shards
+        self.workers: List[WorkerHandle] = [WorkerHandle(shard) for shard in range(shards)]
+        self.market_shard: Dict[str, int] = {}
+        self.token_shard: Dict[str, int] = {}
+        self.market_tokens: Dict[str, tuple] = {}
+        self.config_payloads: Dict[int, bytes] = {}
+        self.positions_df: Optional[pd.DataFrame] = None
+        self.orders_df: Optional[pd.DataFrame] = None
+        self.routed = 0
+        self.unrouted = 0
+        self._context = multiprocessing.get_context('spawn')
+
+    def shard_for_market(self, market: str) -> int:
+        shard = self.market_shard.get(market)
+        return shard if shard is not None else shard_of(market, self.shards)
+
+    # --- processos ---
+
+    async def _spawn(self, handle: WorkerHandle):
+        parent_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        handle.process = self._context.Process(
+            target=run_worker, name=f"shard-{handle.shard}", daemon=True,
+            args=(handle.shard, self.shards, child_sock, global_state.client.browser_wallet))
+        handle.process.start()
+        child_sock.close()
+        handle.reader, handle.writer = await asyncio.open_unix_connection(sock=parent_sock)
+        handle.restarts += 1
+        handle.started_at = time.time()
+        handle.status = {}
+        logger.info(f"Shard {handle.shard} iniciado (pid {handle.process.pid})")
+        asyncio.create_task(self._serve(handle))
+        if handle.shard in self.config_payloads:
+            handle.send(MSG_CONFIG, self.config_payloads[handle.shard])
+            self._send_ledger(handle)
+
+    async def _supervise(self):
+        while True:
+            await asyncio.sleep(SHARD_SUPERVISE_INTERVAL_S)
+            for handle in self.workers:
+                if handle.process is not None and not handle.process.is_alive():
+                    logger.error(f"❌ Shard {handle.shard} terminou (exit {handle.process.exitcode}), reiniciando")
+                    if handle.writer is not None:
+                        handle.writer.close()
+                    await self._spawn(handle)
+
+    # --- intenções ---
+
+    def _execute(self, intent: Dict):
+        """Executa uma intenção com o cliente real (thread do executor). Devolve (ok, orderID)."""
+        client = global_state.client
+        op, target = intent['op'], intent['target']
+        if op == OP_CREATE:
+            resp = client.create_order(target, intent['side'], intent['price'], intent['size'],
+                                       intent['neg_risk'], use_fixed_point=False)
+            return bool(resp), (resp or {}).get('orderID', '')
+        if op == OP_CANCEL_ASSET:
+            client.cancel_all_asset(target)
+        elif op == OP_CANCEL_MARKET:
+            client.cancel_all_market(target)
+        elif op == OP_MERGE:
+            amount = int(intent['size'])
+            tokens = self.market_tokens.get(target)
+            if tokens:
+                # O worker calculou pelo ledger replicado; o valor on-chain é o limite
+                amount = min(amount, client.get_position(tokens[0])[0], client.get_position(tokens[1])[0])
+            if amount <= 0:
+                return False, ''
+            client.merge_positions(amount, target, intent['neg_risk'])
+        else:
+            return False, ''
+        return True, ''
+
+    async def _serve(self, handle: WorkerHandle):
+        loop = asyncio.get_running_loop()
+        reader = handle.reader
+        try:
+            while True:
+                kind, payload = await read_frame(reader)
+                if kind == MSG_INTENT:
+                    intent = decode_intent(payload)
+                    started = time.monotonic_ns()
+                    try:
+                        ok, order_id = await loop.run_in_executor(None, self._execute, intent)
+                    except Exception as e:
+                        logger.error(f"Shard {handle.shard}: intenção {intent['op']} em {intent['target'][:20]}... falhou: {e}")
+                        ok, order_id = False, ''
+                    handle.exec_ns += time.monotonic_ns() - started
+                    handle.executed += 1
+                    handle.failed += 0 if ok else 1
+                    handle.send(MSG_RESULT, encode_result(intent['id'], ok, order_id))
+                elif kind == MSG_STATUS:
+                    handle.status = decode_status(payload)
+                    handle.status_at = time.time()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            logger.warning(f"Shard {handle.shard}: canal fechado")
+
+    # --- configuração, ledger e eventos do usuário ---
+
+    def apply_config(self, snapshot):
+        """Recalcula o mapa mercado/token -> shard e envia a cada worker as linhas do seu shard."""
+        global_state.df, global_state.params = snapshot.df, snapshot.params
+        self.market_shard, self.token_shard, self.market_tokens = {}, {}, {}
+        shard_rows: Dict[int, List[int]] = {shard: [] for shard in range(self.shards)}
+        for position, (_, row) in enumerate(snapshot.df.iterrows()):
+            ids = get_market_ids(row)
+            if not ids:
+                continue
+            token1, token2, condition_id = ids
+            shard = shard_of(condition_id, self.shards)
+            self.market_shard[condition_id] = shard
+            self.token_shard[token1] = self.token_shard[token2] = shard
+            self.market_tokens[condition_id] = (token1, token2)
+            shard_rows[shard].append(position)
+        for handle in self.workers:
+            df = snapshot.df.iloc[shard_rows[handle.shard]].reset_index(drop=True)
+            self.config_payloads[handle.shard] = encode_config(snapshot.version, snapshot.content_hash,
+                                                               df, snapshot.params)
+            handle.send(MSG_CONFIG, self.config_payloads[handle.shard])
+        logger.info(f"Config {snapshot.summary()} distribuída: "
+                    f"{[len(rows) for rows in shard_rows.values()]} mercados por shard")
+
+    def _send_ledger(self, handle: WorkerHandle):
+        positions, orders = [], []
+        if self.positions_df is not None and len(self.positions_df):
+            for asset, size, avg_price in self.positions_df[['asset', 'size', 'avgPrice']].itertuples(index=False):
+                if self.token_shard.get(str(asset)) == handle.shard:
+                    positions.append((str(asset), size, avg_price))
+        if self.orders_df is not None and len(self.orders_df):
+            columns = ['asset_id', 'side', 'price', 'original_size', 'size_matched']
+            for row in self.orders_df[columns].itertuples(index=False):
+                if self.token_shard.get(str(row[0])) == handle.shard:
+                    orders.append((str(row[0]),) + tuple(row[1:]))
+        handle.send(MSG_POSITIONS, encode_positions(positions))
+        handle.send(MSG_ORDERS, encode_orders(orders))
+
+    async def refresh_ledger(self):
+        loop = asyncio.get_running_loop()
+        client = global_state.client
+        self.positions_df = await loop.run_in_executor(None, client.get_all_positions)
+        self.orders_df = await loop.run_in_executor(None, client.get_all_orders)
+        for handle in self.workers:
+            self._send_ledger(handle)
+
+    async def route_user_data(self, json_data):
+        """Handler do WebSocket do usuário: cada linha vai para o worker dono do mercado."""
+        rows = [json_data] if isinstance(json_data, dict) else json_data
+        for row in rows:
+            market = row.get('market') if isinstance(row, dict) else None
+            if not market:
+                self.unrouted += 1
+                continue
+            self.workers[self.shard_for_market(market)].send(MSG_USER, json.dumps(row).encode())
+            self.routed += 1
+
+    async def _update_periodically(self):
+        """Configuração e ledger a cada SHARD_LEDGER_INTERVAL_S; snapshot e relatório a cada 5 minutos."""
+        i = 1
+        while True:
+            await asyncio.sleep(SHARD_LEDGER_INTERVAL_S)
+            try:
+                snapshot = config_provider.poll()
+                if snapshot is not None:
+                    self.apply_config(snapshot)
+                await self.refresh_ledger()
+                if i % 30 == 0:
+                    log_position_snapshot()
+                    logger.info(metrics.report())
+                i = i + 1 if i < 30 else 1
+            except Exception as e:
+                logger.error(f"Erro na atualização do coordenador: {e}")
+
+    def snapshot(self) -> Dict:
+        now = time.time()
+        shards = []
+        for handle in self.workers:
+            alive = handle.process is not None and handle.process.is_alive()
+            shards.append(dict(
+                handle.status, shard=handle.shard, pid=handle.process.pid if handle.process else None,
+                alive=alive, restarts=max(handle.restarts, 0), executed=handle.executed, failed=handle.failed,
+                avg_exec_ms=round(handle.exec_ns / handle.executed / 1e6, 1) if handle.executed else None,
+                status_age_s=round(now - handle.status_at, 1) if handle.status_at else None))
+        return {
+            'workers': self.shards,
+            'alive': sum(1 for shard in shards if shard['alive']),
+            'user_events_routed': self.routed,
+            'user_events_unrouted': self.unrouted,
+            'shards': shards,
+        }
+
+    async def run(self):
+        """Configuração inicial, workers, tarefas periódicas e o WebSocket do usuário (não retorna)."""
+        from poly_data.websocket_handlers import connect_user_websocket
+        snapshot = config_provider.poll()
+        if snapshot is not None:
+            self.apply_config(snapshot)
+        await self.refresh_ledger()
+        for handle in self.workers:
+            await self._spawn(handle)
+        metrics.register_source('shards', self.snapshot)
+        asyncio.create_task(self._update_periodically())
+        asyncio.create_task(self._supervise())
+
+        backoff_time = 5
+        while True:
+            try:
+                await connect_user_websocket(handler=self.route_user_data)
+                logger.info("Reconnecting to the user websocket")
+                backoff_time = 5
+            except Exception as e:
+                logger.error(f"Error in coordinator loop: {e}")
+                await asyncio.sleep(backoff_time)
+                backoff_time = min(backoff_time * 2, 60)
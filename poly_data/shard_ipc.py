@@ -0,0 +1,169 @@
+"""
+Canal entre o coordenador e os workers de shard (SHARD_WORKERS > 0).
+
+Cada worker fala com o coordenador por um par de sockets Unix
+(socket.socketpair), com frames binários: cabeçalho '<IB' (tamanho do
+payload, tipo) + payload. O caminho quente (intenções de ordem, resultados,
+posições e ordens do ledger) usa struct com campos fixos e ids como strings
+com prefixo de tamanho; eventos do WebSocket do usuário seguem como o JSON
+recebido (uma linha por frame) e a configuração (rara) vai em pickle.
+
+shard_of() distribui os mercados por crc32(condition_id), estável entre
+processos e reinícios (hash() do Python não é).
+"""
+import asyncio
+import pickle
+import struct
+import zlib
+from typing import Dict, List, Tuple
+
+# Coordenador -> worker
+MSG_CONFIG = 1
+MSG_USER = 2
+MSG_POSITIONS = 3
+MSG_ORDERS = 4
+MSG_RESULT = 5
+MSG_STOP = 6
+# Worker -> coordenador
+MSG_INTENT = 10
+MSG_STATUS = 11
+
+# Operações de uma intenção
+OP_CREATE = 1
+OP_CANCEL_ASSET = 2
+OP_CANCEL_MARKET = 3
+OP_MERGE = 4
+
+SIDES = {'BUY': 0, 'SELL': 1}
+SIDE_NAMES = ('BUY', 'SELL')
+
+_HEADER = struct.Struct('<IB')
+_STR_LEN = struct.Struct('<H')
+_COUNT = struct.Struct('<I')
+_INTENT = struct.Struct('<IBBBdd')  # id, op, side, neg_risk, price, size (+ id do token/mercado)
+_RESULT = struct.Struct('<IB')  # id, ok (+ orderID)
+_POSITION = struct.Struct('<dd')  # size, avgPrice
+_ORDER = struct.Struct('<Bddd')  # side, price, original_size, size_matched
+_STATUS = struct.Struct('<IIIQQ')  # mercados, assets, posições, eventos do usuário, intenções
+
+# Limite de um frame (proteção contra fluxo corrompido)
+MAX_FRAME = 64 * 1024 * 1024
+
+
+def shard_of(condition_id: str, shards: int) -> int:
+    return zlib.crc32(str(condition_id).encode()) % shards if shards > 1 else 0
+
+
+def frame(kind: int, payload: bytes = b'') -> bytes:
+    if len(payload) > MAX_FRAME:
+        raise ValueError(f"Payload de {len(payload)} bytes excede MAX_FRAME")
+    return _HEADER.pack(len(payload), kind) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    """Próximo frame (tipo, payload); IncompleteReadError quando o outro lado fecha."""
+    length, kind = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    if length > MAX_FRAME:
+        raise ValueError(f"Frame de {length} bytes excede MAX_FRAME")
+    return kind, await reader.readexactly(length) if length else b''
+
+
+def _pack_str(value: str) -> bytes:
+    data = str(value).encode()
+    return _STR_LEN.pack(len(data)) + data
+
+
+def _unpack_str(buf: bytes, offset: int) -> Tuple[str, int]:
+    (n,) = _STR_LEN.unpack_from(buf, offset)
+    offset += _STR_LEN.size
+    return bytes(buf[offset:offset + n]).decode(), offset + n
+
+
+# --- intenções de ordem e resultados ---
+
+def encode_intent(intent_id: int, op: int, target: str, side: str = 'BUY', price: float = 0.0,
+                  size: float = 0.0, neg_risk: bool = False) -> bytes:
+    return _INTENT.pack(intent_id, op, SIDES.get(side.upper(), 0), int(bool(neg_risk)),
+                        float(price), float(size)) + _pack_str(target)
+
+
+def decode_intent(payload: bytes) -> Dict:
+    intent_id, op, side, neg_risk, price, size = _INTENT.unpack_from(payload, 0)
+    target, _ = _unpack_str(payload, _INTENT.size)
+    return {'id': intent_id, 'op': op, 'target': target, 'side': SIDE_NAMES[side],
+            'price': price, 'size': size, 'neg_risk': bool(neg_risk)}
+
+
+def encode_result(intent_id: int, ok: bool, order_id: str = '') -> bytes:
+    return _RESULT.pack(intent_id, int(bool(ok))) + _pack_str(order_id or '')
+
+
+def decode_result(payload: bytes) -> Tuple[int, bool, str]:
+    intent_id, ok = _RESULT.unpack_from(payload, 0)
+    order_id, _ = _unpack_str(payload, _RESULT.size)
+    return intent_id, bool(ok), order_id
+
+
+# --- ledger (posições e ordens abertas) ---
+
+def encode_positions(rows: List[Tuple[str, float, float]]) -> bytes:
+    """[(asset, size, avgPrice)]"""
+    parts = [_COUNT.pack(len(rows))]
+    for asset, size, avg_price in rows:
+        parts.append(_pack_str(asset))
+        parts.append(_POSITION.pack(float(size), float(avg_price)))
+    return b''.join(parts)
+
+
+def decode_positions(payload: bytes) -> List[Tuple[str, float, float]]:
+    (count,) = _COUNT.unpack_from(payload, 0)
+    offset = _COUNT.size
+    rows = []
+    for _ in range(count):
+        asset, offset = _unpack_str(payload, offset)
+        size, avg_price = _POSITION.unpack_from(payload, offset)
+        offset += _POSITION.size
+        rows.append((asset, size, avg_price))
+    return rows
+
+
+def encode_orders(rows: List[Tuple[str, str, float, float, float]]) -> bytes:
+    """[(asset_id, side, price, original_size, size_matched)]"""
+    parts = [_COUNT.pack(len(rows))]
+    for asset, side, price, original_size, size_matched in rows:
+        parts.append(_pack_str(asset))
+        parts.append(_ORDER.pack(SIDES.get(str(side).upper(), 0), float(price),
+                                 float(original_size), float(size_matched)))
+    return b''.join(parts)
+
+
+def decode_orders(payload: bytes) -> List[Tuple[str, str, float, float, float]]:
+    (count,) = _COUNT.unpack_from(payload, 0)
+    offset = _COUNT.size
+    rows = []
+    for _ in range(count):
+        asset, offset = _unpack_str(payload, offset)
+        side, price, original_size, size_matched = _ORDER.unpack_from(payload, offset)
+        offset += _ORDER.size
+        rows.append((asset, SIDE_NAMES[side], price, original_size, size_matched))
+    return rows
+
+
+# --- configuração e status ---
+
+def encode_config(version: int, content_hash: str, df, params: Dict) -> bytes:
+    return pickle.dumps((version, content_hash, df, params), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def decode_config(payload: bytes):
+    return pickle.loads(payload)
+
+
+def encode_status(markets: int, assets: int, positions: int, user_events: int, intents: int) -> bytes:
+    return _STATUS.pack(markets, assets, positions, user_events, intents)
+
+
+def decode_status(payload: bytes) -> Dict:
+    markets, assets, positions, user_events, intents = _STATUS.unpack(payload)
+    return {'markets': markets, 'assets': assets, 'positions': positions,
+            'user_events': user_events, 'intents': intents}
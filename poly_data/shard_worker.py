@@ -0,0 +1,290 @@
+"""
+Worker de shard (SHARD_WORKERS > 0): books e decisões de um subconjunto de mercados.
+
+O worker roda o mesmo código do processo único (data_processing,
+perform_trade, update_markets/update_positions/update_orders) para os
+mercados do seu shard, com dois substitutos instalados no início:
+- global_state.client = ShardClient: create_order, cancel_all_asset,
+  cancel_all_market e merge_positions viram intenções enviadas ao
+  coordenador (que tem a sessão do exchange e assina); a resposta é
+  imediata ({'orderID': 'intent-N', 'status': 'queued'}, registrada no
+  Trade Log como QUEUED) e o resultado chega depois em MSG_RESULT, quando
+  a ordem é registrada de novo como PLACED (orderID real) ou FAILED. get_all_positions/get_all_orders/get_position leem o ledger
+  que o coordenador replica (MSG_POSITIONS/MSG_ORDERS).
+- data_utils.config_provider = ShardConfigProvider: a configuração do shard
+  (linhas de Selected Markets já filtradas) chega em MSG_CONFIG; o
+  update_markets aplica versões e diffs como antes.
+
+O WebSocket de mercado é aberto pelo próprio worker, só com os assets do
+shard. Eventos do usuário chegam roteados pelo coordenador (MSG_USER) e são
+processados em ordem por process_user_data. A inicialização de BookStates
+por HTTP e o reconcile_task ficam no modo de processo único (o worker não
+faz chamadas REST).
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import pandas as pd
+
+import poly_data.global_state as global_state
+import poly_data.data_utils as data_utils
+from poly_data.config_provider import ConfigSnapshot
+from poly_data.book_export import book_export, BOOK_EXPORT_ENABLED
+from poly_data.fixed_point import FixedPointPrice, FixedPointSize, USE_FIXED_POINT
+from poly_data.trade_logger import log_trade_to_sheets
+from poly_data.shard_ipc import (MSG_CONFIG, MSG_USER, MSG_POSITIONS, MSG_ORDERS, MSG_RESULT, MSG_STOP,
+                                 MSG_INTENT, MSG_STATUS, OP_CREATE, OP_CANCEL_ASSET, OP_CANCEL_MARKET, OP_MERGE,
+                                 frame, read_frame, encode_intent, decode_result, decode_positions,
+                                 decode_orders, decode_config, encode_status)
+
+logger = logging.getLogger(__name__)
+
+SHARD_STATUS_INTERVAL_S = 10
+
+POSITION_COLUMNS = ['asset', 'size', 'avgPrice']
+ORDER_COLUMNS = ['asset_id', 'side', 'price', 'original_size', 'size_matched']
+
+
+def _question(token: str) -> str:
+    """Pergunta do mercado de um token, pela configuração atual do shard."""
+    df = global_state.df
+    if df is not None and len(df):
+        rows = df[(df['token1'].astype(str) == token) | (df['token2'].astype(str) == token)]
+        if len(rows):
+            return rows.iloc[0].get('question', 'Unknown')
+    return 'Unknown'
+
+
+class ShardClient:
+    """Cliente do worker: ordens viram intenções ao coordenador, leituras vêm do ledger replicado."""
+
+    def __init__(self, writer: asyncio.StreamWriter, browser_wallet: str):
+        self.writer = writer
+        self.browser_wallet = browser_wallet
+        self._order_book_cache: Dict = {}
+        self.positions_df = pd.DataFrame(columns=POSITION_COLUMNS)
+        self.orders_df = pd.DataFrame(columns=ORDER_COLUMNS)
+        self._next_id = 0
+        self.intents = 0
+        self.failed = 0
+        self.pending: Dict[int, tuple] = {}  # id -> (op, alvo, enviado em, (lado, preço, tamanho, neg_risk))
+
+    def _send(self, op: int, target: str, side: str = 'BUY', price: float = 0.0,
+              size: float = 0.0, neg_risk: bool = False) -> int:
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        intent_id = self._next_id
+        self.pending[intent_id] = (op, str(target), time.monotonic(), (side, price, size, neg_risk))
+        self.writer.write(frame(MSG_INTENT, encode_intent(intent_id, op, str(target), side, price, size, neg_risk)))
+        self.intents += 1
+        return intent_id
+
+    def on_result(self, intent_id: int, ok: bool, order_id: str):
+        op, target, sent_at, order = self.pending.pop(intent_id, (0, '', time.monotonic(), None))
+        if not ok:
+            self.failed += 1
+            logger.error(f"❌ Intenção {intent_id} (op {op}) para {target[:20]}... falhou no coordenador")
+        else:
+            logger.debug(f"Intenção {intent_id} executada em {(time.monotonic() - sent_at) * 1000:.1f}ms: {order_id}")
+        if op == OP_CREATE and order is not None:
+            self._log_order_result(intent_id, ok, order_id, target, order)
+
+    def _log_order_result(self, intent_id: int, ok: bool, order_id: str, token: str, order: tuple):
+        """Completa a linha QUEUED do Trade Log com o resultado do coordenador (fora do event loop)."""
+        side, price, size, neg_risk = order
+        row = {
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'action': side,
+            'market': _question(token),
+            'price': price,
+            'size': size,
+            'order_id': order_id if ok and order_id else 'FAILED',
+            'status': 'PLACED' if ok else 'FAILED',
+            'token_id': token,
+            'neg_risk': neg_risk,
+            'notes': f"intent-{intent_id}",
+        }
+        try:
+            asyncio.get_running_loop().run_in_executor(None, log_trade_to_sheets, row)
+        except RuntimeError:
+            log_trade_to_sheets(row)
+
+    # --- interface usada por trading.py / data_utils.py ---
+
+    def create_order(self, marketId, action, price, size, neg_risk=False, use_fixed_point=True):
+        if use_fixed_point and USE_FIXED_POINT:
+            price, size = FixedPointPrice.to_float_safe(price), FixedPointSize.to_float_safe(size)
+        intent_id = self._send(OP_CREATE, marketId, action, float(price), float(size), neg_risk)
+        return {'orderID': f"intent-{intent_id}", 'status': 'queued'}
+
+    def cancel_all_asset(self, asset_id):
+        self._send(OP_CANCEL_ASSET, asset_id)
+
+    def cancel_all_market(self, marketId):
+        self._send(OP_CANCEL_MARKET, marketId)
+
+    def merge_positions(self, amount_to_merge, condition_id, is_neg_risk_market):
+        self._send(OP_MERGE, condition_id, size=float(amount_to_merge), neg_risk=is_neg_risk_market)
+
+    def get_position(self, tokenId):
+        """(posição bruta, shares) pelo ledger replicado (o coordenador confere on-chain no merge)."""
+        rows = self.positions_df[self.positions_df['asset'] == str(tokenId)]
+        shares = float(rows.iloc[0]['size']) if len(rows) else 0.0
+        raw_position = int(shares * 1e6)
+        if shares < 1:
+            shares = 0
+        return raw_position, shares
+
+    def get_all_positions(self):
+        return self.positions_df.copy()
+
+    def get_all_orders(self):
+        return self.orders_df.copy()
+
+    def set_positions(self, rows):
+        self.positions_df = pd.DataFrame(rows, columns=POSITION_COLUMNS)
+
+    def set_orders(self, rows):
+        self.orders_df = pd.DataFrame(rows, columns=ORDER_COLUMNS)
+
+
+class ShardConfigProvider:
+    """Versões de configuração recebidas do coordenador, com a interface de ConfigProvider."""
+
+    def __init__(self):
+        self.current: Optional[ConfigSnapshot] = None
+        self._pending = None
+
+    def publish(self, version: int, content_hash: str, df: pd.DataFrame, params: Dict):
+        self._pending = (version, content_hash, df, params)
+
+    def poll(self) -> Optional[ConfigSnapshot]:
+        if self._pending is None:
+            return None
+        version, content_hash, df, params = self._pending
+        self._pending = None
+        self.current = ConfigSnapshot(version, content_hash, df, params, previous=self.current)
+        return self.current
+
+    def snapshot(self) -> Dict:
+        current = self.current
+        return {
+            'source': 'coordinator',
+            'version': current.version if current else None,
+            'markets': len(current.df) if current else 0,
+            'age_s': round(time.time() - current.created_at, 1) if current else None,
+        }
+
+
+class ShardWorker:
+    """Loop de um worker: canal com o coordenador, WebSocket de mercado e tarefas periódicas."""
+
+    def __init__(self, shard: int, shards: int):
+        self.shard = shard
+        self.shards = shards
+        self.client: Optional[ShardClient] = None
+        self.config = ShardConfigProvider()
+        self.user_events = 0
+        # Criados em run(), dentro do event loop do worker
+        self.user_queue: Optional[asyncio.Queue] = None
+        self.config_ready: Optional[asyncio.Event] = None
+        self.ledger_ready: Optional[asyncio.Event] = None
+        self.stopped: Optional[asyncio.Event] = None
+
+    async def _read_channel(self, reader: asyncio.StreamReader):
+        positions_seen = orders_seen = False
+        try:
+            while True:
+                kind, payload = await read_frame(reader)
+                if kind == MSG_USER:
+                    self.user_queue.put_nowait(payload)
+                elif kind == MSG_RESULT:
+                    self.client.on_result(*decode_result(payload))
+                elif kind == MSG_POSITIONS:
+                    self.client.set_positions(decode_positions(payload))
+                    positions_seen = True
+                elif kind == MSG_ORDERS:
+                    self.client.set_orders(decode_orders(payload))
+                    orders_seen = True
+                elif kind == MSG_CONFIG:
+                    self.config.publish(*decode_config(payload))
+                    self.config_ready.set()
+                elif kind == MSG_STOP:
+                    break
+                if positions_seen and orders_seen:
+                    self.ledger_ready.set()
+        except asyncio.IncompleteReadError:
+            logger.error(f"Shard {self.shard}: canal com o coordenador fechado")
+        self.stopped.set()
+
+    async def _process_user_events(self):
+        from poly_data.data_processing import process_user_data
+        while True:
+            payload = await self.user_queue.get()
+            self.user_events += 1
+            try:
+                await process_user_data(json.loads(payload))
+            except Exception as e:
+                logger.error(f"Shard {self.shard}: erro no evento do usuário: {e}")
+
+    async def _report_status(self):
+        while True:
+            await asyncio.sleep(SHARD_STATUS_INTERVAL_S)
+            df = global_state.df
+            self.client.writer.write(frame(MSG_STATUS, encode_status(
+                len(df) if df is not None else 0, len(global_state.subscribed_assets),
+                len(global_state.positions), self.user_events, self.client.intents)))
+
+    async def _market_feed(self):
+        from poly_data.websocket_handlers import connect_market_websocket
+        backoff_time = 5
+        while True:
+            try:
+                await connect_market_websocket(list(global_state.subscribed_assets))
+                logger.info(f"Shard {self.shard}: reconectando ao WebSocket de mercado")
+                backoff_time = 5
+            except Exception as e:
+                logger.error(f"Shard {self.shard}: erro no WebSocket de mercado: {e}")
+                await asyncio.sleep(backoff_time)
+                backoff_time = min(backoff_time * 2, 60)
+
+    async def run(self, sock, browser_wallet: str):
+        self.user_queue = asyncio.Queue()
+        self.config_ready, self.ledger_ready, self.stopped = asyncio.Event(), asyncio.Event(), asyncio.Event()
+        reader, writer = await asyncio.open_unix_connection(sock=sock)
+        self.client = ShardClient(writer, browser_wallet)
+        global_state.client = self.client
+        data_utils.config_provider = self.config
+        asyncio.create_task(self._read_channel(reader))
+        if BOOK_EXPORT_ENABLED:
+            try:
+                book_export.open(suffix=f".{self.shard}")
+            except OSError as e:
+                logger.warning(f"Shard {self.shard}: exportação de books desligada: {e}")
+
+        await self.config_ready.wait()
+        await self.ledger_ready.wait()
+        global_state.all_tokens = []
+        data_utils.update_markets()
+        data_utils.update_positions()
+        data_utils.update_orders()
+        logger.info(f"Shard {self.shard}/{self.shards}: {len(global_state.df)} mercados, "
+                    f"{len(global_state.subscribed_assets)} assets")
+
+        # Snapshots de posição (carteira inteira) ficam com o coordenador
+        from poly_data.periodic_updates import update_periodically
+        tasks = [asyncio.create_task(coro) for coro in (
+            update_periodically(snapshots=False), self._process_user_events(), self._report_status(), self._market_feed())]
+        await self.stopped.wait()
+        for task in tasks:
+            task.cancel()
+
+
+def run_worker(shard: int, shards: int, sock, browser_wallet: str):
+    """Ponto de entrada do processo do worker."""
+    logger.info(f"Shard {shard}/{shards} iniciando (pid {os.getpid()})")
+    asyncio.run(ShardWorker(shard, shards).run(sock, browser_wallet))
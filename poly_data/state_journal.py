@@ -0,0 +1,368 @@
+"""
+Journal de estado em disco para reinício a quente (warm restart).
+
+No reinício, main() refazia tudo do zero antes de cotar: sessão da API,
+planilha, todas as posições e ordens e os books. Até lá o bot ficava cego
+e ordens antigas continuavam no book.
+
+Agora cada mutação do estado é anexada a STATE_JOURNAL_DIR/journal.log
+(padrão data/state):
+- posições (set_position e update_positions)
+- ledger de ordens (set_order e update_orders)
+- risk-off do stop-loss (positions/<mercado>.json)
+- versão da configuração
+
+Cada linha tem o crc32 do registro, e uma linha cortada no fim (queda no
+meio da escrita) é descartada na leitura. As atualizações completas
+(update_positions/update_orders a cada 10s) só gravam os tokens que
+mudaram em relação ao espelho do journal. A cada STATE_SNAPSHOT_EVERY
+registros, e a cada nova versão da configuração, o estado é compactado em
+snapshot.pkl (escrita atômica, com o DataFrame e os parâmetros da
+configuração) e o journal recomeça. Registros com seq até a do snapshot
+são ignorados no replay, então uma queda entre os dois passos não duplica
+nada.
+
+No início, restore() carrega o snapshot e reaplica o journal em
+global_state, se o estado for da mesma carteira e tiver menos de
+STATE_WARM_MAX_AGE_S. O main aplica a configuração restaurada (sem ler a
+planilha) e faz só a checagem mínima: busca as ordens abertas, para
+conhecer e cancelar ordens antigas. Depois volta a cotar, e verify()
+confere as posições com o exchange em segundo plano.
+
+Cada registro faz flush (sobrevive à queda do processo);
+STATE_JOURNAL_FSYNC=true também faz fsync (sobrevive à queda da máquina).
+No modo multiprocesso o journal fica desligado (o ledger é do coordenador).
+STATE_JOURNAL=false desliga o journal.
+"""
+import asyncio
+import json
+import logging
+import os
+import pickle
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Optional
+
+import poly_data.global_state as global_state
+
+logger = logging.getLogger(__name__)
+
+STATE_JOURNAL_ENABLED = os.getenv('STATE_JOURNAL', 'true').lower() == 'true'
+STATE_JOURNAL_DIR = os.getenv('STATE_JOURNAL_DIR', os.path.join('data', 'state'))
+STATE_JOURNAL_FSYNC = os.getenv('STATE_JOURNAL_FSYNC', 'false').lower() == 'true'
+STATE_SNAPSHOT_EVERY = int(os.getenv('STATE_SNAPSHOT_EVERY', '5000'))
+STATE_WARM_MAX_AGE_S = float(os.getenv('STATE_WARM_MAX_AGE_S', '3600'))
+
+SNAPSHOT_FILE = 'snapshot.pkl'
+JOURNAL_FILE = 'journal.log'
+LAYOUT_VERSION = 1
+
+# Tipos de registro
+POSITION = 'p'
+ORDER = 'o'
+RISK = 'r'
+CONFIG = 'c'
+
+# Diferença de tamanho (shares) tratada como divergência na verificação
+POSITION_TOLERANCE = 0.01
+
+
+def _plain(value):
+    """Cópia só com tipos do JSON (valores do pandas/numpy viram float)."""
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (str, bool)) or value is None:
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _risk_active(details: Dict, now: datetime) -> bool:
+    try:
+        return datetime.fromisoformat(str(details.get('sleep_till'))) > now
+    except ValueError:
+        return True
+
+
+class StateJournal:
+    """Journal append-only + snapshots compactados do estado de trading."""
+
+    def __init__(self, directory: str = STATE_JOURNAL_DIR, snapshot_every: int = STATE_SNAPSHOT_EVERY):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.file = None
+        self.wallet = ''
+        self.seq = 0
+        # Espelho do estado gravado (base dos diffs e da compactação)
+        self.positions: Dict[str, Dict] = {}
+        self.orders: Dict[str, Dict] = {}
+        self.risk: Dict[str, Dict] = {}
+        self.config = None  # (versão, hash, df, params)
+        self.config_version = None
+        self.records = 0
+        self.since_snapshot = 0
+        self.snapshots = 0
+        self.write_ns = 0
+        # Reinício a quente
+        self.warm = False
+        self.restored_at = None
+        self.restored_age_s = None
+        self.replayed = 0
+        self.torn = 0
+        self.drift = None
+        self.verified_in_s = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    # --- escrita ---
+
+    def open(self, wallet: str = ''):
+        """Compacta o estado atual do espelho e abre um journal novo."""
+        os.makedirs(self.directory, exist_ok=True)
+        self.wallet = str(wallet)
+        self.compact()
+        logger.info(f"Journal de estado em {self.directory} ({len(self.positions)} posições, "
+                    f"{len(self.orders)} ordens, config v{self.config_version})")
+
+    def _append(self, kind: str, key, value):
+        if self.file is None:
+            return
+        started = time.perf_counter_ns()
+        self.seq += 1
+        body = json.dumps([self.seq, time.time(), kind, key, value], separators=(',', ':'))
+        self.file.write(f"{zlib.crc32(body.encode()):08x} {body}\n")
+        self.file.flush()
+        if STATE_JOURNAL_FSYNC:
+            os.fsync(self.file.fileno())
+        self.records += 1
+        self.since_snapshot += 1
+        self.write_ns += time.perf_counter_ns() - started
+        if self.since_snapshot >= self.snapshot_every:
+            self.compact()
+
+    def _sync(self, kind: str, mirror: Dict, current: Dict, key: Optional[str] = None):
+        """Grava os tokens que mudaram em `current` (um token se key, senão todos)."""
+        if self.file is None:
+            return
+        keys = [key] if key is not None else set(mirror) | set(current)
+        for token in keys:
+            value = current.get(token)
+            value = _plain(value) if value is not None else None
+            if mirror.get(token) == value:
+                continue
+            if value is None:
+                mirror.pop(token, None)
+            else:
+                mirror[token] = value
+            self._append(kind, token, value)
+
+    def position(self, token: str):
+        self._sync(POSITION, self.positions, global_state.positions, str(token))
+
+    def all_positions(self):
+        self._sync(POSITION, self.positions, global_state.positions)
+
+    def order(self, token: str):
+        self._sync(ORDER, self.orders, global_state.orders, str(token))
+
+    def all_orders(self):
+        self._sync(ORDER, self.orders, global_state.orders)
+
+    def risk_off(self, market: str, details: Dict):
+        """Risk-off do stop-loss (mesmo conteúdo de positions/<mercado>.json)."""
+        market = str(market)
+        self.risk[market] = _plain(details)
+        self._append(RISK, market, self.risk[market])
+
+    def config_applied(self, snapshot):
+        """Nova versão da configuração aplicada (compacta para o snapshot levar o DataFrame)."""
+        if snapshot.version == self.config_version and self.config is not None:
+            return
+        self.config = (snapshot.version, snapshot.content_hash, snapshot.df, snapshot.params)
+        self.config_version = snapshot.version
+        self._append(CONFIG, snapshot.version, snapshot.content_hash)
+        if self.file is not None:
+            self.compact()
+
+    def compact(self):
+        """Grava o snapshot (atômico) e recomeça o journal."""
+        now = datetime.utcnow()
+        self.risk = {market: details for market, details in self.risk.items() if _risk_active(details, now)}
+        state = {
+            'layout': LAYOUT_VERSION,
+            'wallet': self.wallet,
+            'seq': self.seq,
+            'saved_at': time.time(),
+            'positions': self.positions,
+            'orders': self.orders,
+            'risk': self.risk,
+            'config': self.config,
+        }
+        path = self._path(SNAPSHOT_FILE)
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        if self.file is not None:
+            self.file.close()
+        self.file = open(self._path(JOURNAL_FILE), 'w')
+        self.since_snapshot = 0
+        self.snapshots += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    # --- reinício a quente ---
+
+    def _load(self) -> Optional[Dict]:
+        try:
+            with open(self._path(SNAPSHOT_FILE), 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        if state.get('layout') != LAYOUT_VERSION:
+            return None
+        saved_at = state['saved_at']
+        try:
+            with open(self._path(JOURNAL_FILE)) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            lines = []
+        for line in lines:
+            crc, _, body = line.rstrip('\n').partition(' ')
+            try:
+                if int(crc, 16) != zlib.crc32(body.encode()):
+                    raise ValueError(crc)
+                seq, ts, kind, key, value = json.loads(body)
+            except ValueError:
+                # Linha cortada ou corrompida: o resto do journal não é confiável
+                self.torn += 1
+                break
+            if seq <= state['seq']:
+                continue
+            state['seq'] = seq
+            saved_at = ts
+            self.replayed += 1
+            if kind == POSITION or kind == ORDER:
+                table = state['positions'] if kind == POSITION else state['orders']
+                if value is None:
+                    table.pop(key, None)
+                else:
+                    table[key] = value
+            elif kind == RISK:
+                state['risk'][key] = value
+            elif kind == CONFIG and (state['config'] is None or state['config'][0] != key):
+                # Versão mais nova que a do snapshot (queda antes da compactação): sem o DataFrame
+                state['config'] = None
+        state['saved_at'] = saved_at
+        return state
+
+    def restore(self, wallet: str) -> bool:
+        """Carrega snapshot + journal em global_state. False se não houver estado utilizável."""
+        try:
+            state = self._load()
+        except Exception as e:
+            logger.warning(f"Journal de estado ilegível em {self.directory}: {e}")
+            return False
+        if state is None:
+            return False
+        age_s = time.time() - state['saved_at']
+        if str(state['wallet']).lower() != str(wallet).lower():
+            logger.info("Journal de estado de outra carteira; início a frio")
+            return False
+        if age_s > STATE_WARM_MAX_AGE_S:
+            logger.info(f"Journal de estado com {age_s:.0f}s (> {STATE_WARM_MAX_AGE_S:.0f}s); início a frio")
+            return False
+
+        self.seq = state['seq']
+        self.positions = state['positions']
+        self.orders = state['orders']
+        self.risk = state['risk']
+        self.config = state['config']
+        self.config_version = self.config[0] if self.config else None
+        global_state.positions = {token: dict(value) for token, value in self.positions.items()}
+        global_state.orders = {token: {side: dict(order) for side, order in value.items()}
+                               for token, value in self.orders.items()}
+        self._restore_risk_files()
+        if self.config is not None:
+            from poly_data.config_provider import config_provider
+            config_provider.restore(*self.config)
+
+        self.warm = True
+        self.restored_at = time.time()
+        self.restored_age_s = round(age_s, 1)
+        logger.info(f"♻️  Estado restaurado do journal ({age_s:.0f}s atrás, {self.replayed} registros reaplicados): "
+                    f"{len(self.positions)} posições, {len(self.orders)} ordens, {len(self.risk)} risk-off, "
+                    f"config v{self.config_version}")
+        return True
+
+    def _restore_risk_files(self):
+        now = datetime.utcnow()
+        for market, details in self.risk.items():
+            fname = 'positions/' + market + '.json'
+            if not _risk_active(details, now) or os.path.isfile(fname):
+                continue
+            os.makedirs('positions', exist_ok=True)
+            with open(fname, 'w') as f:
+                f.write(json.dumps(details))
+
+    async def verify(self):
+        """Confere as posições restauradas com o exchange, fora do caminho de cotação."""
+        from poly_data.data_utils import update_positions
+        loop = asyncio.get_running_loop()
+        try:
+            pos_df = await loop.run_in_executor(None, global_state.client.get_all_positions)
+        except Exception as e:
+            logger.error(f"Verificação do estado restaurado falhou: {e}")
+            return
+        exchange = {str(row['asset']): float(row['size']) for _, row in pos_df.iterrows()}
+        local = {token: float(value.get('size') or 0) for token, value in global_state.positions.items()}
+        drift = [token for token in set(exchange) | set(local)
+                 if abs(exchange.get(token, 0.0) - local.get(token, 0.0)) > POSITION_TOLERANCE]
+        for token in drift:
+            logger.warning(f"Posição restaurada de {token[:20]}... diverge: journal {local.get(token, 0.0)}, "
+                           f"exchange {exchange.get(token, 0.0)}")
+        # Exchange é a referência (respeitando trades em andamento, como no ciclo de 10s)
+        update_positions(avgOnly=True, pos_df=pos_df)
+        # update_positions só percorre o que o exchange devolveu: posições vendidas, mescladas
+        # ou resgatadas com o bot parado existem só no journal e são zeradas aqui
+        for token in drift:
+            if token in exchange or token not in global_state.positions:
+                continue
+            if any(global_state.performing.get(f"{token}_{side}") for side in ('buy', 'sell')):
+                logger.warning(f"Posição restaurada de {token[:20]}... não zerada: trades pendentes")
+                continue
+            last_update = global_state.last_trade_update.get(token)
+            if last_update is not None and time.time() - last_update < 5:
+                continue
+            global_state.positions[token]['size'] = 0
+        self.all_positions()
+        self.drift = len(drift)
+        self.verified_in_s = round(time.time() - self.restored_at, 1)
+        logger.info(f"✓ Estado restaurado verificado em {self.verified_in_s}s: {self.drift} posições divergentes")
+
+    def snapshot(self) -> Dict:
+        return {
+            'path': self.directory if self.file is not None else None,
+            'warm_start': self.warm,
+            'restored_age_s': self.restored_age_s,
+            'replayed': self.replayed,
+            'torn_records': self.torn,
+            'position_drift': self.drift,
+            'verified_in_s': self.verified_in_s,
+            'records': self.records,
+            'since_snapshot': self.since_snapshot,
+            'snapshots': self.snapshots,
+            'avg_write_us': round(self.write_ns / self.records / 1e3, 1) if self.records else None,
+        }
+
+
+# Instância global
+state_journal = StateJournal()
@@ -22,7 +22,7 @@ def log_trade_to_sheets(trade_data):
             - price: Order price
             - size: Order size in USDC
             - order_id: Order ID (if available)
-            - status: 'PLACED', 'FILLED', 'CANCELED', etc.
+            - status: 'PLACED', 'QUEUED' (shard worker, result pending), 'FAILED', 'FILLED', 'CANCELED', etc.
             - neg_risk: Whether it's a neg_risk market
     """
     global _worksheet, _spreadsheet
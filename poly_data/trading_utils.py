@@ -24,7 +24,7 @@ except ImportError:
 load_dotenv()
 
 def get_clob_client():
-    host = "https://clob.polymarket.com"
+    host = os.getenv("CLOB_HOST", "https://clob.polymarket.com")
     key = os.getenv("PK")
     browser_address = os.getenv("BROWSER_ADDRESS")
     chain_id = POLYGON
@@ -50,15 +50,23 @@ def get_clob_client():
     )
 
 def get_best_bid_ask_deets(market, name, size, deviation_threshold=0.05):
+    book = global_state.all_data[market]
+    return book_deets(book['bids'], book['asks'], name, size, deviation_threshold)
 
-    best_bid, best_bid_size, second_best_bid, second_best_bid_size, top_bid = find_best_price_with_size(global_state.all_data[market]['bids'], size, reverse=True)
-    best_ask, best_ask_size, second_best_ask, second_best_ask_size, top_ask = find_best_price_with_size(global_state.all_data[market]['asks'], size, reverse=False)
+
+def book_deets(bids, asks, name, size, deviation_threshold=0.05):
+    """
+    Same as get_best_bid_ask_deets, for any bids/asks mapping whose items() are
+    in ascending price order (SortedDict in the bot, ArrayBook in the backtest).
+    """
+    best_bid, best_bid_size, second_best_bid, second_best_bid_size, top_bid = find_best_price_with_size(bids, size, reverse=True)
+    best_ask, best_ask_size, second_best_ask, second_best_ask_size, top_ask = find_best_price_with_size(asks, size, reverse=False)
     
     # Handle None values in mid_price calculation
     if best_bid is not None and best_ask is not None:
         mid_price = (best_bid + best_ask) / 2
-        bid_sum_within_n_percent = sum(size for price, size in global_state.all_data[market]['bids'].items() if best_bid <= price <= mid_price * (1 + deviation_threshold))
-        ask_sum_within_n_percent = sum(size for price, size in global_state.all_data[market]['asks'].items() if mid_price * (1 - deviation_threshold) <= price <= best_ask)
+        bid_sum_within_n_percent = sum(size for price, size in bids.items() if best_bid <= price <= mid_price * (1 + deviation_threshold))
+        ask_sum_within_n_percent = sum(size for price, size in asks.items() if mid_price * (1 - deviation_threshold) <= price <= best_ask)
     else:
         mid_price = None
         bid_sum_within_n_percent = 0
@@ -226,6 +234,16 @@ def get_order_prices(best_bid, best_bid_size, top_bid,  best_ask, best_ask_size,
 
 
 
+def should_stop_loss(pnl, spread, volatility_3h, params):
+    """
+    Stop-loss rule used by perform_trade. Triggers if either:
+    1. PnL is below threshold and spread is tight enough to exit
+    2. Volatility is too high
+    """
+    return ((pnl < params['stop_loss_threshold'] and spread <= params['spread_threshold'])
+            or volatility_3h > params['volatility_threshold'])
+
+
 def round_down(number, decimals):
     factor = 10 ** decimals
     return math.floor(number * factor) / factor
@@ -7,6 +7,10 @@ import time
 
 
 def get_sheet_df():
+    return build_config(*fetch_sheet_tables(open_sheet()))
+
+
+def open_sheet():
     load_dotenv()
     scope = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
     # Check for credentials in multiple locations
@@ -23,8 +27,11 @@ def get_sheet_df():
     except Exception as e:
         print(f"Warning: Falling back to read-only mode for Google Sheets: {str(e)}")
         client = gspread.Client(auth=None)
-    sheet = client.open_by_url(os.getenv("SPREADSHEET_URL"))
+    return client.open_by_url(os.getenv("SPREADSHEET_URL"))
+
 
+def fetch_sheet_tables(sheet):
+    """Reads (and fixes headers of) Selected Markets, All Markets and Hyperparameters."""
     # Selected Markets
     try:
         worksheet = sheet.worksheet("Selected Markets")
@@ -92,6 +99,11 @@ def get_sheet_df():
         print(f"Warning: 'Hyperparameters' sheet is empty or missing required columns: {str(e)}")
         df_hyper = pd.DataFrame(columns=['type', 'param', 'value'])
 
+    return df_selected, df_all, df_hyper
+
+
+def build_config(df_selected, df_all, df_hyper):
+    """Selected/All Markets/Hyperparameters tables -> (markets DataFrame, params by type)."""
     # Transform hyperparameters DataFrame into nested dictionary
     hyperparams = {}
     current_type = None
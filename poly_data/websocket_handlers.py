@@ -2,12 +2,14 @@ import asyncio
 import json
 import websockets
 import traceback
+import os
 import ssl
 import certifi
 import logging
 
 from poly_data.data_processing import process_data, process_user_data
 import poly_data.global_state as global_state
+from poly_data.feed_recorder import feed_recorder
 
 # Configure logging
 logging.basicConfig(
@@ -20,6 +22,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+def _ws_uri(channel):
+    """WebSocket endpoint for a channel (CLOB_WS_HOST points it at a local fake_clob)."""
+    host = os.getenv("CLOB_WS_HOST", "wss://ws-subscriptions-clob.polymarket.com").rstrip('/')
+    return f"{host}/ws/{channel}"
+
+
+def _ssl_context(uri):
+    """TLS context for wss:// endpoints; plain ws:// (local fake_clob) needs none."""
+    if not uri.startswith("wss://"):
+        return None
+    ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ssl_context.load_verify_locations(cafile=certifi.where())
+    return ssl_context
+
 async def connect_market_websocket(chunk, max_retries=5, retry_delay=5):
     """
     Connect to Polymarket's market WebSocket API and process market updates.
@@ -29,9 +46,8 @@ async def connect_market_websocket(chunk, max_retries=5, retry_delay=5):
         max_retries (int): Maximum reconnection attempts
         retry_delay (int): Delay between reconnection attempts in seconds
     """
-    uri = "wss://ws-subscriptions-clob.polymarket.com/ws/market"
-    ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
-    ssl_context.load_verify_locations(cafile=certifi.where())
+    uri = _ws_uri("market")
+    ssl_context = _ssl_context(uri)
 
     for attempt in range(max_retries):
         try:
@@ -42,6 +58,8 @@ async def connect_market_websocket(chunk, max_retries=5, retry_delay=5):
                     try:
                         while True:
                             message = await websocket.recv()
+                            if feed_recorder:
+                                feed_recorder.record(message)
                             try:
                                 json_data = json.loads(message)
                                 logger.debug(f"Received market WebSocket message: {json_data}")
@@ -67,6 +85,8 @@ async def connect_market_websocket(chunk, max_retries=5, retry_delay=5):
                     logger.info(f"WebSocket connected and waiting for messages for {len(chunk)} markets...")
                     while True:
                         message = await websocket.recv()
+                        if feed_recorder:
+                            feed_recorder.record(message)
                         try:
                             json_data = json.loads(message)
                             # Handle both dict and list responses
@@ -86,7 +106,7 @@ async def connect_market_websocket(chunk, max_retries=5, retry_delay=5):
                                     # Check if market is in subscribed_assets (condition_id) or in chunk (token IDs)
                                     if market not in subscribed_assets and market not in chunk:
                                         logger.debug(f"Ignoring data for unsubscribed market: {market} (not in subscribed_assets or chunk)")
-                                    continue
+                                        continue
                                     else:
                                         logger.debug(f"Processing market {market} - found in subscribed assets: {market in subscribed_assets}, in chunk: {market in chunk}")
                                 await process_data([json_data])
@@ -112,17 +132,19 @@ async def connect_market_websocket(chunk, max_retries=5, retry_delay=5):
                 logger.error("Max retries reached for market WebSocket. Giving up.")
                 break
 
-async def connect_user_websocket(max_retries=5, retry_delay=5):
+async def connect_user_websocket(max_retries=5, retry_delay=5, handler=None):
     """
     Connect to Polymarket's user WebSocket API and process order/trade updates.
 
     Args:
         max_retries (int): Maximum reconnection attempts
         retry_delay (int): Delay between reconnection attempts in seconds
+        handler (coroutine function, optional): Receives each parsed message instead of
+            process_user_data (the shard coordinator routes them to the workers)
     """
-    uri = "wss://ws-subscriptions-clob.polymarket.com/ws/user"
-    ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
-    ssl_context.load_verify_locations(cafile=certifi.where())
+    handler = handler or process_user_data
+    uri = _ws_uri("user")
+    ssl_context = _ssl_context(uri)
 
     for attempt in range(max_retries):
         try:
@@ -168,7 +190,7 @@ async def connect_user_websocket(max_retries=5, retry_delay=5):
                                 elif json_data.get('type') == 'authenticated' or json_data.get('channel') == 'user':
                                     logger.info("✓ User WebSocket authenticated successfully")
 
-                            await process_user_data(json_data)
+                            await handler(json_data)
                         except json.JSONDecodeError as e:
                             logger.error(f"Failed to parse user WebSocket message: {message}. Error: {e}")
                 except websockets.ConnectionClosed as e:
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Reproduz uma gravação do feed de mercado (FEED_RECORD_DIR) em process_data.
+
+Usos:
+- carga reproduzível para profiling
+- regressão de book state (--expect-digest compara o digest final)
+- avaliação offline sobre tráfego real
+
+Usage:
+    python replay_feed.py feed_records/                  # velocidade original
+    python replay_feed.py feed_records/ --speed 10       # 10x
+    python replay_feed.py feed_records/ --speed max      # o mais rápido possível
+    python replay_feed.py feed_records/ --speed max --dump-books books.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+from poly_data.feed_replay import replay, book_digest, book_summary
+
+
+def parse_speed(value: str) -> float:
+    if value.lower() in ('max', 'fast', '0'):
+        return 0.0
+    return float(value.lower().rstrip('x'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay de gravações do feed de mercado em process_data")
+    parser.add_argument('path', help='Diretório da gravação ou segmento .frames.gz')
+    parser.add_argument('--speed', type=parse_speed, default=1.0,
+                        help="1 = original, N = N× mais rápido, 'max' = sem espera (padrão: 1)")
+    parser.add_argument('--limit', type=int, default=None, help='Máximo de frames')
+    parser.add_argument('--trade', action='store_true',
+                        help='Dispara perform_trade (exige client e planilha configurados)')
+    parser.add_argument('--with-logging', action='store_true', help='Mantém logs INFO de process_data')
+    parser.add_argument('--dump-books', type=str, default=None, help='Salva top-5 níveis por mercado em JSON')
+    parser.add_argument('--expect-digest', type=str, default=None,
+                        help='Falha (exit 1) se o digest final do book for diferente')
+    args = parser.parse_args()
+
+    if not args.with_logging:
+        logging.disable(logging.INFO)
+
+    stats = asyncio.run(replay(args.path, speed=args.speed, trade=args.trade, limit=args.limit))
+    print(stats.report())
+
+    digest = book_digest()
+    print(f"book digest: {digest}")
+
+    if args.dump_books:
+        with open(args.dump_books, 'w') as f:
+            json.dump({'digest': digest, 'books': book_summary()}, f, indent=2)
+        print(f"Books salvos em {args.dump_books}")
+
+    if args.expect_digest and args.expect_digest != digest:
+        print(f"❌ Digest diferente do esperado ({args.expect_digest})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Backtest de um mercado sobre uma gravação do feed (FEED_RECORD_DIR).
+
+A linha do mercado e os parâmetros vêm da planilha (get_sheet_df), de um
+JSON (--row / --params) ou de um dos PARAMETER_SETS de update_hyperparameters.py
+(--param-set, pode ser repetido para comparar).
+
+Usage:
+    python run_backtest.py feed_records/ --market <condition_id>
+    python run_backtest.py feed_records/ --market <condition_id> --param-set conservative --param-set aggressive
+    python run_backtest.py feed_records/ --row market.json --params params.json --json result.json
+"""
+import argparse
+import json
+import logging
+import sys
+
+from backtest import load_tapes, run_backtest, FILL_MODELS
+
+
+def load_sheet_rows(markets=None):
+    """Linhas de Selected Markets por condition_id (todas ou só `markets`) e os Hyperparameters."""
+    from poly_data.utils import get_sheet_df
+    df, params = get_sheet_df()
+    rows = {}
+    for row in df.to_dict('records'):
+        market = str(row.get('condition_id') or '')
+        if market and (markets is None or market in markets):
+            rows[market] = row
+    return rows, params
+
+
+def load_row_and_params(market: str):
+    """Linha do mercado e parâmetros do seu param_type, lidos da planilha."""
+    rows, params = load_sheet_rows([market])
+    if market not in rows:
+        raise SystemExit(f"❌ Mercado {market} não está em Selected Markets")
+    return rows[market], params
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest da lógica de cotação sobre gravações do feed")
+    parser.add_argument('path', help='Diretório da gravação ou segmento .frames.gz')
+    parser.add_argument('--market', type=str, default=None, help='condition_id (padrão: o da --row)')
+    parser.add_argument('--row', type=str, default=None, help='JSON com a linha do mercado (colunas da planilha)')
+    parser.add_argument('--params', type=str, default=None, help='JSON com um conjunto de Hyperparameters')
+    parser.add_argument('--param-set', action='append', default=[],
+                        help='Conjunto de update_hyperparameters.PARAMETER_SETS (pode repetir)')
+    parser.add_argument('--fill-model', choices=sorted(FILL_MODELS), default='queue')
+    parser.add_argument('--decision-interval', type=float, default=None,
+                        help='Segundos simulados entre decisões em price_change (padrão: 30)')
+    parser.add_argument('--json', type=str, default=None, help='Salva os resultados em JSON')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    sheet_params = {}
+    if args.row:
+        with open(args.row) as f:
+            row = json.load(f)
+    elif args.market:
+        row, sheet_params = load_row_and_params(args.market)
+    else:
+        parser.error('informe --market ou --row')
+    market = args.market or row['condition_id']
+    row.setdefault('condition_id', market)
+
+    param_sets = {}
+    if args.params:
+        with open(args.params) as f:
+            param_sets['custom'] = json.load(f)
+    if args.param_set:
+        from update_hyperparameters import PARAMETER_SETS
+        for name in args.param_set:
+            param_sets[name] = {k: v for k, v in PARAMETER_SETS[name].items() if k != 'description'}
+    if not param_sets:
+        param_type = row.get('param_type')
+        if param_type not in sheet_params:
+            parser.error('sem parâmetros: use --params, --param-set ou um mercado da planilha')
+        param_sets[param_type] = sheet_params[param_type]
+
+    token1 = {market: str(row['token1'])} if row.get('token1') else None
+    tapes = load_tapes(args.path, markets=[market], token1=token1)
+    tape = tapes.get(market)
+    if tape is None or not len(tape):
+        print(f"❌ Nenhum evento de {market} em {args.path}")
+        sys.exit(1)
+
+    kwargs = {}
+    if args.decision_interval is not None:
+        kwargs['decision_interval_s'] = args.decision_interval
+
+    results = []
+    for name, params in param_sets.items():
+        result = run_backtest(tape, dict(row, param_type=name), params,
+                              fill_model=FILL_MODELS[args.fill_model](), **kwargs)
+        print(result.report())
+        results.append(result.to_dict())
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Resultados salvos em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
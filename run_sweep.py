@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Sweep de hiperparâmetros sobre uma gravação do feed, em vários processos.
+
+Os mercados vêm de Selected Markets (ou --rows), a base de um conjunto de
+update_hyperparameters.PARAMETER_SETS, e cada --grid varia um parâmetro.
+Os resultados vão sendo gravados em --results; o melhor conjunto (soma de
+--metric sobre os mercados) é salvo no formato da aba Hyperparameters.
+
+Usage:
+    python run_sweep.py feed_records/ --grid take_profit_threshold=1,2,3 --grid stop_loss_threshold=-1,-2,-3
+    python run_sweep.py feed_records/ --base-set aggressive --grid trade_size=20,50 --workers 8 \\
+        --results sweep_results.csv --write-hyperparameters config/hyperparameters.csv --type-name sweep_best
+"""
+import argparse
+import json
+import logging
+
+from backtest import FILL_MODELS
+from backtest.sweep import (param_grid, prepare_tapes, run_sweep, rank_param_sets, failed_param_sets,
+                            hyperparameter_rows, write_hyperparameters_csv, ROW_KEYS, SWEEP_WORKERS)
+
+
+def parse_value(value: str):
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def parse_grid(specs):
+    """['take_profit_threshold=1,2,3', ...] -> {'take_profit_threshold': [1, 2, 3], ...}"""
+    axes = {}
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        if not values:
+            raise SystemExit(f"❌ --grid inválido: {spec} (use nome=v1,v2,...)")
+        axes[name.strip()] = [parse_value(v) for v in values.split(',') if v.strip()]
+    return axes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep de hiperparâmetros com backtests em paralelo")
+    parser.add_argument('path', help='Diretório da gravação ou segmento .frames.gz')
+    parser.add_argument('--market', action='append', default=None, help='condition_id (pode repetir; padrão: todos)')
+    parser.add_argument('--rows', type=str, default=None,
+                        help='JSON {condition_id: linha} em vez de ler Selected Markets')
+    parser.add_argument('--base-set', type=str, default='default', help='Conjunto base de PARAMETER_SETS')
+    parser.add_argument('--grid', action='append', default=[], help='nome=v1,v2,... (pode repetir)')
+    parser.add_argument('--workers', type=int, default=SWEEP_WORKERS, help='Processos (padrão: núcleos)')
+    parser.add_argument('--fill-model', choices=sorted(FILL_MODELS), default='queue')
+    parser.add_argument('--tape-dir', type=str, default='data/backtest_tapes', help='Fitas decodificadas (mmap)')
+    parser.add_argument('--results', type=str, default='sweep_results.csv', help='CSV com um resultado por job')
+    parser.add_argument('--metric', type=str, default='total', help='Métrica do ranking (padrão: PnL + recompensas)')
+    parser.add_argument('--write-hyperparameters', type=str, default=None,
+                        help='Salva o melhor conjunto como CSV type/param/value')
+    parser.add_argument('--type-name', type=str, default='sweep_best', help='Nome do param_type salvo')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+
+    if args.rows:
+        with open(args.rows) as f:
+            rows = json.load(f)
+        if args.market:
+            rows = {market: row for market, row in rows.items() if market in args.market}
+    else:
+        from run_backtest import load_sheet_rows
+        rows, _ = load_sheet_rows(args.market)
+    if not rows:
+        raise SystemExit("❌ Nenhum mercado para o sweep")
+
+    from update_hyperparameters import PARAMETER_SETS
+    axes = parse_grid(args.grid)
+    param_sets = param_grid(PARAMETER_SETS[args.base_set], axes)
+    print(f"{len(rows)} mercados × {len(param_sets)} conjuntos = {len(rows) * len(param_sets)} backtests")
+
+    tape_paths = prepare_tapes(args.path, args.tape_dir, rows)
+    results = run_sweep(tape_paths, rows, param_sets, results_path=args.results,
+                        workers=args.workers, fill_model=args.fill_model)
+    print(f"Resultados em {args.results}")
+
+    ranked = rank_param_sets(results, args.metric)
+    failed = failed_param_sets(results)
+    if failed:
+        print(f"⚠️  {len(failed)} conjuntos fora do ranking por erro em algum mercado:")
+        for name, failures in sorted(failed.items(), key=lambda item: -item[1])[:5]:
+            print(f"  {name}: {failures} mercados com erro")
+    if not ranked:
+        print("❌ Nenhum conjunto terminou todos os mercados sem erro")
+        return
+    print("=" * 80)
+    print(f"TOP 5 ({args.metric}, soma sobre os mercados)")
+    for name, value, markets in ranked[:5]:
+        combo = {k: v for k, v in param_sets[name].items() if k in axes}
+        print(f"  {name}: {value:.2f} ({markets} mercados) {combo}")
+    print("=" * 80)
+
+    best = param_sets[ranked[0][0]]
+    print(f"Melhor conjunto como linhas de Hyperparameters ({args.type_name}):")
+    for line in hyperparameter_rows(args.type_name, best):
+        print(f"  {line['type']}\t{line['param']}\t{line['value']}")
+    overrides = {k: v for k, v in best.items() if k in ROW_KEYS}
+    if overrides:
+        print(f"Colunas de Selected Markets: {overrides}")
+    if args.write_hyperparameters:
+        write_hyperparameters_csv(args.write_hyperparameters, args.type_name, best)
+        print(f"Salvo em {args.write_hyperparameters}")
+
+
+if __name__ == "__main__":
+    main()
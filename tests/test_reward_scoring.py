@@ -0,0 +1,68 @@
+"""
+score_markets_batch against the pandas reference (score_market) on random books.
+"""
+import random
+from types import SimpleNamespace
+
+import numpy as np
+
+from data_updater.reward_scoring import compare_with_reference, score_market, score_markets_batch
+
+USDC = '0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174'
+
+
+def _row(i, tick, max_spread, rate):
+    return {
+        'question': f'question {i}', 'neg_risk': False, 'condition_id': f'cond-{i}',
+        'tokens': [{'outcome': 'Yes', 'token_id': f'tok-{i}-1'}, {'outcome': 'No', 'token_id': f'tok-{i}-2'}],
+        'rewards': {'min_size': 50, 'max_spread': max_spread,
+                    'rates': [{'asset_address': USDC, 'rewards_daily_rate': rate}]},
+        'minimum_tick_size': tick, 'end_date_iso': '2030-01-01T00:00:00Z', 'market_slug': f'market-{i}',
+    }
+
+
+def _book(rng, best_bid, best_ask, tick):
+    """CLOB book: bids ascending, asks descending (best price last), prices as strings."""
+    bids = [round(best_bid - tick * k, 3) for k in range(rng.randint(0, 15))]
+    asks = [round(best_ask + tick * k, 3) for k in range(rng.randint(0, 15))]
+    return SimpleNamespace(
+        bids=[{'price': str(p), 'size': str(rng.randint(5, 5000))} for p in sorted(p for p in bids if p > 0)],
+        asks=[{'price': str(p), 'size': str(rng.randint(5, 5000))} for p in sorted((p for p in asks if p < 1),
+                                                                                     reverse=True)])
+
+
+def _random_markets(seed, count):
+    rng = random.Random(seed)
+    rows, books = [], []
+    for i in range(count):
+        tick = rng.choice([0.01, 0.001])
+        best_bid = round(rng.randint(1, 980) / 1000, 3)
+        # Spreads of an odd number of 0.001 ticks put the midpoint on a rounding tie (e.g. 0.2055)
+        best_ask = min(0.999, round(best_bid + rng.randint(1, 40) / 1000, 3))
+        rows.append(_row(i, tick, rng.choice([1.5, 2.0, 3.0, 3.5, 4.5]), rng.choice([5, 10, 25, 50, 100, 250])))
+        books.append(_book(rng, best_bid, best_ask, tick))
+    return rows, books
+
+
+def test_batch_matches_reference_on_random_books():
+    rows, books = _random_markets(seed=34, count=400)
+    assert compare_with_reference(rows, books) == []
+
+
+def test_batch_matches_reference_on_rounding_ties():
+    # Books where round(..., 3) of the quoting range lands on a tie: Python float and np.float64 disagree
+    rows, books = [], []
+    for i, (bid, ask, max_spread) in enumerate([(0.775, 0.798, 1.5), (0.739, 0.758, 3.5), (0.22, 0.229, 1.5)]):
+        rows.append(_row(i, 0.001, max_spread, 50))
+        books.append(SimpleNamespace(bids=[{'price': str(bid), 'size': '100'}],
+                                     asks=[{'price': str(ask), 'size': '100'}]))
+    assert compare_with_reference(rows, books) == []
+
+
+def test_best_prices_are_numpy_floats_like_the_reference():
+    rows, books = _random_markets(seed=1, count=20)
+    for ref, fast in zip((score_market(r, b) for r, b in zip(rows, books)), score_markets_batch(rows, books)):
+        for field in ('best_bid', 'best_ask'):
+            assert type(fast[field]) is type(ref[field])
+            if isinstance(ref[field], np.floating):
+                assert fast[field] == ref[field]
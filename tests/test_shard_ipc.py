@@ -0,0 +1,109 @@
+"""
+Frames and struct encodings of the coordinator <-> shard worker channel.
+"""
+import asyncio
+import json
+import socket
+import struct
+
+import pandas as pd
+import pytest
+
+from poly_data.shard_ipc import (
+    MAX_FRAME, MSG_CONFIG, MSG_INTENT, MSG_ORDERS, MSG_POSITIONS, MSG_RESULT, MSG_STATUS, MSG_STOP, MSG_USER,
+    OP_CREATE, OP_MERGE, decode_config, decode_intent, decode_orders, decode_positions, decode_result,
+    decode_status, encode_config, encode_intent, encode_orders, encode_positions, encode_result, encode_status,
+    frame, read_frame, shard_of,
+)
+
+TOKEN = '71321045679252212594626385532706912750332728571942532289631379312455583992563'
+
+
+def _read_all(data: bytes, count: int):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return [await read_frame(reader) for _ in range(count)]
+    return asyncio.run(run())
+
+
+def test_intent_round_trip():
+    payload = encode_intent(7, OP_CREATE, TOKEN, 'sell', 0.455, 125.5, neg_risk=True)
+    assert decode_intent(payload) == {'id': 7, 'op': OP_CREATE, 'target': TOKEN, 'side': 'SELL',
+                                      'price': 0.455, 'size': 125.5, 'neg_risk': True}
+    merge = decode_intent(encode_intent(0xFFFFFFFF, OP_MERGE, '0xabc', size=20.0))
+    assert (merge['id'], merge['side'], merge['price'], merge['neg_risk']) == (0xFFFFFFFF, 'BUY', 0.0, False)
+
+
+def test_result_round_trip():
+    assert decode_result(encode_result(3, True, '0x' + 'ab' * 32)) == (3, True, '0x' + 'ab' * 32)
+    assert decode_result(encode_result(4, False)) == (4, False, '')
+
+
+def test_ledger_round_trips():
+    positions = [(TOKEN, 150.25, 0.52), ('2', 0.0, 0.0)]
+    assert decode_positions(encode_positions(positions)) == positions
+    orders = [(TOKEN, 'BUY', 0.44, 100.0, 12.5), ('2', 'SELL', 0.61, 50.0, 0.0)]
+    assert decode_orders(encode_orders(orders)) == orders
+    assert decode_positions(encode_positions([])) == []
+    assert decode_orders(encode_orders([])) == []
+
+
+def test_config_and_status_round_trips():
+    df = pd.DataFrame([{'question': 'Q?', 'token1': TOKEN, 'token2': '2', 'condition_id': '0xc'}])
+    version, content_hash, decoded, params = decode_config(encode_config(5, 'hash', df, {'default': {'a': 1}}))
+    assert (version, content_hash, params) == (5, 'hash', {'default': {'a': 1}})
+    pd.testing.assert_frame_equal(decoded, df)
+    status = decode_status(encode_status(10, 20, 3, 2 ** 40, 7))
+    assert status == {'markets': 10, 'assets': 20, 'positions': 3, 'user_events': 2 ** 40, 'intents': 7}
+
+
+def test_frames_are_read_back_in_order():
+    user_event = json.dumps({'event_type': 'trade', 'market': '0xc'}).encode()
+    data = (frame(MSG_USER, user_event) + frame(MSG_RESULT, encode_result(1, True, 'x'))
+            + frame(MSG_STOP) + frame(MSG_POSITIONS, encode_positions([(TOKEN, 1.0, 0.5)])))
+    frames = _read_all(data, 4)
+    assert [kind for kind, _ in frames] == [MSG_USER, MSG_RESULT, MSG_STOP, MSG_POSITIONS]
+    assert frames[0][1] == user_event
+    assert frames[2][1] == b''
+    assert decode_positions(frames[3][1]) == [(TOKEN, 1.0, 0.5)]
+
+
+def test_frames_over_a_socketpair():
+    async def run():
+        left, right = socket.socketpair()
+        _, writer = await asyncio.open_unix_connection(sock=left)
+        reader, _ = await asyncio.open_unix_connection(sock=right)
+        payloads = [encode_intent(i, OP_CREATE, TOKEN, 'BUY', 0.5, 10.0) for i in range(200)]
+        for payload in payloads:
+            writer.write(frame(MSG_INTENT, payload))
+        writer.write(frame(MSG_STATUS, encode_status(1, 2, 3, 4, 5)))
+        await writer.drain()
+        received = [await read_frame(reader) for _ in range(201)]
+        writer.close()
+        return received
+    received = asyncio.run(run())
+    assert [decode_intent(p)['id'] for _, p in received[:200]] == list(range(200))
+    assert received[200][0] == MSG_STATUS
+
+
+def test_frame_limits():
+    with pytest.raises(ValueError):
+        frame(MSG_CONFIG, b'\x00' * (MAX_FRAME + 1))
+    # A corrupted header announcing more than MAX_FRAME is rejected before reading the payload
+    header = struct.pack('<IB', MAX_FRAME + 1, MSG_CONFIG)
+    with pytest.raises(ValueError):
+        _read_all(header, 1)
+    # Truncated stream: the other side closed mid-frame
+    with pytest.raises(asyncio.IncompleteReadError):
+        _read_all(frame(MSG_USER, b'{"a": 1}')[:-2], 1)
+    # Ids are length-prefixed with a uint16
+    with pytest.raises(struct.error):
+        encode_result(1, True, 'x' * 65536)
+
+
+def test_shard_of_is_stable():
+    assert shard_of('0xabc', 1) == 0
+    assert shard_of('0xabc', 4) == shard_of('0xabc', 4)
+    assert {shard_of(f'0x{i:064x}', 4) for i in range(64)} == {0, 1, 2, 3}
@@ -0,0 +1,76 @@
+import asyncio
+
+import pandas as pd
+
+import poly_data.global_state as global_state
+from poly_data.state_journal import StateJournal, POSITION
+
+
+class FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get_all_positions(self):
+        return pd.DataFrame(self.rows, columns=['asset', 'size', 'avgPrice'])
+
+
+def _write_journal(directory, positions):
+    journal = StateJournal(str(directory))
+    journal.open('0xWallet')
+    global_state.positions = {token: dict(value) for token, value in positions.items()}
+    journal.all_positions()
+    journal.close()
+
+
+def test_verify_zeroes_positions_missing_on_exchange(tmp_path, monkeypatch):
+    monkeypatch.setattr(global_state, 'performing', {})
+    monkeypatch.setattr(global_state, 'last_trade_update', {})
+    _write_journal(tmp_path, {'kept': {'size': 10.0, 'avgPrice': 0.4}, 'sold': {'size': 25.0, 'avgPrice': 0.6}})
+    global_state.positions = {}
+
+    journal = StateJournal(str(tmp_path))
+    assert journal.restore('0xwallet')
+    assert global_state.positions['sold']['size'] == 25.0
+    journal.open('0xWallet')
+    monkeypatch.setattr(global_state, 'client', FakeClient([('kept', 10.0, 0.4)]))
+
+    asyncio.run(journal.verify())
+
+    assert global_state.positions['sold']['size'] == 0
+    assert global_state.positions['kept']['size'] == 10.0
+    assert journal.drift == 1
+    # A posição zerada foi journalizada: um novo restore já a vê zerada
+    assert journal.positions['sold']['size'] == 0
+    journal.close()
+    global_state.positions = {}
+    assert StateJournal(str(tmp_path)).restore('0xWallet')
+    assert global_state.positions['sold']['size'] == 0
+
+
+def test_verify_keeps_local_only_position_with_pending_trades(tmp_path, monkeypatch):
+    monkeypatch.setattr(global_state, 'performing', {'sold_sell': {'trade-1'}})
+    monkeypatch.setattr(global_state, 'last_trade_update', {})
+    _write_journal(tmp_path, {'sold': {'size': 25.0, 'avgPrice': 0.6}})
+    global_state.positions = {}
+
+    journal = StateJournal(str(tmp_path))
+    assert journal.restore('0xWallet')
+    journal.open('0xWallet')
+    monkeypatch.setattr(global_state, 'client', FakeClient([]))
+
+    asyncio.run(journal.verify())
+
+    assert global_state.positions['sold']['size'] == 25.0
+    journal.close()
+
+
+def test_torn_tail_is_dropped_on_replay(tmp_path):
+    _write_journal(tmp_path, {'a': {'size': 1.0, 'avgPrice': 0.5}})
+    with open(tmp_path / 'journal.log', 'a') as f:
+        f.write(f'00000000 [99,0,"{POSITION}","a",')
+    global_state.positions = {}
+
+    journal = StateJournal(str(tmp_path))
+    assert journal.restore('0xWallet')
+    assert global_state.positions == {'a': {'size': 1.0, 'avgPrice': 0.5}}
+    assert journal.torn == 1
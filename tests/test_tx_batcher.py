@@ -0,0 +1,194 @@
+"""
+Safe multiSend batching: calldata layout, batch planning and a real Safe on eth-tester.
+
+tests/fixtures/safe_contracts.json holds the compiled Safe v1.3.0 singleton
+and proxy, MultiSendCallOnly v1.4.1 and an ERC20 test token (abi + bytecode
+from the Safe releases). ERC20 transfers out of the Safe stand in for the
+redeemPositions calls: they are plain CALLs batched the same way.
+"""
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from eth_utils import keccak, to_checksum_address
+from web3 import Web3
+
+from claimer_core.tx_batcher import (
+    MULTISEND_SELECTOR, SafeBatcher, ZERO_ADDRESS, encodeMultiSend, signSafeTxHash, submitBatchToSafe,
+)
+from claimer_core.tx_manager import TxManager
+
+TESTER_KEY = '0x' + '00' * 31 + '01'
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'safe_contracts.json')
+
+
+def test_encode_multisend_layout():
+    first = {'to': '0x' + '11' * 20, 'data': '0xdeadbeef', 'value': 5}
+    second = {'to': '0x' + '22' * 20, 'data': bytes(range(37))}
+    encoded = encodeMultiSend([first, second])
+
+    assert encoded[:4] == MULTISEND_SELECTOR
+    assert int.from_bytes(encoded[4:36], 'big') == 32  # offset of the bytes argument
+    length = int.from_bytes(encoded[36:68], 'big')
+    packed = encoded[68:68 + length]
+    assert length == (1 + 20 + 32 + 32 + 4) + (1 + 20 + 32 + 32 + 37)
+    # Right-padded to a 32-byte word with zeros
+    assert (len(encoded) - 4) % 32 == 0
+    assert encoded[68 + length:] == b'\x00' * ((-length) % 32)
+
+    assert packed[0] == 0  # CALL
+    assert packed[1:21] == bytes.fromhex('11' * 20)
+    assert int.from_bytes(packed[21:53], 'big') == 5
+    assert int.from_bytes(packed[53:85], 'big') == 4
+    assert packed[85:89] == bytes.fromhex('deadbeef')
+    rest = packed[89:]
+    assert rest[0] == 0
+    assert rest[1:21] == bytes.fromhex('22' * 20)
+    assert int.from_bytes(rest[21:53], 'big') == 0
+    assert int.from_bytes(rest[53:85], 'big') == 37
+    assert rest[85:] == bytes(range(37))
+
+
+def test_sign_safe_tx_hash_is_eth_sign_with_v_plus_4():
+    tx_hash = keccak(b'safe tx')
+    signature = signSafeTxHash(tx_hash, TESTER_KEY)
+    assert len(signature) == 65
+    assert signature[64] in (31, 32)
+    vrs = (signature[64] - 4, int.from_bytes(signature[:32], 'big'), int.from_bytes(signature[32:64], 'big'))
+    recovered = Account.recover_message(encode_defunct(primitive=tx_hash), vrs=vrs)
+    assert recovered == Account.from_key(TESTER_KEY).address
+
+
+class StubBatcher(SafeBatcher):
+    """SafeBatcher with estimateGas stubbed: a fixed cost per redeem, reverting for marked ones."""
+
+    def __init__(self, gas_per_redeem=100_000, base_gas=50_000):
+        self.safe = SimpleNamespace(functions=SimpleNamespace(nonce=lambda: SimpleNamespace(call=lambda: 0)))
+        self.gas_per_redeem = gas_per_redeem
+        self.base_gas = base_gas
+        self.estimates = []
+
+    def estimateGas(self, tx_datas, safe_nonce):
+        self.estimates.append(len(tx_datas))
+        if any(tx.get('reverts') for tx in tx_datas):
+            raise ValueError('execution reverted: GS013')
+        return self.base_gas + self.gas_per_redeem * len(tx_datas)
+
+
+def _redeems(count, reverting=()):
+    return [{'to': '0x' + '44' * 20, 'data': '0x01', 'position_info': {'asset': str(i)}, 'reverts': i in reverting}
+            for i in range(count)]
+
+
+def test_plan_batches_halves_an_over_cap_batch():
+    batcher = StubBatcher()
+    redeems = _redeems(8)
+    # 8 redeems need 850k; the cap fits 4 (450k)
+    planned, failed = batcher.planBatches(redeems, max_gas=500_000)
+    assert failed == []
+    assert batcher.estimates == [8, 4, 4]
+    assert [len(batch) for batch, _ in planned] == [4, 4]
+    assert [gas for _, gas in planned] == [450_000, 450_000]
+    assert [tx for batch, _ in planned for tx in batch] == redeems
+
+
+def test_plan_batches_isolates_a_reverting_redeem():
+    batcher = StubBatcher()
+    redeems = _redeems(6, reverting={4})
+    planned, failed = batcher.planBatches(redeems, max_gas=10_000_000)
+    assert [tx for tx, _ in failed] == [redeems[4]]
+    assert 'GS013' in failed[0][1]
+    batched = [tx for batch, _ in planned for tx in batch]
+    assert batched == [tx for tx in redeems if tx is not redeems[4]]
+
+
+def test_plan_batches_respects_max_size():
+    planned, failed = StubBatcher().planBatches(_redeems(5), max_gas=10_000_000, max_size=2)
+    assert failed == []
+    assert [len(batch) for batch, _ in planned] == [2, 2, 1]
+
+
+# ============ Safe + MultiSendCallOnly on eth-tester ============
+
+@pytest.fixture
+def chain():
+    eth_tester = pytest.importorskip('eth_tester')
+    from web3 import EthereumTesterProvider
+    web3 = Web3(EthereumTesterProvider(eth_tester.EthereumTester()))
+    owner = Account.from_key(TESTER_KEY).address
+    with open(FIXTURES) as f:
+        artifacts = json.load(f)
+
+    def deploy(name, *args):
+        factory = web3.eth.contract(abi=artifacts[name]['abi'], bytecode=artifacts[name]['bytecode'])
+        receipt = web3.eth.wait_for_transaction_receipt(factory.constructor(*args).transact({'from': owner}))
+        return web3.eth.contract(address=receipt['contractAddress'], abi=artifacts[name]['abi'])
+
+    singleton = deploy('Safe')
+    proxy = deploy('SafeProxy', singleton.address)
+    safe = web3.eth.contract(address=proxy.address, abi=artifacts['Safe']['abi'])
+    safe.functions.setup([owner], 1, ZERO_ADDRESS, b'', ZERO_ADDRESS, ZERO_ADDRESS, 0,
+                         ZERO_ADDRESS).transact({'from': owner})
+    multisend = deploy('MultiSendCallOnly')
+    token = deploy('ERC20', 'Test', 'TST', 18, safe.address, 1_000)
+    return SimpleNamespace(web3=web3, safe=safe, multisend=multisend, token=token)
+
+
+def _transfer(chain, recipient, amount):
+    data = chain.token.functions.transfer(to_checksum_address(recipient), amount)._encode_transaction_data()
+    return {'to': chain.token.address, 'data': data, 'value': 0, 'position_info': {'asset': recipient}}
+
+
+def test_submit_batch_to_safe_runs_several_calls_in_one_exec_transaction(chain):
+    manager = TxManager(chain.web3, TESTER_KEY)
+    recipients = ['0x' + f'{i:02x}' * 20 for i in range(0xa1, 0xa5)]
+    txs = [_transfer(chain, r, 10 * (i + 1)) for i, r in enumerate(recipients)]
+
+    results = submitBatchToSafe(txs, chain.safe.address, chain.web3, TESTER_KEY,
+                                multisend_address=chain.multisend.address, tx_manager=manager)
+
+    assert [r['status'] for r in results] == ['success']
+    assert [p['asset'] for p in results[0]['positions']] == recipients
+    for i, recipient in enumerate(recipients):
+        assert chain.token.functions.balanceOf(to_checksum_address(recipient)).call() == 10 * (i + 1)
+    assert chain.token.functions.balanceOf(chain.safe.address).call() == 1_000 - 100
+    # One execTransaction: one Safe nonce and one sender transaction
+    assert chain.safe.functions.nonce().call() == 1
+    assert chain.web3.eth.get_transaction_count(manager.sender) == manager._next_nonce
+    assert manager.sent == 1
+    assert manager.in_flight == {}
+
+
+def test_submit_batch_to_safe_leaves_out_a_reverting_redeem(chain):
+    manager = TxManager(chain.web3, TESTER_KEY)
+    recipients = ['0x' + f'{i:02x}' * 20 for i in range(0xa1, 0xa5)]
+    txs = [_transfer(chain, r, 10 * (i + 1)) for i, r in enumerate(recipients)]
+    # More than the Safe holds: its estimate reverts, so it is split off and reported
+    txs.insert(2, _transfer(chain, '0x' + 'ee' * 20, 10_000))
+
+    results = submitBatchToSafe(txs, chain.safe.address, chain.web3, TESTER_KEY,
+                                multisend_address=chain.multisend.address, tx_manager=manager)
+
+    batches = [r for r in results if r['status'] != 'error']
+    errors = [r for r in results if r['status'] == 'error']
+    assert {r['status'] for r in batches} == {'success'}
+    assert [p['asset'] for r in batches for p in r['positions']] == recipients
+    assert [r['positions'][0]['asset'] for r in errors] == ['0x' + 'ee' * 20]
+    for i, recipient in enumerate(recipients):
+        assert chain.token.functions.balanceOf(to_checksum_address(recipient)).call() == 10 * (i + 1)
+    # Batches went out back to back with consecutive Safe nonces
+    assert chain.safe.functions.nonce().call() == len(batches)
+    assert manager.in_flight == {}
+
+
+def test_send_call_executes_a_plain_call_through_the_safe(chain):
+    manager = TxManager(chain.web3, TESTER_KEY)
+    batcher = SafeBatcher(chain.web3, chain.safe.address, TESTER_KEY, chain.multisend.address, manager)
+    recipient = '0x' + 'b1' * 20
+    tx_hash = batcher.sendCall(chain.token.address, _transfer(chain, recipient, 7)['data'])
+    assert manager.waitForReceipt(tx_hash, timeout=10)['status'] == 1
+    assert chain.token.functions.balanceOf(to_checksum_address(recipient)).call() == 7
+    assert chain.safe.functions.nonce().call() == 1
@@ -0,0 +1,152 @@
+"""
+TxManager against a local EVM node.
+
+Uses anvil (Foundry) when it is on PATH, with automine off, so several
+transactions really are in flight at once. Without anvil, the in-process
+eth-tester chain is used for the tests that don't need a mempool.
+"""
+import shutil
+import socket
+import subprocess
+import time
+
+import pytest
+from eth_account import Account
+from web3 import Web3
+
+from claimer_core.receipt_tracker import trackReceipts
+from claimer_core.tx_manager import TxManager
+
+ANVIL_KEY = '0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80'
+TESTER_KEY = '0x' + '00' * 31 + '01'
+RECIPIENT = '0x' + '22' * 20
+CALL_DATA = '0xabcdef01'
+
+
+class Node:
+    def __init__(self, web3, key, mine, mempool):
+        self.web3 = web3
+        self.key = key
+        self.mine = mine
+        self.mempool = mempool  # False: transactions are mined as they are sent
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def node():
+    anvil = shutil.which('anvil')
+    if anvil:
+        port = _free_port()
+        process = subprocess.Popen([anvil, '--port', str(port), '--no-mining', '--silent'])
+        web3 = Web3(Web3.HTTPProvider(f'http://127.0.0.1:{port}'))
+        for _ in range(100):
+            if web3.is_connected():
+                break
+            time.sleep(0.1)
+        yield Node(web3, ANVIL_KEY, lambda: web3.provider.make_request('evm_mine', []), True)
+        process.terminate()
+        process.wait()
+        return
+    eth_tester = pytest.importorskip('eth_tester')
+    from web3 import EthereumTesterProvider
+    provider = EthereumTesterProvider(eth_tester.EthereumTester())
+    yield Node(Web3(provider), TESTER_KEY, provider.ethereum_tester.mine_blocks, False)
+
+
+def _send(manager):
+    return manager.send({'to': RECIPIENT, 'data': CALL_DATA, 'value': 1})
+
+
+def test_consecutive_nonces_with_several_in_flight(node):
+    manager = TxManager(node.web3, node.key)
+    hashes = [_send(manager) for _ in range(5)]
+
+    assert sorted(manager.in_flight) == [0, 1, 2, 3, 4]
+    assert [manager.in_flight[n] for n in range(5)] == hashes
+    if node.mempool:
+        assert node.web3.eth.get_transaction_count(manager.sender, 'latest') == 0
+    node.mine()
+    for tx_hash in hashes:
+        assert manager.waitForReceipt(tx_hash, timeout=10)['status'] == 1
+    assert manager.in_flight == {}
+    assert node.web3.eth.get_transaction_count(manager.sender, 'latest') == 5
+    assert manager.resyncs == 0
+
+
+def test_resync_after_nonce_too_low(node):
+    if not node.mempool:
+        pytest.skip("needs anvil (node error 'nonce too low')")
+    manager = TxManager(node.web3, node.key)
+    first = _send(manager)
+    node.mine()
+    manager.waitForReceipt(first, timeout=10)
+
+    # Another process uses the next nonce of the same key: the local counter is now stale
+    account = Account.from_key(node.key)
+    external = account.sign_transaction({'to': RECIPIENT, 'value': 1, 'gas': 30000, 'nonce': 1,
+                                         'gasPrice': node.web3.eth.gas_price, 'chainId': node.web3.eth.chain_id})
+    node.web3.eth.send_raw_transaction(external.raw_transaction)
+    node.mine()
+
+    tx_hash = _send(manager)
+    assert manager.resyncs == 1
+    assert node.web3.eth.get_transaction(tx_hash)['nonce'] == 2
+    node.mine()
+    assert manager.waitForReceipt(tx_hash, timeout=10)['status'] == 1
+
+
+def test_estimate_cache_hits(node):
+    manager = TxManager(node.web3, node.key)
+    for _ in range(3):
+        _send(manager)
+    assert manager.estimate_misses == 1
+    assert manager.estimate_hits == 2
+    # Other selector, other cache entry
+    manager.send({'to': RECIPIENT, 'data': '0x12345678', 'value': 1})
+    assert manager.estimate_misses == 2
+
+
+def test_track_receipts_clears_in_flight(node):
+    manager = TxManager(node.web3, node.key)
+    results = [{'status': 'pending', 'tx_hash': _send(manager)} for _ in range(3)]
+    assert all(r['tx_hash'].startswith('0x') for r in results)
+    node.mine()
+
+    trackReceipts(node.web3, results, tx_manager=manager, timeout=10, mode='poll')
+    assert [r['status'] for r in results] == ['success'] * 3
+    assert manager.in_flight == {}
+    assert manager.snapshot()['in_flight'] == 0
+
+
+def test_safe_nonce_is_local_while_exec_transactions_are_in_flight():
+    manager = TxManager(None, TESTER_KEY)
+    safe = '0x' + '33' * 20
+
+    assert manager.nextSafeNonce(safe, 7) == 7
+    manager.in_flight[0] = '0xaa'
+    manager.sentSafeTx(safe, 7, '0xaa')
+    # The first execTransaction is not mined yet: the on-chain nonce still says 7
+    assert manager.nextSafeNonce(safe, 7) == 8
+    manager.in_flight[1] = '0xbb'
+    manager.sentSafeTx(safe, 8, '0xbb')
+    assert manager.nextSafeNonce(safe, 7) == 9
+
+    # Both mined: back to the chain
+    manager.confirm('0xaa')
+    manager.confirm('0xbb')
+    assert manager.nextSafeNonce(safe, 9) == 9
+
+
+def test_safe_nonce_gap_is_dropped_when_nothing_is_in_flight():
+    manager = TxManager(None, TESTER_KEY)
+    safe = '0x' + '33' * 20
+    manager.in_flight[0] = '0xaa'
+    manager.sentSafeTx(safe, 7, '0xaa')
+    # The execTransaction reverted (Safe nonce not consumed) and its receipt was seen
+    manager.confirm('0xaa')
+    assert manager.nextSafeNonce(safe, 7) == 7
@@ -11,15 +11,30 @@ import poly_data.global_state as global_state
 import poly_data.CONSTANTS as CONSTANTS
 
 # Import utility functions for trading
-from poly_data.trading_utils import get_best_bid_ask_deets, get_order_prices, get_buy_sell_amount, round_down, round_up
+from poly_data.trading_utils import (get_best_bid_ask_deets, get_order_prices, get_buy_sell_amount,
+                                     should_stop_loss, round_down, round_up)
 from poly_data.data_utils import get_position, get_order, set_position
 from poly_data.trade_logger import log_trade_to_sheets
 from poly_data.reward_tracker import log_market_snapshot
+from poly_data.profiler_capture import profiler_capture
+from poly_data.bounded_cache import BoundedCache, STATE_CACHE_MAXSIZE
+from poly_data.live_volatility import live_volatility
+from poly_data.state_journal import state_journal
 
 # Create directory for storing position risk information
 if not os.path.exists('positions/'):
     os.makedirs('positions/')
 
+def order_log_status(result):
+    """Trade Log status of a create_order result.
+
+    Shard workers get {'status': 'queued'} back before the coordinator has
+    placed the order; the worker logs PLACED/FAILED when the result arrives.
+    """
+    if not result:
+        return 'FAILED'
+    return 'QUEUED' if result.get('status') == 'queued' else 'PLACED'
+
 def send_buy_order(order):
     """
     Create a BUY order for a specific token.
@@ -99,7 +114,7 @@ def send_buy_order(order):
                     'price': order['price'],
                     'size': order['size'],
                     'order_id': result.get('orderID', 'N/A') if result else 'FAILED',
-                    'status': 'PLACED' if result else 'FAILED',
+                    'status': order_log_status(result),
                     'token_id': order['token'],
                     'neg_risk': order['neg_risk'] == 'TRUE',
                     'position_before': position_before,
@@ -184,7 +199,7 @@ def send_sell_order(order):
             'price': order['price'],
             'size': order['size'],
             'order_id': result.get('orderID', 'N/A') if result else 'FAILED',
-            'status': 'PLACED' if result else 'FAILED',
+            'status': order_log_status(result),
             'token_id': order['token'],
             'neg_risk': order['neg_risk'] == 'TRUE',
             'position_before': position_before,
@@ -195,8 +210,11 @@ def send_sell_order(order):
         print(f"⚠️  Trade logging failed: {e}")
 
 # Dictionary to store locks for each market to prevent concurrent trading on the same market
-market_locks = {}
+# Locks held by a running perform_trade are never evicted
+market_locks = BoundedCache(maxsize=STATE_CACHE_MAXSIZE, name='market_locks',
+                            pinned=lambda market, lock: lock.locked())
 
+@profiler_capture.track('perform_trade')
 async def perform_trade(market):
     """
     Main trading function that handles market making for a specific market.
@@ -228,6 +246,9 @@ async def perform_trade(market):
 
             # Get trading parameters for this market type
             params = global_state.params[row['param_type']]
+
+            # 3h volatility for the risk checks: live feed estimate and/or sheet value (LIVE_VOLATILITY)
+            volatility_3h = live_volatility.volatility_3h(market, row['3_hour'])
             
             # Create a list with both outcomes for the market
             deets = [
@@ -494,12 +515,10 @@ async def perform_trade(market):
                     pos_to_sell = sell_amount  # Amount to sell in risk-off scenario
 
                     # ------- STOP-LOSS LOGIC -------
-                    # Trigger stop-loss if either:
-                    # 1. PnL is below threshold and spread is tight enough to exit
-                    # 2. Volatility is too high
-                    if (pnl < params['stop_loss_threshold'] and spread <= params['spread_threshold']) or row['3_hour'] > params['volatility_threshold']:
+                    # Low PnL with a tight enough spread to exit, or volatility too high
+                    if should_stop_loss(pnl, spread, volatility_3h, params):
                         risk_details['msg'] = (f"Selling {pos_to_sell} because spread is {spread} and pnl is {pnl} "
-                                              f"and ratio is {ratio} and 3 hour volatility is {row['3_hour']}")
+                                              f"and ratio is {ratio} and 3 hour volatility is {volatility_3h}")
                         print("Stop loss Triggered: ", risk_details['msg'])
 
                         # Sell at market best bid to ensure execution
@@ -516,6 +535,7 @@ async def perform_trade(market):
 
                         # Save risk details to file
                         open(fname, 'w').write(json.dumps(risk_details))
+                        state_journal.risk_off(market, risk_details)
                         continue
 
                 # ------- BUY ORDER LOGIC -------
@@ -583,8 +603,8 @@ async def perform_trade(market):
                     if send_buy:
                         # RELAXED CONDITIONS FOR TESTING: Increased volatility threshold and price deviation
                         # Original: row['3_hour'] > params['volatility_threshold'] or price_change >= 0.05
-                        if row['3_hour'] > params['volatility_threshold'] * 2 or price_change >= 0.15:
-                            print(f'3 Hour Volatility of {row["3_hour"]} is greater than max volatility of '
+                        if volatility_3h > params['volatility_threshold'] * 2 or price_change >= 0.15:
+                            print(f'3 Hour Volatility of {volatility_3h} is greater than max volatility of '
                                   f'{params["volatility_threshold"] * 2} or price of {order["price"]} is outside '
                                   f'0.15 of {sheet_value}. Cancelling all orders')
                             client.cancel_all_asset(order['token'])
@@ -6,10 +6,35 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from poly_data.polymarket_client import PolymarketClient
+from poly_data.book_reader import BookReader
 from poly_data.utils import get_sheet_df
 import pandas as pd
 
+# Books exportados pelo bot mais velhos que isso são ignorados (usa a API)
+MAX_BOOK_AGE_S = 60
+
+
+def obter_book(reader, client_holder, condition_id, token1):
+    """(bids, asks, origem): book do bot em memória compartilhada se recente, senão via API."""
+    book = reader.read(str(condition_id))
+    if book is not None and book.age_s < MAX_BOOK_AGE_S:
+        bids = [{'price': price, 'size': size} for price, size in book.bids]
+        asks = [{'price': price, 'size': size} for price, size in book.asks]
+        return bids, asks, f"bot, {book.age_s:.0f}s"
+
+    if not client_holder:
+        from poly_data.polymarket_client import PolymarketClient
+        client_holder.append(PolymarketClient())
+    order_book_result = client_holder[0].get_order_book(token1)
+    # get_order_book retorna uma tupla (bids_df, asks_df)
+    if not order_book_result or len(order_book_result) != 2:
+        return None
+    bids_df, asks_df = order_book_result
+    bids = bids_df.to_dict('records') if not bids_df.empty else []
+    asks = asks_df.to_dict('records') if not asks_df.empty else []
+    return bids, asks, "API"
+
+
 def verificar_atividade_mercados():
     """Verifica a atividade dos mercados inscritos."""
     
@@ -17,9 +42,14 @@ def verificar_atividade_mercados():
     print("🔍 VERIFICAÇÃO DE ATIVIDADE DOS MERCADOS")
     print("=" * 70)
     
-    # Inicializar cliente
-    print("\n1️⃣  Inicializando cliente...")
-    client = PolymarketClient()
+    # Books do bot em execução (o cliente da API só é criado se algum faltar)
+    print("\n1️⃣  Abrindo books exportados pelo bot...")
+    reader = BookReader()
+    client_holder = []
+    if reader.available():
+        print(f"✅ {len(reader.markets())} mercados publicados pelo bot")
+    else:
+        print("⚠️  Bot não está exportando books; usando a API")
     
     # Carregar mercados
     print("\n2️⃣  Carregando mercados da planilha...")
@@ -48,16 +78,13 @@ def verificar_atividade_mercados():
         
         # Verificar order book do token1
         try:
-            order_book_result = client.get_order_book(token1)
-            # get_order_book retorna uma tupla (bids_df, asks_df)
-            if order_book_result and len(order_book_result) == 2:
-                bids_df, asks_df = order_book_result
-                bids = bids_df.to_dict('records') if not bids_df.empty else []
-                asks = asks_df.to_dict('records') if not asks_df.empty else []
+            result = obter_book(reader, client_holder, condition_id, token1)
+            if result is not None:
+                bids, asks, origem = result
                 best_bid = float(bids[0]['price']) if bids and len(bids) > 0 else 0
                 best_ask = float(asks[0]['price']) if asks and len(asks) > 0 else 0
                 
-                print(f"   ✅ Order Book Token1:")
+                print(f"   ✅ Order Book Token1 ({origem}):")
                 print(f"      Bids: {len(bids)}, Asks: {len(asks)}")
                 print(f"      Best Bid: ${best_bid:.4f}, Best Ask: ${best_ask:.4f}")
                 print(f"      Spread: ${best_ask - best_bid:.4f}")
@@ -82,6 +109,7 @@ def verificar_atividade_mercados():
     print(f"✅ Mercados com atividade: {mercados_com_atividade}")
     print(f"⚠️  Mercados sem atividade: {mercados_sem_atividade}")
     print(f"📈 Total: {len(df_selected)}")
+    reader.close()
     
     if mercados_sem_atividade > 0:
         print(f"\n⚠️  ATENÇÃO: {mercados_sem_atividade} mercado(s) sem atividade.")
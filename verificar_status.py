@@ -95,6 +95,30 @@ if os.path.exists("main.log"):
 else:
     print("   ⚠️  main.log não encontrado (bot nunca foi iniciado)")
 
+print()
+
+# 5. Books exportados pelo bot
+print("5. Books do bot (memória compartilhada):")
+try:
+    from poly_data.book_reader import BookReader
+    with BookReader() as reader:
+        writers = reader.writers()
+        if not writers:
+            print("   ⚠️  Nenhuma exportação encontrada (BOOK_EXPORT desligado ou bot parado)")
+        for w in writers:
+            status = "✅" if w['alive'] else "❌"
+            print(f"   {status} {w['path']} (pid {w['pid']}, heartbeat há {w['heartbeat_age_s']}s)")
+        books = reader.read_all()
+        if books:
+            print(f"   ✅ {len(books)} mercado(s) publicados")
+            recentes = sorted(books.values(), key=lambda b: b.updated_ns, reverse=True)[:5]
+            for b in recentes:
+                mid = f"{b.mid:.4f}" if b.mid is not None else "N/A"
+                spread = f"{b.spread:.4f}" if b.spread is not None else "N/A"
+                print(f"      {b.market[:20]}... mid {mid} spread {spread} ({b.age_s:.0f}s)")
+except Exception as e:
+    print(f"   ❌ Erro ao ler books: {e}")
+
 print()
 print("="*60)
 print("💡 Para iniciar o bot: python main.py")